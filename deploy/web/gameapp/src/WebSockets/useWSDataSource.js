@@ -124,6 +124,35 @@ const getItems = (action) => {
   return stringifyList(objects, "nothing of interest");
 };
 
+/*
+    Apply a node change from a sync_actions message to the known nodes,
+    returning false if the change is to a node we don't know about
+  */
+const applyNodeDelta = (nodes, nodeId, delta) => {
+  if (delta.full) {
+    nodes[nodeId] = delta.full;
+    return true;
+  }
+  if (!nodes[nodeId]) {
+    return false;
+  }
+  // Copy on write, as past messages may refer to the old node
+  const node = { ...nodes[nodeId], ...(delta.set || {}) };
+  (delta.unset || []).forEach((field) => {
+    delete node[field];
+  });
+  Object.keys(delta.items || {}).forEach((field) => {
+    const change = delta.items[field];
+    const items = { ...(node[field] || {}), ...change.set };
+    change.unset.forEach((key) => {
+      delete items[key];
+    });
+    node[field] = items;
+  });
+  nodes[nodeId] = node;
+  return true;
+};
+
 //
 export function useWSDataSource(url) {
   /*---------------STATE----------------*/
@@ -138,22 +167,66 @@ export function useWSDataSource(url) {
   /*---------------REFS----------------*/
   const websocket = useRef();
   const agentList = useRef(agents);
+  const syncedNodes = useRef({});
+  const syncedRoomState = useRef({});
+  const syncVersion = useRef(0);
   /*---------------REDUCERS----------------*/
   const [messages, appendMessage] = useReducer(reducer, []);
 
   agentList.current = agents;
 
+  const requestSync = useCallback(() => {
+    syncedNodes.current = {};
+    syncVersion.current = 0;
+    websocket.current.send(JSON.stringify({ command: "sync", data: {} }));
+  }, [websocket]);
+
   const handleMessage = useCallback(
     (msg) => {
       const cmd = JSON.parse(msg.data);
-      if (cmd.command === "actions") {
+      if (cmd.command === "sync_actions") {
+        // Only node changes are sent, so they must apply in order
+        if (cmd.base_version !== syncVersion.current && !cmd.snapshot) {
+          requestSync();
+          return;
+        }
+        if (cmd.snapshot) {
+          syncedNodes.current = {};
+          syncedRoomState.current = {};
+        }
+        const nodes = syncedNodes.current;
+        const applied = Object.keys(cmd.nodes).every((nodeId) =>
+          applyNodeDelta(nodes, nodeId, cmd.nodes[nodeId])
+        );
+        if (!applied) {
+          requestSync();
+          return;
+        }
+        syncVersion.current = cmd.version;
+        cmd.data.forEach((action) => {
+          // Present agents and objects are only sent when they change
+          ["present_agent_ids", "objects"].forEach((key) => {
+            if (action[key] === undefined) {
+              action[key] = syncedRoomState.current[key];
+            } else {
+              syncedRoomState.current[key] = action[key];
+            }
+          });
+          action.room = nodes[action.room_id];
+          action.actor = nodes[action.actor_id];
+          action.target_nodes = action.target_ids.map((nodeId) => nodes[nodeId]);
+        });
+      }
+      if (cmd.command === "actions" || cmd.command === "sync_actions") {
         const buffer = [];
 
         cmd.data.forEach((action) => {
           const isPersonaDescription = action.caller === "SoulSpawnEvent";
           const isLocationDescription = action.caller === "LookEvent";
-          action.room = JSON.parse(action.room);
-          action.actor = JSON.parse(action.actor);
+          if (cmd.command === "actions") {
+            action.room = JSON.parse(action.room);
+            action.actor = JSON.parse(action.actor);
+          }
           var new_agents = {
             ...agentList.current,
             ...action.present_agent_ids,
@@ -193,7 +266,7 @@ export function useWSDataSource(url) {
         setFull(true);
       }
     },
-    [appendMessage, setPersona, setAgents, setLocation]
+    [appendMessage, setPersona, setAgents, setLocation, requestSync]
   );
 
   useEffect(() => {
@@ -229,6 +302,8 @@ export function useWSDataSource(url) {
 
     websocket.current.onopen = () => {
       setConnected(true);
+      // Ask for versioned node changes rather than full node dumps
+      websocket.current.send(JSON.stringify({ command: "sync", data: {} }));
       const hb = JSON.stringify({ command: "hb", data: {} });
       var interval = window.setInterval(() => {
         websocket.current.send(hb);
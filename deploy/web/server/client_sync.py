@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Versioned client-sync protocol for the game socket. The legacy `actions`
+messages embed the full json of the room, actor, and targets with every
+event. Clients that send a `sync` command instead receive `sync_actions`
+messages, which refer to nodes by id and carry only the node changes the
+client hasn't seen yet:
+
+- A full snapshot of the room and everything in it when the player arrives
+- Afterwards, for each node of an event, only the fields that changed, with
+  dict fields (contents, neighbors) diffed item by item
+- The agents and objects present, only when they differ from the last sent
+
+Each message is numbered, and carries the number of the message before it.
+A client that misses a message (or loses its state) sends `sync` again to
+start over from a new snapshot.
+"""
+
+import json
+
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from light.graph.elements.graph_nodes import GraphAgent, GraphNode
+    from light.graph.events.base import GraphEvent
+
+# Parts of the frontend form replaced by node ids in the sync protocol
+NODE_FORM_KEYS = ["room", "actor", "target_nodes"]
+# Parts of the frontend form only sent when they change
+ROOM_STATE_KEYS = ["present_agent_ids", "objects"]
+
+
+def _encode_items(items: Dict[str, str]) -> str:
+    """Join pre-encoded json values into a json object"""
+    return "{%s}" % ",".join(f"{json.dumps(k)}:{v}" for k, v in items.items())
+
+
+def _encode_field(value: Any) -> str:
+    if isinstance(value, dict):
+        return _encode_items(value)
+    return value
+
+
+def get_field_delta(
+    old_fields: Dict[str, Any], new_fields: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Return the changes from one set of field fragments to another, as
+    pre-encoded `set` values, `unset` field names, and per-item `items`
+    changes for dict fields
+    """
+    set_fields: Dict[str, str] = {}
+    item_changes: Dict[str, str] = {}
+    for key, value in new_fields.items():
+        old_value = old_fields.get(key)
+        if old_value is value or old_value == value:
+            continue
+        if isinstance(value, dict) and isinstance(old_value, dict):
+            changed_items = {k: v for k, v in value.items() if old_value.get(k) != v}
+            removed_items = [k for k in old_value if k not in value]
+            item_changes[key] = '{"set":%s,"unset":%s}' % (
+                _encode_items(changed_items),
+                json.dumps(removed_items),
+            )
+        else:
+            set_fields[key] = _encode_field(value)
+    delta: Dict[str, Any] = {}
+    if len(set_fields) > 0:
+        delta["set"] = _encode_items(set_fields)
+    unset_fields = [k for k in old_fields if k not in new_fields]
+    if len(unset_fields) > 0:
+        delta["unset"] = json.dumps(unset_fields)
+    if len(item_changes) > 0:
+        delta["items"] = _encode_items(item_changes)
+    return delta
+
+
+class ClientSyncState:
+    """
+    Tracks what a single connected client knows about the world, and builds
+    the `sync_actions` messages that bring it up to date.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.room_id: Optional[str] = None
+        # Version vector, the message version each known node was last sent in
+        self.node_versions: Dict[str, int] = {}
+        # The field fragments the client last received for each node. These are
+        # shared with the node's own cache, so unchanged nodes cost no copies.
+        self._known_fields: Dict[str, Dict[str, Any]] = {}
+        self._room_state: Dict[str, Any] = {}
+        self.total_messages = 0
+        self.total_snapshots = 0
+
+    def reset(self) -> None:
+        """Forget everything sent, so the next message is a full snapshot"""
+        self.room_id = None
+        self.node_versions = {}
+        self._known_fields = {}
+        self._room_state = {}
+
+    def get_node_delta(self, node: "GraphNode") -> Optional[str]:
+        """
+        Return the encoded changes to send for the given node, or None if
+        the client is already up to date
+        """
+        new_fields = node.get_field_fragments()
+        old_fields = self._known_fields.get(node.node_id)
+        if old_fields is new_fields:
+            return None
+        self._known_fields[node.node_id] = new_fields
+        self.node_versions[node.node_id] = self.version
+        if old_fields is None:
+            return '{"full":%s}' % node.to_fragment()
+        # Every client seeing this change needs the same delta, so it is
+        # cached with the node's current state along with the state it's from
+        cached_deltas = node.get_cached_fragment("sync_deltas", list)
+        for cached_old_fields, encoded_delta in cached_deltas:
+            if cached_old_fields is old_fields:
+                return encoded_delta
+        delta = get_field_delta(old_fields, new_fields)
+        encoded_delta = _encode_items(delta) if len(delta) > 0 else None
+        cached_deltas.append((old_fields, encoded_delta))
+        return encoded_delta
+
+    def get_synced_nodes(
+        self, event: "GraphEvent", viewer: "GraphAgent"
+    ) -> Tuple[List["GraphNode"], bool]:
+        """
+        Return the nodes the client needs current for this event, and if this
+        is a snapshot. Snapshots of the whole room are taken whenever the
+        viewer has arrived somewhere new.
+        """
+        nodes = [event.room, event.actor, viewer] + list(event.target_nodes)
+        room = viewer.get_room()
+        if not room or room.node_id == self.room_id:
+            return nodes, False
+        # Arrived in a new room, send everything in it from scratch
+        self.reset()
+        self.room_id = room.node_id
+        self.total_snapshots += 1
+        return [room] + room.get_contents() + nodes, True
+
+    def build_message(
+        self,
+        event: "GraphEvent",
+        viewer: "GraphAgent",
+        view_text: Optional[str] = None,
+    ) -> str:
+        """Return the encoded `sync_actions` message for the given event"""
+        base_version = self.version
+        self.version += 1
+        nodes, is_snapshot = self.get_synced_nodes(event, viewer)
+        node_deltas: Dict[str, str] = {}
+        for node in nodes:
+            if node.node_id in node_deltas:
+                continue
+            delta = self.get_node_delta(node)
+            if delta is not None:
+                node_deltas[node.node_id] = delta
+
+        if view_text is None:
+            view_text = event.view_as(viewer)
+        form = event.get_shared_frontend_form()[0]
+        action: Dict[str, Any] = {
+            k: v for k, v in form.items() if k not in NODE_FORM_KEYS
+        }
+        for key in ROOM_STATE_KEYS:
+            # Clients reuse the last values they were sent
+            if self._room_state.get(key) == action[key]:
+                del action[key]
+            else:
+                self._room_state[key] = action[key]
+        action["text"] = view_text
+        action["room_id"] = event.room.node_id
+        action["actor_id"] = event.actor.node_id
+        action["target_ids"] = [x.node_id for x in event.target_nodes]
+        self.total_messages += 1
+        return (
+            '{"command":"sync_actions","version":%d,"base_version":%d,'
+            '"snapshot":%s,"nodes":%s,"data":[%s]}'
+            % (
+                self.version,
+                base_version,
+                json.dumps(is_snapshot),
+                _encode_items(node_deltas),
+                json.dumps(action, separators=(",", ":")),
+            )
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "known_nodes": len(self.node_versions),
+            "total_messages": self.total_messages,
+            "total_snapshots": self.total_snapshots,
+        }
@@ -11,15 +11,23 @@ Examples:
 python model_server.py model.opt_file=../../../light/registry/models/config/generic_act_model.opt
 python model_server.py model.opt_file=../../../light/registry/models/config/baseline_adversarial_safety.opt
 python model_server.py model._loader=ParlAIActingScore model.opt_file=../../../light/registry/models/config/baseline_roleplaying_scorer.opt
+
+Concurrent requests are gathered into a queue and run through the model's
+`batch_act` in batches of up to `max_batch_size`, with no request waiting more
+than `max_latency` seconds for its batch to fill. Batching metrics are served
+from `/stats`.
 """
 
+import inspect
 import json
 import logging
 import os
+import time
 import traceback
 import asyncio
 import gc
 import hydra
+from omegaconf import OmegaConf
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING, Any, Dict, Optional, List
 
@@ -28,6 +36,7 @@ import tornado.ioloop
 import tornado.web
 
 from light import LIGHT_DIR
+from light.registry.model_batcher import ModelBatcher, ParlAIBatchedAgentWrapper
 from light.registry.model_pool import ModelPool, ModelTypeName
 from light.registry.parlai_model import ParlAIModelConfig
 from light.registry.hydra_registry import register_script_config, ScriptConfig
@@ -35,6 +44,7 @@ from light.registry.hydra_registry import register_script_config, ScriptConfig
 
 if TYPE_CHECKING:
     from parlai.core.agents import Agent
+    from parlai.core.message import Message
 
 tornado_settings = {
     "autoescape": None,
@@ -42,22 +52,69 @@ tornado_settings = {
 }
 DEFAULT_HOSTNAME = "localhost"
 DEFAULT_PORT = 40000
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_LATENCY = 0.01
 
 HYDRA_CONFIG_DIR = os.path.join(LIGHT_DIR, "hydra_configs")
 
 
+def get_batcher(
+    model: "Agent",
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    max_latency: float = DEFAULT_MAX_LATENCY,
+) -> ModelBatcher:
+    """
+    Get the batcher to queue requests for the given model. Models loaded
+    with batching already share one, otherwise requests are queued to run
+    one at a time, so that they never interleave on the model's state.
+    """
+    if isinstance(model, ParlAIBatchedAgentWrapper):
+        return model.batcher
+
+    async def act_in_order(observations: List["Message"]) -> List["Message"]:
+        acts = []
+        for observation in observations:
+            model.observe(observation)
+            act = model.act()
+            if inspect.isawaitable(act):
+                act = await act
+            acts.append(act)
+        return acts
+
+    return ModelBatcher(
+        act_in_order, max_batch_size=max_batch_size, batch_window=max_latency
+    )
+
+
 class ModelServer(tornado.web.Application):
-    def __init__(self, model: "Agent", given_tornado_settings=None):
+    def __init__(
+        self,
+        model: "Agent",
+        given_tornado_settings=None,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_latency: float = DEFAULT_MAX_LATENCY,
+    ):
         self.model = model
+        self.batcher = get_batcher(model, max_batch_size, max_latency)
+        self.start_time = time.time()
 
         super(ModelServer, self).__init__(self.get_handlers(), **given_tornado_settings)
 
     def get_handlers(self):
         return [
-            (r"/model_request", ResponseHandler, {"model": self.model}),
+            (r"/model_request", ResponseHandler, {"batcher": self.batcher}),
             (r"/is_alive", AliveHandler, {}),
+            (r"/stats", StatsHandler, {"app": self}),
         ]
 
+    def get_stats(self) -> Dict[str, Any]:
+        """Return batching, queue, and throughput metrics for the server"""
+        stats = self.batcher.get_stats()
+        stats["uptime"] = time.time() - self.start_time
+        stats["max_batch_size"] = self.batcher.max_batch_size
+        stats["max_latency"] = self.batcher.batch_window
+        return stats
+
 
 class BaseHandler(tornado.web.RequestHandler):
     def __init__(self, *request, **kwargs):
@@ -92,29 +149,39 @@ class ResponseHandler(BaseHandler):
     return a result
     """
 
-    def initialize(self, model):
-        self.model = model
+    def initialize(self, batcher):
+        self.batcher = batcher
 
-    async def post(self):
-        # Process the data to extract the act
-        data = tornado.escape.json_decode(self.request.body)
-        message = data["observation"]
-        # Pass the act to the model
-        self.model.observe(message)
-        # return the response
-        response = await self.model.act()
+    async def get_response(self, message):
+        """Queue the act for the model, and return a serializable response"""
+        response = await self.batcher.submit(message)
         if "metrics" in response:
             del response["metrics"]
         if "sorted_scores" in response and not isinstance(
-            response["sorted_scored"], list
+            response["sorted_scores"], list
         ):
-            response["sorted_scores"].force_set(response["sorted_scores"].tolist())
+            response.force_set("sorted_scores", response["sorted_scores"].tolist())
+        return response
+
+    async def post(self):
+        # Process the data to extract the act
+        data = tornado.escape.json_decode(self.request.body)
+        if "observations" in data:
+            # Remote clients coalesce concurrent acts into one request
+            responses = await asyncio.gather(
+                *[self.get_response(message) for message in data["observations"]]
+            )
+            result = {"acts": responses}
+        else:
+            responses = [await self.get_response(data["observation"])]
+            result = {"act": responses[0]}
         try:
-            self.write(json.dumps({"act": response}))
+            self.write(json.dumps(result))
         except TypeError:
             print("JSON encoding failed:")
-            print(response.keys())
-            print(response)
+            for response in responses:
+                print(response.keys())
+                print(response)
             raise
 
 
@@ -132,8 +199,25 @@ class AliveHandler(BaseHandler):
         self.write(json.dumps({"alive": True}))
 
 
+class StatsHandler(BaseHandler):
+    """
+    Handler to report throughput, queue wait, and batch size metrics
+    """
+
+    def initialize(self, app):
+        self.app = app
+
+    def get(self):
+        self.write(json.dumps(self.app.get_stats()))
+
+
 def _run_server(
-    given_tornado_settings: Dict[str, Any], hostname: str, port: int, model: "Agent"
+    given_tornado_settings: Dict[str, Any],
+    hostname: str,
+    port: int,
+    model: "Agent",
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    max_latency: float = DEFAULT_MAX_LATENCY,
 ):
     """
     Run the model server with the given setup configuration
@@ -143,6 +227,8 @@ def _run_server(
     app = ModelServer(
         model=model,
         given_tornado_settings=given_tornado_settings,
+        max_batch_size=max_batch_size,
+        max_latency=max_latency,
     )
     app.listen(port, max_buffer_size=1024 ** 3)
     print("Model Server Started")
@@ -154,8 +240,19 @@ def _run_server(
     print("Exiting server")
 
 
-def _init_model(cfg: ParlAIModelConfig) -> "Agent":
-    """Initialize a model for serving"""
+def _init_model(
+    cfg: ParlAIModelConfig,
+    max_batch_size: int = 1,
+    max_latency: float = DEFAULT_MAX_LATENCY,
+) -> "Agent":
+    """
+    Initialize a model for serving, loading it for use with `batch_act`
+    if batches of more than one request are allowed
+    """
+    if max_batch_size > 1:
+        cfg = OmegaConf.merge(
+            cfg, {"max_batch_size": max_batch_size, "batch_window": max_latency}
+        )
     pool = ModelPool()
     pool.register_model(cfg, [ModelTypeName.SERVED])
     model = pool.get_model(ModelTypeName.SERVED)
@@ -177,6 +274,14 @@ class ModelServerConfig(ScriptConfig):
     hostname: str = field(
         default=DEFAULT_HOSTNAME, metadata={"help": "Host to run the server on"}
     )
+    max_batch_size: int = field(
+        default=DEFAULT_MAX_BATCH_SIZE,
+        metadata={"help": "Most requests to run through the model at once"},
+    )
+    max_latency: float = field(
+        default=DEFAULT_MAX_LATENCY,
+        metadata={"help": "Longest (in seconds) to wait for a batch to fill"},
+    )
 
 
 register_script_config("scriptconfig", ModelServerConfig)
@@ -187,8 +292,15 @@ register_script_config("scriptconfig", ModelServerConfig)
 )
 def main(cfg: ModelServerConfig):
     os.environ["LIGHT_MODEL_ROOT"] = cfg.light.model_root
-    model = _init_model(cfg.model)
-    _run_server(tornado_settings, cfg.hostname, cfg.port, model)
+    model = _init_model(cfg.model, cfg.max_batch_size, cfg.max_latency)
+    _run_server(
+        tornado_settings,
+        cfg.hostname,
+        cfg.port,
+        model,
+        max_batch_size=cfg.max_batch_size,
+        max_latency=cfg.max_latency,
+    )
 
 
 if __name__ == "__main__":
@@ -46,6 +46,8 @@ HYDRA_CONFIG_DIR = os.path.join(LIGHT_DIR, "hydra_configs")
 
 DEFAULT_PORT = 35494
 DEFAULT_HOSTNAME = "localhost"
+DEFAULT_WORKER_BASE_PORT = 36000
+DEFAULT_MODEL_BASE_PORT = 40000
 
 MAP_DIR = os.path.join(LIGHT_DIR, "scripts/examples/prod_maps")
 MAPS = [os.path.join(MAP_DIR, m) for m in os.listdir(MAP_DIR)]
@@ -108,13 +110,36 @@ class WorldServerConfig(ScriptConfig):
         default=False,
         metadata={"help": "Whether to initialize writing episodes to the DB"},
     )
+    num_workers: int = field(
+        default=1,
+        metadata={
+            "help": "Number of world processes to run. More than 1 runs the "
+            "sharded server, with this process routing players to the workers, "
+            "and requires a shared database backend such as aws-postgres."
+        },
+    )
+    worker_base_port: int = field(
+        default=DEFAULT_WORKER_BASE_PORT,
+        metadata={"help": "Ports for sharded world processes are counted from here"},
+    )
+    serve_local_models: bool = field(
+        default=True,
+        metadata={
+            "help": "When sharded, serve each non-remote model from one shared "
+            "model server process rather than loading it in every worker"
+        },
+    )
+    model_base_port: int = field(
+        default=DEFAULT_MODEL_BASE_PORT,
+        metadata={"help": "Ports for shared model server processes start here"},
+    )
 
 
 register_script_config("scriptconfig", WorldServerConfig)
 
 
-def make_app(cfg: WorldServerConfig, model_pool: ModelPool):
-    # Construct tornado settings for this app
+def get_tornado_settings(cfg: WorldServerConfig) -> Dict[str, Any]:
+    """Construct tornado settings for the apps of this server"""
     tornado_settings = {
         "autoescape": None,
         "cookie_secret": cfg.cookie_secret,
@@ -131,6 +156,11 @@ def make_app(cfg: WorldServerConfig, model_pool: ModelPool):
         tornado_settings["facebook_secret"] = cfg.facebook_api_secret
     if cfg.get("facebook_asid_salt", None) is not None:
         tornado_settings["facebook_asid_salt"] = cfg.facebook_asid_salt
+    return tornado_settings
+
+
+def make_app(cfg: WorldServerConfig, model_pool: ModelPool):
+    tornado_settings = get_tornado_settings(cfg)
 
     # TODO re-enable world builder once builder models are hydra-registered
     # worldBuilderApp = BuildApplication(get_handlers(ldb), tornado_settings)
@@ -198,6 +228,12 @@ def main(cfg: WorldServerConfig):
     import numpy
     import random
 
+    if cfg.num_workers > 1:
+        from deploy.web.server.sharded_server import run_sharded_server
+
+        run_sharded_server(cfg)
+        return
+
     model_pool = ModelPool.get_from_config(cfg.light.model_pool)
     random.seed(6)
     numpy.random.seed(6)
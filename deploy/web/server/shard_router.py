@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Router for the sharded world server. Each worker process runs its own
+RegistryApplication with its own worlds, and this application sits in front
+of them, forwarding game requests and player sockets to the owning worker.
+
+Games with an id are owned by the worker their id hashes to. Players on the
+default game are pinned to the least loaded worker when their socket opens,
+and stay pinned (for sockets and api calls) while they have open sockets.
+"""
+
+import json
+import logging
+import uuid
+import zlib
+import tornado.escape
+import tornado.web
+import tornado.websocket
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+
+from typing import Any, Dict, List, Optional
+
+# Headers that describe a single hop, and shouldn't be forwarded
+HOP_HEADERS = {
+    "Connection",
+    "Content-Length",
+    "Keep-Alive",
+    "Transfer-Encoding",
+    "Upgrade",
+}
+# Headers the websocket client sets itself during the handshake
+SOCKET_HANDSHAKE_HEADERS = HOP_HEADERS | {
+    "Host",
+    "Origin",
+    "Sec-Websocket-Extensions",
+    "Sec-Websocket-Key",
+    "Sec-Websocket-Version",
+}
+# Headers tornado sets by default, which the worker's response replaces
+REPLACED_HEADERS = {"Content-Type", "Date", "Server"}
+PROXY_REQUEST_TIMEOUT = 600
+
+
+def get_rand_id():
+    return str(uuid.uuid4())
+
+
+def get_shard_for_key(key: str, num_shards: int) -> int:
+    """Stable assignment of a key to a shard, consistent across processes"""
+    return zlib.crc32(key.encode("utf-8")) % num_shards
+
+
+class ShardRouter:
+    """
+    Tracks which worker owns each game, and which worker each player
+    with an open socket is pinned to.
+    """
+
+    def __init__(self, worker_hosts: List[str]):
+        assert len(worker_hosts) > 0, "Need at least one worker to route to"
+        self.worker_hosts = worker_hosts
+        self.num_shards = len(worker_hosts)
+        self.user_pins: Dict[str, int] = {}
+        self.user_sessions: Dict[str, int] = {}
+        self.shard_sessions: List[int] = [0] * self.num_shards
+        self.total_sessions = 0
+
+    def get_shard_for_game(self, game_id: str) -> int:
+        """Return the shard that owns the given (non-default) game"""
+        return get_shard_for_key(game_id, self.num_shards)
+
+    def get_shard_for_user(self, user_key: str) -> int:
+        """Return the pinned shard for a user, or the least loaded shard"""
+        if user_key in self.user_pins:
+            return self.user_pins[user_key]
+        return min(range(self.num_shards), key=lambda i: self.shard_sessions[i])
+
+    def get_shard(self, game_id: str, user_key: str) -> int:
+        """Return the shard to route a request for the given game and user to"""
+        game_id = game_id.strip("/")
+        if game_id == "":
+            return self.get_shard_for_user(user_key)
+        return self.get_shard_for_game(game_id)
+
+    def open_session(self, user_key: str, shard: int) -> None:
+        """Record a socket opened by the user on the shard, pinning them there"""
+        self.user_pins.setdefault(user_key, shard)
+        self.user_sessions[user_key] = self.user_sessions.get(user_key, 0) + 1
+        self.shard_sessions[shard] += 1
+        self.total_sessions += 1
+
+    def close_session(self, user_key: str, shard: int) -> None:
+        """Record a closed socket, unpinning the user if it was their last"""
+        self.shard_sessions[shard] -= 1
+        self.user_sessions[user_key] -= 1
+        if self.user_sessions[user_key] <= 0:
+            del self.user_sessions[user_key]
+            del self.user_pins[user_key]
+
+    def get_url(self, shard: int, uri: str, scheme: str = "http") -> str:
+        """Return the url for the given request uri on the given shard"""
+        return f"{scheme}://{self.worker_hosts[shard]}{uri}"
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the current session counts for each shard"""
+        return {
+            "workers": self.worker_hosts,
+            "open_sessions": self.shard_sessions,
+            "pinned_users": len(self.user_pins),
+            "total_sessions": self.total_sessions,
+        }
+
+
+def get_user_key(handler: tornado.web.RequestHandler) -> str:
+    """Identify the player making a request, for pinning them to a shard"""
+    for cookie_name in ["user", "preauth"]:
+        cookie = handler.get_secure_cookie(cookie_name)
+        if cookie is not None and cookie != b"":
+            return f"{cookie_name}:{tornado.escape.to_unicode(cookie)}"
+    return f"ip:{handler.request.remote_ip}"
+
+
+class ShardProxyHandler(tornado.web.RequestHandler):
+    """Forward a plain http request to the worker owning it"""
+
+    SUPPORTED_METHODS = ("GET", "POST", "OPTIONS")  # type: ignore
+
+    def initialize(self, shard_router: ShardRouter):
+        self.shard_router = shard_router
+
+    def get_shard(self, *args) -> int:
+        """Route by the player making the request"""
+        return self.shard_router.get_shard_for_user(get_user_key(self))
+
+    def get_upstream_uri(self, *args) -> str:
+        return self.request.uri
+
+    async def forward(self, *args):
+        shard = self.get_shard(*args)
+        url = self.shard_router.get_url(shard, self.get_upstream_uri(*args))
+        headers = {
+            k: v for k, v in self.request.headers.get_all() if k not in HOP_HEADERS
+        }
+        headers["X-Real-Ip"] = self.request.remote_ip
+        body = self.request.body if self.request.method == "POST" else None
+        request = HTTPRequest(
+            url,
+            method=self.request.method,
+            headers=headers,
+            body=body,
+            follow_redirects=False,
+            request_timeout=PROXY_REQUEST_TIMEOUT,
+        )
+        response = await AsyncHTTPClient().fetch(request, raise_error=False)
+        if response.code == 599:
+            logging.error(f"Worker {shard} failed to respond: {response.error}")
+            self.set_status(502)
+            self.write(json.dumps({"failed": "world server unavailable"}))
+            return
+        self.set_status(response.code, response.reason)
+        for k, v in response.headers.get_all():
+            if k in HOP_HEADERS:
+                continue
+            if k in REPLACED_HEADERS:
+                self.set_header(k, v)
+            else:
+                self.add_header(k, v)
+        if response.body:
+            self.write(response.body)
+
+    async def get(self, *args):
+        await self.forward(*args)
+
+    async def post(self, *args):
+        await self.forward(*args)
+
+    async def options(self, *args):
+        await self.forward(*args)
+
+
+class ShardGameCreatorProxyHandler(ShardProxyHandler):
+    """
+    Forward game creation to the worker that will own the game, choosing
+    the game id here when none is given so that it routes consistently
+    """
+
+    def prepare(self):
+        if self.path_args[0] == "":
+            self.path_args[0] = get_rand_id()
+
+    def get_shard(self, game_id) -> int:
+        return self.shard_router.get_shard_for_game(game_id)
+
+    def get_upstream_uri(self, game_id) -> str:
+        uri = f"/game/new/{game_id}"
+        if self.request.query:
+            uri += f"?{self.request.query}"
+        return uri
+
+
+class ShardStatsHandler(tornado.web.RequestHandler):
+    """Report how players are spread across the workers"""
+
+    def initialize(self, shard_router: ShardRouter):
+        self.shard_router = shard_router
+
+    def get(self):
+        self.write(json.dumps(self.shard_router.get_stats()))
+
+
+class ShardSocketProxyHandler(tornado.websocket.WebSocketHandler):
+    """
+    Relay a player's game socket to the worker that owns their game, pinning
+    the player to that worker for as long as the socket is open
+    """
+
+    def initialize(self, shard_router: ShardRouter):
+        self.shard_router = shard_router
+        self.upstream: Optional[tornado.websocket.WebSocketClientConnection] = None
+        self.user_key: Optional[str] = None
+        self.shard: Optional[int] = None
+
+    def check_origin(self, origin):
+        return True
+
+    async def open(self, game_id):
+        user_key = get_user_key(self)
+        shard = self.shard_router.get_shard(game_id, user_key)
+        self.shard_router.open_session(user_key, shard)
+        self.user_key = user_key
+        self.shard = shard
+
+        headers = {
+            k: v
+            for k, v in self.request.headers.get_all()
+            if k not in SOCKET_HANDSHAKE_HEADERS
+        }
+        headers["X-Real-Ip"] = self.request.remote_ip
+        request = HTTPRequest(
+            self.shard_router.get_url(shard, self.request.uri, scheme="ws"),
+            headers=headers,
+        )
+        try:
+            self.upstream = await tornado.websocket.websocket_connect(
+                request, on_message_callback=self.on_upstream_message
+            )
+        except Exception as e:
+            logging.error(f"Could not open socket to worker {shard}: {e}")
+            self.close()
+
+    def on_upstream_message(self, message):
+        """Relay messages from the worker to the player"""
+        if message is None:
+            # The worker closed the socket
+            self.close()
+            return
+        try:
+            self.write_message(message, binary=isinstance(message, bytes))
+        except tornado.websocket.WebSocketClosedError:
+            pass
+
+    async def on_message(self, message):
+        """Relay messages from the player to the worker"""
+        if self.upstream is None:
+            return
+        try:
+            await self.upstream.write_message(
+                message, binary=isinstance(message, bytes)
+            )
+        except tornado.websocket.WebSocketClosedError:
+            self.close()
+
+    def on_close(self):
+        if self.shard is not None:
+            self.shard_router.close_session(self.user_key, self.shard)
+            self.shard = None
+        if self.upstream is not None:
+            self.upstream.close()
+            self.upstream = None
+
+
+class ShardRouterApplication(tornado.web.Application):
+    """
+    Application forwarding all of the /game routes to the worker processes
+    """
+
+    def __init__(self, worker_hosts: List[str], tornado_settings: Dict[str, Any]):
+        self.shard_router = ShardRouter(worker_hosts)
+        super(ShardRouterApplication, self).__init__(
+            self.get_handlers(), **tornado_settings
+        )
+
+    def get_handlers(self):
+        handler_args = {"shard_router": self.shard_router}
+        return [
+            (r"/game/shards", ShardStatsHandler, handler_args),
+            (r"/game/new/(.*)", ShardGameCreatorProxyHandler, handler_args),
+            (r"/game(.*)/socket", ShardSocketProxyHandler, handler_args),
+            (r"/game(.*)", ShardProxyHandler, handler_args),
+        ]
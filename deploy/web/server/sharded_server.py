@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Sharded deployment of the world server, used by run_server.py when
+`num_workers` is more than 1. Each worker process runs its own
+RegistryApplication (and thus its own worlds, purgatory, and souls) on a
+dedicated core, while this process serves the landing pages and routes
+players to the workers with a ShardRouterApplication.
+
+Models configured with a remote loader are shared by every worker already.
+Local models are each loaded once into a shared model server process (unless
+`serve_local_models` is off), with the workers given remote loaders for them.
+
+Every process connects to the configured databases, so users created by the
+landing pages here must be visible to the workers. Only database backends
+served from a shared host can be used, not the in-memory or sqlite ones.
+
+Example:
+python run_server.py num_workers=4
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from omegaconf import OmegaConf, DictConfig
+from tornado.httpserver import HTTPServer
+from tornado.routing import (
+    PathMatches,
+    Rule,
+    RuleRouter,
+)
+
+from deploy.web.server.shard_router import ShardRouterApplication
+from light.registry.parlai_remote_model import server_is_alive
+
+from typing import Any, Dict, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from deploy.web.server.run_server import WorldServerConfig
+
+WORKER_HOSTNAME = "localhost"
+REMOTE_LOADER = "ParlAIRemote"
+MODEL_SERVER_STARTUP_TIMEOUT = 60 * 30
+SUPERVISE_INTERVAL = 5
+# Database backends every process can share. The test backend is in-memory,
+# so is private to each process, and local sqlite files can't take writes from
+# many processes at once.
+SHARED_DB_BACKENDS = ["aws-postgres"]
+
+
+def _run_worker(cfg_dict: Dict[str, Any], port: int) -> None:
+    """Run a world server process, owning the games routed to it"""
+    import numpy
+    import random
+    from light.registry.model_pool import ModelPool
+
+    cfg = OmegaConf.create(cfg_dict)
+    model_pool = ModelPool.get_from_config(cfg.light.model_pool)
+    random.seed(6 + port)
+    numpy.random.seed(6 + port)
+    asyncio.run(_run_worker_server(cfg, model_pool, port))
+
+
+async def _run_worker_server(cfg: DictConfig, model_pool, port: int) -> None:
+    from deploy.web.server.registry import RegistryApplication
+    from deploy.web.server.run_server import get_tornado_settings
+    from light.data_model.db.episodes import EpisodeDB
+    from light.data_model.db.users import UserDB
+
+    db_config = cfg.light.db
+    registry_app = RegistryApplication(
+        cfg,
+        model_pool,
+        get_tornado_settings(cfg),
+        episode_db=EpisodeDB(db_config),
+        user_db=UserDB(db_config),
+    )
+    server = HTTPServer(registry_app)
+    server.listen(port, address=WORKER_HOSTNAME)
+    # Every worker hosts its own copy of the default game
+    _ = await registry_app.run_new_game("")
+    print(f"World worker ready on port {port}")
+    while True:
+        await asyncio.sleep(30)
+
+
+def _run_model_server(model_cfg_dict: Dict[str, Any], model_root: str, port: int):
+    """Run a shared model server process for one local model"""
+    from deploy.web.server.model_server import (
+        DEFAULT_MAX_BATCH_SIZE,
+        _init_model,
+        _run_server,
+        tornado_settings,
+    )
+
+    os.environ["LIGHT_MODEL_ROOT"] = model_root
+    max_batch_size = model_cfg_dict.get("max_batch_size", DEFAULT_MAX_BATCH_SIZE)
+    model = _init_model(OmegaConf.create(model_cfg_dict), max_batch_size)
+    _run_server(
+        tornado_settings, WORKER_HOSTNAME, port, model, max_batch_size=max_batch_size
+    )
+
+
+class ShardedServer:
+    """
+    Launches and supervises the model server and world worker processes
+    for a sharded deployment
+    """
+
+    def __init__(self, cfg: "WorldServerConfig"):
+        assert cfg.light.db.backend in SHARED_DB_BACKENDS, (
+            f"Sharded servers need a database backend shared by all workers, one "
+            f"of {SHARED_DB_BACKENDS}, not {cfg.light.db.backend}. Use num_workers=1 "
+            "with the test or local backends."
+        )
+        self.cfg = cfg
+        self.context = multiprocessing.get_context("spawn")
+        self.cfg_dict: Dict[str, Any] = OmegaConf.to_container(cfg, resolve=True)  # type: ignore
+        self.model_servers: Dict[str, Tuple[int, Any]] = {}
+        self.workers: List[Any] = []
+        self.worker_ports = [cfg.worker_base_port + i for i in range(cfg.num_workers)]
+
+    def get_worker_hosts(self) -> List[str]:
+        return [f"{WORKER_HOSTNAME}:{port}" for port in self.worker_ports]
+
+    def launch_model_servers(self) -> None:
+        """
+        Start a model server for every local model, and point the worker
+        configuration at those servers instead
+        """
+        model_pool_cfg = self.cfg_dict["light"]["model_pool"]
+        port = self.cfg.model_base_port
+        for model_name, model_cfg in model_pool_cfg.items():
+            if not isinstance(model_cfg, dict) or "_loader" not in model_cfg:
+                continue
+            if model_cfg["_loader"] == REMOTE_LOADER:
+                continue
+            process = self.context.Process(
+                target=_run_model_server,
+                args=(model_cfg, self.cfg_dict["light"]["model_root"], port),
+                daemon=True,
+            )
+            process.start()
+            self.model_servers[model_name] = (port, process)
+            model_pool_cfg[model_name] = {
+                "_loader": REMOTE_LOADER,
+                "host": f"http://{WORKER_HOSTNAME}:{port}",
+            }
+            port += 1
+
+        for model_name, (port, process) in self.model_servers.items():
+            print(f"Waiting for the shared {model_name} model on port {port}")
+            host = model_pool_cfg[model_name]["host"]
+            start_time = time.time()
+            while not server_is_alive(host):
+                assert process.is_alive(), f"Model server for {model_name} failed"
+                assert (
+                    time.time() - start_time < MODEL_SERVER_STARTUP_TIMEOUT
+                ), f"Model server for {model_name} took too long to start"
+                time.sleep(5)
+
+    def start_worker(self, idx: int) -> Any:
+        process = self.context.Process(
+            target=_run_worker,
+            args=(self.cfg_dict, self.worker_ports[idx]),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def launch_workers(self) -> None:
+        self.workers = [self.start_worker(i) for i in range(len(self.worker_ports))]
+
+    def restart_dead_workers(self) -> None:
+        """Replace any worker process that has exited"""
+        for idx, process in enumerate(self.workers):
+            if not process.is_alive():
+                print(
+                    f"World worker on port {self.worker_ports[idx]} exited "
+                    f"with {process.exitcode}, restarting"
+                )
+                self.workers[idx] = self.start_worker(idx)
+
+    def shutdown(self) -> None:
+        processes = self.workers + [p for (_port, p) in self.model_servers.values()]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+    async def run_router(self) -> None:
+        """Serve the landing pages, and route games to the workers"""
+        from deploy.web.server.run_server import get_tornado_settings
+        from deploy.web.server.tornado_server import LandingApplication
+        from light.data_model.db.users import UserDB
+
+        cfg = self.cfg
+        tornado_settings = get_tornado_settings(cfg)
+        landing_app = LandingApplication(
+            user_db=UserDB(cfg.light.db),
+            hostname=cfg.hostname,
+            password=cfg.password,
+            given_tornado_settings=tornado_settings,
+        )
+        router_app = ShardRouterApplication(self.get_worker_hosts(), tornado_settings)
+        router = RuleRouter(
+            [
+                Rule(PathMatches("/game.*"), router_app),
+                Rule(PathMatches("/.*"), landing_app),
+            ]
+        )
+        server = HTTPServer(router)
+        server.listen(cfg.port)
+        print(
+            f"\nYou can connect to the game at http://{cfg.hostname}:{cfg.port}/ "
+            f"served by {len(self.workers)} world workers"
+        )
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            self.restart_dead_workers()
+
+
+def run_sharded_server(cfg: "WorldServerConfig") -> None:
+    """Launch all of the processes for a sharded server, then route to them"""
+    sharded_server = ShardedServer(cfg)
+    try:
+        if cfg.serve_local_models:
+            sharded_server.launch_model_servers()
+        sharded_server.launch_workers()
+        asyncio.run(sharded_server.run_router())
+    finally:
+        sharded_server.shutdown()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+import unittest
+
+from deploy.web.server.client_sync import ClientSyncState
+from light.graph.events.graph_events import ArriveEvent, GetObjectEvent, SayEvent
+from light.graph.structured_graph import OOGraph
+from light.world.world import World, WorldConfig
+
+
+class SyncedClient:
+    """Mirror of the game client's handling of sync_actions messages"""
+
+    def __init__(self):
+        self.nodes = {}
+        self.version = 0
+
+    def apply_message(self, encoded):
+        message = json.loads(encoded)
+        assert message["command"] == "sync_actions"
+        assert message["snapshot"] or message["base_version"] == self.version
+        if message["snapshot"]:
+            self.nodes = {}
+        for node_id, delta in message["nodes"].items():
+            if "full" in delta:
+                self.nodes[node_id] = delta["full"]
+                continue
+            node = dict(self.nodes[node_id])
+            node.update(delta.get("set", {}))
+            for field in delta.get("unset", []):
+                del node[field]
+            for field, change in delta.get("items", {}).items():
+                items = dict(node.get(field, {}))
+                items.update(change["set"])
+                for key in change["unset"]:
+                    del items[key]
+                node[field] = items
+            self.nodes[node_id] = node
+        self.version = message["version"]
+        return message
+
+
+class TestClientSync(unittest.TestCase):
+    """Unit tests for sending clients versioned node changes"""
+
+    def setUp(self):
+        graph = OOGraph()
+        self.room = graph.add_room("test room", {"desc": "A room for testing"})
+        self.other_room = graph.add_room("other room", {})
+        graph.add_paths_between(self.room, self.other_room, "a door", "a door")
+        self.player = graph.add_agent("player", {})
+        self.npc = graph.add_agent("npc", {})
+        self.sword = graph.add_object("sword", {})
+        for node in [self.player, self.npc, self.sword]:
+            node.force_move_to(self.room)
+        self.world = World(WorldConfig(), True)
+        self.world.oo_graph = graph
+        self.sync_state = ClientSyncState()
+        self.client = SyncedClient()
+
+    def send(self, event):
+        event.execute(self.world)
+        encoded = self.sync_state.build_message(event, self.player)
+        return encoded, self.client.apply_message(encoded)
+
+    def assert_client_current(self):
+        for node in [self.room, self.player, self.npc]:
+            self.assertEqual(
+                self.client.nodes[node.node_id], json.loads(node.to_fragment())
+            )
+
+    def test_snapshot_then_deltas(self):
+        """Clients should get the room once, and then only what changes"""
+        _, message = self.send(SayEvent(self.npc, text_content="hello"))
+        self.assertTrue(message["snapshot"])
+        self.assertIn(self.sword.node_id, message["nodes"])
+        self.assertEqual(message["data"][0]["room_id"], self.room.node_id)
+        self.assert_client_current()
+
+        encoded, message = self.send(SayEvent(self.npc, text_content="again"))
+        self.assertFalse(message["snapshot"])
+        self.assertEqual(message["nodes"], {})
+        self.assertNotIn("desc", encoded)
+
+        get_event = GetObjectEvent(self.npc, target_nodes=[self.sword, self.room])
+        _, message = self.send(get_event)
+        room_delta = message["nodes"][self.room.node_id]
+        self.assertIn(
+            self.sword.node_id, room_delta["items"]["contained_nodes"]["unset"]
+        )
+        self.assertNotIn("full", message["nodes"][self.npc.node_id])
+        self.assert_client_current()
+        self.assertEqual(self.sync_state.node_versions[self.room.node_id], 3)
+
+    def test_arrival_and_resync_send_snapshots(self):
+        """Moving rooms or resetting should start over with a new snapshot"""
+        self.send(SayEvent(self.npc, text_content="hello"))
+        self.player.force_move_to(self.other_room)
+        _, message = self.send(ArriveEvent(self.player, text_content="arrives"))
+        self.assertTrue(message["snapshot"])
+        self.assertNotIn(self.npc.node_id, self.sync_state.node_versions)
+        self.assertEqual(
+            self.client.nodes[self.other_room.node_id],
+            json.loads(self.other_room.to_fragment()),
+        )
+
+        self.sync_state.reset()
+        _, message = self.send(SayEvent(self.player, text_content="hi"))
+        self.assertTrue(message["snapshot"])
+        self.assertEqual(self.sync_state.get_stats()["total_snapshots"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import asyncio
+import json
+import unittest
+from tornado.testing import AsyncHTTPTestCase, gen_test
+
+from parlai.core.message import Message
+
+from deploy.web.server.model_server import ModelServer
+from deploy.web.server.tests.config import TEST_TORNADO_SETTINGS
+from light.registry.model_batcher import ModelBatcher, ParlAIBatchedAgentWrapper
+
+MAX_BATCH_SIZE = 4
+
+
+class StubModel:
+    """Model that echoes observations, remembering only the latest"""
+
+    def __init__(self):
+        self.observation = None
+
+    def observe(self, observation):
+        self.observation = observation
+
+    async def act(self):
+        observation = self.observation
+        await asyncio.sleep(0.01)
+        return Message({"text": observation["text"].upper()})
+
+
+class TestBatchingModelServer(AsyncHTTPTestCase):
+    """Ensure concurrent requests are batched, and answered correctly"""
+
+    def get_app(self):
+        self.batches = []
+
+        def batch_act(observations):
+            self.batches.append(len(observations))
+            return [Message({"text": obs["text"].upper()}) for obs in observations]
+
+        batcher = ModelBatcher(
+            batch_act, max_batch_size=MAX_BATCH_SIZE, batch_window=0.05
+        )
+        return ModelServer(
+            ParlAIBatchedAgentWrapper(batcher),
+            given_tornado_settings=TEST_TORNADO_SETTINGS,
+        )
+
+    async def request(self, body):
+        response = await self.http_client.fetch(
+            self.get_url("/model_request"), method="POST", body=json.dumps(body)
+        )
+        return json.loads(response.body)
+
+    @gen_test
+    async def test_concurrent_requests_are_batched(self):
+        results = await asyncio.gather(
+            *[self.request({"observation": {"text": f"hi {i}"}}) for i in range(6)]
+        )
+        self.assertEqual(
+            [r["act"]["text"] for r in results], [f"HI {i}" for i in range(6)]
+        )
+        result = await self.request(
+            {"observations": [{"text": "a"}, {"text": "b"}, {"text": "c"}]}
+        )
+        self.assertEqual([act["text"] for act in result["acts"]], ["A", "B", "C"])
+        self.assertTrue(all(size <= MAX_BATCH_SIZE for size in self.batches))
+        self.assertLess(len(self.batches), 9)
+
+        stats = json.loads((await self.http_client.fetch(self.get_url("/stats"))).body)
+        self.assertEqual(stats["completed_requests"], 9)
+        self.assertEqual(stats["total_batches"], len(self.batches))
+        self.assertEqual(stats["max_batch_size"], MAX_BATCH_SIZE)
+        self.assertGreater(stats["throughput"], 0)
+        self.assertGreaterEqual(stats["max_queue_wait"], stats["mean_queue_wait"])
+
+
+class TestUnbatchedModelServer(AsyncHTTPTestCase):
+    """Models without batching should still never interleave requests"""
+
+    def get_app(self):
+        return ModelServer(StubModel(), given_tornado_settings=TEST_TORNADO_SETTINGS)
+
+    @gen_test
+    async def test_requests_do_not_interleave(self):
+        responses = await asyncio.gather(
+            *[
+                self.http_client.fetch(
+                    self.get_url("/model_request"),
+                    method="POST",
+                    body=json.dumps({"observation": {"text": f"hi {i}"}}),
+                )
+                for i in range(5)
+            ]
+        )
+        texts = [json.loads(r.body)["act"]["text"] for r in responses]
+        self.assertEqual(texts, [f"HI {i}" for i in range(5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
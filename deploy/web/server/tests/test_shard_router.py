@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+import unittest
+import tornado.web
+import tornado.websocket
+from omegaconf import OmegaConf
+from tornado.httpserver import HTTPServer
+from tornado.testing import AsyncHTTPTestCase, bind_unused_port, gen_test
+
+from deploy.web.server.shard_router import (
+    ShardRouter,
+    ShardRouterApplication,
+)
+from deploy.web.server.sharded_server import ShardedServer
+from deploy.web.server.tests.config import TEST_TORNADO_SETTINGS
+
+NUM_WORKERS = 3
+
+
+class StubWorkerHandler(tornado.web.RequestHandler):
+    """Report which worker handled the request"""
+
+    def initialize(self, worker_idx):
+        self.worker_idx = worker_idx
+
+    def get(self, path):
+        self.write(json.dumps({"worker": self.worker_idx, "path": path}))
+
+    def post(self, path):
+        self.set_status(201)
+        self.write(json.dumps({"worker": self.worker_idx, "path": path}))
+
+
+class StubWorkerSocket(tornado.websocket.WebSocketHandler):
+    """Echo socket messages, tagged with the worker that saw them"""
+
+    def initialize(self, worker_idx):
+        self.worker_idx = worker_idx
+
+    def on_message(self, message):
+        self.write_message(json.dumps({"worker": self.worker_idx, "echo": message}))
+
+
+class TestShardRouter(unittest.TestCase):
+    """Unit tests for routing games and players to shards"""
+
+    def test_games_route_consistently(self):
+        router = ShardRouter([f"localhost:{i}" for i in range(NUM_WORKERS)])
+        other_router = ShardRouter([f"localhost:{i}" for i in range(NUM_WORKERS)])
+        shards = set()
+        for i in range(30):
+            game_id = f"game-{i}"
+            shard = router.get_shard(f"/{game_id}", "user:a")
+            self.assertEqual(shard, other_router.get_shard_for_game(game_id))
+            self.assertEqual(shard, router.get_shard(game_id, "user:b"))
+            shards.add(shard)
+        self.assertEqual(len(shards), NUM_WORKERS)
+
+    def test_default_game_pins_players(self):
+        router = ShardRouter([f"localhost:{i}" for i in range(NUM_WORKERS)])
+        # Players should spread to the least loaded shards
+        for i in range(NUM_WORKERS):
+            user_key = f"user:{i}"
+            router.open_session(user_key, router.get_shard("", user_key))
+        self.assertListEqual(router.shard_sessions, [1] * NUM_WORKERS)
+
+        # And stay put while they have a socket open
+        shard = router.get_shard("", "user:0")
+        router.open_session("user:0", shard)
+        self.assertEqual(router.get_shard("", "user:0"), shard)
+        router.close_session("user:0", shard)
+        self.assertEqual(router.get_shard("", "user:0"), shard)
+        router.close_session("user:0", shard)
+        self.assertNotIn("user:0", router.user_pins)
+        self.assertEqual(router.shard_sessions[shard], 0)
+
+    def test_sharding_requires_shared_db(self):
+        for backend in ["test", "local"]:
+            cfg = OmegaConf.create(
+                {
+                    "num_workers": NUM_WORKERS,
+                    "worker_base_port": 40000,
+                    "light": {"db": {"backend": backend}},
+                }
+            )
+            with self.assertRaises(AssertionError):
+                ShardedServer(cfg)
+        cfg.light.db.backend = "aws-postgres"
+        sharded_server = ShardedServer(cfg)
+        self.assertEqual(len(sharded_server.get_worker_hosts()), NUM_WORKERS)
+
+
+class TestShardRouterApplication(AsyncHTTPTestCase):
+    """Ensure the router forwards requests and sockets to the right worker"""
+
+    def setUp(self):
+        self.worker_hosts = []
+        self.worker_servers = []
+        super().setUp()
+
+    def tearDown(self):
+        for server in self.worker_servers:
+            server.stop()
+        super().tearDown()
+
+    def get_app(self):
+        for i in range(NUM_WORKERS):
+            sock, port = bind_unused_port()
+            app = tornado.web.Application(
+                [
+                    (r"/game(.*)/socket", StubWorkerSocket, {"worker_idx": i}),
+                    (r"(.*)", StubWorkerHandler, {"worker_idx": i}),
+                ]
+            )
+            server = HTTPServer(app)
+            server.add_sockets([sock])
+            self.worker_servers.append(server)
+            self.worker_hosts.append(f"127.0.0.1:{port}")
+        self.app = ShardRouterApplication(self.worker_hosts, TEST_TORNADO_SETTINGS)
+        return self.app
+
+    def test_game_creation_routes_to_owner(self):
+        """New games should be created on the worker that will own them"""
+        response = self.fetch("/game/new/", method="POST", body="")
+        self.assertEqual(response.code, 201)
+        result = json.loads(response.body)
+        game_id = result["path"][len("/game/new/") :]
+        self.assertNotEqual(game_id, "")
+        shard_router = self.app.shard_router
+        self.assertEqual(result["worker"], shard_router.get_shard_for_game(game_id))
+
+        response = self.fetch(f"/game{game_id}/other")
+        self.assertEqual(response.code, 200)
+        self.assertIn("worker", json.loads(response.body))
+
+    @gen_test
+    async def test_socket_relay(self):
+        """Sockets should relay both ways, and pin the player while open"""
+        game_id = "my-game"
+        url = f"ws://127.0.0.1:{self.get_http_port()}/game{game_id}/socket"
+        conn = await tornado.websocket.websocket_connect(url)
+        await conn.write_message("hello")
+        response = json.loads(await conn.read_message())
+        self.assertEqual(response["echo"], "hello")
+        shard_router = self.app.shard_router
+        self.assertEqual(response["worker"], shard_router.get_shard_for_game(game_id))
+        self.assertEqual(sum(shard_router.shard_sessions), 1)
+
+        stats = json.loads(
+            (await self.http_client.fetch(self.get_url("/game/shards"))).body
+        )
+        self.assertEqual(stats["total_sessions"], 1)
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+from deploy.web.server.client_sync import ClientSyncState
 from deploy.web.server.game_instance import (
     Player,
     GameInstance,
@@ -204,6 +205,8 @@ class SocketHandler(tornado.websocket.WebSocketHandler):
         self.player = None
         self.sid = get_rand_id()
         self.user_db = app.user_db
+        # Set once the client asks for versioned sync messages
+        self.client_sync: Optional[ClientSyncState] = None
 
     def safe_write_message(self, msg):
         try:
@@ -309,6 +312,13 @@ class SocketHandler(tornado.websocket.WebSocketHandler):
     async def on_message(self, message):
         msg = tornado.escape.json_decode(tornado.escape.to_basestring(message))
         cmd = msg.get("command")
+        if cmd == "sync":
+            # Also sent to resync, after a client loses track of its state
+            if self.client_sync is None:
+                self.client_sync = ClientSyncState()
+            else:
+                self.client_sync.reset()
+            return
         if self.player is None:
             return
         if cmd == "act":
@@ -890,14 +900,18 @@ class TornadoPlayerProvider(PlayerProvider):
         view = event.view_as(soul.target_node)
         if not self.socket.alive_sent:
             return  # the socket isn't alive yet, let's wait
-        dat = event.to_frontend_form(self.player_soul.target_node)
-        filtered_obs = (
-            dat if dat["text"] is not None and len(dat["text"].strip()) else None
-        )
-        if filtered_obs is not None:
-            self.socket.safe_write_message(
-                json.dumps({"command": "actions", "data": [dat]})
-            )
+        if view is not None and len(view.strip()):
+            client_sync = self.socket.client_sync
+            if client_sync is not None:
+                self.socket.safe_write_message(
+                    client_sync.build_message(event, soul.target_node, view)
+                )
+            else:
+                # The rest of the event is encoded once, and shared by all viewers
+                dat = event.to_frontend_json(soul.target_node, view)
+                self.socket.safe_write_message(
+                    '{"command":"actions","data":[%s]}' % (dat,)
+                )
         if (
             isinstance(event, DeathEvent)
             and event.actor.node_id == soul.target_node.node_id
@@ -944,10 +958,8 @@ class TornadoPlayerProvider(PlayerProvider):
         )
         soul.target_node.user_id = None
         soul.target_node.context_id = None
-        dat = action.to_frontend_form(soul.target_node)
-        self.socket.safe_write_message(
-            json.dumps({"command": "actions", "data": [dat]})
-        )
+        dat = action.to_frontend_json(soul.target_node)
+        self.socket.safe_write_message('{"command":"actions","data":[%s]}' % (dat,))
         if self.user_id is not None:
             if self.user_db is not None and not isinstance(soul, TutorialPlayerSoul):
                 # TODO refactor out from server logic
@@ -19,7 +19,7 @@ class ConversationCheckpointParser:
         self.conv_lst = conv_lst
 
     def count_conversations(self):
-        return len(self.conv)
+        return len(self.conv_lst)
 
     def get_average_conversation_length(self):
         lengths = [len(i) for i in self.conv]
@@ -94,8 +94,13 @@ class ConversationCheckpointParser:
             )
         return data
 
-    def get_convs_data(self):
-        result = []
+    def iter_convs_data(self):
+        """
+        Yields the room ID in the pickle file and turn data of each
+        conversation in order, without building them all up front
+        """
         for i in range(len(self.conv_lst)):
-            result.append((self.get_room_pickle_id(i), self.get_conv_data(i)))
-        return result
+            yield self.get_room_pickle_id(i), self.get_conv_data(i)
+
+    def get_convs_data(self):
+        return list(self.iter_convs_data())
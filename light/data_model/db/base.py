@@ -8,14 +8,17 @@
 from abc import ABC, abstractmethod
 from omegaconf import MISSING, DictConfig  # type: ignore
 from sqlalchemy import create_engine  # type: ignore
+from sqlalchemy.pool import StaticPool  # type: ignore
+from contextlib import nullcontext
 from enum import Enum
-from typing import Optional, Union, Dict, Any, Type
+from typing import Optional, Union, Dict, Any, Type, ContextManager
 from uuid import uuid4
 from dataclasses import dataclass
 from tempfile import mkdtemp
 import shutil
 import os
 import json
+import threading
 
 from hydra.core.config_store import ConfigStore  # type: ignore
 
@@ -107,8 +110,18 @@ class BaseDB(ABC):
         files and instances.
         """
         self.backend = config.backend
+        # Held while using the engine, only needed when threads share a connection
+        self._connection_lock: ContextManager[Any] = nullcontext()
         if config.backend == "test":
-            self.engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+            # In-memory databases are per-connection, so share a single
+            # connection with any background writer threads, one at a time
+            self._connection_lock = threading.RLock()
+            self.engine = create_engine(
+                "sqlite+pysqlite:///:memory:",
+                future=True,
+                connect_args={"check_same_thread": False},
+                poolclass=StaticPool,
+            )
             self.made_temp_dir = config.file_root is None
             if self.made_temp_dir:
                 self.file_root = mkdtemp()
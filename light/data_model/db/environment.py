@@ -1897,7 +1897,7 @@ class EnvDB(BaseDB):
                     f"{db_graph.creator_id} and new {creator_id}"
                 )
                 self.write_data_to_file(
-                    graph.to_json(), dump_file_path, json_encode=False
+                    graph.to_json(compact=True), dump_file_path, json_encode=False
                 )
                 db_graph.status = DBStatus.REVIEW
             else:
@@ -1912,7 +1912,7 @@ class EnvDB(BaseDB):
                 )
                 session.add(db_graph)
                 self.write_data_to_file(
-                    graph.to_json(), dump_file_path, json_encode=False
+                    graph.to_json(compact=True), dump_file_path, json_encode=False
                 )
             session.flush()
             session.commit()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Write-behind queue for episode logging. Interaction loggers finish episodes
+on the world's event path, so writing event and graph files (possibly to s3)
+and committing rows there stalls gameplay. The EpisodeWriter accepts finished
+episodes into a bounded backlog, writes their files from a small worker pool,
+and commits the rows for many episodes in a single transaction. If the
+backlog fills up, new episodes are dropped and counted rather than stalling
+the world or growing without bound.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from typing import Any, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from light.data_model.db.episodes import (
+        EpisodeDB,
+        EpisodeLogType,
+        DBGroupName,
+    )
+
+DEFAULT_WRITE_WORKERS = 4
+DEFAULT_MAX_BACKLOG = 256
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_BATCH_LINGER = 0.05
+
+
+@dataclass
+class PendingEpisode:
+    """All of the content required to write out a single episode"""
+
+    episode_id: str
+    graphs: List[Dict[str, str]]
+    events: Tuple[str, List[Dict[str, str]]]
+    log_type: "EpisodeLogType"
+    action_count: int
+    players: Set[str]
+    group: "DBGroupName"
+    timestamp: float
+    fragments: Optional[Dict[str, str]] = None
+
+
+class EpisodeWriter:
+    """
+    Background writer for an EpisodeDB. Episodes are enqueued with their ids
+    already assigned, so callers can reference them immediately. A dispatcher
+    thread collects up to `max_batch_size` episodes, writes all of their files
+    in parallel on `num_workers` threads, then inserts the rows together.
+
+    Enqueueing never blocks, as it happens on the world's event loop. When
+    `max_backlog` episodes are already waiting, further episodes are dropped
+    until room frees up, and the drops are recorded in the stats.
+    """
+
+    def __init__(
+        self,
+        episode_db: "EpisodeDB",
+        num_workers: int = DEFAULT_WRITE_WORKERS,
+        max_backlog: int = DEFAULT_MAX_BACKLOG,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        batch_linger: float = DEFAULT_BATCH_LINGER,
+    ):
+        assert num_workers > 0, "Must have at least one write worker"
+        assert max_batch_size > 0, "Batches must hold at least one episode"
+        self.episode_db = episode_db
+        self.num_workers = num_workers
+        self.max_backlog = max_backlog
+        self.max_batch_size = max_batch_size
+        self.batch_linger = batch_linger
+        self._queue: "queue.Queue[Optional[PendingEpisode]]" = queue.Queue(
+            maxsize=max_backlog
+        )
+        self._start_lock = threading.Lock()
+        # Guards the metrics, which both threads update
+        self._lock = threading.Lock()
+        self._is_dropping = False
+        self._dispatcher: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._is_shutdown = False
+
+        # Metrics
+        self.total_enqueued = 0
+        self.total_written = 0
+        self.total_failed = 0
+        self.total_batches = 0
+        self.max_backlog_seen = 0
+        self.dropped_enqueues = 0
+
+    def _ensure_started(self) -> None:
+        """Launch the dispatcher and worker pool on first use"""
+        if self._dispatcher is not None:
+            return
+        with self._start_lock:
+            if self._dispatcher is not None:
+                return
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.num_workers, thread_name_prefix="episode-writer"
+            )
+            self._dispatcher = threading.Thread(
+                target=self._run_batches, name="episode-dispatcher", daemon=True
+            )
+            self._dispatcher.start()
+            # Don't lose buffered episodes on interpreter exit
+            atexit.register(self.shutdown)
+
+    def enqueue(self, pending: PendingEpisode) -> Optional[str]:
+        """
+        Add the given episode to the backlog without blocking. Returns the
+        id the episode will be stored under, or None if the backlog was full
+        and the episode was dropped.
+        """
+        assert not self._is_shutdown, "Cannot enqueue to a shut down writer"
+        self._ensure_started()
+        with self._lock:
+            self.total_enqueued += 1
+            try:
+                self._queue.put_nowait(pending)
+            except queue.Full:
+                self.dropped_enqueues += 1
+                if not self._is_dropping:
+                    # Only warn once per stall, rather than on every episode
+                    self._is_dropping = True
+                    logging.warning(
+                        f"Episode backlog is full at {self.max_backlog}, "
+                        "dropping episodes until it drains"
+                    )
+                return None
+            self._is_dropping = False
+            self.max_backlog_seen = max(self.max_backlog_seen, self._queue.qsize())
+        return pending.episode_id
+
+    def _collect_batch(self) -> List[Optional[PendingEpisode]]:
+        """Wait for one episode, then gather more until full or out of time"""
+        batch = [self._queue.get()]
+        deadline = time.time() + self.batch_linger
+        while len(batch) < self.max_batch_size and batch[-1] is not None:
+            remaining = deadline - time.time()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batches(self) -> None:
+        """Dispatcher loop, writes batches until receiving the stop sentinel"""
+        assert self._pool is not None
+        while True:
+            batch = self._collect_batch()
+            episodes = [p for p in batch if p is not None]
+            if len(episodes) > 0:
+                self._write_batch(episodes)
+            for _ in batch:
+                self._queue.task_done()
+            if len(episodes) < len(batch):
+                return  # Received the stop sentinel
+
+    def _write_batch(self, episodes: List[PendingEpisode]) -> None:
+        """Write all files for the batch in parallel, then insert all rows"""
+        assert self._pool is not None
+        file_writes: List[Tuple[Any, str, bool]] = []
+        for pending in episodes:
+            file_writes += self.episode_db._get_episode_file_writes(pending)
+        try:
+            futures = [
+                self._pool.submit(
+                    self.episode_db.write_data_to_file,
+                    data,
+                    filename,
+                    json_encode=json_encode,
+                )
+                for (data, filename, json_encode) in file_writes
+            ]
+            for future in futures:
+                future.result()
+            self.episode_db._insert_episodes(episodes)
+        except Exception:
+            logging.exception(f"Failed to write a batch of {len(episodes)} episodes")
+            with self._lock:
+                self.total_failed += len(episodes)
+            return
+        with self._lock:
+            self.total_written += len(episodes)
+            self.total_batches += 1
+
+    def get_backlog(self) -> int:
+        """Return the number of episodes waiting to be written"""
+        return self._queue.qsize()
+
+    def drain(self) -> None:
+        """Block until every episode enqueued so far has been written"""
+        if self._dispatcher is None:
+            return
+        self._queue.join()
+
+    def shutdown(self) -> None:
+        """Drain the backlog, then stop the dispatcher and worker pool"""
+        if self._is_shutdown:
+            return
+        self._is_shutdown = True
+        if self._dispatcher is None:
+            return
+        self._queue.put(None)
+        self._dispatcher.join()
+        assert self._pool is not None
+        self._pool.shutdown(wait=True)
+        atexit.unregister(self.shutdown)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the current backlog and drop metrics"""
+        with self._lock:
+            return {
+                "backlog": self.get_backlog(),
+                "max_backlog": self.max_backlog,
+                "max_backlog_seen": self.max_backlog_seen,
+                "total_enqueued": self.total_enqueued,
+                "total_written": self.total_written,
+                "total_failed": self.total_failed,
+                "total_batches": self.total_batches,
+                "dropped_enqueues": self.dropped_enqueues,
+            }
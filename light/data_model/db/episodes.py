@@ -11,8 +11,19 @@ from light.data_model.db.base import (
     DBSplitType,
     HasDBIDMixin,
 )
+from light.data_model.db.episode_writer import EpisodeWriter, PendingEpisode
 from light.data_model.db.users import DBPlayer
-from typing import Optional, List, Tuple, Dict, Set, Sequence, TYPE_CHECKING
+from typing import (
+    Any,
+    Optional,
+    List,
+    Tuple,
+    Dict,
+    Set,
+    Sequence,
+    Iterator,
+    TYPE_CHECKING,
+)
 from sqlalchemy import (
     select,
     Enum,
@@ -31,6 +42,7 @@ from sqlalchemy.orm import (
     reconstructor,
 )
 from light.graph.events.base import GraphEvent
+from contextlib import contextmanager
 import time
 import enum
 import os
@@ -86,13 +98,18 @@ class DBEpisodeGraph(HasDBIDMixin, SQLBase):
         argument="DBEpisode", back_populates="graphs", foreign_keys=[episode_id]
     )
 
-    def get_graph(self, db: "EpisodeDB") -> "OOGraph":
-        """Return the initialized graph based on this file"""
+    def get_graph(
+        self, db: "EpisodeDB", fragments: Optional[Dict[str, str]] = None
+    ) -> "OOGraph":
+        """
+        Return the initialized graph based on this file, resolving
+        node fragments from the given episode fragments if required
+        """
         from light.graph.structured_graph import OOGraph
 
         graph_json = db.read_data_from_file(self.full_path)
         assert isinstance(graph_json, str)
-        graph = OOGraph.from_json(graph_json)
+        graph = OOGraph.from_snapshot(graph_json, fragments)
         return graph
 
     def __repr__(self):
@@ -140,6 +157,7 @@ class DBEpisode(HasDBIDMixin, SQLBase):
     @reconstructor
     def init_on_load(self):
         self._cached_map = None
+        self._cached_fragments = None
 
     def get_actors(self) -> List[str]:
         """Return the actors in this episode"""
@@ -160,6 +178,7 @@ class DBEpisode(HasDBIDMixin, SQLBase):
         data_dict = db.read_data_from_file(self.dump_file_path, json_encoded=True)
         assert isinstance(data_dict, dict)
         events = data_dict["events"]
+        self._cached_fragments = data_dict.get("fragments", {})
         graph_grouped_events: List[Tuple[str, List["GraphEvent"]]] = []
         current_graph_events = []
         curr_graph_key = None
@@ -196,9 +215,18 @@ class DBEpisode(HasDBIDMixin, SQLBase):
 
     def get_graph(self, id_or_key: str, db: "EpisodeDB") -> "OOGraph":
         """Return a specific graph by id or key"""
-        with Session(db.engine) as session:
+        fragments = self.get_fragments(db)
+        with db._get_session() as session:
             session.add(self)
-            return self.get_graph_map()[id_or_key].get_graph(db)
+            return self.get_graph_map()[id_or_key].get_graph(db, fragments)
+
+    def get_fragments(self, db: "EpisodeDB") -> Dict[str, str]:
+        """Return the node fragments that this episode's graphs reference"""
+        if self._cached_fragments is None:
+            data_dict = db.read_data_from_file(self.dump_file_path, json_encoded=True)
+            assert isinstance(data_dict, dict)
+            self._cached_fragments = data_dict.get("fragments", {})
+        return self._cached_fragments
 
     def get_after_graph(self, db: "EpisodeDB") -> "OOGraph":
         """Return the state of the graph after this episode"""
@@ -269,6 +297,7 @@ class EpisodeDB(BaseDB):
         the list of available splits and datasets.
         """
         SQLBase.metadata.create_all(self.engine)
+        self.writer = EpisodeWriter(self)
 
     def _validate_init(self):
         """
@@ -277,6 +306,15 @@ class EpisodeDB(BaseDB):
         # TODO Check the table for any possible consistency issues
         # and ensure that the episode directories for listed splits exist
 
+    @contextmanager
+    def _get_session(self) -> Iterator[Session]:
+        """
+        Open a session, holding the connection lock so that reads here
+        never interleave with the background writer's inserts
+        """
+        with self._connection_lock, Session(self.engine) as session:
+            yield session
+
     def write_wild_metadata(
         self,
         episode_id: str,
@@ -286,7 +324,8 @@ class EpisodeDB(BaseDB):
         is_complete: Optional[bool] = None,
         choice_text: Optional[str] = None,
     ) -> None:
-        with Session(self.engine) as session:
+        self.flush()  # Metadata references the episode row
+        with self._get_session() as session:
             episode_metadata = WildMetadata(
                 episode_id=episode_id,
                 score=score,
@@ -310,33 +349,24 @@ class EpisodeDB(BaseDB):
         Return a specific episode by id, raising an issue if it doesnt exist
         """
         stmt = select(WildMetadata).where(WildMetadata.episode_id == episode_id)
-        with Session(self.engine) as session:
+        with self._get_session() as session:
             wild_metadata = self._enforce_get_first(
                 session, stmt, "Episode did not exist"
             )
             session.expunge_all()
             return wild_metadata
 
-    def write_episode(
-        self,
-        graphs: List[Dict[str, str]],
-        events: Tuple[str, List[Dict[str, str]]],
-        log_type: EpisodeLogType,
-        action_count: int,
-        players: Set[str],
-        group: DBGroupName,
-    ) -> str:
+    def _get_episode_paths(
+        self, pending: "PendingEpisode"
+    ) -> Tuple[str, Dict[str, str]]:
         """
-        Create an entry given the current argument data, store it
-        to file on the database
+        Return the event dump path for the given episode, and a
+        mapping from graph keys to their dump paths
         """
-        actor_string = ",".join(list(players))
-        event_filename = events[0]
-        event_list = events[1]
-
         # Trim the filename from the left if too long
-        event_filename = event_filename[-70:]
-
+        event_filename = pending.events[0][-70:]
+        group = pending.group
+        log_type = pending.log_type
         dump_file_path = os.path.join(
             FILE_PATH_KEY, group.value, log_type.value, event_filename
         )
@@ -346,59 +376,152 @@ class EpisodeDB(BaseDB):
             log_type.value,
             "graphs",
         )
-
-        # File writes
-        self.write_data_to_file(
-            {"events": event_list}, dump_file_path, json_encode=True
-        )
-        for graph_info in graphs:
-            graph_full_path = os.path.join(graph_dump_root, graph_info["filename"])
-            self.write_data_to_file(graph_info["graph_json"], graph_full_path)
-
-        # DB Writes
-        episode_id = DBEpisode.get_id()
-        with Session(self.engine) as session:
-            episode = DBEpisode(
-                id=episode_id,
-                group=group,
-                split=DBSplitType.UNSET,
-                status=DBStatus.REVIEW,
-                actors=actor_string,
-                dump_file_path=dump_file_path,
-                turn_count=len(event_list),
-                human_count=len(players),
-                action_count=action_count,
-                timestamp=time.time(),
-                log_type=log_type,
+        graph_paths = {
+            graph_info["key"]: os.path.join(graph_dump_root, graph_info["filename"])
+            for graph_info in pending.graphs
+        }
+        return dump_file_path, graph_paths
+
+    def _get_episode_file_writes(
+        self, pending: "PendingEpisode"
+    ) -> List[Tuple[Any, str, bool]]:
+        """
+        Return the (data, filename, json_encode) file writes required
+        to store the given episode
+        """
+        dump_file_path, graph_paths = self._get_episode_paths(pending)
+        dump_data: Dict[str, Any] = {"events": pending.events[1]}
+        if pending.fragments is not None:
+            # Graph snapshots reference these shared node fragments
+            dump_data["fragments"] = pending.fragments
+        file_writes: List[Tuple[Any, str, bool]] = [(dump_data, dump_file_path, True)]
+        for graph_info in pending.graphs:
+            file_writes.append(
+                (graph_info["graph_json"], graph_paths[graph_info["key"]], False)
             )
-            first_id = None
-            curr_id = None
-            for idx, graph_info in enumerate(graphs):
-                graph_full_path = os.path.join(graph_dump_root, graph_info["filename"])
-                curr_id = DBEpisodeGraph.get_id()
-                db_graph = DBEpisodeGraph(
-                    id=curr_id,
-                    graph_key_id=graph_info["key"],
-                    full_path=graph_full_path,
+        return file_writes
+
+    def _insert_episodes(self, pendings: List["PendingEpisode"]) -> None:
+        """
+        Insert the rows for all of the given episodes (whose files have
+        already been written) in a single transaction
+        """
+        with self._get_session() as session:
+            for pending in pendings:
+                dump_file_path, graph_paths = self._get_episode_paths(pending)
+                episode = DBEpisode(
+                    id=pending.episode_id,
+                    group=pending.group,
+                    split=DBSplitType.UNSET,
+                    status=DBStatus.REVIEW,
+                    actors=",".join(list(pending.players)),
+                    dump_file_path=dump_file_path,
+                    turn_count=len(pending.events[1]),
+                    human_count=len(pending.players),
+                    action_count=pending.action_count,
+                    timestamp=pending.timestamp,
+                    log_type=pending.log_type,
                 )
-                if idx == 0:
-                    first_id = curr_id
-                episode.graphs.append(db_graph)
-            session.add(episode)
-            assert first_id is not None and curr_id is not None
-            episode.first_graph_id = first_id
-            episode.final_graph_id = curr_id
+                first_id = None
+                curr_id = None
+                for idx, graph_info in enumerate(pending.graphs):
+                    curr_id = DBEpisodeGraph.get_id()
+                    db_graph = DBEpisodeGraph(
+                        id=curr_id,
+                        graph_key_id=graph_info["key"],
+                        full_path=graph_paths[graph_info["key"]],
+                    )
+                    if idx == 0:
+                        first_id = curr_id
+                    episode.graphs.append(db_graph)
+                session.add(episode)
+                assert first_id is not None and curr_id is not None
+                episode.first_graph_id = first_id
+                episode.final_graph_id = curr_id
             session.flush()
             session.commit()
 
-        return episode_id
+    def _make_pending_episode(
+        self,
+        graphs: List[Dict[str, str]],
+        events: Tuple[str, List[Dict[str, str]]],
+        log_type: EpisodeLogType,
+        action_count: int,
+        players: Set[str],
+        group: DBGroupName,
+        fragments: Optional[Dict[str, str]] = None,
+    ) -> "PendingEpisode":
+        """Package the given episode content, assigning it an id"""
+        return PendingEpisode(
+            episode_id=DBEpisode.get_id(),
+            graphs=graphs,
+            events=events,
+            log_type=log_type,
+            action_count=action_count,
+            players=set(players),
+            group=group,
+            timestamp=time.time(),
+            fragments=fragments,
+        )
+
+    def write_episode(
+        self,
+        graphs: List[Dict[str, str]],
+        events: Tuple[str, List[Dict[str, str]]],
+        log_type: EpisodeLogType,
+        action_count: int,
+        players: Set[str],
+        group: DBGroupName,
+        fragments: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """
+        Create an entry given the current argument data, store it
+        to file on the database
+        """
+        pending = self._make_pending_episode(
+            graphs, events, log_type, action_count, players, group, fragments
+        )
+        for data, filename, json_encode in self._get_episode_file_writes(pending):
+            self.write_data_to_file(data, filename, json_encode=json_encode)
+        self._insert_episodes([pending])
+        return pending.episode_id
+
+    def enqueue_episode(
+        self,
+        graphs: List[Dict[str, str]],
+        events: Tuple[str, List[Dict[str, str]]],
+        log_type: EpisodeLogType,
+        action_count: int,
+        players: Set[str],
+        group: DBGroupName,
+        fragments: Optional[Dict[str, str]] = None,
+    ) -> Optional[str]:
+        """
+        Queue an entry to be written by the background writer, returning
+        the id it will be stored under, or None if the writer's backlog was
+        full and the entry was dropped. Reads through this EpisodeDB
+        wait for queued episodes to be written first.
+        """
+        pending = self._make_pending_episode(
+            graphs, events, log_type, action_count, players, group, fragments
+        )
+        return self.writer.enqueue(pending)
+
+    def flush(self) -> None:
+        """Block until all queued episodes have been written"""
+        self.writer.drain()
+
+    def get_writer_stats(self) -> Dict[str, Any]:
+        """Return backlog and drop metrics for the background writer"""
+        return self.writer.get_stats()
 
     def get_episode(self, episode_id: str) -> "DBEpisode":
         """
         Return a specific episode by id, raising an issue if it doesnt exist
         """
+        self.flush()
         stmt = select(DBEpisode).where(DBEpisode.id == episode_id)
-        with Session(self.engine) as session:
+        with self._get_session() as session:
             episode = self._enforce_get_first(session, stmt, "Episode did not exist")
             for graph in episode.graphs:
                 # Load all the graph keys
@@ -423,6 +546,7 @@ class EpisodeDB(BaseDB):
         """
         Return all matching episodes
         """
+        self.flush()
         stmt = select(DBEpisode)
         if group is not None:
             stmt = stmt.where(DBEpisode.group == group)
@@ -444,7 +568,7 @@ class EpisodeDB(BaseDB):
             stmt = stmt.where(DBEpisode.timestamp >= min_creation_time)
         if max_creation_time is not None:
             stmt = stmt.where(DBEpisode.timestamp <= max_creation_time)
-        with Session(self.engine) as session:
+        with self._get_session() as session:
             episodes = session.scalars(stmt).all()
             session.expunge_all()
             return episodes
@@ -458,6 +582,7 @@ class EpisodeDB(BaseDB):
 
         Return true on success
         """
+        self.flush()
         hashing_time = time.time()
         sha = hashlib.sha256()
 
@@ -470,7 +595,7 @@ class EpisodeDB(BaseDB):
             sha.update(hash_name.encode())
             return str(sha.hexdigest()[:30])
 
-        with Session(self.engine) as session:
+        with self._get_session() as session:
             stmt = select(DBEpisode).where(DBEpisode.group == group)
             episodes = session.scalars(stmt).all()
             for episode in episodes:
@@ -478,6 +603,7 @@ class EpisodeDB(BaseDB):
                 actors = actors_string.split(",")
                 processed_actors = [rehash(a) for a in actors]
                 episode.actors = ",".join(processed_actors)
+
                 # Rewrite the graphs and events too
                 def replace_all_actors(in_data: str) -> str:
                     out_data = in_data
@@ -503,11 +629,12 @@ class EpisodeDB(BaseDB):
         Create a scrubbed version of this database for use in releases
         """
         assert config.file_root != self.file_root, "Cannot copy DB to same location!"
+        self.flush()
         new_db = EpisodeDB(config)
 
         # Copy all the basic content
         for table_name, table_obj in SQLBase.metadata.tables.items():
-            with self.engine.connect() as orig_conn:
+            with self._connection_lock, self.engine.connect() as orig_conn:
                 with new_db.engine.connect() as new_conn:
                     keys = table_obj.c.keys()
                     all_data = [
@@ -519,7 +646,7 @@ class EpisodeDB(BaseDB):
                     new_conn.execute(table_obj.insert().values(all_data))
                     new_conn.commit()
 
-        with Session(self.engine) as session:
+        with self._get_session() as session:
             stmt = select(DBEpisode)
             episodes = session.scalars(stmt).all()
             for episode in episodes:
@@ -536,3 +663,8 @@ class EpisodeDB(BaseDB):
             new_db.anonymize_group(group=group)
 
         return new_db
+
+    def shutdown(self):
+        # Drain outstanding episodes before the storage goes away
+        self.writer.shutdown()
+        super().shutdown()
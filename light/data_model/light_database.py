@@ -7,9 +7,10 @@
 import sqlite3
 import os
 import csv
-import random, itertools
+import random
 import pandas as pd
 from collections import defaultdict
+from collections.abc import Mapping
 from tqdm import tqdm
 from parlai.core.params import ParlaiParser
 from light.data_model.conversation_checkpoint_parser import ConversationCheckpointParser
@@ -18,7 +19,9 @@ from light.graph.utils import get_article
 from light.data_model.onboarding_flags import OnboardingFlags
 import sys
 import parlai.utils.misc as parlai_utils
-import json
+import time
+import urllib.parse
+from typing import Dict, List, Optional, Tuple
 
 sys.modules["parlai.core.utils"] = parlai_utils
 
@@ -137,6 +140,450 @@ def format_list_for_sql(list):
     return "{}".format(", ".join("('{}')".format(i) for i in list))
 
 
+# Columns kept in each full text index, kept up to date by triggers
+FTS_TABLE_COLUMNS = [
+    ("base_objects", ["name"]),
+    ("objects", ["name", "physical_description"]),
+    ("base_rooms", ["name"]),
+    ("rooms", ["name", "description", "backstory"]),
+    ("base_characters", ["name"]),
+    ("characters", ["name", "persona", "physical_description"]),
+    ("utterances", ["dialogue"]),
+    ("turns", ["interaction_type", "action"]),
+]
+
+# Attributes of objects, as floats between 0 and 1
+OBJECT_ATTRIBUTES = [
+    "is_container",
+    "is_drink",
+    "is_food",
+    "is_gettable",
+    "is_surface",
+    "is_wearable",
+    "is_weapon",
+]
+
+
+def get_name_defaults(name, name_prefix=None, is_plural=None):
+    """Guess the name prefix and plurality of an entity when not provided"""
+    if name_prefix is None:
+        name_prefix = get_article(name)
+    if is_plural is None:
+        is_plural = 0 if name[-1] != "s" else 0.7
+    return name_prefix, is_plural
+
+
+def get_random_split():
+    """Pick a data split for new content, with an 80/10/10 train/test/val split"""
+    choice = random.randint(0, 9)
+    if choice < 8:
+        return DB_TRAIN_SPLIT
+    elif choice == 8:
+        return DB_TEST_SPLIT
+    return DB_VAL_SPLIT
+
+
+# Columns of each type of entry for bulk imports, as the columns that make an
+# entry unique followed by the rest. Types are in the order their rows need to
+# be inserted to satisfy foreign keys.
+BULK_IMPORT_COLUMNS = {
+    DB_TYPE_BASE_ROOM: (["name"], []),
+    DB_TYPE_ROOM: (["name", "base_id", "description", "backstory"], []),
+    DB_TYPE_BASE_CHAR: (["name"], []),
+    DB_TYPE_CHAR: (
+        ["name", "base_id", "persona", "physical_description"],
+        ["name_prefix", "is_plural", "char_type"],
+    ),
+    DB_TYPE_BASE_OBJ: (["name"], []),
+    DB_TYPE_OBJ: (
+        ["name", "base_id", "physical_description"],
+        OBJECT_ATTRIBUTES + ["name_prefix", "is_plural"],
+    ),
+    DB_TYPE_EDGE: (["parent_id", "child_id", "edge_type", "edge_strength"], []),
+    DB_TYPE_TEXT_EDGE: (
+        [
+            "parent_id",
+            "child_text",
+            "child_desc",
+            "child_label",
+            "edge_type",
+            "edge_strength",
+        ],
+        [],
+    ),
+    DB_TYPE_INTERACTION: ([], ["setting_id"]),
+    DB_TYPE_PLAYER: ([], []),
+    DB_TYPE_PARTICIPANT: ([], ["interaction_id", "character_id", "player_id"]),
+    DB_TYPE_UTTERANCE: (["dialogue"], []),
+    DB_TYPE_TURN: (
+        [],
+        [
+            "interaction_id",
+            "turn_number",
+            "turn_time",
+            "interaction_type",
+            "utterance_id",
+            "action",
+            "speaker_id",
+            "listener_id",
+        ],
+    ),
+}
+
+# Rows to collect before inserting them during a bulk import
+BULK_IMPORT_BATCH_SIZE = 50000
+
+
+class BulkImport:
+    """
+    Collects the entries loaded from a data dump into a LIGHTDatabase, and
+    inserts them with one executemany per table and batch. Ids are assigned
+    up front rather than per insert, and entries are deduplicated against
+    the unique columns of the existing rows in memory rather than with a
+    query per entry. Full text indices are updated once at the end of the
+    import, rather than by triggers on every insert.
+
+    Entries are created with the production status and marked as from a
+    pickle, as with the data dumps loaded by LIGHTDatabase.
+    """
+
+    def __init__(self, db: "LIGHTDatabase"):
+        self.db = db
+        self.c = db.c
+        self.c.execute("SELECT MAX(id) FROM id_table")
+        max_id = self.c.fetchone()[0] or 0
+        self.c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'id_table'")
+        sequence = self.c.fetchone()
+        self.first_id = max(max_id, sequence[0] if sequence else 0) + 1
+        self.next_id = self.first_id
+        self._existing: Dict[str, Dict[Tuple, int]] = {}
+        self._id_rows: List[Tuple] = []
+        self._rows: Dict[str, List[Tuple]] = defaultdict(list)
+        self._split_updates: List[Tuple[str, int]] = []
+        self.num_rows = 0
+        self.start_time = time.time()
+
+    def __enter__(self) -> "BulkImport":
+        # Drop the insert triggers, the full text indices are built at the end
+        for table, _columns in FTS_TABLE_COLUMNS:
+            self.c.execute(f"DROP TRIGGER IF EXISTS {table}_table_bd_ad")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if exc_type is None:
+                self.flush()
+                for table, columns in FTS_TABLE_COLUMNS:
+                    cols = ", ".join(columns)
+                    self.c.execute(
+                        f"""
+                        INSERT INTO {table}_table_fts (docid, {cols})
+                        SELECT id, {cols} FROM {table}_table WHERE id >= ?
+                        """,
+                        (self.first_id,),
+                    )
+        finally:
+            self.db.create_triggers()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return the rows inserted so far, and how quickly"""
+        seconds = time.time() - self.start_time
+        return {
+            "rows": self.num_rows,
+            "seconds": seconds,
+            "rows_per_second": self.num_rows / max(seconds, 1e-9),
+        }
+
+    def _get_existing(self, type: str) -> Dict[Tuple, int]:
+        """Load the ids of the existing entries of a type by their unique columns"""
+        if type not in self._existing:
+            key_columns, _ = BULK_IMPORT_COLUMNS[type]
+            self.c.execute(
+                "SELECT id, {} FROM {}".format(
+                    ", ".join(key_columns), self.db.table_dict[type]
+                )
+            )
+            self._existing[type] = {tuple(row[1:]): row[0] for row in self.c}
+        return self._existing[type]
+
+    def create(self, type: str, values: Tuple = (), split: Optional[str] = None):
+        """Add a new entry with the given column values, returning its id"""
+        id = self.next_id
+        self.next_id += 1
+        self._id_rows.append((id, type, DB_STATUS_PROD, True, split))
+        self._rows[type].append((id,) + tuple(values))
+        if len(self._id_rows) >= BULK_IMPORT_BATCH_SIZE:
+            self.flush()
+        return id
+
+    def get_or_create(
+        self, type: str, key: Tuple, values: Tuple = (), split: Optional[str] = None
+    ) -> Tuple[int, bool]:
+        """
+        Return the id of the entry with the given unique column values, and
+        whether it was created by this call
+        """
+        existing = self._get_existing(type)
+        if key in existing:
+            return existing[key], False
+        id = self.create(type, key + tuple(values), split=split)
+        existing[key] = id
+        return id, True
+
+    def update_split(self, id: int, split: str) -> None:
+        self._split_updates.append((split, id))
+
+    def flush(self) -> None:
+        """Insert all of the collected rows"""
+        self.c.executemany(
+            """
+            INSERT INTO id_table (id, type, status, is_from_pickle, split)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            self._id_rows,
+        )
+        self._id_rows = []
+        for type, (key_columns, value_columns) in BULK_IMPORT_COLUMNS.items():
+            rows = self._rows.pop(type, [])
+            if len(rows) == 0:
+                continue
+            columns = ["id"] + key_columns + value_columns
+            self.c.executemany(
+                "INSERT INTO {} ({}) VALUES ({})".format(
+                    self.db.table_dict[type],
+                    ", ".join(columns),
+                    ", ".join(["?"] * len(columns)),
+                ),
+                rows,
+            )
+            self.num_rows += len(rows)
+        self.c.executemany(
+            "UPDATE id_table SET split = ? WHERE id = ?", self._split_updates
+        )
+        self._split_updates = []
+
+
+# Tables copied into the cache built by LIGHTDatabase.create_cache, as the
+# cache key, the table name, and the column rows are looked up by. Edge
+# tables are looked up by parent, and return a list of rows for each.
+CACHED_TABLES = {
+    "id": ("id_table", "id"),
+    "db_edges": ("node_content_table", "parent_id"),
+    "text_edges": ("text_edges_table", "parent_id"),
+    "characters": ("characters_table", "id"),
+    "rooms": ("rooms_table", "id"),
+    "objects": ("objects_table", "id"),
+    "base_chars": ("base_characters_table", "id"),
+    "base_rooms": ("base_rooms_table", "id"),
+    "base_objs": ("base_objects_table", "id"),
+    "worlds": ("world_table", "id"),
+}
+
+# Extra indices on the cached tables, for the other columns they're filtered by
+CACHED_TABLE_INDICES = {
+    "id": [("type",)],
+    "db_edges": [("id",), ("child_id", "edge_type")],
+    "text_edges": [("id",)],
+}
+
+# Cache keys holding the entries of each type, for get_id(expand=True)
+CACHED_TYPE_KEYS = {
+    DB_TYPE_CHAR: "characters",
+    DB_TYPE_ROOM: "rooms",
+    DB_TYPE_OBJ: "objects",
+    DB_TYPE_BASE_CHAR: "base_chars",
+    DB_TYPE_BASE_ROOM: "base_rooms",
+    DB_TYPE_BASE_OBJ: "base_objs",
+    DB_TYPE_WORLD: "worlds",
+}
+
+# Bytes of the cache file each process memory maps
+CACHE_MMAP_SIZE = 1 << 32
+
+
+class CachedTable(Mapping):
+    """
+    Read only view of one table in a LIGHTDatabaseCache, mapping the key
+    column to its row, or to the list of rows sharing it for edge tables.
+    Rows are only read from the cache file when they're looked up. Entries
+    set or deleted are kept in memory, as the cache file is never written to.
+    """
+
+    def __init__(self, cache: "LIGHTDatabaseCache", key: str):
+        self.cache = cache
+        self.name = key
+        self.key_column = CACHED_TABLES[key][1]
+        self.grouped = self.key_column != "id"
+        self._changes = {}
+
+    def select(self, **conditions) -> List[sqlite3.Row]:
+        """Return the rows matching all of the given non-None column values"""
+        conditions = {k: v for k, v in conditions.items() if v is not None}
+        where = " AND ".join(f"{column} = ?" for column in conditions)
+        rows = self.cache.execute(
+            "SELECT * FROM {} {}".format(self.name, f"WHERE {where}" if where else ""),
+            tuple(conditions.values()),
+        )
+        if len(self._changes) == 0:
+            return rows
+        rows = [r for r in rows if r[self.key_column] not in self._changes]
+        for value in self._changes.values():
+            for row in value if self.grouped else [value]:
+                if row is not None and all(row[k] == v for k, v in conditions.items()):
+                    rows.append(row)
+        return rows
+
+    def __getitem__(self, key):
+        key = int(key)
+        if key in self._changes:
+            if self._changes[key] is None:
+                raise KeyError(key)
+            return self._changes[key]
+        rows = self.cache.execute(
+            f"SELECT * FROM {self.name} WHERE {self.key_column} = ?", (key,)
+        )
+        if len(rows) == 0:
+            raise KeyError(key)
+        return rows if self.grouped else rows[0]
+
+    def __setitem__(self, key, value):
+        self._changes[int(key)] = value
+
+    def __delitem__(self, key):
+        self._changes[int(key)] = None
+
+    def __iter__(self):
+        keys = self.cache.execute(
+            f"SELECT DISTINCT {self.key_column} FROM {self.name} "
+            f"ORDER BY {self.key_column}"
+        )
+        for (key,) in keys:
+            if self._changes.get(key, True) is not None:
+                yield key
+        for key, value in self._changes.items():
+            if value is not None and not self.cache.execute(
+                f"SELECT 1 FROM {self.name} WHERE {self.key_column} = ?", (key,)
+            ):
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def values(self):
+        """Return the rows (or lists of edges) of the table in a single scan"""
+        if not self.grouped:
+            return [self[key] for key in self] if self._changes else self.select()
+        grouped = defaultdict(list)
+        for row in self.select():
+            grouped[row[self.key_column]].append(row)
+        return list(grouped.values())
+
+
+class LIGHTDatabaseCache:
+    """
+    Read only copy of the tables used to build graphs from a LIGHTDatabase,
+    saved as an SQLite file next to the database. The file is opened
+    immutable and memory mapped, so worker processes share its pages through
+    the OS rather than each parsing their own copy, and rows are only read
+    when they're looked up. Edge tables are clustered by parent id.
+    """
+
+    def __init__(self, dbpath: str):
+        self.dbpath = dbpath
+        self.path = dbpath + ".cache.db"
+        self._conn = None
+        self._pid = None
+        self.tables = {key: CachedTable(self, key) for key in CACHED_TABLES}
+
+    def is_stale(self) -> bool:
+        return not os.path.exists(self.path) or os.path.getmtime(
+            self.path
+        ) <= os.path.getmtime(self.dbpath)
+
+    def build(self) -> None:
+        """Write the cache file from the database, replacing any existing one"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("ATTACH DATABASE ? AS src", (self.dbpath,))
+            for key, (table_name, key_column) in CACHED_TABLES.items():
+                columns = [
+                    f"{row[1]} {row[2]}"
+                    for row in conn.execute(f"PRAGMA src.table_info({table_name})")
+                ]
+                if key_column == "id":
+                    primary_key, table_options = "id", ""
+                else:
+                    primary_key = f"{key_column}, id"
+                    table_options = " WITHOUT ROWID"
+                conn.execute(
+                    "CREATE TABLE {} ({}, PRIMARY KEY ({})){}".format(
+                        key, ", ".join(columns), primary_key, table_options
+                    )
+                )
+                conn.execute(
+                    f"INSERT INTO {key} SELECT * FROM src.{table_name} "
+                    f"ORDER BY {primary_key}"
+                )
+                for index_columns in CACHED_TABLE_INDICES.get(key, []):
+                    conn.execute(
+                        "CREATE INDEX {0}_{1} ON {0} ({2})".format(
+                            key, "_".join(index_columns), ", ".join(index_columns)
+                        )
+                    )
+            conn.commit()
+            conn.execute("DETACH DATABASE src")
+            conn.execute("ANALYZE")
+        finally:
+            conn.close()
+        os.replace(tmp_path, self.path)
+        self.close()
+
+    def load(self) -> None:
+        """Open the cache file, building it first if it's older than the database"""
+        try:
+            if not self.is_stale():
+                self.get_connection().execute("SELECT count(*) FROM id").fetchone()
+                return
+        except sqlite3.DatabaseError:
+            pass  # rebuild the cache if the old one is corrupted
+        self.build()
+
+    def get_connection(self) -> sqlite3.Connection:
+        # Connections can't be shared with forked processes, so each opens its own
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(
+                "file:{}?mode=ro&immutable=1".format(urllib.parse.quote(self.path)),
+                uri=True,
+                check_same_thread=False,
+            )
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute(f"PRAGMA mmap_size = {CACHE_MMAP_SIZE}")
+            self._pid = os.getpid()
+        return self._conn
+
+    def execute(self, query: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        return self.get_connection().execute(query, params).fetchall()
+
+    def close(self) -> None:
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def __getitem__(self, key: str) -> CachedTable:
+        return self.tables[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.tables
+
+    def keys(self):
+        return self.tables.keys()
+
+
 class LIGHTDatabase:
     def __init__(self, dbpath, read_only=False):
         argparser = ParlaiParser(False, False)
@@ -293,55 +740,15 @@ class LIGHTDatabase:
     # Connect to sqlite3 in __init__ instead because __init__ is called
     # before __enter__
     def create_cache(self):
-        """Create a cached version of the database in dict format
-        with id as the keys and the rows are values"""
+        """
+        Load the LIGHTDatabaseCache of this database, mapping the ids in each
+        cached table to their rows, building it if it's missing or outdated
+        """
         self.cache_init = True
         self.use_cache = True
         self.read_only = True
-
-        try:
-            possible_cache_path = self.dbpath + ".json"
-            if os.path.exists(possible_cache_path):
-                cache_date = os.path.getmtime(possible_cache_path)
-                database_date = os.path.getmtime(self.dbpath)
-                if cache_date > database_date:
-                    with open(possible_cache_path, "r") as json_cache:
-                        self.cache = json.load(json_cache)
-                        for key in self.cache.keys():
-                            for str_id in self.cache[key].ids():
-                                self.cache[key][int(str_id)] = self.cache[key][str_id]
-                        return
-        except Exception:
-            pass  # initialize a new cache if the old one is corrupted
-
-        db_table_dict = {
-            "id": "id_table",
-            "db_edges": "node_content_table",
-            "text_edges": "text_edges_table",
-            "characters": "characters_table",
-            "rooms": "rooms_table",
-            "objects": "objects_table",
-            "base_chars": "base_characters_table",
-            "base_rooms": "base_rooms_table",
-            "base_objs": "base_objects_table",
-            "worlds": "world_table",
-        }
-
-        for key, table_name in db_table_dict.items():
-            self.c.execute("""SELECT * FROM {0};""".format(table_name))
-            results = self.c.fetchall()
-            if "edges" in key:
-                self.cache[key] = {}
-                for row in results:
-                    if row["parent_id"] in self.cache[key]:
-                        self.cache[key][int(row["parent_id"])].append(dict(row))
-                    else:
-                        self.cache[key][int(row["parent_id"])] = [dict(row)]
-            else:
-                self.cache[key] = {int(row["id"]): dict(row) for row in results}
-
-        with open(possible_cache_path, "w") as json_cache:
-            json.dump(self.cache, json_cache)
+        self.cache = LIGHTDatabaseCache(self.dbpath)
+        self.cache.load()
 
     def __enter__(self):
         conn = sqlite3.connect(self.dbpath)
@@ -438,14 +845,19 @@ class LIGHTDatabase:
         id_table.
         """
         if self.use_cache and id is not None:
-            use_id = int(id)
-            if use_id in self.cache["id"]:
-                found_id = self.cache["id"][use_id]
-                if expand:
-                    return [self.cache[found_id["type"] + "s"][use_id]]
-                return [found_id]
-        if self.use_cache and type is not None:
-            return [row for row in self.cache["id"].values() if row["type"] == type]
+            found_id = self.cache["id"].get(id)
+            if found_id is not None:
+                if not expand:
+                    return [found_id]
+                if found_id["type"] in CACHED_TYPE_KEYS:
+                    return [self.cache[CACHED_TYPE_KEYS[found_id["type"]]][id]]
+        if self.use_cache and type is not None and id is None:
+            results = self.cache["id"].select(type=type)
+            if not expand:
+                return results
+            if type in CACHED_TYPE_KEYS:
+                cached = self.cache[CACHED_TYPE_KEYS[type]]
+                return [cached[row["id"]] for row in results]
         self.c.execute(
             """
             SELECT * FROM id_table
@@ -499,7 +911,7 @@ class LIGHTDatabase:
         Deletes specified id from id_table
         """
         self.c.execute("DELETE FROM id_table WHERE id = ?", (id,))
-        if self.use_cache and id in self.cache["id"]:
+        if self.use_cache:
             del self.cache["id"][id]
 
     def update_status(self, id, status):
@@ -1229,6 +1641,10 @@ class LIGHTDatabase:
         return (id, inserted)
 
     def get_base_character(self, id=None, name=None):
+        if self.use_cache and id is not None:
+            cached = self.cache["base_chars"].get(id)
+            if cached is not None and name in (None, cached["name"]):
+                return [cached]
         self.c.execute(
             """
             SELECT * FROM base_characters_table
@@ -1242,9 +1658,10 @@ class LIGHTDatabase:
     def get_character(
         self, id=None, name=None, base_id=None, persona=None, physical_description=None
     ):
-        if self.use_cache:
-            if id is not None and id in self.cache["characters"]:
-                return [self.cache["characters"][id]]
+        if self.use_cache and id is not None:
+            cached = self.cache["characters"].get(id)
+            if cached is not None:
+                return [cached]
         self.c.execute(
             """
             SELECT * FROM characters_table
@@ -1259,6 +1676,10 @@ class LIGHTDatabase:
         return self.c.fetchall()
 
     def get_base_object(self, id=None, name=None):
+        if self.use_cache and id is not None:
+            cached = self.cache["base_objs"].get(id)
+            if cached is not None and name in (None, cached["name"]):
+                return [cached]
         self.c.execute(
             """
             SELECT * FROM base_objects_table
@@ -1287,8 +1708,10 @@ class LIGHTDatabase:
         shape=None,
         value=None,
     ):
-        if self.use_cache and id is not None and id in self.cache["objects"]:
-            return [self.cache["objects"][id]]
+        if self.use_cache and id is not None:
+            cached = self.cache["objects"].get(id)
+            if cached is not None:
+                return [cached]
         self.c.execute(
             """
             SELECT * from objects_table
@@ -1329,6 +1752,10 @@ class LIGHTDatabase:
         return self.c.fetchall()
 
     def get_base_room(self, id=None, name=None):
+        if self.use_cache and id is not None:
+            cached = self.cache["base_rooms"].get(id)
+            if cached is not None and name in (None, cached["name"]):
+                return [cached]
         self.c.execute(
             """
             SELECT * FROM base_rooms_table
@@ -1342,9 +1769,10 @@ class LIGHTDatabase:
     def get_room(
         self, id=None, name=None, base_id=None, description=None, backstory=None
     ):
-        if self.use_cache:
-            if id is not None and id in self.cache["rooms"]:
-                return [self.cache["rooms"][id]]
+        if self.use_cache and id is not None:
+            cached = self.cache["rooms"].get(id)
+            if cached is not None:
+                return [cached]
 
         self.c.execute(
             """
@@ -1363,7 +1791,13 @@ class LIGHTDatabase:
         self, id=None, parent_id=None, child_id=None, edge_type=None, edge_strength=None
     ):
         if self.use_cache:
-            results = self.get_edges_cached("db_edges", parent_id, edge_type)
+            results = self.cache["db_edges"].select(
+                id=id,
+                parent_id=parent_id,
+                child_id=child_id,
+                edge_type=edge_type,
+                edge_strength=edge_strength,
+            )
             if len(results):
                 return results
         self.c.execute(
@@ -1388,7 +1822,13 @@ class LIGHTDatabase:
         edge_strength=None,
     ):
         if self.use_cache:
-            results = self.get_edges_cached("text_edges", parent_id, edge_type)
+            results = self.cache["text_edges"].select(
+                id=id,
+                parent_id=parent_id,
+                child_text=child_text,
+                edge_type=edge_type,
+                edge_strength=edge_strength,
+            )
             if len(results):
                 return results
 
@@ -1406,17 +1846,9 @@ class LIGHTDatabase:
         return self.c.fetchall()
 
     def get_edges_cached(self, cache_key, parent_id=None, edge_type=None):
-        results = []
-        if parent_id is not None:
-            results = self.cache[cache_key][parent_id]
-        if edge_type is not None:
-            if len(results) == 0:
-                results = self.cache[cache_key].values()
-                results = list(
-                    itertools.chain.from_iterable([rows for rows in results])
-                )
-            results = [r for r in results if r["edge_type"] == edge_type]
-        return results
+        if parent_id is None and edge_type is None:
+            return []
+        return self.cache[cache_key].select(parent_id=parent_id, edge_type=edge_type)
 
     def init_user_tables(self):
         """
@@ -2110,23 +2542,11 @@ class LIGHTDatabase:
         Creates triggers to keep full text index up to date with the content
         table
         """
-        "interaction", "utterance", "participant",
-        "turn"
-        trigger_info = [
-            ("base_objects", ["name"]),
-            ("objects", ["name", "physical_description"]),
-            ("base_rooms", ["name"]),
-            ("rooms", ["name", "description", "backstory"]),
-            ("base_characters", ["name"]),
-            ("characters", ["name", "persona", "physical_description"]),
-            ("utterances", ["dialogue"]),
-            ("turns", ["interaction_type", "action"]),
-        ]
-        for i in trigger_info:
+        for i in FTS_TABLE_COLUMNS:
             comma_separated = ", ".join([str(j) for j in i[1]])
             comma_separated_with_new = ", ".join(["new." + str(j) for j in i[1]])
             # can use .format because all variables are defined in the
-            # trigger_info table above and cannot be altered by users
+            # FTS_TABLE_COLUMNS and cannot be altered by users
             self.c.execute(
                 """
                 CREATE TRIGGER IF NOT EXISTS {0}_table_bu
@@ -2369,370 +2789,275 @@ class LIGHTDatabase:
 
     def add_conversation_data(self, pklpath, disable_TQDM=False):
         """
-        Loads all conversation data from pickle file located at pklpath.
+        Loads all conversation data from pickle file located at pklpath, in
+        bulk. Returns the rows inserted and how quickly.
         """
         conv_parser = ConversationCheckpointParser(pklpath)
-        convs_data = conv_parser.get_convs_data()
-        for i in tqdm(
-            range(len(convs_data)), desc="loading conversations", disable=disable_TQDM
-        ):
-            room_pickle_id, data = convs_data[i]
-            room_id = self.id_room_dict[room_pickle_id]
-            # dictionary that maps between character name and character id
-            # in the database
-            name_to_id = self.name_to_id(conv_parser.name_to_persona(i))
-            # if the conversation has not already been added, add it to the
-            # database
-            for i in data:
-                i["speaker"] = name_to_id[i["speaker"]]
-                if i["listener"]:
-                    i["listener"] = name_to_id[i["listener"]]
-            if not self.is_duplicate_conversation(data, room_id):
-                interaction_id = self.create_interaction(
-                    room_id,
-                    entry_attributes={"is_from_pickle": True, "status": DB_STATUS_PROD},
-                )[0]
+        with BulkImport(self) as bulk:
+            persona_to_ids = defaultdict(list)
+            self.c.execute("SELECT id, persona FROM characters_table")
+            for row in self.c.fetchall():
+                persona_to_ids[row[1]].append(row[0])
+            # Map (utterance, room, character) to the interactions in the room
+            # that have the utterance and the character as a participant, to
+            # check if a conversation has already been loaded
+            said_in = defaultdict(set)
+            self.c.execute(
+                """
+                SELECT DISTINCT turns_table.utterance_id,
+                    interactions_table.setting_id,
+                    participants_table.character_id,
+                    turns_table.interaction_id
+                FROM turns_table
+                INNER JOIN interactions_table
+                    ON interactions_table.id = turns_table.interaction_id
+                INNER JOIN participants_table
+                    ON participants_table.interaction_id = turns_table.interaction_id
+                WHERE turns_table.utterance_id IS NOT NULL
+                """
+            )
+            for row in self.c.fetchall():
+                said_in[(row[0], row[1], row[2])].add(row[3])
+
+            for conv_idx, (room_pickle_id, data) in enumerate(
+                tqdm(
+                    conv_parser.iter_convs_data(),
+                    total=conv_parser.count_conversations(),
+                    desc="loading conversations",
+                    disable=disable_TQDM,
+                )
+            ):
+                room_id = self.id_room_dict[room_pickle_id]
+                # dictionary that maps between character name and character id
+                # in the database
+                name_to_id = {}
+                for name, persona in conv_parser.name_to_persona(conv_idx).items():
+                    char_ids = persona_to_ids[persona]
+                    assert len(char_ids) == 1
+                    name_to_id[name] = char_ids[0]
+                for d in data:
+                    d["speaker"] = name_to_id[d["speaker"]]
+                    if d["listener"]:
+                        d["listener"] = name_to_id[d["listener"]]
+                utterance_ids = [
+                    bulk.get_or_create(DB_TYPE_UTTERANCE, (d["text"],))[0] for d in data
+                ]
+
+                # if the same speakers have said every utterance in an
+                # existing conversation in this room, it's already been added
+                possible_interaction_ids = None
+                for d, utterance_id in zip(data, utterance_ids):
+                    found = said_in.get((utterance_id, room_id, d["speaker"]), set())
+                    if possible_interaction_ids is None:
+                        possible_interaction_ids = found
+                    else:
+                        possible_interaction_ids = possible_interaction_ids & found
+                    if len(possible_interaction_ids) == 0:
+                        break
+                if possible_interaction_ids is None or len(possible_interaction_ids):
+                    continue
+
+                interaction_id = bulk.create(DB_TYPE_INTERACTION, (room_id,))
                 # char_to_participant maps speaker id to (participant ID of
                 # speaker, participant ID of listener). Participant ID of
                 # listener is None when the speaker is speaking to the room
                 char_to_participant = {}
-                char1_player_id = self.create_player(
-                    entry_attributes={"is_from_pickle": True, "status": DB_STATUS_PROD}
-                )[0]
-                char1_id = self.create_participant(
-                    interaction_id,
-                    data[0]["speaker"],
-                    char1_player_id,
-                    entry_attributes={"is_from_pickle": True, "status": DB_STATUS_PROD},
-                )[0]
-                if data[0]["listener"] == None:
-                    char2_id = None
-                    char_to_participant[data[0]["speaker"]] = (char1_id, None)
+                speaker, listener = data[0]["speaker"], data[0]["listener"]
+                char1_player_id = bulk.create(DB_TYPE_PLAYER)
+                char1_id = bulk.create(
+                    DB_TYPE_PARTICIPANT, (interaction_id, speaker, char1_player_id)
+                )
+                if listener == None:
+                    char_to_participant[speaker] = (char1_id, None)
                 else:
-                    char2_player_id = self.create_player(
-                        entry_attributes={
-                            "is_from_pickle": True,
-                            "status": DB_STATUS_PROD,
-                        }
-                    )[0]
-                    char2_id = self.create_participant(
-                        interaction_id,
-                        data[0]["listener"],
-                        char2_player_id,
-                        entry_attributes={
-                            "is_from_pickle": True,
-                            "status": DB_STATUS_PROD,
-                        },
-                    )[0]
-                    char_to_participant[data[0]["speaker"]] = (char1_id, char2_id)
-                    char_to_participant[data[0]["listener"]] = (char2_id, char1_id)
+                    char2_player_id = bulk.create(DB_TYPE_PLAYER)
+                    char2_id = bulk.create(
+                        DB_TYPE_PARTICIPANT, (interaction_id, listener, char2_player_id)
+                    )
+                    char_to_participant[speaker] = (char1_id, char2_id)
+                    char_to_participant[listener] = (char2_id, char1_id)
                 turn_number = 0
                 # add each turn in order
-                for d in data:
+                for d, utterance_id in zip(data, utterance_ids):
                     speaker_id, listener_id = char_to_participant[d["speaker"]]
-                    utterance_id = self.create_utterance(
-                        d["text"],
-                        entry_attributes={
-                            "is_from_pickle": True,
-                            "status": DB_STATUS_PROD,
-                        },
-                    )[0]
                     # add turn related to speech
-                    self.create_turn(
-                        interaction_id,
-                        turn_number,
-                        d["duration"],
-                        "speech",
-                        utterance_id,
-                        None,
-                        speaker_id,
-                        listener_id,
-                        entry_attributes={
-                            "is_from_pickle": True,
-                            "status": DB_STATUS_PROD,
-                        },
-                    )
-                    turn_number += 1
-                    # add turn related to action/emote, if there are any
-                    if d["action"] != None:
-                        self.create_turn(
+                    bulk.create(
+                        DB_TYPE_TURN,
+                        (
                             interaction_id,
                             turn_number,
                             d["duration"],
-                            d["action"][0],
+                            "speech",
+                            utterance_id,
                             None,
-                            d["action"][1],
                             speaker_id,
                             listener_id,
-                            entry_attributes={
-                                "is_from_pickle": True,
-                                "status": DB_STATUS_PROD,
-                            },
+                        ),
+                    )
+                    turn_number += 1
+                    # add turn related to action/emote, if there are any
+                    if d["action"] != None:
+                        bulk.create(
+                            DB_TYPE_TURN,
+                            (
+                                interaction_id,
+                                turn_number,
+                                d["duration"],
+                                d["action"][0],
+                                None,
+                                d["action"][1],
+                                speaker_id,
+                                listener_id,
+                            ),
                         )
                         turn_number += 1
+                for utterance_id in set(utterance_ids):
+                    for char_id in char_to_participant.keys():
+                        said_in[(utterance_id, room_id, char_id)].add(interaction_id)
+        return self._report_bulk_import(bulk, disable_TQDM)
 
     def add_environment_data(self, pklpath, disable_TQDM=False):
         """
-        Loads all contents of the pickle file located at pklpath to the database
+        Loads all contents of the pickle file located at pklpath to the
+        database, in bulk. Returns the rows inserted and how quickly.
         """
         enviro_parser = EnvironmentCheckpointParser(pklpath)
         rooms = enviro_parser.get_rooms()
         characters = enviro_parser.get_characters()
         objects = enviro_parser.get_objects()
         neighbors = enviro_parser.get_neighbors()
-        # add all rooms
-        for i in tqdm(
-            range(len(list(rooms.keys()))), desc="loading rooms", disable=disable_TQDM
-        ):
-            key = list(rooms.keys())[i]
-            r = rooms[key]
-            base_id = self.create_base_room(
-                r["category"],
-                entry_attributes={"is_from_pickle": True, "status": DB_STATUS_PROD},
-            )[0]
-            id = self.create_room(
-                r["setting"],
-                base_id,
-                r["description"],
-                r["background"],
-                entry_attributes={"is_from_pickle": True, "status": DB_STATUS_PROD},
-            )[0]
-            split = "test"
-            self.update_split(id, split)
-            self.id_room_dict[r["room_id"]] = id
-        # add all characters
-        for i in tqdm(
-            range(len(list(characters.keys()))),
-            desc="loading characters",
-            disable=disable_TQDM,
-        ):
-            key = list(characters.keys())[i]
-            c = characters[key]
-            base_form = min(c["base_form"], key=len).lower()
-            base_id = self.create_base_character(
-                base_form,
-                entry_attributes={"is_from_pickle": True, "status": DB_STATUS_PROD},
-            )[0]
-            # each character can have multiple personas and thus correspond to
-            # multiple entries in the database. Each character id in the pickle
-            # file corresponds to an array of character ids in the database
-            self.id_char_dict[c["character_id"]] = []
-            for i in range(len(c["personas"])):
-                id = self.create_character(
-                    c["name"],
-                    base_id,
-                    c["personas"][i],
-                    c["desc"],
-                    entry_attributes={"is_from_pickle": True, "status": DB_STATUS_PROD},
-                    is_plural=c.get("is_plural"),
-                    char_type=c.get("char_type"),
-                    name_prefix=c.get("name_prefix"),
-                )[0]
-                self.id_char_dict[c["character_id"]].append(id)
-        # add all objects
-        for i in tqdm(
-            range(len(list(objects.keys()))),
-            desc="loading objects",
-            disable=disable_TQDM,
-        ):
-            key = list(objects.keys())[i]
-            o = objects[key]
-            base_form = min(o["base_form"], key=len).lower()
-            base_id = self.create_base_object(
-                base_form,
-                entry_attributes={"is_from_pickle": True, "status": DB_STATUS_PROD},
-            )[0]
-            id = self.create_object(
-                o["name"],
-                base_id,
-                o["is_container"],
-                o["is_drink"],
-                o["is_food"],
-                o["is_gettable"],
-                o["is_surface"],
-                o["is_wearable"],
-                o["is_weapon"],
-                o["descriptions"][0],
-                entry_attributes={"is_from_pickle": True, "status": DB_STATUS_PROD},
-                name_prefix=o.get("name_prefix"),
-                is_plural=o.get("is_plural"),
-            )[0]
-            self.id_object_dict[o["object_id"]] = id
-        # add all node content (edges)
-        # in corresponds to inside the description and ex corresponds to
-        # extra possibility. In has edge strength 1 and ex has edge strength 0
-        for i in tqdm(
-            range(len(list(rooms.keys()))),
-            desc="loading edges for rooms",
-            disable=disable_TQDM,
-        ):
-            key = list(rooms.keys())[i]
-            r = rooms[key]
-            for i in r["ex_characters"]:
-                char_lst = self.id_char_dict[i]
-                for c in char_lst:
-                    self.create_node_content(
-                        self.id_room_dict[r["room_id"]],
-                        c,
-                        "ex_contained",
-                        0,
-                        entry_attributes={
-                            "is_from_pickle": True,
-                            "status": DB_STATUS_PROD,
-                        },
-                    )
-            for i in r["ex_objects"]:
-                self.create_node_content(
-                    self.id_room_dict[r["room_id"]],
-                    self.id_object_dict[i],
-                    "ex_contained",
-                    0,
-                    entry_attributes={"is_from_pickle": True, "status": DB_STATUS_PROD},
+        with BulkImport(self) as bulk:
+            # add all rooms
+            for r in tqdm(rooms.values(), desc="loading rooms", disable=disable_TQDM):
+                base_id = bulk.get_or_create(DB_TYPE_BASE_ROOM, (r["category"],))[0]
+                id, inserted = bulk.get_or_create(
+                    DB_TYPE_ROOM,
+                    (r["setting"], base_id, r["description"], r["background"]),
+                    split=DB_TEST_SPLIT,
                 )
-            for i in r["in_characters"]:
-                char_lst = self.id_char_dict[i]
-                for c in char_lst:
-                    self.create_node_content(
-                        self.id_room_dict[r["room_id"]],
-                        c,
-                        "in_contained",
-                        1,
-                        entry_attributes={
-                            "is_from_pickle": True,
-                            "status": DB_STATUS_PROD,
-                        },
-                    )
-            for i in r["in_objects"]:
-                self.create_node_content(
-                    self.id_room_dict[r["room_id"]],
-                    self.id_object_dict[i],
-                    "in_contained",
-                    1,
-                    entry_attributes={"is_from_pickle": True, "status": DB_STATUS_PROD},
+                if not inserted:
+                    bulk.update_split(id, DB_TEST_SPLIT)
+                self.id_room_dict[r["room_id"]] = id
+            # add all characters
+            for c in tqdm(
+                characters.values(), desc="loading characters", disable=disable_TQDM
+            ):
+                base_form = min(c["base_form"], key=len).lower()
+                base_id = bulk.get_or_create(DB_TYPE_BASE_CHAR, (base_form,))[0]
+                name_prefix, is_plural = get_name_defaults(
+                    c["name"], c.get("name_prefix"), c.get("is_plural")
                 )
-        for i in tqdm(
-            range(len(list(characters.keys()))),
-            desc="loading edges for characters",
-            disable=disable_TQDM,
-        ):
-            key = list(characters.keys())[i]
-            c = characters[key]
-            char_lst = self.id_char_dict[c["character_id"]]
-            for i in c["wearing_objects"]:
-                for char in char_lst:
-                    if type(i) is str:
-                        self.create_text_edge(
-                            char,
-                            str(i),
-                            DB_EDGE_WORN,
-                            1,
-                            entry_attributes={
-                                "is_from_pickle": True,
-                                "status": DB_STATUS_PROD,
-                            },
-                        )
-                    else:
-                        self.create_node_content(
-                            char,
-                            self.id_object_dict[i],
-                            DB_EDGE_WORN,
-                            1,
-                            entry_attributes={
-                                "is_from_pickle": True,
-                                "status": DB_STATUS_PROD,
-                            },
-                        )
-            for i in c["wielding_objects"]:
-                for char in char_lst:
-                    if type(i) is str:
-                        self.create_text_edge(
-                            char,
-                            str(i),
-                            DB_EDGE_WIELDED,
-                            1,
-                            entry_attributes={
-                                "is_from_pickle": True,
-                                "status": DB_STATUS_PROD,
-                            },
-                        )
-                    else:
-                        self.create_node_content(
-                            char,
-                            self.id_object_dict[i],
-                            DB_EDGE_WIELDED,
-                            1,
-                            entry_attributes={
-                                "is_from_pickle": True,
-                                "status": DB_STATUS_PROD,
-                            },
-                        )
-            for i in c["carrying_objects"]:
-                for char in char_lst:
-                    if type(i) is str:
-                        self.create_text_edge(
-                            char,
-                            str(i),
-                            DB_EDGE_IN_CONTAINED,
-                            1,
-                            entry_attributes={
-                                "is_from_pickle": True,
-                                "status": DB_STATUS_PROD,
-                            },
-                        )
-                    else:
-                        self.create_node_content(
-                            char,
-                            self.id_object_dict[i],
-                            DB_EDGE_IN_CONTAINED,
-                            1,
-                            entry_attributes={
-                                "is_from_pickle": True,
-                                "status": DB_STATUS_PROD,
-                            },
-                        )
-        # add neighbors for rooms
-        for i in tqdm(
-            range(len(neighbors)), desc="loading neighbors", disable=disable_TQDM
-        ):
-            id, n_dict = neighbors[i]
-            # We read the destination, direction, and direction from the neighbor in
-            # as the child_text, child_label, and child_desc respectively.
-            child_text = n_dict["destination"]
-            child_label = n_dict["direction"]
-            child_desc = n_dict["connection"]
-
-            # create text edge with edge type "neighbor" and edge strength 1
-            # -1 indicates there is no parent room
-            if id == -1:
-                continue
-                # TODO we may have to handle these separately somehow.
-                self.create_text_edge(
-                    None,
-                    child_text,
-                    DB_EDGE_NEIGHBOR,
-                    1,
-                    child_label=child_label,
-                    child_desc=child_desc,
-                    entry_attributes={"is_from_pickle": True, "status": DB_STATUS_PROD},
+                # each character can have multiple personas and thus correspond to
+                # multiple entries in the database. Each character id in the pickle
+                # file corresponds to an array of character ids in the database
+                self.id_char_dict[c["character_id"]] = []
+                for persona in c["personas"]:
+                    id = bulk.get_or_create(
+                        DB_TYPE_CHAR,
+                        (c["name"], base_id, persona, c["desc"]),
+                        (name_prefix, is_plural, c.get("char_type", "unknown")),
+                    )[0]
+                    self.id_char_dict[c["character_id"]].append(id)
+            # add all objects
+            for o in tqdm(
+                objects.values(), desc="loading objects", disable=disable_TQDM
+            ):
+                base_form = min(o["base_form"], key=len).lower()
+                base_id = bulk.get_or_create(DB_TYPE_BASE_OBJ, (base_form,))[0]
+                attributes = []
+                for attr in OBJECT_ATTRIBUTES:
+                    assert (
+                        float(o[attr]) >= 0 and float(o[attr]) <= 1
+                    ), f"{attr} value must be a float between 0 and 1"
+                    attributes.append(o[attr])
+                name_prefix, is_plural = get_name_defaults(
+                    o["name"], o.get("name_prefix"), o.get("is_plural")
                 )
-            else:
-                # some rooms in the original data are rejected and thus don't
-                # have corresponding entries in the database
-                try:
-                    self.create_text_edge(
+                id = bulk.get_or_create(
+                    DB_TYPE_OBJ,
+                    (o["name"], base_id, o["descriptions"][0]),
+                    tuple(attributes) + (name_prefix, is_plural),
+                    split=get_random_split(),
+                )[0]
+                self.id_object_dict[o["object_id"]] = id
+            # add all node content (edges)
+            # in corresponds to inside the description and ex corresponds to
+            # extra possibility. In has edge strength 1 and ex has edge strength 0
+            for r in tqdm(
+                rooms.values(), desc="loading edges for rooms", disable=disable_TQDM
+            ):
+                room_id = self.id_room_dict[r["room_id"]]
+                for key, edge_type, edge_strength in [
+                    ("ex_characters", DB_EDGE_EX_CONTAINED, 0),
+                    ("ex_objects", DB_EDGE_EX_CONTAINED, 0),
+                    ("in_characters", DB_EDGE_IN_CONTAINED, 1),
+                    ("in_objects", DB_EDGE_IN_CONTAINED, 1),
+                ]:
+                    for i in r[key]:
+                        if key.endswith("characters"):
+                            child_ids = self.id_char_dict[i]
+                        else:
+                            child_ids = [self.id_object_dict[i]]
+                        for child_id in child_ids:
+                            bulk.get_or_create(
+                                DB_TYPE_EDGE,
+                                (room_id, child_id, edge_type, edge_strength),
+                            )
+            for c in tqdm(
+                characters.values(),
+                desc="loading edges for characters",
+                disable=disable_TQDM,
+            ):
+                char_lst = self.id_char_dict[c["character_id"]]
+                for key, edge_type in [
+                    ("wearing_objects", DB_EDGE_WORN),
+                    ("wielding_objects", DB_EDGE_WIELDED),
+                    ("carrying_objects", DB_EDGE_IN_CONTAINED),
+                ]:
+                    for i in c[key]:
+                        for char in char_lst:
+                            if type(i) is str:
+                                bulk.get_or_create(
+                                    DB_TYPE_TEXT_EDGE, (char, i, "", "", edge_type, 1)
+                                )
+                            else:
+                                bulk.get_or_create(
+                                    DB_TYPE_EDGE,
+                                    (char, self.id_object_dict[i], edge_type, 1),
+                                )
+            # add neighbors for rooms
+            for id, n_dict in tqdm(
+                neighbors, desc="loading neighbors", disable=disable_TQDM
+            ):
+                # -1 indicates there is no parent room, TODO we may have to
+                # handle these separately somehow. Some rooms in the original
+                # data are rejected and thus don't have entries in the database
+                if id == -1 or id not in self.id_room_dict:
+                    continue
+                # We read the destination, direction, and connection from the
+                # neighbor in as the child_text, child_label, and child_desc
+                bulk.get_or_create(
+                    DB_TYPE_TEXT_EDGE,
+                    (
                         self.id_room_dict[id],
-                        child_text,
+                        n_dict["destination"],
+                        n_dict["connection"],
+                        n_dict["direction"],
                         DB_EDGE_NEIGHBOR,
                         1,
-                        child_label=child_label,
-                        child_desc=child_desc,
-                        entry_attributes={
-                            "is_from_pickle": True,
-                            "status": DB_STATUS_PROD,
-                        },
-                    )
-                except KeyError:
-                    pass
+                    ),
+                )
+        return self._report_bulk_import(bulk, disable_TQDM)
+
+    def _report_bulk_import(self, bulk, disable_TQDM):
+        """Print how quickly a finished bulk import went, and return its stats"""
+        stats = bulk.get_stats()
+        if not disable_TQDM:
+            print(
+                f"Loaded {stats['rows']} rows in {stats['seconds']:.1f}s "
+                f"({stats['rows_per_second']:.0f} rows/s)"
+            )
+        return stats
 
     def get_table_name(self, id, return_type=False):
         """
@@ -3241,9 +3566,10 @@ class LIGHTDatabase:
         assert self.is_world_owned_by(
             world_id, player_id
         ), "Cannot load a world you do not own"
-        if self.use_cache:
-            if world_id is not None and world_id in self.cache["worlds"]:
-                return [self.cache["worlds"][world_id]]
+        if self.use_cache and world_id is not None:
+            cached = self.cache["worlds"].get(world_id)
+            if cached is not None:
+                return [cached]
         self.c.execute(
             """
             SELECT * FROM world_table
@@ -45,6 +45,7 @@ from light.data_model.light_database import (
     CONTENT_STATUSES,
     EDIT_STATUSES,
 )
+from light.graph.builders.base_elements import DBCharacter, DBObject, DBRoom
 
 
 class TestDatabase(unittest.TestCase):
@@ -1711,18 +1712,19 @@ class TestDatabase(unittest.TestCase):
                 "Objects are not successfully created",
             )
 
-        # Test if node contents (edges) are created successfully
+        # Test if node contents (edges) are created successfully. The second
+        # object reuses the first's base object, so is the next id after it
         with LIGHTDatabase(os.path.join(self.data_dir, self.DB_NAME)) as test:
             edges_no_id = set([i[1:] for i in test.get_node_content()])
             self.assertEqual(
                 edges_no_id,
                 set(
                     [
-                        (8, 13, DB_EDGE_IN_CONTAINED, 1),
-                        (9, 13, DB_EDGE_IN_CONTAINED, 1),
+                        (8, 12, DB_EDGE_IN_CONTAINED, 1),
+                        (9, 12, DB_EDGE_IN_CONTAINED, 1),
                         (2, 8, DB_EDGE_EX_CONTAINED, 0),
                         (8, 11, DB_EDGE_WORN, 1),
-                        (2, 13, DB_EDGE_EX_CONTAINED, 0),
+                        (2, 12, DB_EDGE_EX_CONTAINED, 0),
                         (4, 6, DB_EDGE_IN_CONTAINED, 1),
                         (9, 11, DB_EDGE_WORN, 1),
                         (2, 9, DB_EDGE_EX_CONTAINED, 0),
@@ -1779,6 +1781,37 @@ class TestDatabase(unittest.TestCase):
             )
             self.assertEqual(set([turn1, turn2]), set(turns_no_id))
 
+        # Test that full text search covers the loaded data, and still covers
+        # new entries after the import
+        with LIGHTDatabase(os.path.join(self.data_dir, self.DB_NAME)) as test:
+            self.assertEqual(
+                [i[1] for i in test.search_database(DB_TYPE_ROOM, "wooden")],
+                ["A battleship"],
+            )
+            self.assertEqual(
+                [i[1] for i in test.search_database(DB_TYPE_UTTERANCE, "you")],
+                ["hello to you too"],
+            )
+            rbase_id = test.create_base_room("lagoon")[0]
+            self.assertEqual(
+                [i[0] for i in test.search_database(DB_TYPE_BASE_ROOM, "lagoon")],
+                [rbase_id],
+            )
+
+        # Test that loading the same data again doesn't add anything
+        with LIGHTDatabase(os.path.join(self.data_dir, self.DB_NAME)) as test:
+            num_ids = len(test.get_id())
+            stats = test.add_environment_data(
+                os.path.join(self.data_dir, "enviro.pickle"), disable_TQDM=True
+            )
+            self.assertEqual(stats["rows"], 0)
+            stats = test.add_conversation_data(
+                os.path.join(self.data_dir, "conv.pickle"), disable_TQDM=True
+            )
+            self.assertEqual(stats["rows"], 0)
+            self.assertEqual(len(test.get_id()), num_ids)
+            self.assertEqual(len(test.get_interaction()), 1)
+
     def test_edit_entity(self):
         """
         Tests whether editing entities in the database (except for utterances)
@@ -2727,6 +2760,78 @@ class TestDatabase(unittest.TestCase):
                 results.add(tuple(test.find_database_entities_in_rooms(classroom)))
             self.assertEqual(len(results), 3)
 
+    def test_read_only_cache(self):
+        """Ensure read only databases are served from an up to date cache file"""
+        db_path = os.path.join(self.data_dir, self.DB_NAME)
+        with LIGHTDatabase(db_path) as test:
+            base_room = test.create_base_room("room")[0]
+            room = test.create_room("room 1", base_room, "tiny", "old")[0]
+            base_char = test.create_base_character("troll")[0]
+            char = test.create_character(None, base_char, "tall", "big")[0]
+            base_obj = test.create_base_object("knife")[0]
+            obj = test.create_object(None, base_obj, 0.4, 0.2, 0, 0, 0, 0, 0, "big")[0]
+            test.create_node_content(room, char, DB_EDGE_IN_CONTAINED, 1)
+            test.create_node_content(room, obj, DB_EDGE_EX_CONTAINED, 1)
+            test.create_text_edge(room, "a rock", DB_EDGE_IN_CONTAINED, 1)
+
+        ldb = LIGHTDatabase(db_path, read_only=True)
+        cache_path = db_path + ".cache.db"
+        self.assertTrue(os.path.exists(cache_path))
+        with ldb as test:
+            self.assertEqual(test.get_room(id=room)[0]["name"], "room 1")
+            self.assertEqual(test.get_character(id=char)[0]["persona"], "tall")
+            self.assertEqual(test.get_object(id=obj)[0]["is_container"], 0.4)
+            self.assertEqual(test.get_base_character(id=base_char)[0]["name"], "troll")
+            self.assertEqual(test.get_id(id=base_obj, expand=True)[0]["name"], "knife")
+            self.assertEqual(test.get_id(id=room)[0]["type"], DB_TYPE_ROOM)
+            self.assertEqual([r["id"] for r in test.get_id(type=DB_TYPE_OBJ)], [obj])
+            self.assertEqual(
+                [e["child_id"] for e in test.get_node_content(parent_id=room)],
+                [char, obj],
+            )
+            self.assertEqual(
+                [
+                    e["parent_id"]
+                    for e in test.get_node_content(
+                        child_id=obj, edge_type=DB_EDGE_EX_CONTAINED
+                    )
+                ],
+                [room],
+            )
+            self.assertEqual(
+                test.get_text_edge(parent_id=room)[0]["child_text"], "a rock"
+            )
+        self.assertIn(room, ldb.cache["rooms"])
+        self.assertNotIn(char, ldb.cache["rooms"])
+        self.assertEqual(list(ldb.cache["characters"].keys()), [char])
+        self.assertEqual(len(ldb.cache["db_edges"][room]), 2)
+
+        # Graph builder elements look up their edges in the cache
+        db_room = DBRoom(ldb, room, ldb.cache)
+        self.assertEqual(db_room.in_characters["db"], [char])
+        self.assertEqual(db_room.category, "room")
+        db_obj = DBObject(ldb, obj, ldb.cache)
+        self.assertEqual(db_obj.ex_room_ids, [room])
+        self.assertEqual(db_obj.in_room_ids, [])
+        self.assertEqual(DBCharacter(ldb, char, ldb.cache).in_room_ids, [room])
+
+        # Entries changed while cached are kept in memory
+        del ldb.cache["rooms"][room]
+        self.assertNotIn(room, ldb.cache["rooms"])
+        self.assertEqual(list(ldb.cache["rooms"].keys()), [])
+
+        # The cache is only rebuilt once the database changes
+        cache_mtime = os.path.getmtime(cache_path)
+        LIGHTDatabase(db_path, read_only=True)
+        self.assertEqual(os.path.getmtime(cache_path), cache_mtime)
+        with LIGHTDatabase(db_path) as test:
+            room2 = test.create_room("room 2", base_room, "tiny", "old")[0]
+        os.utime(cache_path, (0, 0))
+        ldb = LIGHTDatabase(db_path, read_only=True)
+        with ldb as test:
+            self.assertEqual(test.get_room(id=room2)[0]["name"], "room 2")
+        self.assertEqual(list(ldb.cache["rooms"].keys()), [room, room2])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -10,6 +10,7 @@ from omegaconf import OmegaConf
 import os
 import json
 import time
+import threading
 
 from light.graph.elements.graph_nodes import GraphAgent
 from light.graph.structured_graph import OOGraph
@@ -24,6 +25,7 @@ from light.graph.events.graph_events import (
 from light.world.content_loggers import AgentInteractionLogger, RoomInteractionLogger
 from light.world.utils.json_utils import read_event_logs
 from light.data_model.db.episodes import EpisodeDB, EpisodeLogType
+from light.data_model.db.episode_writer import EpisodeWriter
 from light.data_model.db.base import LightDBConfig
 
 TEST_USER_ID = "USR-test"
@@ -423,3 +425,100 @@ class TestEpisodesDB(unittest.TestCase):
         for key in episode.get_graph_map().keys():
             graph = episode.get_graph(key, copy_db)
             self.assertNotIn(agent_node.user_id, str(graph.to_json()))
+
+    def test_background_writer_batches_episodes(self):
+        """
+        Test that enqueued episodes are written in shared batches, and
+        that reads wait for the backlog to drain
+        """
+        episode_db = EpisodeDB(self.config)
+        episode_db.writer = EpisodeWriter(
+            episode_db, max_backlog=4, max_batch_size=4, batch_linger=0.2
+        )
+        initial = self.setUp_single_room_graph(episode_db)
+        test_graph, test_world, agent_node, room_node = initial
+        room_logger = test_graph.room_id_to_loggers[room_node.node_id]
+
+        episode_ids = []
+        for _ in range(4):
+            room_logger._begin_meta_episode()
+            room_logger.worth_logging = True
+            room_logger._end_meta_episode()
+            episode_ids.append(room_logger._last_episode_logged)
+
+        episode_db.flush()
+        stats = episode_db.get_writer_stats()
+        self.assertEqual(stats["backlog"], 0)
+        self.assertEqual(stats["total_enqueued"], 4)
+        self.assertEqual(stats["total_written"], 4)
+        self.assertEqual(stats["total_failed"], 0)
+        self.assertLess(stats["total_batches"], 4, "Episodes should share batches")
+        self.assertLessEqual(stats["max_backlog_seen"], 4)
+        self.assertEqual(stats["dropped_enqueues"], 0)
+
+        episodes = episode_db.get_episodes()
+        self.assertEqual(set(e.id for e in episodes), set(episode_ids))
+        for episode_id in episode_ids:
+            episode = episode_db.get_episode(episode_id)
+            self.assertEqual(len(episode.graphs), 2)
+            self.assertEqual(len(episode.get_parsed_events(episode_db)), 0)
+
+    def test_background_writer_drops_when_stalled(self):
+        """Test that a stalled writer keeps its backlog bounded, dropping episodes"""
+        episode_db = EpisodeDB(self.config)
+        episode_db.writer = EpisodeWriter(
+            episode_db, max_backlog=2, max_batch_size=1, batch_linger=0
+        )
+        initial = self.setUp_single_room_graph(episode_db)
+        test_graph, test_world, agent_node, room_node = initial
+        room_logger = test_graph.room_id_to_loggers[room_node.node_id]
+
+        # Hold up the writes, so the backlog stays full
+        write_gate = threading.Event()
+        insert_episodes = episode_db._insert_episodes
+
+        def gated_insert_episodes(pendings):
+            write_gate.wait()
+            insert_episodes(pendings)
+
+        episode_db._insert_episodes = gated_insert_episodes
+
+        episode_ids = []
+        for _ in range(10):
+            room_logger._begin_meta_episode()
+            room_logger.worth_logging = True
+            room_logger._end_meta_episode()
+            episode_ids.append(room_logger._last_episode_logged)
+            self.assertLessEqual(episode_db.writer.get_backlog(), 2)
+        stats = episode_db.writer.get_stats()
+        self.assertEqual(stats["total_enqueued"], 10)
+        self.assertEqual(stats["max_backlog_seen"], 2)
+        # At most one episode held by the stalled dispatcher, and two waiting
+        self.assertGreaterEqual(stats["dropped_enqueues"], 7)
+        self.assertEqual(stats["total_written"], 0)
+        written_ids = [e_id for e_id in episode_ids if e_id is not None]
+        self.assertEqual(len(written_ids), 10 - stats["dropped_enqueues"])
+
+        write_gate.set()
+        episode_db.flush()
+        stats = episode_db.get_writer_stats()
+        self.assertEqual(stats["backlog"], 0)
+        self.assertEqual(stats["total_written"], len(written_ids))
+        self.assertEqual(set(e.id for e in episode_db.get_episodes()), set(written_ids))
+
+    def test_background_writer_drains_on_shutdown(self):
+        """Test that shutting down the db writes out any queued episodes"""
+        episode_db = EpisodeDB(LightDBConfig(backend="local", file_root=self.data_dir))
+        initial = self.setUp_single_room_graph(episode_db)
+        test_graph, test_world, agent_node, room_node = initial
+        room_logger = test_graph.room_id_to_loggers[room_node.node_id]
+        room_logger._begin_meta_episode()
+        room_logger.worth_logging = True
+        room_logger._end_meta_episode()
+        episode_id = room_logger._last_episode_logged
+        episode_db.shutdown()
+        self.assertEqual(episode_db.get_writer_stats()["total_written"], 1)
+
+        reloaded_db = EpisodeDB(LightDBConfig(backend="local", file_root=self.data_dir))
+        episode = reloaded_db.get_episode(episode_id)
+        self.assertEqual(len(episode.graphs), 2)
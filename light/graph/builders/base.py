@@ -8,7 +8,16 @@ import asyncio
 from dataclasses import dataclass
 from light.data_model.db.base import DBStatus
 
-from typing import Dict, List, Optional, TYPE_CHECKING
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+)
 
 if TYPE_CHECKING:
     from light.data_model.db.environment import EnvDB, DBRoom, DBAgent, DBObject
@@ -70,51 +79,66 @@ class DBGraphBuilder(GraphBuilder):
         self.allow_blocked = allow_blocked
         self.db = db
         self.db.create_node_cache()
-        self.__usable_rooms = None
-        self.__usable_chars = None
-        self.__usable_objects = None
-
-    def get_usable_rooms(self) -> List[str]:
+        self.__usable_rooms: List[str] = []
+        self.__usable_chars: List[str] = []
+        self.__usable_objects: List[str] = []
+        self.__usable_room_set: FrozenSet[str] = frozenset()
+        self.__usable_char_set: FrozenSet[str] = frozenset()
+        self.__usable_object_set: FrozenSet[str] = frozenset()
+        self.__room_feats_to_id: Dict[str, str] = {}
+        self.__char_feats_to_id: Dict[Tuple[str, str], str] = {}
+        self.__obj_feats_to_id: Dict[Tuple[str, str], str] = {}
+        self.__searched_feats_to_id: Dict[Tuple[str, ...], Optional[str]] = {}
+        self._build_lookups()
+
+    def _build_lookups(self) -> None:
         """
-        Return all rooms that are currently usable,
-        caching the result
+        Build the usable id sets and the exact-match maps from text features
+        to db_id in a single pass over the db's node cache, so that resolving
+        candidates never needs a query
         """
-        if self.__usable_rooms is None:
-            rooms = self.db.find_rooms()
-            if not self.allow_blocked:
-                rooms = [r for r in rooms if r.status == DBStatus.PRODUCTION]
-            self.__usable_rooms = [r.db_id for r in rooms]
+        assert self.db._cache is not None, "Node cache must be created first"
+
+        def is_usable(elem) -> bool:
+            return self.allow_blocked or elem.status == DBStatus.PRODUCTION
+
+        rooms = [r for r in self.db._cache["rooms"].values() if is_usable(r)]
+        chars = [c for c in self.db._cache["nodes"].values() if is_usable(c)]
+        objs = [o for o in self.db._cache["objects"].values() if is_usable(o)]
+        self.__usable_rooms = [r.db_id for r in rooms]
+        self.__usable_chars = [c.db_id for c in chars]
+        self.__usable_objects = [o.db_id for o in objs]
+        self.__usable_room_set = frozenset(self.__usable_rooms)
+        self.__usable_char_set = frozenset(self.__usable_chars)
+        self.__usable_object_set = frozenset(self.__usable_objects)
+
+        # The first match wins, as in the db search
+        for room in rooms:
+            self.__room_feats_to_id.setdefault(room.name.strip(), room.db_id)
+        for char in chars:
+            char_key = (char.name.strip(), char.persona.strip())
+            self.__char_feats_to_id.setdefault(char_key, char.db_id)
+        for obj in objs:
+            obj_key = (obj.name.strip(), obj.physical_description.strip())
+            self.__obj_feats_to_id.setdefault(obj_key, obj.db_id)
+
+    def get_usable_rooms(self) -> List[str]:
+        """Return all rooms that are currently usable"""
         return self.__usable_rooms.copy()
 
     def get_usable_chars(self) -> List[str]:
-        """
-        Return all chars that are currently usable,
-        caching the result
-        """
-        if self.__usable_chars is None:
-            chars = self.db.find_agents()
-            if not self.allow_blocked:
-                chars = [c for c in chars if c.status == DBStatus.PRODUCTION]
-            self.__usable_chars = [c.db_id for c in chars]
+        """Return all chars that are currently usable"""
         return self.__usable_chars.copy()
 
     def get_usable_objects(self) -> List[str]:
-        """
-        Return all objects that are currently usable,
-        caching the result
-        """
-        if self.__usable_objects is None:
-            objs = self.db.find_objects()
-            if not self.allow_blocked:
-                objs = [o for o in objs if o.status == DBStatus.PRODUCTION]
-            self.__usable_objects = [o.db_id for o in objs]
+        """Return all objects that are currently usable"""
         return self.__usable_objects.copy()
 
     def get_room_from_id(self, room_id: str) -> Optional["DBRoom"]:
         """Get a DBRoom representation for a room in the database by that
         room's database id. Return None if no match
         """
-        if not room_id in self.get_usable_rooms():
+        if not room_id in self.__usable_room_set:
             return None
         return self.db.get_room(room_id)
 
@@ -122,7 +146,7 @@ class DBGraphBuilder(GraphBuilder):
         """Get a DBObject representation for an object in the database by that
         object's database id. Return None if no match
         """
-        if not object_id in self.get_usable_objects():
+        if not object_id in self.__usable_object_set:
             return None
         return self.db.get_object(object_id)
 
@@ -130,13 +154,13 @@ class DBGraphBuilder(GraphBuilder):
         """Get a DBAgent representation for a char in the database by that
         char's database id. Return None if no match
         """
-        if not char_id in self.get_usable_chars():
+        if not char_id in self.__usable_char_set:
             return None
         return self.db.get_agent(char_id)
 
     def get_random_room(self) -> Optional["DBRoom"]:
         """Get a random room from the database."""
-        room_ids = self.get_usable_rooms()
+        room_ids = self.__usable_rooms
         if not len(room_ids):
             return None  # Returning none if the list is empty
         room_id = random.choice(room_ids)
@@ -145,7 +169,7 @@ class DBGraphBuilder(GraphBuilder):
 
     def get_random_char(self) -> Optional["DBAgent"]:
         """Get a random char from the database."""
-        char_ids = self.get_usable_chars()
+        char_ids = self.__usable_chars
         if not len(char_ids):
             return None
         char_id = random.choice(char_ids)
@@ -154,7 +178,7 @@ class DBGraphBuilder(GraphBuilder):
 
     def get_random_obj(self) -> Optional["DBObject"]:
         """Get a random obj from the database."""
-        obj_ids = self.get_usable_objects()
+        obj_ids = self.__usable_objects
         if not len(obj_ids):
             return None
         obj_id = random.choice(obj_ids)
@@ -170,41 +194,55 @@ class DBGraphBuilder(GraphBuilder):
             ]
         return [r.name for r in room_name_list]
 
+    def _search_feats_to_id(
+        self, key: Tuple[str, ...], find_elems: Callable[[], List[Any]]
+    ) -> Optional[str]:
+        """
+        Fall back to searching the db for features without an exact match,
+        remembering the result for the next time they come up
+        """
+        if key not in self.__searched_feats_to_id:
+            elems = find_elems()
+            db_id = None
+            if len(elems) > 0:
+                if self.allow_blocked or elems[0].status == DBStatus.PRODUCTION:
+                    db_id = elems[0].db_id
+            self.__searched_feats_to_id[key] = db_id
+        return self.__searched_feats_to_id[key]
+
     def roomfeats_to_id(self, text_feats) -> Optional[str]:
         """Return db_id of a room from text features"""
-        features = text_feats.split(". ")
-        rooms = self.db.find_rooms(name=features[0])
-        if len(rooms) == 0:
-            return None
-        if self.allow_blocked or rooms[0].status == DBStatus.PRODUCTION:
-            return rooms[0].db_id
-        return None
+        name = text_feats.split(". ")[0]
+        db_id = self.__room_feats_to_id.get(name.strip())
+        if db_id is not None:
+            return db_id
+        return self._search_feats_to_id(
+            ("room", name), lambda: self.db.find_rooms(name=name)
+        )
 
     def objfeats_to_id(self, text_feats) -> Optional[str]:
         """Return db_id of an object from text features"""
         features = text_feats.split(". ", 1)
-        objs = self.db.find_objects(
-            name=features[0].strip(),
-            physical_description=features[1].strip(),
+        key = (features[0].strip(), features[1].strip())
+        db_id = self.__obj_feats_to_id.get(key)
+        if db_id is not None:
+            return db_id
+        return self._search_feats_to_id(
+            ("object",) + key,
+            lambda: self.db.find_objects(name=key[0], physical_description=key[1]),
         )
-        if len(objs) == 0:
-            return None
-        if self.allow_blocked or objs[0].status == DBStatus.PRODUCTION:
-            return objs[0].db_id
-        return None
 
     def charfeats_to_id(self, text_feats) -> Optional[str]:
         """Return db_id of character from text features"""
         features = text_feats.split(". ", 1)
-        agents = self.db.find_agents(
-            name=features[0].strip(),
-            persona=features[1].strip(),
+        key = (features[0].strip(), features[1].strip())
+        db_id = self.__char_feats_to_id.get(key)
+        if db_id is not None:
+            return db_id
+        return self._search_feats_to_id(
+            ("char",) + key,
+            lambda: self.db.find_agents(name=key[0], persona=key[1]),
         )
-        if len(agents) == 0:
-            return None
-        if self.allow_blocked or agents[0].status == DBStatus.PRODUCTION:
-            return agents[0].db_id
-        return None
 
 
 class SingleSuggestionGraphBuilder(object):
@@ -3,7 +3,7 @@
 # Copyright (c) Meta Platforms, Inc. and affiliates.
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
-import copy, itertools
+import copy
 from light.data_model.light_database import (
     LIGHTDatabase,
     DB_TYPE_ROOM,
@@ -44,10 +44,8 @@ class DBElement(object):
         of  parent node and type of connection"""
         if self.use_cache:
             text_edges_list = []
-            if self.id in self.text_edge_cache:
-                filtered = self.text_edge_cache[self.id]
-                if type is not None:
-                    filtered = [f for f in filtered if f["edge_type"] == type]
+            filtered = self.text_edge_cache.select(parent_id=self.id, edge_type=type)
+            if len(filtered) > 0:
                 with self.db as ldb:
                     text_edges_list = [
                         edge["child_text"]
@@ -72,27 +70,20 @@ class DBElement(object):
         else:
             return_id = "parent_id"
         if self.db_edge_cache is not None:
-            filtered = []
-            if return_child and self.id in self.db_edge_cache:
-                filtered = [
+            if return_child:
+                return [
                     edge["child_id"]
-                    for edge in self.db_edge_cache[self.id]
-                    if (edge["edge_type"] == type or type == None)
-                ]
-            else:
-                if parent_type is not None:
-                    filtered = list(
-                        itertools.chain.from_iterable(
-                            [rows for rows in self.db_edge_cache.values()]
-                        )
+                    for edge in self.db_edge_cache.select(
+                        parent_id=self.id, edge_type=type
                     )
-                    filtered = [
-                        row["parent_id"]
-                        for row in filtered
-                        if (row["edge_type"] == type or type == None)
-                        and row["child_id"] == self.id
-                        and self.cache["id"][row["parent_id"]]["type"] == parent_type
-                    ]
+                ]
+            filtered = []
+            if parent_type is not None:
+                # Uses the cache's index on child ids, rather than a full scan
+                for edge in self.db_edge_cache.select(child_id=self.id, edge_type=type):
+                    parent = self.cache["id"].get(edge["parent_id"])
+                    if parent is not None and parent["type"] == parent_type:
+                        filtered.append(edge["parent_id"])
             return filtered
         with self.db as ldb:
             if parent_type is not None:
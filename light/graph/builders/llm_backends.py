@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Completion backends for the LLM-based graph builders. Backends are async, run
+a bounded number of queries at once, retry failed queries with exponential
+backoff, and can store completions in a content-addressed on-disk cache keyed
+on the prompt and sampling parameters, so rebuilding from the same prompt
+doesn't need to query the model again.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+from typing import Any, Callable, Dict, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from omegaconf import DictConfig
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_RETRIES = 4
+DEFAULT_RETRY_DELAY = 1.0
+
+
+class CompletionCache:
+    """On-disk cache of completions, stored under the hash of their request"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def get_key(request: Dict[str, Any]) -> str:
+        encoded = json.dumps(request, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached completion for the given key, if there is one"""
+        try:
+            with open(self._get_path(key)) as cache_file:
+                return json.load(cache_file)["completion"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+    def put(self, key: str, request: Dict[str, Any], completion: str) -> None:
+        """Store a completion, writing atomically so readers never see a partial"""
+        path = self._get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump({"request": request, "completion": completion}, cache_file)
+        os.replace(tmp_path, path)
+
+
+class CompletionBackend:
+    """
+    Abstract async completion backend. Subclasses implement _complete,
+    while this class handles caching, concurrency limits, and retries.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        cache_dir: Optional[str] = None,
+        retries: int = DEFAULT_RETRIES,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+    ):
+        self.max_concurrency = max_concurrency
+        self.cache = CompletionCache(cache_dir) if cache_dir else None
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight: Dict[str, "asyncio.Future[str]"] = {}
+        self.total_queries = 0
+        self.total_cache_hits = 0
+        self.total_retries = 0
+        self.total_query_time = 0.0
+        self.active_queries = 0
+        self.max_active_queries = 0
+
+    def get_model_name(self) -> str:
+        """Name of the model completing prompts, as part of cache keys"""
+        raise NotImplementedError
+
+    async def _complete(self, prompt: str, params: Dict[str, Any]) -> str:
+        """Query the model for a completion of the given prompt"""
+        raise NotImplementedError
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Asyncio primitives are bound to a loop, so make new ones per loop
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._in_flight = {}
+        assert self._semaphore is not None
+        return self._semaphore
+
+    async def complete(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        top_p: float = 1.0,
+        frequency_penalty: float = 0,
+        presence_penalty: float = 0,
+        sample: int = 0,
+    ) -> str:
+        """
+        Return a completion of the given prompt. Differing sample numbers
+        request (and cache) independent completions of the same prompt.
+        """
+        params = {
+            "temperature": temperature,
+            "top_p": top_p,
+            "frequency_penalty": frequency_penalty,
+            "presence_penalty": presence_penalty,
+        }
+        request = {
+            "model": self.get_model_name(),
+            "prompt": prompt,
+            "params": params,
+            "sample": sample,
+        }
+        key = CompletionCache.get_key(request)
+        if self.cache is not None:
+            completion = self.cache.get(key)
+            if completion is not None:
+                self.total_cache_hits += 1
+                return completion
+
+        semaphore = self._get_semaphore()
+        if key in self._in_flight:
+            # The same request is already being made, share its result
+            return await asyncio.shield(self._in_flight[key])
+        query = asyncio.ensure_future(self._query(semaphore, prompt, params))
+        self._in_flight[key] = query
+        try:
+            completion = await query
+        finally:
+            self._in_flight.pop(key, None)
+        if self.cache is not None:
+            self.cache.put(key, request, completion)
+        return completion
+
+    async def _query(
+        self, semaphore: asyncio.Semaphore, prompt: str, params: Dict[str, Any]
+    ) -> str:
+        """Make the query once there's room for it"""
+        async with semaphore:
+            self.active_queries += 1
+            self.max_active_queries = max(self.max_active_queries, self.active_queries)
+            try:
+                return await self._query_with_retries(prompt, params)
+            finally:
+                self.active_queries -= 1
+
+    async def _query_with_retries(self, prompt: str, params: Dict[str, Any]) -> str:
+        """Make the query, retrying with jittered exponential backoff"""
+        for attempt in range(self.retries + 1):
+            start_time = time.time()
+            try:
+                self.total_queries += 1
+                return await self._complete(prompt, params)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                self.total_retries += 1
+                delay = self.retry_delay * (2**attempt)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+            finally:
+                self.total_query_time += time.time() - start_time
+        raise AssertionError("Unreachable, the last attempt returns or raises")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "total_queries": self.total_queries,
+            "total_cache_hits": self.total_cache_hits,
+            "total_retries": self.total_retries,
+            "total_query_time": self.total_query_time,
+            "max_active_queries": self.max_active_queries,
+        }
+
+
+class OpenAICompletionBackend(CompletionBackend):
+    """Completions from the OpenAI completion API"""
+
+    def __init__(
+        self,
+        org_id: str,
+        secret_key: str,
+        engine: str = "text-davinci-002",
+        max_tokens: int = 700,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        try:
+            import openai  # type: ignore
+        except ImportError:
+            print("For the openai backend, you must also `pip install openai`")
+            raise
+        openai.organization = org_id
+        openai.api_key = secret_key
+        self.openai = openai
+        self.engine = engine
+        self.max_tokens = max_tokens
+
+    def get_model_name(self) -> str:
+        return f"openai/{self.engine}/{self.max_tokens}"
+
+    async def _complete(self, prompt: str, params: Dict[str, Any]) -> str:
+        loop = asyncio.get_running_loop()
+        completion = await loop.run_in_executor(
+            None,
+            lambda: self.openai.Completion.create(
+                engine=self.engine,
+                prompt=prompt,
+                max_tokens=self.max_tokens,
+                **params,
+            ),
+        )
+        print(".", end="", flush=True)
+        return completion.choices[0].text.strip()
+
+
+def default_stub_response(prompt: str) -> str:
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return f"stub completion {digest[:8]}"
+
+
+class StubCompletionBackend(CompletionBackend):
+    """
+    Deterministic local backend, for tests and offline runs. Completions
+    come from the given respond function, after an optional fixed delay.
+    """
+
+    def __init__(
+        self,
+        respond: Callable[[str], str] = default_stub_response,
+        delay: float = 0,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.respond = respond
+        self.delay = delay
+        self.prompts = []
+
+    def get_model_name(self) -> str:
+        return "stub"
+
+    async def _complete(self, prompt: str, params: Dict[str, Any]) -> str:
+        self.prompts.append(prompt)
+        if self.delay > 0:
+            await asyncio.sleep(self.delay)
+        return self.respond(prompt).strip()
+
+
+def get_completion_backend(builder_config: "DictConfig") -> CompletionBackend:
+    """Create the completion backend requested by the given builder config"""
+    backend_args = {
+        "max_concurrency": builder_config.max_concurrent_queries,
+        "cache_dir": builder_config.cache_dir,
+    }
+    if builder_config._backend == "openai":
+        return OpenAICompletionBackend(
+            builder_config.openai_org_id,
+            builder_config.openai_secret_key,
+            **backend_args,
+        )
+    elif builder_config._backend == "stub":
+        return StubCompletionBackend(**backend_args)
+    raise AssertionError(f"Unsupported backend {builder_config._backend}")
@@ -4,8 +4,8 @@ constructs a full world from just a text prompt
 by using a series of queries against a large language model
 """
 
+import asyncio
 import time
-import openai
 import random
 from light.graph.builders.base import (
     GraphBuilder,
@@ -13,6 +13,11 @@ from light.graph.builders.base import (
     SingleSuggestionGraphBuilder,
     POSSIBLE_NEW_ENTRANCES,
 )
+from light.graph.builders.llm_backends import (
+    CompletionBackend,
+    DEFAULT_MAX_CONCURRENCY,
+    get_completion_backend,
+)
 from light.graph.structured_graph import OOGraph
 from light.world.world import World, WorldConfig
 
@@ -271,6 +276,14 @@ class LLMPromptBuilderConfig(GraphBuilderConfig):
         default=15,
         metadata={"help": ("cap on number of characters to include")},
     )
+    max_concurrent_queries: int = field(
+        default=DEFAULT_MAX_CONCURRENCY,
+        metadata={"help": ("Number of LLM queries to have in flight at once")},
+    )
+    cache_dir: Optional[str] = field(
+        default=None,
+        metadata={"help": ("Directory to cache completions in, if any")},
+    )
 
 
 @dataclass
@@ -286,45 +299,28 @@ class GPT3LLMBuilderConfig(LLMPromptBuilderConfig):
     )
 
 
-last_query_time = time.time()
-last_query = None
-
-
-def query_openai(
-    prompt: str,
-    temperature: float = 0.7,
-    top_p: float = 1.0,
-    frequency_penalty: float = 0,
-    presence_penalty: float = 0,
-):
-    """Wrapper around openai queries, with some parameters"""
-    global last_query
-    completion = openai.Completion.create(
-        engine="text-davinci-002",
-        temperature=temperature,
-        top_p=top_p,
-        prompt=prompt,
-        frequency_penalty=frequency_penalty,
-        presence_penalty=presence_penalty,
-        max_tokens=700,
-    )
-    last_query = f"Prompt: {prompt}\nGeneration: {completion.choices[0].text.strip()}"
-    print(".", end="", flush=True)
-    return completion.choices[0].text.strip()
+@dataclass
+class StubLLMBuilderConfig(LLMPromptBuilderConfig):
+    _backend: str = "stub"
 
 
 def retry(count=5, exc_type=Exception):
+    """
+    Retry a query that failed to parse, requesting a new sample of the
+    completion each attempt, so that cached failures aren't repeated
+    """
+
     def decorator(func):
         @wraps(func)
-        def result(*args, **kwargs):
-            ret_exec = "No Query"
-            for _i in range(count):
+        async def result(*args, **kwargs):
+            ret_exec = None
+            for attempt in range(count):
                 try:
-                    return func(*args, **kwargs)
+                    return await func(*args, attempt=attempt, **kwargs)
                 except exc_type as e:
                     ret_exec = e
                     print("e", end="", flush=True)
-            print("Exception Query:\n" + last_query)
+            print(f"Exception Query:\n{func.__name__}: {ret_exec}")
             raise ret_exec
 
         return result
@@ -333,19 +329,20 @@ def retry(count=5, exc_type=Exception):
 
 
 @retry(count=8)
-def get_story_locations(
-    story_prompt: str, builder_config: "DictConfig", num_locs: int = 10
+async def get_story_locations(
+    story_prompt: str,
+    backend: "CompletionBackend",
+    num_locs: int = 10,
+    attempt: int = 0,
 ) -> List[str]:
     """Get a list of story locations given a related story prompt"""
     final_prompt = PROMPT_TO_LOCATIONS.format(num_locs, story_prompt)
-    if builder_config._backend == "openai":
-        result = query_openai(
-            final_prompt,
-            frequency_penalty=0.15,
-            presence_penalty=0.1,
-        )
-    else:
-        raise AssertionError(f"Unsupported backend {builder_config._backend}")
+    result = await backend.complete(
+        final_prompt,
+        frequency_penalty=0.15,
+        presence_penalty=0.1,
+        sample=attempt,
+    )
 
     result = "1. " + result
     lines = result.split("\n")
@@ -354,19 +351,20 @@ def get_story_locations(
 
 
 @retry(count=8)
-def get_story_characters(
-    story_prompt: str, builder_config: "DictConfig", num_chars: int = 10
+async def get_story_characters(
+    story_prompt: str,
+    backend: "CompletionBackend",
+    num_chars: int = 10,
+    attempt: int = 0,
 ) -> List[str]:
     """Get a list of story characters given a related story prompt"""
     final_prompt = PROMPT_TO_CHARACTERS.format(num_chars, story_prompt)
-    if builder_config._backend == "openai":
-        result = query_openai(
-            final_prompt,
-            frequency_penalty=0.15,
-            presence_penalty=0.1,
-        )
-    else:
-        raise AssertionError(f"Unsupported backend {builder_config._backend}")
+    result = await backend.complete(
+        final_prompt,
+        frequency_penalty=0.15,
+        presence_penalty=0.1,
+        sample=attempt,
+    )
 
     result = "1. " + result
     lines = result.split("\n")
@@ -375,13 +373,12 @@ def get_story_characters(
 
 
 @retry(count=8)
-def get_location_category(location_name: str, builder_config: "DictConfig") -> str:
+async def get_location_category(
+    location_name: str, backend: "CompletionBackend", attempt: int = 0
+) -> str:
     """Provide the category of a location, from the set "self-contained", "generic", "composite", 'not a location' """
     final_prompt = LOCATION_TO_CATEGORY.format(location_name)
-    if builder_config._backend == "openai":
-        result = query_openai(final_prompt)
-    else:
-        raise AssertionError(f"Unsupported backend {builder_config._backend}")
+    result = await backend.complete(final_prompt, sample=attempt)
     result = result.lower().split("\n", 1)[0].strip()
     assert result in [
         "self-contained",
@@ -393,15 +390,15 @@ def get_location_category(location_name: str, builder_config: "DictConfig") -> s
 
 
 @retry(count=8)
-def split_composite_location(
-    story_prompt: str, location_name: str, builder_config: "DictConfig"
+async def split_composite_location(
+    story_prompt: str,
+    location_name: str,
+    backend: "CompletionBackend",
+    attempt: int = 0,
 ) -> List[str]:
     """Given a composite location, provide a list of locations that would comprise it"""
     final_prompt = COMPOSITE_TO_COMPONENTS.format(story_prompt, location_name)
-    if builder_config._backend == "openai":
-        result = query_openai(final_prompt, frequency_penalty=0.2)
-    else:
-        raise AssertionError(f"Unsupported backend {builder_config._backend}")
+    result = await backend.complete(final_prompt, frequency_penalty=0.2, sample=attempt)
 
     result = "1. " + result
     lines = result.split("\n")
@@ -410,15 +407,15 @@ def split_composite_location(
 
 
 @retry(count=8)
-def get_group_location_instances(
-    story_prompt: str, location_name: str, builder_config: "DictConfig"
+async def get_group_location_instances(
+    story_prompt: str,
+    location_name: str,
+    backend: "CompletionBackend",
+    attempt: int = 0,
 ) -> List[str]:
     """Given a grouped location, provide some instances"""
     final_prompt = GROUPING_TO_INSTANCES.format(story_prompt, location_name)
-    if builder_config._backend == "openai":
-        result = query_openai(final_prompt)
-    else:
-        raise AssertionError(f"Unsupported backend {builder_config._backend}")
+    result = await backend.complete(final_prompt, sample=attempt)
 
     result = "1. " + result
     lines = result.split("\n")
@@ -427,15 +424,15 @@ def get_group_location_instances(
 
 
 @retry(count=8)
-def describe_location(
-    story_prompt: str, location_name: str, builder_config: "DictConfig"
+async def describe_location(
+    story_prompt: str,
+    location_name: str,
+    backend: "CompletionBackend",
+    attempt: int = 0,
 ) -> Dict[str, str]:
     """Given a location, provide the description and backstory"""
     final_prompt = LOCATION_NAME_TO_DESCRIPTIONS.format(story_prompt, location_name)
-    if builder_config._backend == "openai":
-        result = query_openai(final_prompt)
-    else:
-        raise AssertionError(f"Unsupported backend {builder_config._backend}")
+    result = await backend.complete(final_prompt, sample=attempt)
 
     description, backstory = result.split("\nBackstory:")
     return {
@@ -445,20 +442,18 @@ def describe_location(
 
 
 @retry(count=8)
-def annotate_location(
+async def annotate_location(
     story_prompt: str,
     location_name: str,
     location_description: str,
-    builder_config: "DictConfig",
+    backend: "CompletionBackend",
+    attempt: int = 0,
 ) -> Dict[str, List[str]]:
     """Given a location and description, provide contents"""
     final_prompt = LOCATION_ANNOTATION.format(
         story_prompt, location_name, location_description
     )
-    if builder_config._backend == "openai":
-        result = query_openai(final_prompt)
-    else:
-        raise AssertionError(f"Unsupported backend {builder_config._backend}")
+    result = await backend.complete(final_prompt, sample=attempt)
 
     characters, other = result.split("\nObjects:")
     if "Nearby Locations" in other:
@@ -486,15 +481,15 @@ def annotate_location(
 
 
 @retry(count=8)
-def annotate_prompted_character(
-    story_prompt: str, character_name: str, builder_config: "DictConfig"
+async def annotate_prompted_character(
+    story_prompt: str,
+    character_name: str,
+    backend: "CompletionBackend",
+    attempt: int = 0,
 ) -> Dict[str, List[str]]:
     """Given a character and the story they come from, annotate attributes"""
     final_prompt = PROMPTED_CHARACTER_ANNOTATION.format(story_prompt, character_name)
-    if builder_config._backend == "openai":
-        result = query_openai(final_prompt)
-    else:
-        raise AssertionError(f"Unsupported backend {builder_config._backend}")
+    result = await backend.complete(final_prompt, sample=attempt)
 
     singular, other = result.split("\nPlural Form:")
     plural, other = other.split("\nSingular Persona:")
@@ -515,17 +510,17 @@ def annotate_prompted_character(
 
 
 @retry(count=8)
-def annotate_set_character(
-    location_description: str, character_name: str, builder_config: "DictConfig"
+async def annotate_set_character(
+    location_description: str,
+    character_name: str,
+    backend: "CompletionBackend",
+    attempt: int = 0,
 ) -> Dict[str, List[str]]:
     """Given a character and the room they come from, annotate attributes AND contents"""
     final_prompt = ROOM_CHARACTER_ANNOTATION.format(
         location_description, character_name
     )
-    if builder_config._backend == "openai":
-        result = query_openai(final_prompt)
-    else:
-        raise AssertionError(f"Unsupported backend {builder_config._backend}")
+    result = await backend.complete(final_prompt, sample=attempt)
 
     singular, other = result.split("\nPlural Form:")
     plural, other = other.split("\nSingular Persona:")
@@ -561,15 +556,12 @@ def annotate_set_character(
 
 
 @retry(count=8)
-def annotate_object(
-    object_name: str, builder_config: "DictConfig"
+async def annotate_object(
+    object_name: str, backend: "CompletionBackend", attempt: int = 0
 ) -> Dict[str, List[str]]:
     """Given an object name, annotate it fully"""
     final_prompt = OBJECT_ANNOTATION.format(object_name)
-    if builder_config._backend == "openai":
-        result = query_openai(final_prompt)
-    else:
-        raise AssertionError(f"Unsupported backend {builder_config._backend}")
+    result = await backend.complete(final_prompt, sample=attempt)
 
     singular, other = result.split("\nPlural form:")
     plural, other = other.split("\nSingular description:")
@@ -595,16 +587,13 @@ def annotate_object(
 
 
 @retry(count=8)
-def get_neighbor_map(
-    location_list: List[str], builder_config: "DictConfig"
+async def get_neighbor_map(
+    location_list: List[str], backend: "CompletionBackend", attempt: int = 0
 ) -> Dict[str, List[str]]:
     """Given an object name, annotate it fully"""
     noted_locations = [f"{idx + 1}. {loc}" for (idx, loc) in enumerate(location_list)]
     final_prompt = ROOM_NEIGHBORS.format("\n".join(noted_locations))
-    if builder_config._backend == "openai":
-        result = query_openai(final_prompt)
-    else:
-        raise AssertionError(f"Unsupported backend {builder_config._backend}")
+    result = await backend.complete(final_prompt, sample=attempt)
 
     result = "1. " + result.strip()
     lines = result.split("\n")
@@ -624,14 +613,16 @@ class LLMPromptGraphBuilder(GraphBuilder):
 
     CONFIG_CLASS = LLMPromptBuilderConfig
 
-    def __init__(self, builder_config: "DictConfig"):
-        """Initialize the LLM"""
+    def __init__(
+        self,
+        builder_config: "DictConfig",
+        backend: Optional[CompletionBackend] = None,
+    ):
+        """Initialize the LLM, using the given backend if provided"""
         self.builder_config = builder_config
-        if builder_config._backend == "openai":
-            openai.organization = builder_config.openai_org_id
-            openai.api_key = builder_config.openai_secret_key
-        else:
-            raise AssertionError(f"Unsupported backend {builder_config._backend}")
+        if backend is None:
+            backend = get_completion_backend(builder_config)
+        self.backend = backend
 
         self.possible_rooms: Dict[str, Dict[str, Any]] = {}  # room name to props
         self.possible_agents: Dict[str, Dict[str, Any]] = {}  # char name to props
@@ -760,23 +751,44 @@ class LLMPromptGraphBuilder(GraphBuilder):
                         elem["singular"] = elem["singular"][len(article) :]
         return name_list
 
-    def build_possible_locations(
+    async def _build_individual_location(
+        self, story_prompt: str, i_room: Dict[str, Any]
+    ) -> None:
+        """Describe and then annotate a self-contained location"""
+        i_room.update(
+            await describe_location(story_prompt, i_room["name"], self.backend)
+        )
+        i_room.update(
+            await annotate_location(
+                story_prompt,
+                i_room["name"],
+                i_room["description"],
+                self.backend,
+            )
+        )
+        print("r", end="", flush=True)
+
+    async def build_possible_locations(
         self, story_prompt: str, size: int
     ) -> Dict[str, Dict[str, Any]]:
         """
         Given a story prompt and desired world size, create at least that many
-        possible rooms
+        possible rooms. The independent queries of each round run concurrently.
         """
-        base_locations = get_story_locations(story_prompt, self.builder_config)
+        base_locations = await get_story_locations(story_prompt, self.backend)
         base_location_list = self._cleanup_names([{"name": n} for n in base_locations])
         completed_locations = []
         location_names = set()
         # iterate through the process of building locations until we hit the cap
         while len(location_names) < size and len(base_location_list) > 0:
-            for location in base_location_list:
-                location["category"] = get_location_category(
-                    location["name"], self.builder_config
-                )
+            categories = await asyncio.gather(
+                *[
+                    get_location_category(location["name"], self.backend)
+                    for location in base_location_list
+                ]
+            )
+            for location, category in zip(base_location_list, categories):
+                location["category"] = category
 
             individuals = [
                 l for l in base_location_list if l["category"] == "self-contained"
@@ -784,40 +796,47 @@ class LLMPromptGraphBuilder(GraphBuilder):
             composites = [l for l in base_location_list if l["category"] == "composite"]
             groupings = [l for l in base_location_list if l["category"] == "generic"]
 
+            # Only create as many rooms as could be used
+            individuals = individuals[: size + 10 - len(location_names)]
+            await asyncio.gather(
+                *[self._build_individual_location(story_prompt, i) for i in individuals]
+            )
+
             visible_neighbors = []
             # Create rooms for the individuals
             for i_room in individuals:
-                i_room.update(
-                    describe_location(story_prompt, i_room["name"], self.builder_config)
-                )
-                i_room.update(
-                    annotate_location(
-                        story_prompt,
-                        i_room["name"],
-                        i_room["description"],
-                        self.builder_config,
-                    )
-                )
                 i_room["neighbors"] = self._drop_articles(i_room["locations"])
                 visible_neighbors += self._cleanup_names(
                     [{"name": n} for n in i_room["locations"]]
                 )
                 completed_locations.append(i_room)
                 location_names.add(i_room["name"])
-                print("r", end="", flush=True)
-                if len(location_names) >= size + 10:
-                    break
 
             if len(completed_locations) >= size:
                 break
 
+            # Split composites and get group instances concurrently
+            all_composite_names, all_instance_names = await asyncio.gather(
+                asyncio.gather(
+                    *[
+                        split_composite_location(story_prompt, c["name"], self.backend)
+                        for c in composites
+                    ]
+                ),
+                asyncio.gather(
+                    *[
+                        get_group_location_instances(
+                            story_prompt, g["name"], self.backend
+                        )
+                        for g in groupings
+                    ]
+                ),
+            )
+
             # Break out composites into _potentially_ individual rooms
             broken_composites = []
-            for composite in composites:
+            for composite, composite_names in zip(composites, all_composite_names):
                 c_name = composite["name"]
-                composite_names = split_composite_location(
-                    story_prompt, c_name, self.builder_config
-                )
                 # Pick random elements of the composite to be the neighbor suggestion
                 clean_names = self._drop_articles(composite_names)
                 for loc in completed_locations:
@@ -842,11 +861,8 @@ class LLMPromptGraphBuilder(GraphBuilder):
 
             # Get instances for anything that is a group
             group_instances = []
-            for group in groupings:
+            for group, instance_names in zip(groupings, all_instance_names):
                 g_name = group["name"]
-                instance_names = get_group_location_instances(
-                    story_prompt, g_name, self.builder_config
-                )
                 random.shuffle(instance_names)
                 instance_names = instance_names[:3]
                 clean_names = self._drop_articles(instance_names)
@@ -889,14 +905,14 @@ class LLMPromptGraphBuilder(GraphBuilder):
         random.shuffle(locs)
         return [l for l in locs if grid.get(l) is None]
 
-    def layout_locations(
+    async def layout_locations(
         self,
         possible_locations: Dict[str, Dict[str, Any]],
         size: int,
     ) -> Dict[Tuple[int, int], Dict[str, Any]]:
         """Given a dict of possible locations, lay them out into a grid"""
         room_name_list = list(possible_locations.keys())
-        neighbor_mapping = get_neighbor_map(room_name_list, self.builder_config)
+        neighbor_mapping = await get_neighbor_map(room_name_list, self.backend)
         for room in possible_locations.values():
             room["neighbors"] += neighbor_mapping[room["name"].lower()]
         room_0 = list(possible_locations.values())[0]
@@ -986,14 +1002,34 @@ class LLMPromptGraphBuilder(GraphBuilder):
 
         return grid
 
-    def build_possible_characters(
-        self, story_prompt: str, locations: List[Dict[str, Any]]
+    async def build_story_characters(self, story_prompt: str) -> List[Dict[str, Any]]:
+        """Create and annotate the characters from the story prompt alone"""
+        base_character_names = await get_story_characters(story_prompt, self.backend)
+        base_characters = self._cleanup_names(
+            [{"name": n} for n in base_character_names]
+        )
+        annotations = await asyncio.gather(
+            *[
+                annotate_prompted_character(story_prompt, b["name"], self.backend)
+                for b in base_characters
+            ]
+        )
+        for b_char, annotation in zip(base_characters, annotations):
+            b_char.update(annotation)
+            b_char["location"] = None
+        return base_characters
+
+    async def build_possible_characters(
+        self,
+        story_prompt: str,
+        locations: List[Dict[str, Any]],
+        base_characters: Optional[List[Dict[str, Any]]] = None,
     ) -> Dict[str, Dict[str, Any]]:
         """
         Create the dictionary of possible characters based on the
-        story prompt and locations
+        story prompt and locations, building the story characters
+        if they haven't already been
         """
-        base_character_names = get_story_characters(story_prompt, self.builder_config)
         additional_characters = []
         for location in locations:
             additional_characters += [
@@ -1001,30 +1037,29 @@ class LLMPromptGraphBuilder(GraphBuilder):
             ]
         additional_characters = self._cleanup_names(additional_characters)
 
-        for a_char in additional_characters:
-            a_char.update(
+        set_annotations = asyncio.gather(
+            *[
                 annotate_set_character(
                     a_char["location"]["description"],
                     a_char["name"],
-                    self.builder_config,
+                    self.backend,
                 )
-            )
-
-        base_characters = self._cleanup_names(
-            [{"name": n} for n in base_character_names]
+                for a_char in additional_characters
+            ]
         )
-        for b_char in base_characters:
-            b_char.update(
-                annotate_prompted_character(
-                    story_prompt, b_char["name"], self.builder_config
-                )
+        if base_characters is None:
+            base_characters, annotations = await asyncio.gather(
+                self.build_story_characters(story_prompt), set_annotations
             )
-            b_char["location"] = None
+        else:
+            annotations = await set_annotations
+        for a_char, annotation in zip(additional_characters, annotations):
+            a_char.update(annotation)
 
         all_chars = base_characters + additional_characters
         return {c["name"].lower(): c for c in all_chars}
 
-    def build_possible_objects(
+    async def build_possible_objects(
         self,
         characters: Dict[str, Dict[str, Any]],
         locations: List[Dict[str, Any]],
@@ -1049,8 +1084,11 @@ class LLMPromptGraphBuilder(GraphBuilder):
             char_objs += [{"name": obj, "location": character} for obj in local_objs]
 
         all_objs = self._cleanup_names(room_objects + char_objs)
-        for obj in all_objs:
-            obj.update(annotate_object(obj["name"], self.builder_config))
+        annotations = await asyncio.gather(
+            *[annotate_object(obj["name"], self.backend) for obj in all_objs]
+        )
+        for obj, annotation in zip(all_objs, annotations):
+            obj.update(annotation)
         all_objs = self._cleanup_names(all_objs)
         return {obj["name"].lower(): obj for obj in all_objs}
 
@@ -1240,28 +1278,36 @@ class LLMPromptGraphBuilder(GraphBuilder):
 
         return g
 
-    def build_graph(self, prompt: str) -> OOGraph:
+    async def build_graph(self, prompt: str) -> OOGraph:
         """Build a graph from the given prompt"""
         self.reset_graph()
 
-        # Get possible locations
+        # Get possible locations, while creating the story characters
         print("Generating rooms:")
-        possible_locations = self.build_possible_locations(
-            prompt, self.builder_config.num_rooms
-        )
+        story_characters = asyncio.ensure_future(self.build_story_characters(prompt))
+        try:
+            possible_locations = await self.build_possible_locations(
+                prompt, self.builder_config.num_rooms
+            )
 
-        # Create layout
-        print("\nCreating Grid layout:")
-        grid = self.layout_locations(possible_locations, self.builder_config.num_rooms)
-        used_locations = list(grid.values())
+            # Create layout
+            print("\nCreating Grid layout:")
+            grid = await self.layout_locations(
+                possible_locations, self.builder_config.num_rooms
+            )
+            used_locations = list(grid.values())
 
-        # Get possible characters, based only on used rooms
-        print("\nGenerating Characters:")
-        possible_characters = self.build_possible_characters(prompt, used_locations)
+            # Get possible characters, based only on used rooms
+            print("\nGenerating Characters:")
+            possible_characters = await self.build_possible_characters(
+                prompt, used_locations, await story_characters
+            )
+        finally:
+            story_characters.cancel()
 
         # Get possible objects
         print("\nGenerating Objects:")
-        possible_objects = self.build_possible_objects(
+        possible_objects = await self.build_possible_objects(
             possible_characters, used_locations
         )
 
@@ -1293,9 +1339,9 @@ class LLMPromptGraphBuilder(GraphBuilder):
         while graph is None and attempts > 0:
             try:
                 random.seed(time.time())
-                graph = self.build_graph(prompt)
+                graph = await self.build_graph(prompt)
                 world = World(self._get_attached_config(world_config))
-                world.oo_graph = g
+                world.oo_graph = graph
                 return graph, world
             except Exception as _e:
                 print(_e)
@@ -1338,7 +1384,7 @@ if __name__ == "__main__":
         config.num_characters = int(input("Num Chars:\n> "))
 
         builder = LLMPromptGraphBuilder(config)
-        graph = builder.build_graph(prompt)
+        graph = asyncio.run(builder.build_graph(prompt))
 
         output_name = input("\nProvide output name:\n>") + ".json"
         output_dir = os.path.join(map_dir, output_name)
@@ -17,6 +17,7 @@ from light.graph.builders.base import (
     SingleSuggestionGraphBuilder,
     POSSIBLE_NEW_ENTRANCES,
 )
+from light.graph.builders.starspace_index import CandidateEmbeddingIndex
 from light.world.content_loggers import RoomInteractionLogger
 from light.data_model.light_database import (
     DB_EDGE_IN_CONTAINED,
@@ -174,6 +175,12 @@ class StarspaceBuilder(DBGraphBuilder, SingleSuggestionGraphBuilder):
         parser.add_argument(
             "--map-size", type=int, default=6, help="define the size of the map"
         )
+        parser.add_argument(
+            "--embedding-index-dir",
+            type=str,
+            default=None,
+            help="Directory to save and memory-map candidate embedding indices",
+        )
         parser.add_argument(
             "--is-logging",
             type="bool",
@@ -215,6 +222,30 @@ class StarspaceBuilder(DBGraphBuilder, SingleSuggestionGraphBuilder):
         share_dict["opt"] = opt
         self.agents["character"] = create_agent_from_shared(share_dict)
         self.agent = self.agents["room"]
+        self.load_embedding_indices()
+
+    def load_embedding_indices(self):
+        """
+        Embed the fixed candidates of the room, object, and character models
+        once, so that similarity queries are matrix ops rather than a full
+        act() over all of the candidates
+        """
+        index_dir = self.opt.get("embedding_index_dir")
+        feats_to_ids = {
+            "room": self.roomfeats_to_id,
+            "object": self.objfeats_to_id,
+            "character": self.charfeats_to_id,
+        }
+        self.indices = {}
+        for agent_type, feats_to_id in feats_to_ids.items():
+            index_path = None
+            if index_dir is not None:
+                index_path = os.path.join(index_dir, agent_type)
+            index = CandidateEmbeddingIndex.from_starspace_agent(
+                self.agents[agent_type], index_path
+            )
+            index.resolve_ids(feats_to_id)
+            self.indices[agent_type] = index
 
     def _props_from_obj(self, obj):
         """Given a DBObject representing an object in the world, extract the
@@ -503,72 +534,77 @@ class StarspaceBuilder(DBGraphBuilder, SingleSuggestionGraphBuilder):
         else:
             return None, None
 
+    def get_room_feats(self, room):
+        """Return the text features of a room, caching them"""
+        if room.db_id not in self.roomid_to_feats:
+            return self.get_text_features(room)
+        return self.roomid_to_feats[room.db_id]
+
     async def room_similarity(self, loc1, loc2):
         """Determine how similar the starspace model thinks two given rooms are"""
-        room_1 = self.grid[loc1]
-        room_2 = self.grid[loc2]
-        if room_1.db_id not in self.roomid_to_feats:
-            txt_feats = self.get_text_features(room_1)
-        else:
-            txt_feats = self.roomid_to_feats[room_1.db_id]
-        if room_2.db_id not in self.roomid_to_feats:
-            sim_feats = self.get_text_features(room_2)
-        else:
-            sim_feats = self.roomid_to_feats[room_2.db_id]
-        # TODO(M2) refactor to use the builder you create for the light v1 task,
-        # or to have feature calculation as a shared utility function that
-        # is referenced both here and in your builder
+        return self.room_similarities(loc1, [loc2])[0]
 
-        # Get prediction from StarSpace model.
-        msg = {"text": txt_feats, "episode_done": True}
-        self.agents["room"].reset()
-        self.agents["room"].observe(msg)
-        response = await self.agents["room"].act()
-        score = 100000
-        for i, k in enumerate(response["text_candidates"]):
-            if k == sim_feats:
-                score = i
-                break
-        return score
+    def room_similarities(self, loc, other_locs):
+        """
+        Determine how similar the starspace model thinks a room is to each of
+        the given rooms, as the rank each would have in the model's predictions
+        """
+        txt_feats = self.get_room_feats(self.grid[loc])
+        sim_feats = [self.get_room_feats(self.grid[l]) for l in other_locs]
+        ranks = self.indices["room"].rank(txt_feats, sim_feats)
+        # Only the top 100 predictions count as similar at all
+        return [rank if rank < 100 else 100000 for rank in ranks]
 
-    async def possibly_connect_to_neighbor(self, loc1, loc2, src_dir):
-        """Connect two rooms if the model thinks they're similar enough"""
+    def can_connect_to_neighbor(self, loc1, loc2, src_dir):
+        """Determine if there's an unconnected room at loc2 to connect to"""
         # TODO rather than connecting if two rooms are similar, perhaps
         # we should be connecting if a room is similar to another
         # room's listed neighbor. Then we can be more strict on sim
-        if (
+        return not (
             loc2 not in self.grid
             or self.grid[loc2].setting == "EMPTY"
             or src_dir in self.grid[loc1].possible_connections
-        ):
+        )
+
+    def connect_to_neighbor(self, loc1, loc2, src_dir):
+        """Connect two rooms, marking it as a model possible connection"""
+        self.grid[loc2].possible_connections[INV_DIR[src_dir]] = True
+        self.grid[loc1].possible_connections[src_dir] = True
+        self.grid[loc2].possible_connections[INV_DIR[src_dir] + "*"] = True
+        self.grid[loc1].possible_connections[src_dir + "*"] = True
+
+    async def possibly_connect_to_neighbor(self, loc1, loc2, src_dir):
+        """Connect two rooms if the model thinks they're similar enough"""
+        if not self.can_connect_to_neighbor(loc1, loc2, src_dir):
             # nothing there or it is already connected
             return
-        else:
-            # compute similarity of rooms:
-            sim = await self.room_similarity(loc1, loc2)
-            if sim > 100:
-                # if not in the top 100 most similar rooms, no connection.
-                return
-            # make connection, mark as model possible connection
-            self.grid[loc2].possible_connections[INV_DIR[src_dir]] = True
-            self.grid[loc1].possible_connections[src_dir] = True
-            self.grid[loc2].possible_connections[INV_DIR[src_dir] + "*"] = True
-            self.grid[loc1].possible_connections[src_dir + "*"] = True
+        # compute similarity of rooms:
+        sim = await self.room_similarity(loc1, loc2)
+        if sim > 100:
+            # if not in the top 100 most similar rooms, no connection.
+            return
+        self.connect_to_neighbor(loc1, loc2, src_dir)
 
     async def possibly_connect_to_neighbors(self, loc):
         """Try to connect a room to all of its possible neighbors"""
-        await self.possibly_connect_to_neighbor(
-            loc, (loc[0] - 1, loc[1], loc[2]), "west"
-        )
-        await self.possibly_connect_to_neighbor(
-            loc, (loc[0] + 1, loc[1], loc[2]), "east"
-        )
-        await self.possibly_connect_to_neighbor(
-            loc, (loc[0], loc[1] - 1, loc[2]), "north"
-        )
-        await self.possibly_connect_to_neighbor(
-            loc, (loc[0], loc[1] + 1, loc[2]), "south"
-        )
+        neighbors = [
+            ((loc[0] - 1, loc[1], loc[2]), "west"),
+            ((loc[0] + 1, loc[1], loc[2]), "east"),
+            ((loc[0], loc[1] - 1, loc[2]), "north"),
+            ((loc[0], loc[1] + 1, loc[2]), "south"),
+        ]
+        neighbors = [
+            (loc2, src_dir)
+            for loc2, src_dir in neighbors
+            if self.can_connect_to_neighbor(loc, loc2, src_dir)
+        ]
+        if len(neighbors) == 0:
+            return
+        # Score all of the neighbors against this room at once
+        sims = self.room_similarities(loc, [loc2 for loc2, _ in neighbors])
+        for (loc2, src_dir), sim in zip(neighbors, sims):
+            if sim <= 100:
+                self.connect_to_neighbor(loc, loc2, src_dir)
 
     async def add_room(self, room, loc, src_loc, src_dir):
         """Add a room as the neighbor of the room at src_loc"""
@@ -655,18 +691,12 @@ class StarspaceBuilder(DBGraphBuilder, SingleSuggestionGraphBuilder):
             feats_to_id = self.charfeats_to_id
             get_x_from_id = self.get_char_from_id
         if agent_type != None:
-            self.agents[agent_type].reset()
-            msg = {"text": txt_feats, "episode_done": True}
-            self.agents[agent_type].observe(msg)
-            response = await self.agents[agent_type].act()
-            ind = 0
-            while ind < len(response["text_candidates"]):
-                key = response["text_candidates"][ind]
-                rind = feats_to_id(key)
-                if rind is not None and rind not in banned_items:
-                    return get_x_from_id(rind)
-                ind = ind + 1
-            return None
+            index = self.indices[agent_type]
+            mask = index.get_mask(banned_items)
+            best = index.top_k([txt_feats], 1, mask)[0]
+            if len(best) == 0:
+                return None
+            return get_x_from_id(index.candidate_ids[best[0]])
 
     async def get_similar_room(self, txt_feats):
         """Find a similar room to the text room given
@@ -694,24 +724,12 @@ class StarspaceBuilder(DBGraphBuilder, SingleSuggestionGraphBuilder):
             # This is added due to the new model prediction for neighbors
         else:
             txt_feats = self.roomid_to_feats[room_id]
-        response = await self.agent_recommend(txt_feats, "room")
-        ind = 0
-        results = []
-        while len(results) < num_results:
-            key = response["text_candidates"][ind]
-            if key in self.feats_to_roomid:
-                rind = self.feats_to_roomid[key]
-            else:
-                rind = self.roomfeats_to_id(key)
-            if rind not in banned_rooms:
-                results.append(self.get_room_from_id(rind))
-            ind = ind + 1
-            if len(response["text_candidates"]) <= ind:
-                if len(results) == 0:
-                    return None
-                else:
-                    return results
-        return results
+        index = self.indices["room"]
+        mask = index.get_mask(banned_rooms)
+        best = index.top_k([txt_feats], num_results, mask)[0]
+        if len(best) == 0:
+            return None
+        return [self.get_room_from_id(index.candidate_ids[idx]) for idx in best]
 
     async def get_graph(self):
         """Construct a graph using the grid created with build_world after
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Precomputed embedding indices over the fixed candidate sets that the map
+builders' starspace models rank against. Rather than running a full act()
+over every candidate for each query and scanning the ranked text, the
+candidate embeddings are computed once (and saved to disk, to be memory
+mapped on later loads), so that top-k and rank queries are matrix ops.
+"""
+
+import json
+import os
+import numpy as np
+
+from typing import Callable, Dict, Iterable, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from parlai.agents.starspace.starspace import StarspaceAgent  # type: ignore
+
+# Encodes a list of texts to a (num_texts, dim) matrix
+EncodeFn = Callable[[List[str]], np.ndarray]
+
+# Rank given to texts that aren't candidates, matching a miss in the model's
+# returned text_candidates
+MISSING_RANK = 100000
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length, so dot products are cosine similarities"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-8)
+
+
+def get_starspace_encoders(agent: "StarspaceAgent") -> Dict[str, EncodeFn]:
+    """
+    Return functions that embed queries and candidates the same way a
+    ParlAI starspace agent does when ranking its fixed candidates
+    """
+    import torch
+
+    model = agent.model
+
+    def encode(texts: List[str], encoder, use_lin: bool) -> np.ndarray:
+        embeddings = []
+        with torch.no_grad():
+            for text in texts:
+                tokens = agent.parse(text)
+                if len(tokens) == 0:
+                    tokens = [agent.NULL_IDX]
+                embedding = encoder(torch.LongTensor(tokens).unsqueeze(0))
+                if use_lin and model.lins > 0:
+                    embedding = model.lin(embedding)
+                embeddings.append(embedding.reshape(-1).numpy())
+        return np.stack(embeddings).astype(np.float32)
+
+    return {
+        "query": lambda texts: encode(texts, model.encoder, True),
+        "candidate": lambda texts: encode(texts, model.encoder2, False),
+    }
+
+
+class CandidateEmbeddingIndex:
+    """
+    Normalized embeddings for a fixed list of candidate texts, along with the
+    db_id each candidate resolves to, supporting batched top-k and rank queries
+    """
+
+    def __init__(
+        self,
+        candidates: List[str],
+        embeddings: np.ndarray,
+        encode_queries: Optional[EncodeFn] = None,
+    ):
+        assert len(candidates) == embeddings.shape[0], "Need one row per candidate"
+        self.candidates = candidates
+        self.embeddings = embeddings
+        self.encode_queries = encode_queries
+        self.candidate_to_idx: Dict[str, int] = {}
+        for idx, candidate in enumerate(candidates):
+            self.candidate_to_idx.setdefault(candidate, idx)
+        self.candidate_ids: List[Optional[str]] = [None] * len(candidates)
+        self._id_to_idxs: Dict[str, List[int]] = {}
+        self._unresolved_mask = np.ones(len(candidates), dtype=bool)
+        self._query_cache: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def build(
+        cls,
+        candidates: List[str],
+        encode_candidates: EncodeFn,
+        encode_queries: Optional[EncodeFn] = None,
+        batch_size: int = 1024,
+    ) -> "CandidateEmbeddingIndex":
+        """Embed all of the candidates, a batch at a time"""
+        batches = [
+            encode_candidates(candidates[i : i + batch_size])
+            for i in range(0, len(candidates), batch_size)
+        ]
+        embeddings = normalize_rows(np.concatenate(batches).astype(np.float32))
+        return cls(candidates, embeddings, encode_queries)
+
+    @classmethod
+    def from_starspace_agent(
+        cls, agent: "StarspaceAgent", index_path: Optional[str] = None
+    ) -> "CandidateEmbeddingIndex":
+        """
+        Create an index over the agent's fixed candidates, loading it from
+        index_path if it's been saved there for the same candidates, and
+        saving it there otherwise
+        """
+        encoders = get_starspace_encoders(agent)
+        candidates = list(agent.fixedCands_txt)
+        if index_path is not None and cls.exists(index_path):
+            index = cls.load(index_path, encoders["query"])
+            if index.candidates == candidates:
+                return index
+        index = cls.build(candidates, encoders["candidate"], encoders["query"])
+        if index_path is not None:
+            index.save(index_path)
+        return index
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(f"{path}.npy") and os.path.exists(f"{path}.json")
+
+    def save(self, path: str) -> None:
+        """Save the embeddings and candidates to path.npy and path.json"""
+        dirname = os.path.dirname(path)
+        if len(dirname) > 0:
+            os.makedirs(dirname, exist_ok=True)
+        np.save(f"{path}.npy", np.ascontiguousarray(self.embeddings))
+        with open(f"{path}.json", "w") as json_file:
+            json.dump(self.candidates, json_file)
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        encode_queries: Optional[EncodeFn] = None,
+        mmap: bool = True,
+    ) -> "CandidateEmbeddingIndex":
+        """Load a saved index, memory-mapping the embeddings by default"""
+        with open(f"{path}.json") as json_file:
+            candidates = json.load(json_file)
+        embeddings = np.load(f"{path}.npy", mmap_mode="r" if mmap else None)
+        return cls(candidates, embeddings, encode_queries)
+
+    def resolve_ids(self, feats_to_id: Callable[[str], Optional[str]]) -> None:
+        """Resolve the db_id of each candidate, for id-based masking"""
+        self.candidate_ids = [feats_to_id(c) for c in self.candidates]
+        self._id_to_idxs = {}
+        for idx, db_id in enumerate(self.candidate_ids):
+            if db_id is not None:
+                self._id_to_idxs.setdefault(db_id, []).append(idx)
+        self._unresolved_mask = np.array(
+            [db_id is None for db_id in self.candidate_ids], dtype=bool
+        )
+
+    def get_mask(self, banned_ids: Iterable[str] = ()) -> np.ndarray:
+        """
+        Return a mask of the candidates that can't be returned, being
+        either banned or not resolving to a usable db_id
+        """
+        mask = self._unresolved_mask.copy()
+        for db_id in banned_ids:
+            mask[self._id_to_idxs.get(db_id, [])] = True
+        return mask
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Return normalized query embeddings, caching those already seen"""
+        assert self.encode_queries is not None, "Index has no query encoder"
+        missing = [t for t in dict.fromkeys(texts) if t not in self._query_cache]
+        if len(missing) > 0:
+            encoded = normalize_rows(self.encode_queries(missing))
+            for text, embedding in zip(missing, encoded):
+                self._query_cache[text] = embedding
+        return np.stack([self._query_cache[t] for t in texts])
+
+    def score(self, texts: List[str]) -> np.ndarray:
+        """Return the (num_texts, num_candidates) cosine similarity matrix"""
+        return self.encode(texts) @ self.embeddings.T
+
+    def top_k(
+        self, texts: List[str], k: int, mask: Optional[np.ndarray] = None
+    ) -> List[List[int]]:
+        """
+        Return the indices of the k best candidates for each text, best first,
+        skipping any candidates in the mask
+        """
+        scores = self.score(texts)
+        if mask is not None:
+            scores[:, mask] = -np.inf
+            k = min(k, int((~mask).sum()))
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in texts]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(top, order, axis=1).tolist()
+
+    def rank(self, text: str, targets: List[str]) -> List[int]:
+        """
+        Return the rank each target would have among the candidates ranked
+        for the given text, or MISSING_RANK if a target isn't a candidate
+        """
+        scores = self.score([text])[0]
+        idxs = [self.candidate_to_idx.get(target) for target in targets]
+        found = [idx for idx in idxs if idx is not None]
+        # Count the candidates that outscore each target, all at once
+        found_ranks = iter((scores[None, :] > scores[found][:, None]).sum(axis=1))
+        return [MISSING_RANK if idx is None else int(next(found_ranks)) for idx in idxs]
@@ -166,6 +166,24 @@ class TestDBGraphBuilder(unittest.TestCase):
         edges = room1.text_edges
         self.assertIn("Dirty Neighbor", [e.child_text for e in edges])
 
+    def test_feats_to_id(self):
+        builder = self.graphBuilder
+        self.assertEqual(builder.roomfeats_to_id("room1. room. dirty old"), self.roomID)
+        self.assertEqual(builder.objfeats_to_id("OBJ_1. big"), self.objID)
+        self.assertEqual(
+            builder.charfeats_to_id("troll2 under the bridge. Female"), self.charID2
+        )
+        # Partial features fall back to searching the db
+        self.assertEqual(builder.objfeats_to_id("OBJ_. Sma"), self.objID2)
+        self.assertIsNone(builder.roomfeats_to_id("room3"))
+
+        # Entries pending review are not usable unless blocked are allowed
+        strict_builder = DBGraphBuilder(GraphBuilderConfig(), self.env_db)
+        self.assertEqual(strict_builder.get_usable_rooms(), [])
+        self.assertIsNone(strict_builder.get_room_from_id(self.roomID))
+        self.assertIsNone(strict_builder.roomfeats_to_id("room1"))
+        self.assertIsNone(strict_builder.objfeats_to_id("OBJ_1. big"))
+
 
 if __name__ == "__main__":
     unittest.main()
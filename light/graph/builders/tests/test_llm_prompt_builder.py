@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+import asyncio
+import random
+import shutil
+import tempfile
+
+from light.graph.builders.llm_backends import StubCompletionBackend
+from light.graph.builders.llm_prompt_builder import (
+    LLMPromptGraphBuilder,
+    StubLLMBuilderConfig,
+    PROMPT_TO_LOCATIONS,
+    PROMPT_TO_CHARACTERS,
+    LOCATION_TO_CATEGORY,
+    GROUPING_TO_INSTANCES,
+    LOCATION_NAME_TO_DESCRIPTIONS,
+    LOCATION_ANNOTATION,
+    ROOM_NEIGHBORS,
+    PROMPTED_CHARACTER_ANNOTATION,
+    ROOM_CHARACTER_ANNOTATION,
+    OBJECT_ANNOTATION,
+)
+
+
+def get_queried_name(prompt: str, label: str, end_label: str) -> str:
+    """Extract the value the prompt ends by asking about"""
+    return prompt.rsplit(label, 1)[1].split(end_label, 1)[0].strip()
+
+
+def describe_character(name: str) -> str:
+    return (
+        f"{name}\nPlural Form: {name}s\nSingular Persona: I am the {name}.\n"
+        f"Singular Physical Description: This is the {name}.\n"
+        f"Singular Motivation: Be the best {name}.\nEmoji: *"
+    )
+
+
+class StubStoryModel:
+    """Answers each kind of builder prompt in the format the builder expects"""
+
+    def __init__(self):
+        self.bad_categories = {"old tavern"}
+
+    def categorize(self, prompt: str) -> str:
+        location = get_queried_name(prompt, "Location:", "\n").lower()
+        if location in self.bad_categories:
+            # Fail the first time, so the query is retried with a new sample
+            self.bad_categories.remove(location)
+            return "a tavern, probably"
+        return "generic" if location == "dark forest" else "self-contained"
+
+    def annotate_location(self, prompt: str) -> str:
+        name = get_queried_name(prompt, "Location name:", "\n")
+        neighbor = "Town square" if name != "Town square" else "Old tavern"
+        return (
+            f"- {name} keeper\nObjects:\n- {name} sign\nNearby Locations:\n- {neighbor}"
+        )
+
+    def map_neighbors(self, prompt: str) -> str:
+        listed = get_queried_name(prompt, "Locations:\n", "Neighbor Lists:")
+        names = [line.split(". ", 1)[1] for line in listed.split("\n")]
+        lines = [
+            f"{idx + 1}. {name}: {', '.join(n for n in names if n != name)}"
+            for idx, name in enumerate(names)
+        ]
+        return "\n".join(lines).split(". ", 1)[1]
+
+    def respond(self, prompt: str) -> str:
+        if prompt.startswith(PROMPT_TO_LOCATIONS.split("{}")[0]):
+            return "Town square\n2. Old tavern\n3. Dark forest"
+        if prompt.startswith(PROMPT_TO_CHARACTERS.split("{}")[0]):
+            return "blacksmith\n2. knight\n3. bard"
+        if prompt.startswith(LOCATION_TO_CATEGORY.split("{}")[0]):
+            return self.categorize(prompt)
+        if prompt.startswith(GROUPING_TO_INSTANCES.split("{}")[0]):
+            return "pine grove\n2. mossy clearing"
+        if prompt.startswith(LOCATION_NAME_TO_DESCRIPTIONS.split("{}")[0]):
+            name = get_queried_name(prompt, "Location:", "\n")
+            return f"A place called {name}.\nBackstory: {name} was built long ago."
+        if prompt.startswith(LOCATION_ANNOTATION.split("{}")[0]):
+            return self.annotate_location(prompt)
+        if prompt.startswith(ROOM_NEIGHBORS.split("{}")[0]):
+            return self.map_neighbors(prompt)
+        if prompt.startswith(PROMPTED_CHARACTER_ANNOTATION.split("{}")[0]):
+            return describe_character(get_queried_name(prompt, "Name:", "\n"))
+        if prompt.startswith(ROOM_CHARACTER_ANNOTATION.split("{}")[0]):
+            name = get_queried_name(prompt, "Name:", "\n")
+            return (
+                describe_character(name)
+                + "\nCarrying:\n- bread\nWielding:\n- None\nWearing:\n- None"
+            )
+        if prompt.startswith(OBJECT_ANNOTATION.split("{}")[0]):
+            name = get_queried_name(prompt, "Name:", "\n")
+            return (
+                f"{name}\nPlural form: {name}s\nSingular description: A {name}.\n"
+                "Food: no\nDrink: no\nHoldable: yes\nWearable: no\n"
+                "Wieldable: no\nSurface: no\nContainer: no"
+            )
+        raise AssertionError(f"Unexpected prompt: {prompt}")
+
+
+class TestLLMPromptGraphBuilder(unittest.TestCase):
+    """Ensure worlds build from concurrent, cached completions"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.config = StubLLMBuilderConfig(
+            prompt="A quiet town", num_rooms=4, num_characters=3
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def build(self, backend):
+        builder = LLMPromptGraphBuilder(self.config, backend=backend)
+        random.seed(4)
+        graph = asyncio.run(builder.build_graph(self.config.prompt))
+        return sorted(node.name for node in graph.all_nodes.values())
+
+    def test_build_and_rebuild_from_cache(self):
+        backend = StubCompletionBackend(
+            StubStoryModel().respond, delay=0.01, cache_dir=self.cache_dir
+        )
+        node_names = self.build(backend)
+        self.assertIn("Town square", node_names)
+        self.assertIn("pine grove", node_names)
+        self.assertIn("Town square sign", node_names)
+        stats = backend.get_stats()
+        self.assertGreater(stats["max_active_queries"], 1)
+        self.assertEqual(stats["total_cache_hits"], 0)
+
+        # Rebuilding from the same prompt shouldn't query the model at all,
+        # including the retried category that failed on its first sample
+        rebuild_backend = StubCompletionBackend(
+            StubStoryModel().respond, cache_dir=self.cache_dir
+        )
+        self.assertEqual(self.build(rebuild_backend), node_names)
+        self.assertEqual(rebuild_backend.get_stats()["total_queries"], 0)
+        # Repeated annotations share one query, but each is a separate hit
+        self.assertGreater(
+            rebuild_backend.get_stats()["total_cache_hits"],
+            stats["total_queries"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from parlai.core.agents import create_agent
+from parlai.core.dict import DictionaryAgent
+from parlai.core.params import ParlaiParser
+
+from light.graph.builders.starspace_index import (
+    CandidateEmbeddingIndex,
+    MISSING_RANK,
+)
+
+CANDIDATES = [
+    f"the {color} room with {item}"
+    for color in ["red", "blue", "green", "dark", "old", "tall"]
+    for item in ["a bed", "a sword", "trees", "a fire"]
+]
+
+
+class TestCandidateEmbeddingIndex(unittest.TestCase):
+    """Ensure embedding index queries match the starspace model's rankings"""
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        cands_path = os.path.join(self.data_dir, "cands.txt")
+        with open(cands_path, "w") as cands_file:
+            cands_file.write("\n".join(CANDIDATES))
+        dict_path = os.path.join(self.data_dir, "model.dict")
+        parser = ParlaiParser(True, True)
+        opt = parser.parse_args(
+            [
+                "--model",
+                "starspace",
+                "--fixed-candidates-file",
+                cands_path,
+                "--embeddingsize",
+                "16",
+                "--dict-file",
+                dict_path,
+            ]
+        )
+        dictionary = DictionaryAgent(opt)
+        for candidate in CANDIDATES:
+            dictionary.add_to_dict(dictionary.tokenize(candidate))
+        dictionary.save(dict_path)
+        self.agent = create_agent(opt)
+        self.index_path = os.path.join(self.data_dir, "index", "room")
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_matches_model_ranking(self):
+        index = CandidateEmbeddingIndex.from_starspace_agent(
+            self.agent, self.index_path
+        )
+        query = "a room with a fire"
+        self.agent.observe({"text": query, "episode_done": True})
+        expected = self.agent.act()["text_candidates"]
+        top = index.top_k([query], 10)[0]
+        self.assertEqual([index.candidates[idx] for idx in top], expected[:10])
+        self.assertEqual(
+            index.rank(query, expected[:3] + ["not a candidate"]),
+            [0, 1, 2, MISSING_RANK],
+        )
+
+        # Saved indices are reloaded memory-mapped, without re-embedding
+        loaded = CandidateEmbeddingIndex.from_starspace_agent(
+            self.agent, self.index_path
+        )
+        self.assertIsInstance(loaded.embeddings, np.memmap)
+        self.assertEqual(loaded.top_k([query], 10)[0], top)
+
+    def test_masks_banned_and_unresolved(self):
+        index = CandidateEmbeddingIndex.from_starspace_agent(self.agent)
+        index.resolve_ids(lambda feats: None if "dark" in feats else feats)
+        query = "the dark room with a fire"
+        mask = index.get_mask(["the tall room with a fire"])
+        best = [index.candidate_ids[idx] for idx in index.top_k([query], 30, mask)[0]]
+        self.assertEqual(len(best), len(CANDIDATES) - 5)
+        self.assertNotIn("the tall room with a fire", best)
+        self.assertTrue(all("dark" not in db_id for db_id in best))
+        self.assertEqual(index.top_k([query], 1, np.ones(len(CANDIDATES), bool)), [[]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,9 @@
 
 import random
 import json
-from typing import List, Set, Dict, Any, Optional, TypeVar, cast
+import hashlib
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Set, TypeVar, cast
 
 NodeProps = Dict[str, Any]
 
@@ -32,6 +34,27 @@ def node_to_json(node):
     return json.dumps(node, cls=GraphEncoder, sort_keys=True, indent=4)
 
 
+def get_msgpack():
+    """Import msgpack, which is only required for binary graph encodings"""
+    try:
+        import msgpack  # type: ignore
+    except ImportError:
+        print("For binary graph encodings, you must also `pip install msgpack`")
+        raise
+    return msgpack
+
+
+def msgpack_default(o):
+    """Convert the graph-specific values msgpack can't encode on its own"""
+    if isinstance(o, set):
+        return sorted(list(o))
+    if isinstance(o, tuple):
+        return list(o)
+    if isinstance(o, GraphEdge):
+        return {k: v for k, v in o.__dict__.items() if not k.startswith("_")}
+    raise TypeError(f"Cannot msgpack encode {o!r}")
+
+
 # TODO:  refactor to not use here
 class GraphEncoder(json.JSONEncoder):
     def default(self, o):
@@ -47,6 +70,10 @@ class GraphEncoder(json.JSONEncoder):
         return use_dict
 
 
+# Shared encoder for the compact json of individual node fields
+FIELD_ENCODER = GraphEncoder(sort_keys=True, separators=(",", ":"))
+
+
 class GraphEdge(object):
     """Representative structure for having an edge between two nodes in the
     graph. Provides an interface for dereferencing edges but can still be
@@ -54,6 +81,10 @@ class GraphEdge(object):
 
     EDGE_TYPE = "GraphEdge"
 
+    # Edges copied into a forked graph resolve their target by id through
+    # the fork on first use, so copying one node doesn't copy its neighbors
+    _target_graph = None
+
     def __init__(self, target_node):
         assert isinstance(
             target_node, GraphNode
@@ -62,10 +93,14 @@ class GraphEdge(object):
         self.target_id = target_node.node_id
 
     def get(self):
-        return self._target_node
+        target_node = self._target_node
+        if target_node is None and self._target_graph is not None:
+            target_node = self._target_graph.get_node_copy(self.target_id)
+            self._target_node = target_node
+        return target_node
 
     def __repr__(self):
-        return f"{self.EDGE_TYPE}({self._target_node})"
+        return f"{self.EDGE_TYPE}({self.get()})"
 
 
 class LockEdge(GraphEdge):
@@ -177,6 +212,106 @@ class GraphNode(object):
         # TODO there are probably more properties currently abstracted by
         # the overarching graph class
 
+    # -------- Cached serialization -------- #
+
+    def __setattr__(self, name, value):
+        # Nodes have no descriptors, so fields can be set on __dict__ directly,
+        # which keeps this hook cheap for the many assignments in node setup
+        attrs = self.__dict__
+        attrs[name] = value
+        if name[0] != "_":
+            # Assigning any serialized field invalidates the cached fragments
+            attrs["_fragments"] = None
+            if name == "name" or name == "names":
+                # Keep the owning graph's name index in sync with renames
+                name_index = attrs.get("_name_index")
+                if name_index is not None:
+                    name_index.update_names(self)
+
+    def mark_dirty(self) -> None:
+        """
+        Invalidate the cached serializations of this node. Required after
+        in-place changes to a field, which assignment tracking can't see.
+        """
+        self.__dict__["_fragments"] = None
+
+    def _get_fragment_cache(self) -> Dict[str, Any]:
+        """Return the cache of serializations for the current node state"""
+        fragments = self.__dict__.get("_fragments")
+        if fragments is None:
+            fragments = {}
+            self.__dict__["_fragments"] = fragments
+        return fragments
+
+    def get_serialized_fields(self) -> Dict[str, Any]:
+        """Return the fields of this node that are serialized"""
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    def to_fragment(self, strip_contents: bool = False) -> str:
+        """
+        Return the compact json for this node, cached until the node changes.
+        Optionally drop the contents and neighbors, as done for the rooms
+        neighboring a snapshot in OOGraph.to_json_rv
+        """
+        fragments = self._get_fragment_cache()
+        key = "json_stripped" if strip_contents else "json"
+        if key not in fragments:
+            fields = self.get_serialized_fields()
+            if strip_contents:
+                fields["contained_nodes"] = {}
+                fields["neighbors"] = {}
+            fragments[key] = json.dumps(
+                fields, cls=GraphEncoder, sort_keys=True, separators=(",", ":")
+            )
+        return fragments[key]
+
+    def get_cached_fragment(self, key: str, build_fn: Callable[[], Any]) -> Any:
+        """
+        Return a derived serialization of this node stored under the given
+        key, building it with build_fn if it isn't cached for this state
+        """
+        fragments = self._get_fragment_cache()
+        if key not in fragments:
+            fragments[key] = build_fn()
+        return fragments[key]
+
+    def get_field_fragments(self) -> Dict[str, Any]:
+        """
+        Return the compact json of each serialized field, with dict fields
+        (such as contents and neighbors) split into the json of each item.
+        Cached until the node changes, and used to find changed fields.
+        """
+        fragments = self._get_fragment_cache()
+        if "fields" not in fragments:
+            encode = FIELD_ENCODER.encode
+            field_fragments: Dict[str, Any] = {}
+            for key, value in self.get_serialized_fields().items():
+                if isinstance(value, dict):
+                    field_fragments[key] = {str(k): encode(v) for k, v in value.items()}
+                else:
+                    field_fragments[key] = encode(value)
+            fragments["fields"] = field_fragments
+        return fragments["fields"]
+
+    def get_fragment_hash(self, strip_contents: bool = False) -> str:
+        """Return a content hash of this node's fragment"""
+        fragments = self._get_fragment_cache()
+        key = "hash_stripped" if strip_contents else "hash"
+        if key not in fragments:
+            fragment = self.to_fragment(strip_contents)
+            fragments[key] = hashlib.sha1(fragment.encode()).hexdigest()[:20]
+        return fragments[key]
+
+    def to_msgpack_fragment(self) -> bytes:
+        """Return the msgpack encoding of this node, cached until it changes"""
+        fragments = self._get_fragment_cache()
+        if "msgpack" not in fragments:
+            msgpack = get_msgpack()
+            fragments["msgpack"] = msgpack.packb(
+                self.get_serialized_fields(), default=msgpack_default
+            )
+        return fragments["msgpack"]
+
     @classmethod
     def from_graph(cls, graph, node_id):
         """Init this node from an existing place in the graph"""
@@ -257,12 +392,14 @@ class GraphNode(object):
         assert contained_node.size <= self.contain_size, "Can't fit anything else"
         self.contained_nodes[contained_node.node_id] = GraphEdge(contained_node)
         self.contain_size -= contained_node.size
+        self.mark_dirty()
 
     def remove_contained_node(self, contained_node):
         """Remove the given node from the list of nodes contained in this one"""
         assert contained_node.node_id in self.contained_nodes, "Given node not present"
         del self.contained_nodes[contained_node.node_id]
         self.contain_size += contained_node.size
+        self.mark_dirty()
 
     def get_contents(self):
         """get copy of the list of nodes inside this node"""
@@ -306,14 +443,17 @@ class GraphNode(object):
         """Set key class attributes as props for this node"""
         # TODO - try not to use this until formalized, it's hard to track
         self.__dict__[prop_name] = val
+        self.mark_dirty()
 
     def add_class(self, class_name):
         """Add a class to this node"""
         self.classes.add(class_name)
+        self.mark_dirty()
 
     def remove_class(self, class_name):
         """remove a class from this node"""
         self.classes.remove(class_name)
+        self.mark_dirty()
 
     def get_room(self) -> "GraphRoom":
         """get this node's first containing room"""
@@ -353,7 +493,7 @@ class GraphNode(object):
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return node_to_json(self) == node_to_json(other)
+            return self.to_fragment() == other.to_fragment()
         else:
             return False
 
@@ -395,8 +535,10 @@ class GraphNode(object):
             if self.node_id in old_container.contained_nodes:
                 if old_container.contained_nodes[self.node_id].get() == self:
                     del old_container.contained_nodes[self.node_id]
+                    old_container.mark_dirty()
         # Add to new container and update
         container_node.contained_nodes[self.node_id] = GraphEdge(self)
+        container_node.mark_dirty()
         self.set_container(container_node)
 
     def ready_to_clean_corpse(self) -> bool:
@@ -524,12 +666,14 @@ class GraphRoom(GraphNode):
         self.neighbors[other_node.node_id] = NeighborEdge(
             other_node, edge_label, edge_desc, locked_edge
         )
+        self.mark_dirty()
 
     def remove_neighbor(self, other_node):
         assert (
             other_node in self.get_neighbors()
         ), "Can't remove neighbor that isn't there"
         del self.neighbors[other_node.node_id]
+        self.mark_dirty()
 
     def delete_and_cleanup(self):
         """Remove this room from being present in the graph, return nodes deleted"""
@@ -560,6 +704,9 @@ class GraphAgent(GraphNode):
     DEFAULT_ATTACK_TAGGED_AGENTS = []
     DEFAULT_MAX_DISTANCE_FROM_START_LOCATION = 1000000
     DEFAULT_DONT_ACCEPT_GIFTS = False
+    # Observations and text chunks kept for agents nobody is reading out
+    MAX_OBSERVATIONS = 200
+    MAX_TEXT_BUFFER_CHUNKS = 200
 
     NODE_TYPE = "GraphAgent"
 
@@ -667,12 +814,14 @@ class GraphAgent(GraphNode):
         ), "Can only block agents in the same room"
         self.blocking = GraphEdge(other_agent)
         other_agent.blocked_by[self.node_id] = GraphEdge(self)
+        other_agent.mark_dirty()
 
     def unblock(self):
         """Remove the edges between this agent and the agent they are blocking"""
         assert self.blocking is not None, "Not blocking anyone"
         blocked_agent = self.blocking.get()
         del blocked_agent.blocked_by[self.node_id]
+        blocked_agent.mark_dirty()
         self.blocking = None
 
     def get_blockers(self):
@@ -695,12 +844,14 @@ class GraphAgent(GraphNode):
         ), "Can only follow agents in the same room"
         self.following = GraphEdge(other_agent)
         other_agent.followed_by[self.node_id] = GraphEdge(self)
+        other_agent.mark_dirty()
 
     def unfollow(self):
         """Remove the edges between this agent and the agent they are following"""
         assert self.following is not None, "Not following anyone"
         followed_agent = self.following.get()
         del followed_agent.followed_by[self.node_id]
+        followed_agent.mark_dirty()
         self.following = None
 
     def get_followers(self):
@@ -733,17 +884,17 @@ class GraphAgent(GraphNode):
     def clear_memory(self):
         """Clear memory buffers for this player"""
         # TODO consider moving to a player object
-        self._text_buffer = ""  # clear buffer
-        self._observations = []  # clear buffer
+        self._text_buffer = deque(maxlen=self.MAX_TEXT_BUFFER_CHUNKS)
+        self._observations = deque(maxlen=self.MAX_OBSERVATIONS)
         self._visited_rooms = set()
         self._last_room = None
 
     def get_text(self, clear_actions=True):
         """Return the text in this agent's buffer"""
-        txt = self._text_buffer
-        self._text_buffer = ""  # clear buffer
+        txt = "".join(self._text_buffer)
+        self._text_buffer.clear()
         if clear_actions:
-            self._observations = []  # clear buffer
+            self._observations.clear()
         return txt
 
     def observe_action(self, text, action=None):
@@ -753,13 +904,12 @@ class GraphAgent(GraphNode):
             action = {"caller": None, "room_id": self.get_room(), "txt": text}
         self._observations.append(action)
         if text is not None:
-            self._text_buffer += text
+            self._text_buffer.append(text)
 
     def get_observations(self):
         """Return all the observations from this character's history"""
-        obs = []
-        while len(self._observations) > 0:
-            obs.append(self._observations.pop(0))
+        obs = list(self._observations)
+        self._observations.clear()
         return obs
 
     def set_player(self, current_player):
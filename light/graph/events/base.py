@@ -17,6 +17,7 @@ from light.world.utils.json_utils import (
     convert_dict_to_node,
 )
 import time
+import functools
 import inspect
 import json
 from uuid import uuid4
@@ -27,6 +28,7 @@ from typing import (
     List,
     NamedTuple,
     Optional,
+    Tuple,
     Type,
     TYPE_CHECKING,
     Union,
@@ -59,6 +61,24 @@ def proper_caps_wrapper(func):
     return wrap
 
 
+def track_execution(execute):
+    """
+    Decorator for event execute methods to notify the world after an event
+    executes, so that caches of room state can be invalidated.
+    """
+
+    @functools.wraps(execute)
+    def wrap(self, world, *args, **kwargs):
+        try:
+            return execute(self, world, *args, **kwargs)
+        finally:
+            note_executed = getattr(world, "note_event_executed", None)
+            if note_executed is not None:
+                note_executed(self)
+
+    return wrap
+
+
 class ProcessedArguments(NamedTuple):
     targets: List[GraphNode]
     text: Optional[str] = None
@@ -82,6 +102,12 @@ class GraphEvent(object):
     # All invokable events should define at least one template
     TEMPLATES: List[str] = []
 
+    def __init_subclass__(cls, **kwargs):
+        """Track the execution of every event subclass"""
+        super().__init_subclass__(**kwargs)
+        if "execute" in cls.__dict__:
+            cls.execute = track_execution(cls.__dict__["execute"])
+
     def __init__(
         self,
         actor: GraphAgent,
@@ -109,6 +135,7 @@ class GraphEvent(object):
         self.event_id = event_id
         self.entered_text = None
         self.event_time = time.time()
+        self._shared_frontend_form: Optional[Tuple[Dict[str, Any], str]] = None
 
     def set_entered_text(self, entered_text):
         """Set the text tentered for this event to be loaded later"""
@@ -255,6 +282,7 @@ class GraphEvent(object):
                     raise AssertionError("Node was none of expected types")
                 sync_nodes[x.node_id] = x
                 graph.all_nodes[x.node_id] = x
+                graph.index_node(x)
             for node in sync_nodes.values():
                 node.sync(graph.all_nodes)
 
@@ -301,6 +329,8 @@ class GraphEvent(object):
             use_dict["_target_ids"] = [node.node_id for node in self.target_nodes]
             use_dict["_viewer_id"] = None if viewer is None else viewer.node_id
 
+        # The shared frontend form is a render cache, not event state
+        use_dict.pop("_shared_frontend_form", None)
         use_dict["__class__"] = className
         use_dict["__module__"] = self.__module__
         res = json.dumps(use_dict, cls=GraphEncoder, sort_keys=True, indent=indent)
@@ -314,10 +344,10 @@ class GraphEvent(object):
             args_str += f', "{self.text_content}"'
         return f"{self.__class__.__name__}({args_str})"
 
-    def to_frontend_form(self, viewer: "GraphAgent") -> Dict[str, Any]:
+    def build_shared_frontend_form(self) -> Dict[str, Any]:
         """
-        Parse out the contents of this event as seen by the given agent
-        and return a dict that is consumable by our frontends
+        Return the parts of this event's frontend form that are the same
+        for every viewer. Nodes are included as their compact json fragments.
         """
         contents = self.room.get_contents()
         present_dict = {x.node_id: x.name for x in contents if x.agent}
@@ -325,18 +355,57 @@ class GraphEvent(object):
             x.node_id: x.get_prefix_view() for x in contents if x.object
         }
         return {
-            "text": self.view_as(viewer),
             "caller": self.__class__.__name__,
             "event_id": self.event_id,
-            "target_nodes": [node_to_json(x) for x in self.target_nodes],
+            "target_nodes": [x.to_fragment() for x in self.target_nodes],
             "additional_text": self.text_content,
             "present_agent_ids": present_dict,
             "canonical_targets": self._canonical_targets,
-            "room": node_to_json(self.room),
-            "actor": node_to_json(self.actor),
+            "room": self.room.to_fragment(),
+            "actor": self.actor.to_fragment(),
             "objects": present_objects_dict,
         }
 
+    def get_shared_frontend_form(self) -> Tuple[Dict[str, Any], str]:
+        """
+        Return the viewer-independent frontend form, along with its encoded
+        json body (without braces). Built once, on first view, then shared.
+        """
+        shared_form = getattr(self, "_shared_frontend_form", None)
+        if shared_form is None:
+            form = self.build_shared_frontend_form()
+            encoded = json.dumps(form, separators=(",", ":"))
+            shared_form = (form, encoded[1:-1])
+            self._shared_frontend_form = shared_form
+        return shared_form
+
+    def to_frontend_form(self, viewer: "GraphAgent") -> Dict[str, Any]:
+        """
+        Parse out the contents of this event as seen by the given agent
+        and return a dict that is consumable by our frontends
+        """
+        frontend_form: Dict[str, Any] = {"text": self.view_as(viewer)}
+        frontend_form.update(self.get_shared_frontend_form()[0])
+        return frontend_form
+
+    def to_frontend_json(
+        self, viewer: "GraphAgent", view_text: Optional[str] = None
+    ) -> str:
+        """
+        Return the compact json encoding of `to_frontend_form`, encoding
+        only the viewer's text for each viewer. Takes the result of
+        `view_as` if the caller already has it.
+        """
+        if type(self).to_frontend_form is not GraphEvent.to_frontend_form:
+            # Subclasses customizing the form directly can't share encodings
+            return json.dumps(self.to_frontend_form(viewer), separators=(",", ":"))
+        if view_text is None:
+            view_text = self.view_as(viewer)
+        return '{"text":%s,%s}' % (
+            json.dumps(view_text),
+            self.get_shared_frontend_form()[1],
+        )
+
     @classmethod
     def get_vocab(cls) -> List[str]:
         """
@@ -405,6 +474,7 @@ class ErrorEvent(GraphEvent):
             for k, v in self.__dict__.copy().items()
             if not k.startswith(f"_{className}__")
         }
+        use_dict.pop("_shared_frontend_form", None)
         use_dict["__failed_event"] = self.__failed_event.__name__
         use_dict["__error_module"] = self.__failed_event.__module__
         use_dict["__failed_constraint"] = self.__failed_constraint
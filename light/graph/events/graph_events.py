@@ -76,8 +76,8 @@ class SystemMessageEvent(TriggeredEvent):
         world.broadcast_to_agents(self, agents=[self.actor])
         return []
 
-    def to_frontend_form(self, viewer: "GraphAgent") -> Dict[str, Any]:
-        frontend_form = super().to_frontend_form(viewer)
+    def build_shared_frontend_form(self) -> Dict[str, Any]:
+        frontend_form = super().build_shared_frontend_form()
         frontend_form["event_data"] = self.event_data
         return frontend_form
 
@@ -1550,7 +1550,7 @@ class HitEvent(GraphEvent):
             # pick weapon that hit the opponent
             weapons = []
             for id, obj in self.actor.contained_nodes.items():
-                n = obj._target_node
+                n = obj.get()
                 assert isinstance(n, GraphObject)
                 if n.wieldable and n.equipped:
                     weapons.append(n)
@@ -3242,6 +3242,11 @@ class LockableEvent(GraphEvent):
         assert lock_edge is not None, "Cannot lock a non-lockable thing"
 
         self.process_locking(lock_edge)
+        # The lock state is serialized with the node holding the edge
+        if lock_target.room:
+            self.room.mark_dirty()
+        else:
+            lock_target.mark_dirty()
 
         world.broadcast_to_room(self)
         self.executed = True
@@ -4008,8 +4013,8 @@ class RewardEvent(GraphEvent):
                 valid_actions.append(cls(actor, target_nodes=[agent]))
         return valid_actions
 
-    def to_frontend_form(self, viewer: "GraphAgent") -> Dict[str, Any]:
-        frontend_form = super().to_frontend_form(viewer)
+    def build_shared_frontend_form(self) -> Dict[str, Any]:
+        frontend_form = super().build_shared_frontend_form()
         frontend_form["target_event_id"] = self.target_event_id
         return frontend_form
 
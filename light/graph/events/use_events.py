@@ -140,6 +140,7 @@ class UseEvent(GraphEvent):
                 if not ("remaining_uses" in on_use):
                     # add missing field
                     on_use["remaining_uses"] = "inf"
+                    use_node.mark_dirty()
                 remaining_uses = on_use["remaining_uses"]
                 if remaining_uses == "inf":
                     pass
@@ -147,6 +148,8 @@ class UseEvent(GraphEvent):
                     self.target_nodes[0].on_use[i]["remaining_uses"] = (
                         remaining_uses - 1
                     )
+                    # In-place changes aren't seen by the node's fragment cache
+                    self.target_nodes[0].mark_dirty()
                 else:
                     # No remaining uses for this event, but may
                     # be others
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Copy-on-access forks of an OOGraph, for running many short-lived simulations
+(such as RL rollouts or self-play) from one base graph. A fork shares the
+nodes of its parent, and copies a node the first time it is accessed through
+the fork, so a fork costs memory proportional to the nodes it touches rather
+than the size of the graph. Edges on copied nodes resolve their targets
+lazily by id, so copying a node doesn't copy its neighbors.
+
+The parent graph must not change while it has live forks, though forks can
+themselves be forked.
+"""
+
+from collections import deque
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional
+
+from light.graph.elements.graph_nodes import GraphEdge, GraphNode
+from light.graph.name_index import ForkedNodeNameIndex
+from light.graph.structured_graph import OOGraph
+from light.graph.utils import BoundedHistory
+
+
+def fork_value(value: Any, graph: "ForkedOOGraph") -> Any:
+    """Copy a node field for the fork, making any edges resolve lazily"""
+    if isinstance(value, GraphEdge):
+        return fork_edge(value, graph)
+    if isinstance(value, GraphNode):
+        return graph.get_node_copy(value.node_id)
+    if isinstance(value, dict):
+        return {k: fork_value(v, graph) for k, v in value.items()}
+    if isinstance(value, list):
+        return [fork_value(v, graph) for v in value]
+    if isinstance(value, set):
+        return {fork_value(v, graph) for v in value}
+    if isinstance(value, deque):
+        return deque((fork_value(v, graph) for v in value), maxlen=value.maxlen)
+    if isinstance(value, BoundedHistory):
+        return value.copy()
+    return value
+
+
+def fork_edge(edge: GraphEdge, graph: "ForkedOOGraph") -> GraphEdge:
+    """Copy an edge, to resolve its target through the fork on first use"""
+    new_edge = edge.__class__.__new__(edge.__class__)
+    attrs = new_edge.__dict__
+    for key, value in edge.__dict__.items():
+        # Edge fields are plain values, other than the lock of a path
+        attrs[key] = fork_edge(value, graph) if isinstance(value, GraphEdge) else value
+    new_edge._target_node = None
+    new_edge._target_graph = graph
+    return new_edge
+
+
+def fork_node(node: GraphNode, graph: "ForkedOOGraph") -> GraphNode:
+    """Copy a node for the fork, without running the node's setup"""
+    new_node = node.__class__.__new__(node.__class__)
+    # Register the copy first, as fields may refer back to the node itself
+    graph._copies[node.node_id] = new_node
+    attrs = new_node.__dict__
+    for key, value in node.__dict__.items():
+        if key == "_props":
+            # Only read while the node is initialized
+            attrs[key] = value
+        elif key == "_fragments":
+            # Cached serializations stay valid until the copy changes
+            attrs[key] = None if value is None else value.copy()
+        elif key == "_name_index":
+            attrs[key] = None if value is None else graph._name_index
+        else:
+            attrs[key] = fork_value(value, graph)
+    return new_node
+
+
+class ForkedNodeTable(MutableMapping):
+    """
+    A node dict of a forked graph, layered over the same dict of the parent.
+    Only membership changes are stored, and nodes are looked up as the
+    fork's copies.
+    """
+
+    def __init__(self, parent: Dict[str, GraphNode], graph: "ForkedOOGraph"):
+        self._parent = parent
+        self._graph = graph
+        self._added: Dict[str, GraphNode] = {}
+        self._removed = set()
+        self._num_new = 0
+
+    def __contains__(self, node_id) -> bool:
+        if node_id in self._added:
+            return True
+        return node_id not in self._removed and node_id in self._parent
+
+    def __getitem__(self, node_id: str) -> GraphNode:
+        if node_id in self._added:
+            return self._added[node_id]
+        if node_id in self._removed or node_id not in self._parent:
+            raise KeyError(node_id)
+        return self._graph.get_node_copy(node_id)
+
+    def __setitem__(self, node_id: str, node: GraphNode) -> None:
+        if node_id not in self._added and node_id not in self._parent:
+            self._num_new += 1
+        self._added[node_id] = node
+        self._removed.discard(node_id)
+        self._graph._copies[node_id] = node
+
+    def __delitem__(self, node_id: str) -> None:
+        if node_id not in self:
+            raise KeyError(node_id)
+        if node_id in self._added:
+            del self._added[node_id]
+            if node_id not in self._parent:
+                self._num_new -= 1
+        if node_id in self._parent:
+            self._removed.add(node_id)
+
+    def __iter__(self) -> Iterator[str]:
+        for node_id in self._parent:
+            if node_id not in self._removed:
+                yield node_id
+        for node_id in self._added:
+            if node_id not in self._parent:
+                yield node_id
+
+    def __len__(self) -> int:
+        return len(self._parent) - len(self._removed) + self._num_new
+
+
+class ForkedOOGraph(OOGraph):
+    """
+    An OOGraph forked from a parent graph, which can be used and changed
+    like any other graph without affecting its parent. Create with
+    OOGraph.fork.
+    """
+
+    def __init__(self, parent: OOGraph):
+        self._parent = parent
+        self._copies: Dict[str, GraphNode] = {}
+        self.objects = ForkedNodeTable(parent.objects, self)
+        self.agents = ForkedNodeTable(parent.agents, self)
+        self.rooms = ForkedNodeTable(parent.rooms, self)
+        self.all_nodes = ForkedNodeTable(parent.all_nodes, self)
+        self.dead_nodes = ForkedNodeTable(parent.dead_nodes, self)
+        self.room_id_to_loggers = {}
+        self.cnt = parent.cnt
+        self._nodes_to_delete = list(parent._nodes_to_delete)
+        self._deleted_nodes = {}
+        self.title = parent.title
+        self.db_id = parent.db_id
+        self._void_id = parent.void.node_id
+        self._name_index = ForkedNodeNameIndex(
+            parent._get_name_index(), self.get_node_copy
+        )
+        self._room_distances = parent._room_distances.fork(self)
+
+    @property
+    def void(self):
+        return self.get_node_copy(self._void_id)
+
+    def _peek_node(self, node_id: str) -> Optional[GraphNode]:
+        node = self._copies.get(node_id)
+        if node is None:
+            node = self._parent._peek_node(node_id)
+        return node
+
+    def get_node_copy(self, node_id: str) -> Optional[GraphNode]:
+        """Return this fork's copy of a node, copying it from the parent if new"""
+        node = self._copies.get(node_id)
+        if node is None:
+            parent_node = self._parent._peek_node(node_id)
+            if parent_node is None:
+                return None
+            node = fork_node(parent_node, self)
+        return node
+
+    def get_owned_nodes(self) -> List[GraphNode]:
+        """Return the nodes this fork has copied, as the rest are the parent's"""
+        return list(self._copies.values())
+
+    def get_num_copied_nodes(self) -> int:
+        """Return how many nodes this fork holds its own copy of"""
+        return len(self._copies)
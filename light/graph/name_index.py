@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Name index over the nodes of an OOGraph, used to avoid scanning every node
+in the graph for whole-graph searches in desc_to_nodes and find_nodes_by_name.
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Set, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from light.graph.elements.graph_nodes import GraphNode
+
+# Length of the substrings indexed for searching
+GRAM_SIZE = 3
+
+
+def get_grams(text: str) -> Set[str]:
+    """Return all of the GRAM_SIZE length substrings of the given text"""
+    return {text[i : i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def get_search_strings(node: "GraphNode") -> List[str]:
+    """
+    Return the strings desc_to_nodes matches queries against for a node
+    viewed from nowhere in particular: its name and any alternate names,
+    lowercased with a trailing `s` to allow matching plurals
+    """
+    return [name.lower() + "s" for name in [node.name] + list(node.names)]
+
+
+class NodeNameIndex:
+    """
+    Index from exact names, and from the trigrams of lowercased names, to the
+    ids of the nodes in a graph. Queries return candidate ids in the order
+    nodes were added to the index, which matches the order of all_nodes.
+
+    Nodes notify the index when their name or names are assigned, and the
+    owning graph adds and removes nodes as they enter and leave the graph.
+    """
+
+    def __init__(self):
+        self._nodes: Dict[str, "GraphNode"] = {}
+        self._order: Dict[str, int] = {}
+        self._search_strings: Dict[str, List[str]] = {}
+        self._names: Dict[str, str] = {}
+        self._ids_by_name: Dict[str, Set[str]] = {}
+        self._ids_by_gram: Dict[str, Set[str]] = {}
+        self._count = 0
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node: "GraphNode") -> bool:
+        return self._nodes.get(node.node_id) is node
+
+    def add(self, node: "GraphNode") -> None:
+        """Index the given node, replacing any node indexed with the same id"""
+        node_id = node.node_id
+        if node_id in self._nodes:
+            self.remove(self._nodes[node_id])
+        self._nodes[node_id] = node
+        self._order[node_id] = self._count
+        self._count += 1
+        self._index_names(node)
+        node._name_index = self
+
+    def remove(self, node: "GraphNode") -> None:
+        """Remove the given node from the index, if it is indexed"""
+        if node not in self:
+            return
+        self._unindex_names(node.node_id)
+        del self._nodes[node.node_id]
+        del self._order[node.node_id]
+        if node.__dict__.get("_name_index") is self:
+            node._name_index = None
+
+    def rebuild(self, nodes: Iterable["GraphNode"]) -> None:
+        """Replace the index contents with the given nodes"""
+        for node in list(self._nodes.values()):
+            self.remove(node)
+        for node in nodes:
+            self.add(node)
+
+    def update_names(self, node: "GraphNode") -> None:
+        """Re-index the names for a node that was renamed"""
+        if node not in self:
+            return
+        self._unindex_names(node.node_id)
+        self._index_names(node)
+
+    def _index_names(self, node: "GraphNode") -> None:
+        node_id = node.node_id
+        search_strings = get_search_strings(node)
+        self._search_strings[node_id] = search_strings
+        self._names[node_id] = node.name
+        self._ids_by_name.setdefault(node.name, set()).add(node_id)
+        for search_string in search_strings:
+            for gram in get_grams(search_string):
+                self._ids_by_gram.setdefault(gram, set()).add(node_id)
+
+    def _unindex_names(self, node_id: str) -> None:
+        name = self._names.pop(node_id)
+        self._ids_by_name[name].discard(node_id)
+        if len(self._ids_by_name[name]) == 0:
+            del self._ids_by_name[name]
+        for search_string in self._search_strings.pop(node_id):
+            for gram in get_grams(search_string):
+                gram_ids = self._ids_by_gram.get(gram)
+                if gram_ids is None:
+                    continue
+                gram_ids.discard(node_id)
+                if len(gram_ids) == 0:
+                    del self._ids_by_gram[gram]
+
+    def _in_order(self, node_ids: Iterable[str]) -> List["GraphNode"]:
+        """Return the nodes for the given ids, in the order they were added"""
+        return [self._nodes[i] for i in sorted(node_ids, key=self._order.__getitem__)]
+
+    def get_nodes_named(self, name: str) -> List["GraphNode"]:
+        """Return all nodes with exactly the given name"""
+        return self._in_order(self._get_ids_named(name))
+
+    def get_search_strings(self, node: "GraphNode") -> List[str]:
+        """Return the (cached if possible) search strings for a node"""
+        if node in self:
+            return self._search_strings[node.node_id]
+        return get_search_strings(node)
+
+    def search(self, query: str) -> Optional[List["GraphNode"]]:
+        """
+        Return the nodes with a name or alternate name containing the given
+        lowercase query (allowing for plurals), or None if the query is too
+        short for the index to narrow down.
+        """
+        matched_ids = self._search_ids(query)
+        if matched_ids is None:
+            return None
+        return self._in_order(matched_ids)
+
+    # Id-level accessors, which forked indices use to read through to their parent
+
+    def _get_ids(self) -> Iterable[str]:
+        return self._nodes.keys()
+
+    def _has_id(self, node_id: str) -> bool:
+        return node_id in self._nodes
+
+    def _get_order(self, node_id: str) -> int:
+        return self._order[node_id]
+
+    def _get_count(self) -> int:
+        return self._count
+
+    def _get_search_strings_for_id(self, node_id: str) -> List[str]:
+        return self._search_strings[node_id]
+
+    def _get_ids_named(self, name: str) -> Set[str]:
+        return self._ids_by_name.get(name, set())
+
+    def _search_ids(self, query: str) -> Optional[Set[str]]:
+        query_grams = get_grams(query)
+        if len(query_grams) == 0:
+            return None
+        # Intersect starting from the rarest substring
+        gram_sets = sorted(
+            (self._ids_by_gram.get(gram, set()) for gram in query_grams), key=len
+        )
+        candidate_ids = set(gram_sets[0])
+        for gram_set in gram_sets[1:]:
+            if len(candidate_ids) == 0:
+                break
+            candidate_ids.intersection_update(gram_set)
+        return {
+            node_id
+            for node_id in candidate_ids
+            if any(query in s for s in self._search_strings[node_id])
+        }
+
+
+class ForkedNodeNameIndex(NodeNameIndex):
+    """
+    Name index for a forked graph, layered over the (unchanging) index of its
+    parent graph. Nodes added or renamed in the fork are indexed locally,
+    hiding any parent entry with the same id, so the fork only stores what
+    changed. Queries return the fork's copies of matched nodes, resolved by
+    id through get_node.
+    """
+
+    def __init__(self, parent: NodeNameIndex, get_node: Callable[[str], "GraphNode"]):
+        self._parent = parent
+        self._get_node = get_node
+        self._local = NodeNameIndex()
+        # Locally added nodes come after all of the parent's nodes
+        self._local._count = parent._get_count()
+        self._hidden: Set[str] = set()
+
+    def _is_visible_in_parent(self, node_id: str) -> bool:
+        return node_id not in self._hidden and self._parent._has_id(node_id)
+
+    def __len__(self) -> int:
+        return len(self._parent) - len(self._hidden) + len(self._local)
+
+    def __contains__(self, node: "GraphNode") -> bool:
+        node_id = node.node_id
+        if self._local._has_id(node_id):
+            return node in self._local
+        return self._is_visible_in_parent(node_id) and self._get_node(node_id) is node
+
+    def add(self, node: "GraphNode") -> None:
+        if self._is_visible_in_parent(node.node_id):
+            self._hidden.add(node.node_id)
+        self._local.add(node)
+
+    def remove(self, node: "GraphNode") -> None:
+        if self._local._has_id(node.node_id):
+            self._local.remove(node)
+        elif node in self:
+            self._hidden.add(node.node_id)
+            if node.__dict__.get("_name_index") is self:
+                node._name_index = None
+
+    def rebuild(self, nodes: Iterable["GraphNode"]) -> None:
+        self._hidden.update(self._parent._get_ids())
+        self._local.rebuild(nodes)
+
+    def update_names(self, node: "GraphNode") -> None:
+        if node not in self or self._local._has_id(node.node_id):
+            return
+        # Move the renamed node into the local index, keeping its position
+        self._hidden.add(node.node_id)
+        self._local.add(node)
+        self._local._order[node.node_id] = self._parent._get_order(node.node_id)
+
+    def get_search_strings(self, node: "GraphNode") -> List[str]:
+        if self._local._has_id(node.node_id) or node not in self:
+            return self._local.get_search_strings(node)
+        return self._parent._get_search_strings_for_id(node.node_id)
+
+    def _in_order(self, node_ids: Iterable[str]) -> List["GraphNode"]:
+        return [
+            self._local._nodes[i] if self._local._has_id(i) else self._get_node(i)
+            for i in sorted(node_ids, key=self._get_order)
+        ]
+
+    def _get_ids(self) -> Iterable[str]:
+        parent_ids = [i for i in self._parent._get_ids() if i not in self._hidden]
+        return parent_ids + list(self._local._get_ids())
+
+    def _has_id(self, node_id: str) -> bool:
+        return self._local._has_id(node_id) or self._is_visible_in_parent(node_id)
+
+    def _get_order(self, node_id: str) -> int:
+        if self._local._has_id(node_id):
+            return self._local._get_order(node_id)
+        return self._parent._get_order(node_id)
+
+    def _get_count(self) -> int:
+        return self._local._get_count()
+
+    def _get_search_strings_for_id(self, node_id: str) -> List[str]:
+        if self._local._has_id(node_id):
+            return self._local._get_search_strings_for_id(node_id)
+        return self._parent._get_search_strings_for_id(node_id)
+
+    def _get_ids_named(self, name: str) -> Set[str]:
+        parent_ids = self._parent._get_ids_named(name)
+        return {i for i in parent_ids if i not in self._hidden} | set(
+            self._local._get_ids_named(name)
+        )
+
+    def _search_ids(self, query: str) -> Optional[Set[str]]:
+        parent_ids = self._parent._search_ids(query)
+        if parent_ids is None:
+            return None
+        local_ids = self._local._search_ids(query) or set()
+        return {i for i in parent_ids if i not in self._hidden} | local_ids
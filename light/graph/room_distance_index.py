@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Index of the distances between the rooms of an OOGraph, used to score and
+filter candidate quest targets over every room at once rather than walking
+the graph for each of them.
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from light.graph.elements.graph_nodes import GraphRoom
+    from light.graph.structured_graph import OOGraph
+
+# Hop distance stored between rooms with no path between them
+UNREACHABLE = np.iinfo(np.int16).max
+
+
+def get_grid_location(room: "GraphRoom") -> List[float]:
+    """Return the (x, y, z) grid location of a room"""
+    return (list(room.grid_location) + [0, 0, 0])[:3]
+
+
+def get_grid_distance(loc1: Sequence[float], loc2: Sequence[float]) -> float:
+    """Return the euclidean distance between two grid locations"""
+    return math.dist(loc1[:3], loc2[:3])
+
+
+class RoomDistanceIndex:
+    """
+    Shortest path hop counts between every pair of rooms in a graph, along
+    with each room's grid location. The index is built on first use, and
+    kept up to date as rooms and paths are added through the graph. Paths
+    added or removed on rooms directly require invalidating the index.
+
+    hops[i, j] is the number of paths to take from room i to get to room j,
+    with rows and columns in the order rooms were added to the index.
+    """
+
+    def __init__(self, graph: "OOGraph", parent: Optional["RoomDistanceIndex"] = None):
+        self._graph = graph
+        # Index of the graph this one was forked from, while they're the same
+        self._parent = parent
+        self._room_ids: List[str] = []
+        self._room_idx: Dict[str, int] = {}
+        self._hops: Optional[np.ndarray] = None
+        self._grid: Optional[np.ndarray] = None
+
+    def fork(self, graph: "OOGraph") -> "RoomDistanceIndex":
+        """
+        Return an index for a fork of this index's graph, sharing the arrays
+        until either graph changes its rooms or paths
+        """
+        index = RoomDistanceIndex(graph, parent=self)
+        if self.is_built():
+            index._share_from(self)
+        return index
+
+    def _share_from(self, other: "RoomDistanceIndex") -> None:
+        self._room_ids = list(other._room_ids)
+        self._room_idx = dict(other._room_idx)
+        # Arrays are always replaced rather than changed in place
+        self._hops = other._hops
+        self._grid = other._grid
+
+    def is_built(self) -> bool:
+        return self._hops is not None
+
+    def invalidate(self) -> None:
+        """Drop the index, to be rebuilt from the graph on next use"""
+        self._parent = None
+        self._room_ids = []
+        self._room_idx = {}
+        self._hops = None
+        self._grid = None
+
+    def build(self) -> None:
+        """
+        Compute the hops between all rooms with a breadth first search from
+        every room at once, tracking which start rooms have reached each room
+        as packed bits
+        """
+        if self._parent is not None:
+            # Nothing has changed since the fork, so reuse the parent's index
+            self._parent._ensure_built()
+            self._share_from(self._parent)
+            return
+        rooms = list(self._graph.rooms.values())
+        self._room_ids = [room.node_id for room in rooms]
+        self._room_idx = {room_id: idx for idx, room_id in enumerate(self._room_ids)}
+        num_rooms = len(rooms)
+        self._grid = np.array(
+            [get_grid_location(room) for room in rooms], dtype=np.float64
+        ).reshape(num_rooms, 3)
+        # Indexed by [to room, from room] while searching
+        hops_to = np.full((num_rooms, num_rooms), UNREACHABLE, dtype=np.int32)
+        np.fill_diagonal(hops_to, 0)
+        sources, targets = [], []
+        for idx, room in enumerate(rooms):
+            for neighbor_id in room.neighbors.keys():
+                if neighbor_id in self._room_idx:
+                    sources.append(idx)
+                    targets.append(self._room_idx[neighbor_id])
+        if len(sources) > 0:
+            # Group the paths by the room they lead to
+            order = np.argsort(targets, kind="stable")
+            sources = np.array(sources)[order]
+            targets = np.array(targets)[order]
+            starts = np.flatnonzero(np.r_[True, targets[1:] != targets[:-1]])
+            heads = targets[starts]
+            reached = np.packbits(np.eye(num_rooms, dtype=bool), axis=1)
+            frontier = reached.copy()
+            level = 0
+            while frontier.any():
+                level += 1
+                spread = np.zeros_like(frontier)
+                spread[heads] = np.bitwise_or.reduceat(
+                    frontier[sources], starts, axis=0
+                )
+                frontier = spread & ~reached
+                reached |= frontier
+                newly_reached = np.unpackbits(frontier, axis=1, count=num_rooms)
+                hops_to[newly_reached.astype(bool)] = level
+        self._hops = np.ascontiguousarray(hops_to.T)
+
+    def _ensure_built(self) -> None:
+        if self._hops is None or len(self._room_ids) != len(self._graph.rooms):
+            self.build()
+
+    def add_room(self, room: "GraphRoom") -> None:
+        """Add a room with no paths to the index, if it's been built"""
+        self._parent = None
+        if not self.is_built():
+            return
+        num_rooms = len(self._room_ids)
+        self._room_idx[room.node_id] = num_rooms
+        self._room_ids.append(room.node_id)
+        hops = np.full((num_rooms + 1, num_rooms + 1), UNREACHABLE, dtype=np.int32)
+        hops[:num_rooms, :num_rooms] = self._hops
+        hops[num_rooms, num_rooms] = 0
+        self._hops = hops
+        grid = np.array([get_grid_location(room)], dtype=np.float64)
+        self._grid = np.concatenate([self._grid, grid])
+
+    def add_path(self, from_room: "GraphRoom", to_room: "GraphRoom") -> None:
+        """Shorten any routes that can now go through a new path between rooms"""
+        self._parent = None
+        if not self.is_built():
+            return
+        from_idx = self._room_idx.get(from_room.node_id)
+        to_idx = self._room_idx.get(to_room.node_id)
+        if from_idx is None or to_idx is None:
+            self.invalidate()
+            return
+        if self._hops[from_idx, to_idx] <= 1:
+            return
+        via = self._hops[:, from_idx, None] + 1 + self._hops[None, to_idx, :]
+        self._hops = np.minimum(self._hops, via)
+
+    def get_room_index(self, room_id: str) -> Optional[int]:
+        """Return the row and column of the given room, if it's indexed"""
+        self._ensure_built()
+        return self._room_idx.get(room_id)
+
+    def get_room_ids(self) -> List[str]:
+        """Return the ids of the indexed rooms, in index order"""
+        self._ensure_built()
+        return self._room_ids
+
+    def get_hops(self, from_room_id: str, to_room_id: str) -> Optional[int]:
+        """Return the paths to take between two rooms, or None if unreachable"""
+        self._ensure_built()
+        hops = self._hops[self._room_idx[from_room_id], self._room_idx[to_room_id]]
+        return None if hops >= UNREACHABLE else int(hops)
+
+    def get_hops_from(self, room_id: str) -> np.ndarray:
+        """Return the hops from the given room to every indexed room"""
+        self._ensure_built()
+        return self._hops[self._room_idx[room_id]]
+
+    def get_grid_locations(self) -> np.ndarray:
+        """Return the (x, y, z) grid location of every indexed room"""
+        self._ensure_built()
+        return self._grid
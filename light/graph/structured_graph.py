@@ -13,10 +13,16 @@ from light.graph.elements.graph_nodes import (
     GraphNode,
     GraphVoidNode,
     GraphEdge,
+    get_msgpack,
 )
-from typing import Optional, Dict, Any
+from light.graph.name_index import NodeNameIndex
+from light.graph.room_distance_index import RoomDistanceIndex
+from typing import Optional, Dict, Any, List, Tuple
 from light.world.utils.json_utils import GraphEncoder
 
+# Snapshots in this format hold a fragment hash in place of each node
+FRAGMENT_SNAPSHOT_FORMAT = "fragments"
+
 
 class OOGraph(object):
     """Graph class that takes normal graph and formats it in an easily
@@ -36,6 +42,8 @@ class OOGraph(object):
         self.dead_nodes = {}
         self.title = title
         self.db_id = db_id
+        self._name_index = NodeNameIndex()
+        self._room_distances = RoomDistanceIndex(self)
 
     @staticmethod
     def from_graph(graph, start_location=None):
@@ -65,6 +73,7 @@ class OOGraph(object):
         oo_graph.all_nodes.update(oo_graph.objects)
         oo_graph.all_nodes.update(oo_graph.agents)
         oo_graph.all_nodes.update(oo_graph.rooms)
+        oo_graph._name_index.rebuild(oo_graph.all_nodes.values())
         for node in oo_graph.all_nodes.values():
             node.sync(oo_graph.all_nodes)
 
@@ -81,7 +90,7 @@ class OOGraph(object):
 
         for room in oo_graph.rooms.values():
             room_id = room.node_id
-            for ((edge_type, neighbor_id), edge) in graph._node_to_edges[
+            for (edge_type, neighbor_id), edge in graph._node_to_edges[
                 room.node_id
             ].items():
                 if edge_type != "path_to":
@@ -202,6 +211,7 @@ class OOGraph(object):
         node.force_move_to(self.void)
         self.agents[id] = node
         self.all_nodes[id] = node
+        self._name_index.add(node)
         return node
 
     def add_room(self, name, props, uid="", db_id=None):
@@ -212,6 +222,8 @@ class OOGraph(object):
         node.force_move_to(self.void)
         self.rooms[id] = node
         self.all_nodes[id] = node
+        self._name_index.add(node)
+        self._room_distances.add_room(node)
 
         return node
 
@@ -225,6 +237,7 @@ class OOGraph(object):
         node.force_move_to(self.void)
         self.objects[id] = node
         self.all_nodes[id] = node
+        self._name_index.add(node)
         return node
 
     def add_node(self, name, props, is_player=False, uid="", is_room=False):
@@ -257,6 +270,8 @@ class OOGraph(object):
         assert node1 != node2, "cannot create path from room to itself"
         node1.add_neighbor(node2, desc1, locked_with, examine1)
         node2.add_neighbor(node1, desc2, locked_with, examine2)
+        self._room_distances.add_path(node1, node2)
+        self._room_distances.add_path(node2, node1)
 
     def mark_node_for_deletion(self, id):
         """Mark a node to be removed from the graph on next deletion"""
@@ -281,6 +296,9 @@ class OOGraph(object):
         i = node.node_id
         if self.all_nodes[i] == node:
             del self.all_nodes[i]
+        self._name_index.remove(node)
+        if node.room:
+            self._room_distances.invalidate()
         for check_dict in [self.agents, self.objects, self.rooms, self.dead_nodes]:
             if i in check_dict:
                 if check_dict[i] == node:
@@ -289,9 +307,56 @@ class OOGraph(object):
 
     # Graph setters and getters and simple accessors
 
+    def index_node(self, node: GraphNode) -> None:
+        """
+        Add a node to the name index. Only required when inserting into
+        all_nodes directly rather than through the add_* methods.
+        """
+        self._name_index.add(node)
+
+    def _get_name_index(self) -> NodeNameIndex:
+        """Return the name index, rebuilding it if all_nodes was modified directly"""
+        if len(self._name_index) != len(self.all_nodes):
+            self._name_index.rebuild(self.all_nodes.values())
+        return self._name_index
+
+    def get_room_distance_index(self) -> RoomDistanceIndex:
+        """Return the index of hop and grid distances between rooms"""
+        return self._room_distances
+
+    def invalidate_room_distances(self) -> None:
+        """
+        Drop the room distance index. Only required after adding or removing
+        paths on rooms directly rather than through add_paths_between.
+        """
+        self._room_distances.invalidate()
+
     def get_node(self, id) -> Optional[GraphNode]:
         return self.all_nodes.get(id)
 
+    def get_owned_nodes(self) -> List[GraphNode]:
+        """
+        Return every node this graph holds in memory, including deleted nodes
+        kept around for edges that may still point at them
+        """
+        return list(self.all_nodes.values()) + list(self._deleted_nodes.values())
+
+    def _peek_node(self, id) -> Optional[GraphNode]:
+        """Return any node an edge in this graph could target, even if deleted"""
+        node = self.all_nodes.get(id)
+        if node is None:
+            node = self.void if id == self.void.node_id else self._deleted_nodes.get(id)
+        return node
+
+    def fork(self) -> "OOGraph":
+        """
+        Return a copy-on-access fork of this graph, which shares unchanged
+        nodes with this one. This graph must not change while forks are in use.
+        """
+        from light.graph.forked_graph import ForkedOOGraph
+
+        return ForkedOOGraph(self)
+
     def node_exists(self, id) -> bool:
         return id in self.all_nodes
 
@@ -383,7 +448,7 @@ class OOGraph(object):
         Return all nodes that exact match the given node name,
         if any exist.
         """
-        return [n for n in self.get_all_nodes() if n.name == node_name]
+        return self._get_name_index().get_nodes_named(node_name)
 
     def desc_to_nodes(self, desc, nearby_node=None, nearbytype=None):
         """Get nodes nearby to a given node from that node's perspective"""
@@ -431,22 +496,25 @@ class OOGraph(object):
                     for item in o:
                         if item.room or (item.object and item.container):
                             o = o.union(item.get_contents())
-        else:
-            o = set(self.get_all_nodes())
+
+        query = desc.lower()
+        if nearby_node is None:
+            # Only nodes with a name containing the query can match
+            o = self._get_name_index().search(query)
+            if o is None:
+                o = set(self.get_all_nodes())
 
         if nearby_node is not None and nearby_node in o:
             o.remove(nearby_node)
 
-        query = desc.lower()
         # Go through official in-game special case aliases for real nodes
         if nearby_node is not None and nearby_node.get_room() in o and desc == "room":
             return [nearby_node.get_room()]
 
         # get the nodes in the set that match the given desc
+        node_views = [(node, node.get_view_from(from_node)) for node in o]
         valid_nodes_1 = [
-            (node, node.get_view_from(from_node))
-            for node in o
-            if query in node.get_view_from(from_node).lower() + "s"
+            (node, view) for (node, view) in node_views if query in view.lower() + "s"
         ]
 
         # Check the parent name trees for names that also could match in the
@@ -476,22 +544,78 @@ class OOGraph(object):
         assert isinstance(node, GraphAgent), "Can only kill agents"
         new_node_id, new_node_object = node.die()
         self.all_nodes[new_node_id] = new_node_object
+        self._name_index.add(new_node_object)
         self.objects[new_node_id] = new_node_object
         self.dead_nodes[new_node_id] = new_node_object
         self.delete_nodes([node])
         return new_node_object
 
-    def to_json(self):
+    def to_json(self, compact: bool = False):
+        """
+        Export the full graph as json. Compact exports have no whitespace, and
+        reuse each node's cached fragment, so only changed nodes are encoded.
+        """
+        if compact:
+            return self._to_compact_json()
         dicts = {
             "objects": sorted(list(self.objects.keys())),
             "agents": sorted(list(self.agents.keys())),
             "rooms": sorted(list(self.rooms.keys())),
-            "nodes": self.all_nodes,
+            "nodes": dict(self.all_nodes),
             "title": self.title,
             "db_id": self.db_id,
         }
         return json.dumps(dicts, cls=GraphEncoder, sort_keys=True, indent=4)
 
+    def _get_header_dict(self) -> Dict[str, Any]:
+        """Return everything in the json export other than the nodes"""
+        return {
+            "agents": sorted(list(self.agents.keys())),
+            "db_id": self.db_id,
+            "objects": sorted(list(self.objects.keys())),
+            "rooms": sorted(list(self.rooms.keys())),
+            "title": self.title,
+        }
+
+    def _to_compact_json(self) -> str:
+        """
+        Splice the cached node fragments into a compact export, identical
+        to json.dumps of to_json's contents with sort_keys and no whitespace
+        """
+        node_items = ",".join(
+            f"{json.dumps(node_id)}:{self.all_nodes[node_id].to_fragment()}"
+            for node_id in sorted(self.all_nodes.keys())
+        )
+        items = {
+            k: json.dumps(v, separators=(",", ":"))
+            for k, v in self._get_header_dict().items()
+        }
+        items["nodes"] = f"{{{node_items}}}"
+        return "{" + ",".join(f'"{k}":{items[k]}' for k in sorted(items)) + "}"
+
+    def to_msgpack(self) -> bytes:
+        """
+        Export the full graph with msgpack, a smaller and faster binary
+        alternative to to_json, reusing cached per-node encodings.
+        """
+        msgpack = get_msgpack()
+        packer = msgpack.Packer()
+        header = self._get_header_dict()
+        encoded = [packer.pack_map_header(len(header) + 1)]
+        for key, value in header.items():
+            encoded += [packer.pack(key), packer.pack(value)]
+        encoded += [packer.pack("nodes"), packer.pack_map_header(len(self.all_nodes))]
+        for node_id in sorted(self.all_nodes.keys()):
+            encoded.append(packer.pack(node_id))
+            encoded.append(self.all_nodes[node_id].to_msgpack_fragment())
+        return b"".join(encoded)
+
+    @staticmethod
+    def from_msgpack(input_bytes: bytes, opt: Optional[Dict[str, Any]] = None):
+        """Create a graph from the output of to_msgpack"""
+        msgpack = get_msgpack()
+        return OOGraph.from_json_dict(msgpack.unpackb(input_bytes), opt)
+
     def to_json_rv(self, room_id):
         """Export a graph with room_id, its descendants, and its direct neighbors (for logging)"""
         room_node = self.all_nodes[room_id]
@@ -531,6 +655,82 @@ class OOGraph(object):
         }
         return json.dumps(dicts, cls=GraphEncoder, sort_keys=True, indent=4)
 
+    def to_fragments_rv(self, room_id: str) -> Tuple[str, Dict[str, str]]:
+        """
+        Export the same contents as to_json_rv as a snapshot manifest that
+        references content-addressed node fragments. Returns the manifest
+        and a map from fragment hash to node fragment. Unchanged nodes produce
+        the same fragments across snapshots, so they only need storing once.
+        """
+        room_node = self.all_nodes[room_id]
+        fragments: Dict[str, str] = {}
+        node_hashes: Dict[str, str] = {}
+        agents = []
+        objects = []
+        rooms = []
+
+        def add_fragment(node, strip_contents):
+            fragment_hash = node.get_fragment_hash(strip_contents)
+            fragments[fragment_hash] = node.to_fragment(strip_contents)
+            node_hashes[node.node_id] = fragment_hash
+            if node.room:
+                rooms.append(node.node_id)
+            elif node.agent:
+                agents.append(node.node_id)
+            elif node.object:
+                objects.append(node.node_id)
+
+        for neighbor in room_node.get_neighbors():
+            add_fragment(neighbor, strip_contents=True)
+        for node in OOGraph.get_contained_in_room(room_node):
+            if node.node_id not in node_hashes:
+                add_fragment(node, strip_contents=False)
+
+        manifest = {
+            "snapshot_format": FRAGMENT_SNAPSHOT_FORMAT,
+            "agents": sorted(agents),
+            "nodes": node_hashes,
+            "objects": sorted(objects),
+            "rooms": sorted(rooms),
+            "title": self.title,
+            "db_id": self.db_id,
+        }
+        return json.dumps(manifest, sort_keys=True), fragments
+
+    @staticmethod
+    def expand_snapshot(
+        snapshot_json: str, fragments: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Return the full graph dict for a snapshot, which is either regular
+        graph json or a fragment manifest to resolve against fragments
+        """
+        dict_format = json.loads(snapshot_json)
+        if dict_format.get("snapshot_format") != FRAGMENT_SNAPSHOT_FORMAT:
+            return dict_format
+        assert fragments is not None, "Fragment snapshots require their fragments"
+        del dict_format["snapshot_format"]
+        dict_format["nodes"] = {
+            node_id: json.loads(fragments[fragment_hash])
+            for node_id, fragment_hash in dict_format["nodes"].items()
+        }
+        return dict_format
+
+    @staticmethod
+    def snapshot_to_json(
+        snapshot_json: str, fragments: Optional[Dict[str, str]] = None
+    ) -> str:
+        """Return the full graph json (as from to_json_rv) for a snapshot"""
+        dict_format = OOGraph.expand_snapshot(snapshot_json, fragments)
+        return json.dumps(dict_format, cls=GraphEncoder, sort_keys=True, indent=4)
+
+    @staticmethod
+    def from_snapshot(
+        snapshot_json: str, fragments: Optional[Dict[str, str]] = None
+    ) -> "OOGraph":
+        """Create a graph from either graph json or a fragment snapshot"""
+        return OOGraph.from_json_dict(OOGraph.expand_snapshot(snapshot_json, fragments))
+
     @staticmethod
     def get_contained_in_room(room_node):
         """
@@ -549,7 +749,12 @@ class OOGraph(object):
 
     @staticmethod
     def from_json(input_json: str, opt: Optional[Dict[str, Any]] = None):
-        dict_format = json.loads(input_json)
+        return OOGraph.from_json_dict(json.loads(input_json), opt)
+
+    @staticmethod
+    def from_json_dict(
+        dict_format: Dict[str, Any], opt: Optional[Dict[str, Any]] = None
+    ) -> "OOGraph":
         title = dict_format.get("title", "untitled")
         db_id = dict_format.get("db_id")
         oo_graph = OOGraph(title=title, db_id=db_id)
@@ -569,6 +774,7 @@ class OOGraph(object):
         oo_graph.all_nodes.update(oo_graph.objects)
         oo_graph.all_nodes.update(oo_graph.agents)
         oo_graph.all_nodes.update(oo_graph.rooms)
+        oo_graph._name_index.rebuild(oo_graph.all_nodes.values())
 
         sync_nodes = {oo_graph.void.node_id: oo_graph.void}
         sync_nodes.update(oo_graph.all_nodes)
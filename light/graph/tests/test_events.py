@@ -52,6 +52,7 @@ from light.graph.elements.graph_nodes import (
     GraphAgent,
 )
 from light.world.world import World, WorldConfig
+from light.world.utils.json_utils import node_to_json
 
 from typing import Tuple, List, Type, Optional
 
@@ -414,6 +415,35 @@ class SayEventTest(GraphEventTests):
 
     HAS_VALID_EVENTS = False
 
+    def test_frontend_form_is_shared(self) -> None:
+        """Viewers should share one compact encoding of the event's nodes"""
+        actor = self.graph.get_node("test_agent_0")
+        event = SayEvent(actor, text_content="hello there")
+        event.execute(self.world)
+        frontend_form = event.to_frontend_form(actor)
+        self.assertEqual(frontend_form["text"], event.view_as(actor))
+        self.assertEqual(
+            json.loads(frontend_form["room"]),
+            json.loads(node_to_json(actor.get_room())),
+        )
+        self.assertNotIn("\n", frontend_form["actor"])
+        self.assertEqual(json.loads(event.to_frontend_json(actor)), frontend_form)
+        shared_form = event.get_shared_frontend_form()
+        self.assertIs(shared_form, event.get_shared_frontend_form())
+
+    def test_frontend_form_not_serialized(self) -> None:
+        """Rendering for a viewer shouldn't change the logged event"""
+        actor = self.graph.get_node("test_agent_0")
+        event = SayEvent(actor, text_content="hello there")
+        event.execute(self.world)
+        full_json = event.to_json()
+        compressed_json = event.to_json(compressed=True)
+        event.to_frontend_form(actor)
+        self.assertEqual(event.to_json(), full_json)
+        self.assertEqual(event.to_json(compressed=True), compressed_json)
+        loaded_event = GraphEvent.from_json(compressed_json, self.world)
+        self.assertIsNone(loaded_event._shared_frontend_form)
+
 
 class ShoutEventTest(GraphEventTests):
 
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+import asyncio
+
+from light.graph.structured_graph import OOGraph
+from light.world.world import World, WorldConfig
+
+ACTIONS = ["get knife", "go hall", "put knife in box", "go kitchen"]
+
+
+class TestForkedGraph(unittest.TestCase):
+    """Ensure forks behave like copies, without changing their parent"""
+
+    def setUp(self):
+        graph = OOGraph()
+        self.kitchen = graph.add_room("kitchen", {})
+        self.hall = graph.add_room("hall", {})
+        graph.add_paths_between(self.kitchen, self.hall, "a door", "a door")
+        self.chef = graph.add_agent("chef", {})
+        self.guard = graph.add_agent("guard", {})
+        self.knife = graph.add_object("knife", {"wieldable": True})
+        self.box = graph.add_object("box", {"container": True})
+        for node in [self.chef, self.guard, self.knife]:
+            node.force_move_to(self.kitchen)
+        self.box.force_move_to(self.hall)
+        self.world = World(WorldConfig())
+        self.world.oo_graph = graph
+        self.graph = graph
+        self.base_json = graph.to_json()
+
+    def run_actions(self, world):
+        for action in ACTIONS:
+            executed, _ = asyncio.run(world.parse_exec(self.chef.node_id, action))
+            self.assertTrue(executed, action)
+
+    def test_fork_matches_copy(self):
+        """Forks should end up where a copy from json would"""
+        fork = self.world.fork()
+        self.assertEqual(fork.oo_graph.get_num_copied_nodes(), 0)
+        self.run_actions(fork)
+        fork.oo_graph.assert_valid()
+        self.assertEqual(self.graph.to_json(), self.base_json)
+
+        json_world = World(WorldConfig())
+        json_world.oo_graph = OOGraph.from_json(self.base_json)
+        self.run_actions(json_world)
+        self.assertEqual(fork.oo_graph.to_json(), json_world.oo_graph.to_json())
+
+    def test_only_accessed_nodes_copied(self):
+        """Nodes should be copied as they're used, not with their neighbors"""
+        fork = self.graph.fork()
+        knife = fork.get_node(self.knife.node_id)
+        self.assertIsNot(knife, self.knife)
+        self.assertIs(fork.get_node(self.knife.node_id), knife)
+        self.assertEqual(fork.get_num_copied_nodes(), 1)
+        self.assertIs(knife.get_container(), fork.get_node(self.kitchen.node_id))
+        self.assertEqual(fork.get_num_copied_nodes(), 2)
+        self.assertIn(knife, fork.rooms[self.kitchen.node_id].get_contents())
+
+    def test_fork_changes_membership(self):
+        """Additions, deaths, and renames should only show in the fork"""
+        fork = self.graph.fork()
+        shield = fork.add_object("shield", {})
+        shield.force_move_to(fork.get_node(self.hall.node_id))
+        fork.agent_die(fork.get_node(self.guard.node_id))
+        fork.get_node(self.knife.node_id).name = "dagger"
+        fork.assert_valid()
+
+        self.assertEqual(len(fork.all_nodes), len(self.graph.all_nodes) + 1)
+        self.assertNotIn(self.guard.node_id, fork.agents)
+        self.assertIn(self.guard.node_id, self.graph.agents)
+        self.assertNotIn(shield.node_id, self.graph.all_nodes)
+        self.assertEqual(fork.find_nodes_by_name("knife"), [])
+        self.assertEqual(self.graph.find_nodes_by_name("knife"), [self.knife])
+        self.assertEqual(
+            [n.node_id for n in fork.desc_to_nodes("dagger")], [self.knife.node_id]
+        )
+        dead_guard = fork.find_nodes_by_name("guard")
+        self.assertEqual(list(fork.dead_nodes.values()), dead_guard)
+        self.assertEqual(self.graph.to_json(), self.base_json)
+
+    def test_nested_forks(self):
+        """Forks of forks should see their parent's changes, but not share them"""
+        fork = self.world.fork()
+        self.run_actions(fork)
+        fork_json = fork.oo_graph.to_json()
+        nested_fork = fork.fork()
+        self.assertEqual(nested_fork.oo_graph.to_json(), fork_json)
+        asyncio.run(nested_fork.parse_exec(self.chef.node_id, "go hall"))
+        chef = nested_fork.oo_graph.get_node(self.chef.node_id)
+        self.assertEqual(chef.get_room().node_id, self.hall.node_id)
+        self.assertEqual(fork.oo_graph.to_json(), fork_json)
+        self.assertEqual(self.graph.to_json(), self.base_json)
+
+
+if __name__ == "__main__":
+    unittest.main()
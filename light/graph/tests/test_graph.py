@@ -19,7 +19,16 @@ from light.graph.elements.graph_nodes import (
     UNINTERESTING_PHRASES,
 )
 
+from light.graph.events.use_events import UseEvent
 from light.graph.structured_graph import OOGraph
+from light.world.world import World, WorldConfig
+
+try:
+    import msgpack  # type: ignore
+
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
 
 
 class TestGraphUnits(unittest.TestCase):
@@ -479,6 +488,57 @@ class TestGraphFunctions(unittest.TestCase):
             self.assertTrue(len(last_found) <= len(curr_found.name))
             last_found = curr_found.name
 
+    def test_name_index_tracks_changes(self):
+        """ensure name searches follow renames, deletions, and deaths"""
+        self.assertListEqual(
+            self.graph.find_nodes_by_name(self.OBJECT_1_NAME), [self.obj_1]
+        )
+        self.graph.set_name(self.obj_1.node_id, "shiny sword")
+        self.assertListEqual(self.graph.find_nodes_by_name(self.OBJECT_1_NAME), [])
+        self.assertListEqual(self.graph.find_nodes_by_name("shiny sword"), [self.obj_1])
+        self.assertListEqual(self.graph.desc_to_nodes("sword"), [self.obj_1])
+        self.assertListEqual(self.graph.desc_to_nodes("swords"), [self.obj_1])
+        # The original name remains as an alternate name
+        self.assertListEqual(self.graph.desc_to_nodes(self.OBJECT_1_NAME), [self.obj_1])
+
+        # Alternate names are searchable too
+        self.obj_2.names = ["blade"]
+        self.assertListEqual(self.graph.desc_to_nodes("blade"), [self.obj_2])
+
+        # Same names should come back in the order they were added
+        self.graph.set_name(self.obj_2.node_id, "shiny sword")
+        self.assertListEqual(
+            self.graph.find_nodes_by_name("shiny sword"), [self.obj_1, self.obj_2]
+        )
+
+        dead_char = self.graph.agent_die(self.char_1)
+        self.assertListEqual(
+            self.graph.find_nodes_by_name(self.CHARACTER_1_NAME), [dead_char]
+        )
+        self.assertListEqual(
+            self.graph.desc_to_nodes(self.CHARACTER_1_NAME), [dead_char]
+        )
+
+        self.graph.delete_nodes([self.room_2])
+        self.assertListEqual(self.graph.desc_to_nodes("shiny"), [self.obj_1])
+        self.assertListEqual(self.graph.desc_to_nodes(self.CHARACTER_2_NAME), [])
+
+        # Search results should match a scan over every node in the graph
+        for query in ["find", "fi", "iny", "room", "object", "x"]:
+            expected = {
+                node
+                for node in self.graph.get_all_nodes()
+                if any(query in n.lower() + "s" for n in [node.name] + node.names)
+            }
+            self.assertSetEqual(set(self.graph.desc_to_nodes(query)), expected)
+
+        # Reloaded graphs should have the same index
+        reloaded = OOGraph.from_json(self.graph.to_json())
+        self.assertListEqual(
+            [n.node_id for n in reloaded.find_nodes_by_name("shiny sword")],
+            [self.obj_1.node_id],
+        )
+
     def test_json_dump(self):
         """Ensure that json dumping makes the intended conversion"""
         as_json_1 = self.graph.to_json()
@@ -494,6 +554,69 @@ class TestGraphFunctions(unittest.TestCase):
         self.assertEqual(as_json_1, as_json_2)
         self.assertDictEqual(json.loads(as_json_1), json.loads(as_json_2))
 
+    def test_compact_json_dump(self):
+        """Ensure compact dumps match the full dumps, and track node changes"""
+        as_json = self.graph.to_json()
+        as_compact_json = self.graph.to_json(compact=True)
+        self.assertNotIn("\n", as_compact_json)
+        self.assertEqual(
+            as_compact_json,
+            json.dumps(json.loads(as_json), sort_keys=True, separators=(",", ":")),
+        )
+        from_compact_json = OOGraph.from_json(as_compact_json)
+        from_compact_json.assert_valid()
+        self.assertEqual(from_compact_json.to_json(), as_json)
+
+        # Cached fragments should be invalidated by changes to a node
+        fragment = self.obj_1.to_fragment()
+        self.assertIs(self.obj_1.to_fragment(), fragment)
+        self.obj_1.set_prop("value", 5)
+        self.assertIn('"value":5', self.obj_1.to_fragment())
+        self.obj_1.name = "renamed object"
+        self.assertIn('"name":"renamed object"', self.obj_1.to_fragment())
+        room_fragment = self.room_2.to_fragment()
+        self.obj_1.move_to(self.room_2)
+        self.assertNotEqual(room_fragment, self.room_2.to_fragment())
+        self.assertEqual(
+            self.graph.to_json(compact=True),
+            json.dumps(
+                json.loads(self.graph.to_json()), sort_keys=True, separators=(",", ":")
+            ),
+        )
+
+    def test_compact_json_tracks_use_events(self):
+        """Ensure in-place changes to an object's uses invalidate its fragment"""
+        self.obj_1.on_use = [
+            {
+                "constraints": [],
+                "events": [
+                    {"type": "broadcast_message", "params": {"self_view": "Glows."}}
+                ],
+                "remaining_uses": 2,
+            }
+        ]
+        self.obj_1.force_move_to(self.char_1)
+        world = World(WorldConfig())
+        world.oo_graph = self.graph
+        fragment = self.obj_1.to_fragment()
+        UseEvent(self.char_1, [self.obj_1]).on_use(world)
+        self.assertNotEqual(fragment, self.obj_1.to_fragment())
+        self.assertIn('"remaining_uses":1', self.obj_1.to_fragment())
+        self.assertEqual(
+            self.graph.to_json(compact=True),
+            json.dumps(
+                json.loads(self.graph.to_json()), sort_keys=True, separators=(",", ":")
+            ),
+        )
+
+    @unittest.skipIf(not HAS_MSGPACK, "msgpack not installed")
+    def test_msgpack_dump(self):
+        """Ensure that binary dumps can be reconstructed into the same graph"""
+        as_msgpack = self.graph.to_msgpack()
+        from_msgpack = OOGraph.from_msgpack(as_msgpack)
+        from_msgpack.assert_valid()
+        self.assertEqual(from_msgpack.to_json(), self.graph.to_json())
+
     def test_json_from_room_view(self):
         """Ensure that json dumping from a room POV can be reconstructed into a graph
         with only the room"""
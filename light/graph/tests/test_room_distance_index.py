@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+from collections import deque
+
+from light.graph.room_distance_index import RoomDistanceIndex
+from light.graph.structured_graph import OOGraph
+
+
+def bfs_hops(graph, from_room):
+    """Reference hop counts from one room, found by walking the graph"""
+    hops = {from_room.node_id: 0}
+    queue = deque([from_room])
+    while len(queue) > 0:
+        room = queue.popleft()
+        for neighbor in room.get_neighbors():
+            if neighbor.node_id not in hops:
+                hops[neighbor.node_id] = hops[room.node_id] + 1
+                queue.append(neighbor)
+    return hops
+
+
+class TestRoomDistanceIndex(unittest.TestCase):
+    """Ensure the room distance index matches walking the graph"""
+
+    def setUp(self):
+        self.graph = OOGraph()
+        self.rooms = [
+            self.graph.add_room(f"room {i}", {"grid_location": [i, 0, 0]})
+            for i in range(6)
+        ]
+        # A line of rooms 0-3, with 4 off of 1 and 5 unconnected
+        for i, j in [(0, 1), (1, 2), (2, 3), (1, 4)]:
+            self.graph.add_paths_between(
+                self.rooms[i], self.rooms[j], f"to {j}", f"to {i}"
+            )
+
+    def assert_matches_bfs(self, graph, index):
+        for from_room in graph.rooms.values():
+            expected = bfs_hops(graph, from_room)
+            for to_room in graph.rooms.values():
+                self.assertEqual(
+                    index.get_hops(from_room.node_id, to_room.node_id),
+                    expected.get(to_room.node_id),
+                )
+
+    def test_build(self):
+        index = self.graph.get_room_distance_index()
+        self.assert_matches_bfs(self.graph, index)
+        self.assertEqual(
+            index.get_hops(self.rooms[0].node_id, self.rooms[4].node_id), 2
+        )
+        self.assertIsNone(index.get_hops(self.rooms[0].node_id, self.rooms[5].node_id))
+        grid = index.get_grid_locations()
+        self.assertEqual(
+            list(grid[index.get_room_index(self.rooms[3].node_id)]), [3, 0, 0]
+        )
+
+    def test_incremental_updates(self):
+        index = self.graph.get_room_distance_index()
+        index.get_hops_from(self.rooms[0].node_id)
+        new_room = self.graph.add_room("new room", {})
+        self.graph.add_paths_between(self.rooms[5], new_room, "to new", "to 5")
+        self.graph.add_paths_between(self.rooms[3], self.rooms[5], "to 5", "to 3")
+        self.graph.add_paths_between(self.rooms[0], self.rooms[3], "to 3", "to 0")
+        self.assert_matches_bfs(self.graph, index)
+        fresh_index = RoomDistanceIndex(self.graph)
+        fresh_index.build()
+        self.assertTrue((fresh_index._hops == index._hops).all())
+
+        # Deleting rooms rebuilds the index
+        self.graph.delete_nodes([self.rooms[3]])
+        self.assert_matches_bfs(self.graph, index)
+
+    def test_forks_share_index(self):
+        index = self.graph.get_room_distance_index()
+        fork = self.graph.fork()
+        fork_index = fork.get_room_distance_index()
+        self.assertIs(fork_index.get_hops_from(self.rooms[0].node_id).base, index._hops)
+        self.assertEqual(fork.get_num_copied_nodes(), 0)
+
+        fork.add_paths_between(
+            fork.get_node(self.rooms[0].node_id),
+            fork.get_node(self.rooms[5].node_id),
+            "to 5",
+            "to 0",
+        )
+        self.assertEqual(
+            fork_index.get_hops(self.rooms[0].node_id, self.rooms[5].node_id), 1
+        )
+        self.assertIsNone(index.get_hops(self.rooms[0].node_id, self.rooms[5].node_id))
+        self.assert_matches_bfs(fork, fork_index)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,9 @@
 
 """Contains some helper functions that are useful across multiple files"""
 
+from collections import Counter, deque
+from typing import Any, Hashable, Iterable, Iterator, Optional
+
 
 def rm(d, val):
     """Removes a value from a dictionary if it exists, does nothing otherwise"""
@@ -41,3 +44,55 @@ def deprecated(f):
         return res
 
     return wrapper
+
+
+class BoundedHistory:
+    """
+    The most recent entries appended to a history, up to maxlen of them, with
+    constant time checks for whether an entry is still in the history.
+    Entries must be hashable.
+    """
+
+    def __init__(self, maxlen: Optional[int], entries: Iterable[Hashable] = ()):
+        self.maxlen = maxlen
+        self._entries: deque = deque(maxlen=maxlen)
+        self._counts: Counter = Counter()
+        for entry in entries:
+            self.append(entry)
+
+    def append(self, entry: Hashable) -> None:
+        """Add an entry, dropping the oldest if the history is full"""
+        if self.maxlen is not None and len(self._entries) == self.maxlen:
+            if self.maxlen == 0:
+                return
+            oldest = self._entries[0]
+            self._counts[oldest] -= 1
+            if self._counts[oldest] == 0:
+                del self._counts[oldest]
+        self._entries.append(entry)
+        self._counts[entry] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._counts.clear()
+
+    def copy(self) -> "BoundedHistory":
+        history = BoundedHistory(self.maxlen)
+        history._entries = self._entries.copy()
+        history._counts = self._counts.copy()
+        return history
+
+    def __contains__(self, entry: Any) -> bool:
+        return entry in self._counts
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, idx: int) -> Hashable:
+        return self._entries[idx]
+
+    def __repr__(self) -> str:
+        return f"BoundedHistory({list(self._entries)!r}, maxlen={self.maxlen})"
@@ -405,6 +405,18 @@ def get_args():
         default=4,
         help="how many training CPU processes to use (default: 16)",
     )
+    parser.add_argument(
+        "--num_env_workers",
+        type=int,
+        default=0,
+        help="worker processes to shard game graphs across, 0 to step them serially",
+    )
+    parser.add_argument(
+        "--print_env_obs",
+        type=bool,
+        default=False,
+        help="print the model observations of every environment step",
+    )
     parser.add_argument(
         "--quest_len",
         type=int,
@@ -14,7 +14,7 @@ class Environment(object):
         self.steps = 0
         self.self_setting = None
         self.partner_setting = None
-        # self.graph = None
+        self.graph = None
         self.index = 0
         self.goal = None
         self.partner_id = None
@@ -37,6 +37,8 @@ class Environment(object):
         self.self_id = copy.copy(instance["self_id"])
         self.possible_acts = copy.copy(instance["possible_acts"])
         self.quest = copy.copy(instance["quest"])
+        if instance.get("graph", None) is not None:
+            self.graph = instance["graph"]
         if instance.get("embeddings", None) is not None:
             self.embeddings = torch.FloatTensor(instance["embeddings"])
         if instance.get("internal_id", None) is not None:
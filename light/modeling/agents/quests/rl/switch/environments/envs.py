@@ -18,6 +18,11 @@ from light.modeling.agents.quests.rl.switch.environments.environment import Envi
 from light.modeling.agents.quests.rl.switch.environments.env_generator import (
     EnvironmentGenerator,
 )
+from light.modeling.agents.quests.rl.switch.environments.subproc_envs import (
+    SubprocGameEnvs,
+    execute_action,
+    list_possible_actions,
+)
 from light.modeling.agents.quests.rl.shared.process.constants import *
 from light.modeling.agents.quests.rl.switch.agents.env_agents import LightRetrievalAgent
 
@@ -154,6 +159,48 @@ class EnvironmentWrapper(object):
         self.previous_rl_obs = []
         self.goal_types = opt["goal_types"].split(",")
         self.i = 0
+        self.print_obs = opt.get("print_env_obs", False)
+
+        # Game graphs can be sharded across worker processes, which then run
+        # game steps while the main process makes batched model calls
+        self.game_envs = None
+        if opt.get("num_env_workers", 0) > 0 and "emote" not in self.goal_types:
+            self.game_envs = SubprocGameEnvs(self.no_envs, opt["num_env_workers"])
+
+    def close(self):
+        if self.game_envs is not None:
+            self.game_envs.close()
+
+    def set_env(self, idx, instance):
+        """Set up an environment (and its game graph) from an instance"""
+        self.envs[idx].set_attrs(instance)
+        if self.game_envs is not None:
+            self.game_envs.set_graph(
+                idx, self.envs[idx].graph, self.envs[idx].partner_id
+            )
+
+    def get_possible_acts(self):
+        """Return the actions each environment agent can currently take"""
+        if "emote" in self.goal_types:
+            return [copy(ALL_EMOTES) for _ in range(self.no_envs)]
+        if self.game_envs is not None:
+            return self.game_envs.get_possible_actions()
+        return [
+            list_possible_actions(self.envs[idx].graph, self.envs[idx].partner_id)
+            for idx in range(self.no_envs)
+        ]
+
+    def execute_env_act(self, idx, text):
+        """Execute an environment agent's act in its game graph"""
+        if self.game_envs is not None:
+            self.game_envs.execute(idx, text)
+        else:
+            execute_action(self.envs[idx].graph, self.envs[idx].partner_id, text)
+
+    def start_game_step(self):
+        """Start running queued game steps in the workers, if there are any"""
+        if self.game_envs is not None:
+            self.game_envs.step_async()
 
     def get_env(self):
         """
@@ -275,7 +322,7 @@ class EnvironmentWrapper(object):
             # All agents observe settings
             for idx in range(self.no_envs):
                 try:
-                    self.envs[idx].set_attrs(self.get_env())
+                    self.set_env(idx, self.get_env())
                 except TypeError:
                     end = True
 
@@ -300,6 +347,7 @@ class EnvironmentWrapper(object):
 
             if end:
                 return _, True
+            self.start_game_step()
             # get context embeddings
             output = deepcopy(self.rl_encoder.batch_act(obs))
             for_type = output[0]["embedding_ctx"]
@@ -351,24 +399,13 @@ class EnvironmentWrapper(object):
                     rl_utt_obs.append(
                         self.rl_retrievers[idx].observe(self.previous_rl_obs[idx])
                     )
-            print("\nRL RET OBS")
-            print(rl_utt_obs)
+            if self.print_obs:
+                print("\nRL RET OBS")
+                print(rl_utt_obs)
             rl_utts = self.rl_retrieval.batch_act(rl_utt_obs)
 
             # get possible actions from the environment
-            if "emote" in self.goal_types:
-                possible_acts = [copy(ALL_EMOTES) for _ in range(self.no_envs)]
-            else:
-                possible_acts = [
-                    list(
-                        sorted(
-                            self.envs[idx].graph.get_possible_actions(
-                                self.envs[idx].partner_id, use_actions=USE_ACTIONS
-                            )
-                        )
-                    )
-                    for idx in range(self.no_envs)
-                ]
+            possible_acts = self.get_possible_acts()
 
             # environment, RL agent observe RL utt
             env_utt_obs = []
@@ -389,8 +426,9 @@ class EnvironmentWrapper(object):
                 }
                 self.rl_encoders[idx].observe(copy(rl_encoder_input))
                 env_utt_obs.append(self.env_agents[idx].observe(copy(env_speech_input)))
-            print("\nENV UTT OBS")
-            print(env_utt_obs)
+            if self.print_obs:
+                print("\nENV UTT OBS")
+                print(env_utt_obs)
 
             # environment utterance
             env_utt = deepcopy(self.env_agent.batch_act(env_utt_obs))
@@ -417,8 +455,9 @@ class EnvironmentWrapper(object):
                 #     copy(rl_encoder_input)
                 # )
                 env_act_obs.append(self.env_agents[idx].observe(copy(env_act_input)))
-            print("\nENV ACT OBS")
-            print(env_act_obs)
+            if self.print_obs:
+                print("\nENV ACT OBS")
+                print(env_act_obs)
 
             # environment act
             env_act = deepcopy(self.env_agent.batch_act(env_act_obs))
@@ -434,13 +473,7 @@ class EnvironmentWrapper(object):
                         }
                     )
                     if "action" in self.goal_types:
-                        try:
-                            _ = self.envs[idx].graph.parse_exec(
-                                self.envs[idx].partner_id, env_act[idx]["text"]
-                            )
-                        except:
-                            print("Action cannot be executed ...")
-                            print(env_act[idx]["text"])
+                        self.execute_env_act(idx, env_act[idx]["text"])
 
             # check reward
             reward, done, info = self.goal_achieved(env_utt, env_act, possible_acts)
@@ -462,10 +495,11 @@ class EnvironmentWrapper(object):
                         "episode_done": True,
                     }
                     full_history_rl = self.rl_encoders[idx].observe(copy(e_done))
-                    print("\nRL ENCODER HISTORY\n")
-                    print(full_history_rl)
-                    print("\nENV HISTORY\n")
-                    print(env_history)
+                    if self.print_obs:
+                        print("\nRL ENCODER HISTORY\n")
+                        print(full_history_rl)
+                        print("\nENV HISTORY\n")
+                        print(env_history)
                     self.rl_retrievers[idx].observe(copy(e_done))
                     self.rl_encoders[idx].reset()
                     self.rl_retrievers[idx].reset()
@@ -482,7 +516,7 @@ class EnvironmentWrapper(object):
 
                     # reset the environment with new instance
                     try:
-                        self.envs[idx].set_attrs(self.get_env())
+                        self.set_env(idx, self.get_env())
                     except TypeError:
                         end = True
                         continue
@@ -520,8 +554,10 @@ class EnvironmentWrapper(object):
                     )
             if end:
                 return None, reward, done, info, end
+            self.start_game_step()
             output = deepcopy(self.rl_encoder.batch_act(rl_obs))
-            print("OUTPUT", output)
+            if self.print_obs:
+                print("OUTPUT", output)
             for_type = output[0]["embedding_ctx"]
             encoded = for_type.new(self.no_envs, for_type.size(0))
             for i in range(self.no_envs):
@@ -763,19 +799,7 @@ class EnvironmentWrapper(object):
             actions = self.rl_retrieval.batch_act(rl_ret_obs)
 
             # get possible actions from the environment
-            if "emote" in self.goal_types:
-                possible_acts = [copy(ALL_EMOTES) for _ in range(self.no_envs)]
-            else:
-                possible_acts = [
-                    list(
-                        sorted(
-                            self.envs[idx].graph.get_possible_actions(
-                                self.envs[idx].partner_id, use_actions=USE_ACTIONS
-                            )
-                        )
-                    )
-                    for idx in range(self.no_envs)
-                ]
+            possible_acts = self.get_possible_acts()
 
             env_utt_obs, env_act_obs = [], []
 
@@ -825,13 +849,7 @@ class EnvironmentWrapper(object):
                             "episode_done": False,
                         }
                     )
-                    try:
-                        _ = self.envs[idx].graph.parse_exec(
-                            self.envs[idx].partner_id, env_act[idx]["text"]
-                        )
-                    except:
-                        print("Action cannot be executed ...")
-                        print(env_act[idx]["text"])
+                    self.execute_env_act(idx, env_act[idx]["text"])
 
             reward, done, info = self.goal_achieved(env_utt, env_act, possible_acts)
             rl_obs = []
@@ -865,7 +883,7 @@ class EnvironmentWrapper(object):
                     new_env = self.get_env()
                     if new_env is None:
                         return None, reward, done, info
-                    self.envs[idx].set_attrs(new_env)
+                    self.set_env(idx, new_env)
                     self.rl_encoders[idx].history.set_goal(self.envs[idx].goal)
                     self.rl_retrievers[idx].history.set_goal(self.envs[idx].goal)
 
@@ -897,6 +915,7 @@ class EnvironmentWrapper(object):
                         self.rl_encoders[idx].observe(copy(encode_model_input))
                     )
                     self.previous_rl_obs.append(copy(encode_model_input))
+            self.start_game_step()
             output = deepcopy(self.rl_encoder.batch_act(rl_obs))
             for_type = output[0]["embedding_ctx"]
             encoded = for_type.new(self.no_envs, for_type.size(0))
@@ -66,7 +66,8 @@ class QuestEnv(object):
         self.rewshape = rewshape
 
         self.speech_quest = data["speech_seq"]
-        self.graph_data = deepcopy(graph)
+        # Each reset forks this base world, which must stay unchanged
+        self.graph_data = graph
         self.possible_acts_data = deepcopy(possible_acts)
         # self.possible_actions = data['available_actions']
         self.possible_says = []
@@ -89,7 +90,7 @@ class QuestEnv(object):
         # self.world = World(WorldConfig())
         # g = OOGraph.from_json(deepcopy(self.graph_data))
         # self.world.oo_graph = g
-        self.world = deepcopy(self.graph_data)
+        self.world = self.graph_data.fork()
         self.possible_acts = self.possible_acts_data
 
     def check_reverse_act_progress(self, action, id=None):
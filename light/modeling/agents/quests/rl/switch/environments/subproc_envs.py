@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Subprocess-backed game graphs for the quest RL environment wrappers. The LIGHT
+game graphs of a batch of environments are sharded across worker processes,
+which execute the environment agent's actions and list the next possible
+actions for their shard in parallel. Possible action lists come back through
+shared memory rather than being pickled through pipes, while all of the model
+calls stay batched on the main process.
+"""
+
+import asyncio
+import multiprocessing as mp
+import numpy as np
+
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional, Tuple
+
+from light.modeling.agents.quests.rl.shared.process.constants import USE_ACTIONS
+
+# Bytes available to each environment's newline-joined possible actions. Lists
+# that don't fit are sent through the pipe instead.
+DEFAULT_SLOT_BYTES = 1 << 16
+OVERFLOW_LENGTH = -1
+
+
+def list_possible_actions(graph, actor_id: str) -> List[str]:
+    """Return the sorted actions the actor can take in the graph"""
+    return list(sorted(graph.get_possible_actions(actor_id, use_actions=USE_ACTIONS)))
+
+
+def execute_action(
+    graph,
+    actor_id: str,
+    action: str,
+    loop: Optional[asyncio.AbstractEventLoop] = None,
+) -> bool:
+    """Execute the action as the actor in the graph, returning if it succeeded"""
+    try:
+        result = graph.parse_exec(actor_id, action)
+        if asyncio.iscoroutine(result):
+            if loop is None:
+                result = asyncio.run(result)
+            else:
+                result = loop.run_until_complete(result)
+        return bool(result[0])
+    except Exception:
+        print("Action cannot be executed ...")
+        print(action)
+        return False
+
+
+def graph_from_json(graph_json: str):
+    """Create a game world over the given serialized graph"""
+    from light.graph.structured_graph import OOGraph
+    from light.world.world import World, WorldConfig
+
+    world = World(WorldConfig())
+    world.oo_graph = OOGraph.from_json(graph_json)
+    return world
+
+
+class SharedActionLists:
+    """
+    Per-environment slots of shared memory, each holding the newline-joined
+    possible actions of one environment, alongside their encoded lengths
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        slot_bytes: int = DEFAULT_SLOT_BYTES,
+        name: Optional[str] = None,
+    ):
+        self.num_envs = num_envs
+        self.slot_bytes = slot_bytes
+        lengths_bytes = num_envs * np.dtype(np.int64).itemsize
+        size = lengths_bytes + num_envs * slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = SharedMemory(create=True, size=size)
+        else:
+            self.shm = SharedMemory(name=name)
+        self.name = self.shm.name
+        self.lengths = np.ndarray((num_envs,), dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray(
+            (num_envs, slot_bytes),
+            dtype=np.uint8,
+            buffer=self.shm.buf,
+            offset=lengths_bytes,
+        )
+
+    def write(self, idx: int, actions: List[str]) -> bool:
+        """Write an environment's actions, returning False if they don't fit"""
+        encoded = "\n".join(actions).encode("utf-8")
+        if len(encoded) > self.slot_bytes:
+            self.lengths[idx] = OVERFLOW_LENGTH
+            return False
+        self.data[idx, : len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+        self.lengths[idx] = len(encoded)
+        return True
+
+    def read(self, idx: int) -> Optional[List[str]]:
+        """Read an environment's actions, or None if they overflowed"""
+        length = int(self.lengths[idx])
+        if length == OVERFLOW_LENGTH:
+            return None
+        if length == 0:
+            return []
+        return self.data[idx, :length].tobytes().decode("utf-8").split("\n")
+
+    def close(self) -> None:
+        # Views into the buffer must be released before it can be closed
+        del self.lengths, self.data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _game_worker(remote, parent_remote, shm_name, num_envs, slot_bytes, env_idxs):
+    """
+    Worker loop owning the game graphs of a shard of environments. Each step
+    executes the pending actions, swaps in the graphs of reset environments,
+    and then writes the possible actions of every environment in the shard.
+    """
+    parent_remote.close()
+    action_lists = SharedActionLists(num_envs, slot_bytes, name=shm_name)
+    loop = asyncio.new_event_loop()
+    graphs: Dict[int, Any] = {}
+    actor_ids: Dict[int, str] = {}
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                actions, resets = data
+                for idx, action in actions.items():
+                    execute_action(graphs[idx], actor_ids[idx], action, loop)
+                for idx, (graph_json, actor_id) in resets.items():
+                    graphs[idx] = graph_from_json(graph_json)
+                    actor_ids[idx] = actor_id
+                overflowed = {}
+                for idx in env_idxs:
+                    if idx not in graphs:
+                        action_lists.write(idx, [])
+                        continue
+                    possible = list_possible_actions(graphs[idx], actor_ids[idx])
+                    if not action_lists.write(idx, possible):
+                        overflowed[idx] = possible
+                remote.send(overflowed)
+            elif cmd == "close":
+                break
+            else:
+                raise NotImplementedError(f"Unknown worker command {cmd}")
+    except KeyboardInterrupt:
+        print("Game worker: got KeyboardInterrupt")
+    finally:
+        action_lists.close()
+        loop.close()
+
+
+class SubprocGameEnvs:
+    """
+    Game graphs for a batch of environments, sharded across worker processes
+    in the style of SubprocVecEnv. Actions and resets are queued per worker,
+    then step_async runs them all (along with listing the next possible
+    actions) while the caller gets on with batched model calls, and
+    get_possible_actions waits for the results.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        num_workers: int,
+        slot_bytes: int = DEFAULT_SLOT_BYTES,
+        start_method: Optional[str] = None,
+    ):
+        self.num_envs = num_envs
+        self.num_workers = max(1, min(num_workers, num_envs))
+        if start_method is None:
+            # Forking a process that already has models loaded isn't safe
+            forkserver = "forkserver" in mp.get_all_start_methods()
+            start_method = "forkserver" if forkserver else "spawn"
+        ctx = mp.get_context(start_method)
+        self.action_lists = SharedActionLists(num_envs, slot_bytes)
+
+        self.shards = [
+            shard.tolist()
+            for shard in np.array_split(np.arange(num_envs), self.num_workers)
+        ]
+        self.env_to_worker = {}
+        for worker_idx, shard in enumerate(self.shards):
+            for idx in shard:
+                self.env_to_worker[idx] = worker_idx
+
+        self.remotes, self.processes = [], []
+        for shard in self.shards:
+            remote, work_remote = ctx.Pipe()
+            args = (
+                work_remote,
+                remote,
+                self.action_lists.name,
+                num_envs,
+                slot_bytes,
+                shard,
+            )
+            process = ctx.Process(target=_game_worker, args=args, daemon=True)
+            process.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+        self._pending_actions: List[Dict[int, str]] = [{} for _ in self.shards]
+        self._pending_resets: List[Dict[int, Tuple[str, str]]] = [
+            {} for _ in self.shards
+        ]
+        self.waiting = False
+        self.closed = False
+
+    def set_graph(self, idx: int, graph, actor_id: str) -> None:
+        """Queue replacing an environment's game graph on the next step"""
+        worker_idx = self.env_to_worker[idx]
+        graph_json = graph.oo_graph.to_json()
+        self._pending_actions[worker_idx].pop(idx, None)
+        self._pending_resets[worker_idx][idx] = (graph_json, actor_id)
+
+    def execute(self, idx: int, action: str) -> None:
+        """Queue executing an action in an environment on the next step"""
+        self._pending_actions[self.env_to_worker[idx]][idx] = action
+
+    def step_async(self) -> None:
+        """Send the queued actions and resets to the workers"""
+        if self.waiting:
+            self.step_wait()
+        for worker_idx, remote in enumerate(self.remotes):
+            data = (self._pending_actions[worker_idx], self._pending_resets[worker_idx])
+            remote.send(("step", data))
+        self._pending_actions = [{} for _ in self.shards]
+        self._pending_resets = [{} for _ in self.shards]
+        self.waiting = True
+
+    def step_wait(self) -> List[List[str]]:
+        """Wait for the workers, returning the possible actions of every env"""
+        overflowed = {}
+        for remote in self.remotes:
+            overflowed.update(remote.recv())
+        self.waiting = False
+        possible_actions = []
+        for idx in range(self.num_envs):
+            actions = self.action_lists.read(idx)
+            possible_actions.append(actions if actions is not None else overflowed[idx])
+        return possible_actions
+
+    def get_possible_actions(self) -> List[List[str]]:
+        """Return the possible actions after the queued actions and resets"""
+        if not self.waiting:
+            self.step_async()
+        return self.step_wait()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self.waiting:
+            self.step_wait()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.action_lists.close()
+        self.closed = True
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+from light.graph.structured_graph import OOGraph
+from light.modeling.agents.quests.rl.switch.environments.subproc_envs import (
+    SharedActionLists,
+    SubprocGameEnvs,
+)
+from light.world.world import World, WorldConfig
+
+
+def make_world():
+    """A room with an agent and a ball to pick up, returning the agent id"""
+    graph = OOGraph()
+    room = graph.add_room("room", {})
+    agent = graph.add_agent("agent", {})
+    agent.force_move_to(room)
+    ball = graph.add_object("ball", {"gettable": True})
+    ball.force_move_to(room)
+    world = World(WorldConfig())
+    world.oo_graph = graph
+    return world, agent.node_id
+
+
+class TestSharedActionLists(unittest.TestCase):
+    """Ensure action lists round trip through the shared memory slots"""
+
+    def test_write_and_read(self):
+        action_lists = SharedActionLists(3, slot_bytes=32)
+        try:
+            self.assertTrue(action_lists.write(0, ["get ball", "go north"]))
+            self.assertTrue(action_lists.write(1, []))
+            self.assertEqual(action_lists.read(0), ["get ball", "go north"])
+            self.assertEqual(action_lists.read(1), [])
+            self.assertEqual(action_lists.read(2), [])
+
+            # Other processes attach to the same slots by name
+            attached = SharedActionLists(3, slot_bytes=32, name=action_lists.name)
+            self.assertEqual(attached.read(0), ["get ball", "go north"])
+            attached.write(2, ["drop ball"])
+            attached.close()
+            self.assertEqual(action_lists.read(2), ["drop ball"])
+        finally:
+            action_lists.close()
+
+    def test_overflow_and_slot_reuse(self):
+        action_lists = SharedActionLists(2, slot_bytes=16)
+        try:
+            self.assertFalse(action_lists.write(0, ["a very long action name"]))
+            self.assertIsNone(action_lists.read(0))
+            self.assertEqual(action_lists.read(1), [])
+
+            # A slot can be reused after overflowing, or for shorter lists
+            self.assertTrue(action_lists.write(0, ["get ball", "look"]))
+            self.assertEqual(action_lists.read(0), ["get ball", "look"])
+            self.assertTrue(action_lists.write(0, ["hug"]))
+            self.assertEqual(action_lists.read(0), ["hug"])
+        finally:
+            action_lists.close()
+
+
+class TestSubprocGameEnvs(unittest.TestCase):
+    """Ensure game graphs sharded across workers step like local graphs"""
+
+    def run_envs(self, num_workers, slot_bytes=1 << 16, start_method=None):
+        world, agent_id = make_world()
+        envs = SubprocGameEnvs(
+            3, num_workers, slot_bytes=slot_bytes, start_method=start_method
+        )
+        try:
+            # Environments without a graph have no actions yet
+            envs.set_graph(0, world, agent_id)
+            envs.set_graph(1, world, agent_id)
+            self.assertEqual(
+                envs.get_possible_actions(), [["get ball"], ["get ball"], []]
+            )
+
+            envs.execute(0, "get ball")
+            envs.set_graph(2, world, agent_id)
+            envs.step_async()
+            self.assertTrue(envs.waiting)
+            self.assertEqual(
+                envs.step_wait(), [["drop ball"], ["get ball"], ["get ball"]]
+            )
+            self.assertFalse(envs.waiting)
+
+            # Resetting an environment replaces its pending action
+            envs.execute(1, "get ball")
+            envs.set_graph(1, world, agent_id)
+            envs.execute(2, "get ball")
+            self.assertEqual(
+                envs.get_possible_actions(),
+                [["drop ball"], ["get ball"], ["drop ball"]],
+            )
+        finally:
+            envs.close()
+        self.assertTrue(envs.closed)
+
+    def test_single_worker(self):
+        self.run_envs(num_workers=1)
+
+    # No models are loaded in these tests, so the rest fork their workers to
+    # start them faster
+
+    def test_sharded_workers(self):
+        envs = SubprocGameEnvs(2, num_workers=4, start_method="fork")
+        self.assertEqual(envs.num_workers, 2)
+        envs.close()
+        self.run_envs(num_workers=2, start_method="fork")
+
+    def test_overflowed_actions(self):
+        # Lists that don't fit in their slot come back through the pipes
+        self.run_envs(num_workers=2, slot_bytes=4, start_method="fork")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -56,3 +56,7 @@ class ModelLoader(ABC):
     def get_model(self, overrides: Optional[Dict[str, Any]] = None) -> "Agent":
         """Return a copy of the running model"""
         raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return any runtime metrics this loader tracks for its models"""
+        return {}
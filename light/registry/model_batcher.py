@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Micro-batching layer for locally loaded models. Many souls may await `act()`
+on copies of the same model at once, and running those one at a time means
+many tiny forward passes. The ModelBatcher collects concurrent requests
+within a short window and resolves them together with a single `batch_act`.
+
+Batch functions may also be coroutines (such as requests to a remote model
+server), in which case up to `max_concurrent_batches` run at once.
+"""
+
+from collections import Counter, deque
+from parlai.core.agents import Agent
+from parlai.core.message import Message
+import asyncio
+import time
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+DEFAULT_BATCH_WINDOW = 0.01
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_CONCURRENT_BATCHES = 1
+TIMING_WINDOW = 1000
+
+BatchFunction = Callable[
+    [List[Message]], Union[List[Message], Awaitable[List[Message]]]
+]
+# An observation, the future for its act, and when it was queued
+QueueEntry = Tuple[Message, asyncio.Future, float]
+
+
+class ModelBatcher:
+    """
+    Queues concurrent act requests for a single model and runs them through
+    the provided batch function in groups of at most `max_batch_size`,
+    waiting at most `batch_window` seconds for a batch to fill.
+
+    Synchronous batch functions run one batch at a time in an executor, while
+    coroutine batch functions run up to `max_concurrent_batches` at once.
+    """
+
+    def __init__(
+        self,
+        batch_fn: BatchFunction,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        batch_window: float = DEFAULT_BATCH_WINDOW,
+        max_concurrent_batches: int = DEFAULT_MAX_CONCURRENT_BATCHES,
+    ):
+        assert max_batch_size > 0, "Batches must hold at least one request"
+        assert max_concurrent_batches > 0, "Must be able to run a batch"
+        self.batch_fn = batch_fn
+        self.is_async = asyncio.iscoroutinefunction(batch_fn)
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.max_concurrent_batches = max_concurrent_batches
+        self.batch_size_histogram: Counter = Counter()
+        self.total_requests = 0
+        self.completed_requests = 0
+        self.in_flight_batches = 0
+        self.queue_waits: deque = deque(maxlen=TIMING_WINDOW)
+        self.batch_times: deque = deque(maxlen=TIMING_WINDOW)
+        self.first_request_time: Optional[float] = None
+        self.last_completion_time: Optional[float] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional["asyncio.Queue[QueueEntry]"] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+
+    def _ensure_worker(self) -> None:
+        """Launch the batching task in the currently running loop if needed"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            # Models are often loaded in a different loop than they are used in,
+            # so the queue and worker are bound lazily to the caller's loop.
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._batch_slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = loop.create_task(self._run_batches())
+
+    async def submit(self, observation: Message) -> Message:
+        """Queue the given observation, and return the act produced for it"""
+        self._ensure_worker()
+        assert self._queue is not None and self._loop is not None
+        result_future = self._loop.create_future()
+        self.total_requests += 1
+        queued_time = time.time()
+        if self.first_request_time is None:
+            self.first_request_time = queued_time
+        await self._queue.put((observation, result_future, queued_time))
+        return await result_future
+
+    async def _collect_batch(self) -> List[QueueEntry]:
+        """Wait for one request, then gather more until full or out of time"""
+        assert self._queue is not None and self._loop is not None
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run_batches(self) -> None:
+        """Main loop, run batches for as long as the owning loop is alive"""
+        assert self._loop is not None
+        while True:
+            batch = await self._collect_batch()
+            # Requests whose callers have gone away don't need to be run
+            batch = [entry for entry in batch if not entry[1].cancelled()]
+            if len(batch) == 0:
+                continue
+            self.batch_size_histogram[len(batch)] += 1
+            if not self.is_async:
+                await self._run_batch(batch)
+                continue
+            # Pipeline async batches, up to the concurrency limit
+            assert self._batch_slots is not None
+            await self._batch_slots.acquire()
+            self._loop.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[QueueEntry]) -> None:
+        """Run a single batch, and resolve the futures of its callers"""
+        assert self._loop is not None
+        observations = [obs for (obs, _fut, _queued) in batch]
+        start_time = time.time()
+        self.queue_waits.extend(start_time - queued for (_o, _f, queued) in batch)
+        self.in_flight_batches += 1
+        try:
+            if self.is_async:
+                acts = await self.batch_fn(observations)  # type: ignore
+            else:
+                # Run the forward pass off of the event loop thread
+                acts = await self._loop.run_in_executor(
+                    None, self.batch_fn, observations
+                )
+        except Exception as e:
+            for (_obs, fut, _queued) in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self.in_flight_batches -= 1
+            if self.is_async and self._batch_slots is not None:
+                self._batch_slots.release()
+            self.last_completion_time = time.time()
+            self.batch_times.append(self.last_completion_time - start_time)
+        self.completed_requests += len(batch)
+        for (_obs, fut, _queued), act in zip(batch, acts):
+            if not fut.done():
+                fut.set_result(act)
+
+    def get_queue_depth(self) -> int:
+        """Return the number of requests waiting to be batched"""
+        if self._queue is None:
+            return 0
+        return self._queue.qsize()
+
+    def get_throughput(self) -> float:
+        """Return the completed requests per second since the first request"""
+        if self.first_request_time is None or self.last_completion_time is None:
+            return 0.0
+        elapsed = self.last_completion_time - self.first_request_time
+        if elapsed <= 0:
+            return 0.0
+        return self.completed_requests / elapsed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the current queue depth, timing, and batch size metrics"""
+        queue_waits = list(self.queue_waits)
+        batch_times = list(self.batch_times)
+        return {
+            "queue_depth": self.get_queue_depth(),
+            "in_flight_batches": self.in_flight_batches,
+            "total_requests": self.total_requests,
+            "completed_requests": self.completed_requests,
+            "throughput": self.get_throughput(),
+            "mean_queue_wait": sum(queue_waits) / max(len(queue_waits), 1),
+            "max_queue_wait": max(queue_waits, default=0.0),
+            "mean_batch_time": sum(batch_times) / max(len(batch_times), 1),
+            "total_batches": sum(self.batch_size_histogram.values()),
+            "batch_size_histogram": dict(self.batch_size_histogram),
+        }
+
+
+class ParlAIBatchedAgentWrapper(Agent):
+    """
+    Agent wrapper that holds the observation for a single caller and
+    executes the act through the shared ModelBatcher.
+    """
+
+    def __init__(self, batcher: ModelBatcher):
+        self.observed_act = Message({"text": "", "episode_done": True})
+        self.batcher = batcher
+
+    async def act(self) -> Message:
+        return await self.batcher.submit(self.observed_act)
+
+    def observe(self, observation: Message) -> None:
+        self.observed_act = observation
@@ -119,3 +119,15 @@ class ModelPool:
                 f"No models registered for requested name {model_name}"
             )
         return loader.get_model(overrides)
+
+    def get_model_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the runtime metrics (such as batching queue depth and
+        batch size histograms) for every registered model that reports them
+        """
+        model_stats = {}
+        for model_name, loader in self._model_loaders.items():
+            loader_stats = loader.get_stats()
+            if len(loader_stats) > 0:
+                model_stats[model_name] = loader_stats
+        return model_stats
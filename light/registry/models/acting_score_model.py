@@ -12,8 +12,43 @@ import types
 
 from light.registry.parlai_model import ParlAIModelConfig, ParlAIModelLoader
 
+from typing import List
+
 SCORE_INDS = [1000, 2000, 5000, 10000]
 
+# Observations with label candidates that also set this key are scored
+# inline, and additionally against the fixed candidates, in one request.
+# The fixed candidate scores are returned under FIXED_CAND_SCORES_KEY.
+INCLUDE_FIXED_CAND_SCORES_KEY = "include_fixed_cand_scores"
+FIXED_CAND_SCORES_KEY = "fixed_cand_scores"
+
+
+def set_candidate_source(model: Agent, source: str) -> None:
+    """Switch the acting score model between fixed and inline candidates"""
+    model.opt["candidates"] = source
+    model.candidates = source
+    model.opt["eval_candidates"] = source
+    model.eval_candidates = source
+
+
+def get_fixed_cand_scores(score_row) -> List[float]:
+    """Extract the scores at SCORE_INDS of a row of fixed candidate scores"""
+    list_scores = sorted(score_row.tolist())
+    list_scores.reverse()
+    return [list_scores[i] for i in SCORE_INDS]
+
+
+def as_fixed_cand_observation(observation: Message) -> Message:
+    """Strip the inline candidates from an observation to score it as fixed"""
+    fixed_observation = Message(
+        {
+            k: v
+            for k, v in observation.items()
+            if k not in ["label_candidates", "eval_labels"]
+        }
+    )
+    return fixed_observation
+
 
 @dataclass
 class ParlAIPolyencoderActingScoreModelConfig(ParlAIModelConfig):
@@ -46,7 +81,7 @@ class ParlAIPolyencoderActingScoreModelLoader(ParlAIModelLoader):
 
         def new_observe(model_self, message: Message):
             model_self._last_observe = message
-            old_observe(message)
+            return old_observe(message)
 
         model.observe = types.MethodType(new_observe, model)
         model._last_observe = Message({})
@@ -56,29 +91,77 @@ class ParlAIPolyencoderActingScoreModelLoader(ParlAIModelLoader):
         def new_act(model_self):
             if model_self._last_observe.get("label_candidates"):
                 # Evalling just one cand
-                model_self.opt["candidates"] = "inline"
-                model_self.candidates = "inline"
-                model_self.opt["eval_candidates"] = "inline"
-                model_self.eval_candidates = "inline"
+                set_candidate_source(model_self, "inline")
                 model_self.reset()
                 old_observe(model_self._last_observe)  # re-observe to vectorize
                 act = old_act()
                 scores = model_self.scores
                 act["scores"] = scores[0].tolist()
+                if model_self._last_observe.get(INCLUDE_FIXED_CAND_SCORES_KEY):
+                    # Fused request, also score the context on the fixed cands
+                    fixed_observation = as_fixed_cand_observation(
+                        model_self._last_observe
+                    )
+                    set_candidate_source(model_self, "fixed")
+                    model_self.reset()
+                    old_observe(fixed_observation)
+                    old_act()
+                    act[FIXED_CAND_SCORES_KEY] = get_fixed_cand_scores(
+                        model_self.scores[0]
+                    )
             else:
                 # Evalling against the base candidates
-                model_self.opt["candidates"] = "fixed"
-                model_self.candidates = "fixed"
-                model_self.opt["eval_candidates"] = "fixed"
-                model_self.eval_candidates = "fixed"
+                set_candidate_source(model_self, "fixed")
                 # model_self.reset()
                 act = old_act()
-                list_scores = sorted(model_self.scores[0].tolist())
-                list_scores.reverse()
-                scores = [list_scores[i] for i in SCORE_INDS]
-                act["scores"] = scores
+                act["scores"] = get_fixed_cand_scores(model_self.scores[0])
             return act
 
         model.act = types.MethodType(new_act, model)
 
         return model
+
+    def batch_act(
+        self, model: Agent, slots: List[Agent], observations: List[Message]
+    ) -> List[Message]:
+        """
+        Batch version of the patched act. Requests with label candidates
+        score inline, the rest score against the fixed candidates, so each
+        group runs as its own batch. Fused requests are part of both groups.
+        """
+        inline_group = [
+            i for i, obs in enumerate(observations) if obs.get("label_candidates")
+        ]
+        fixed_group = [
+            i
+            for i, obs in enumerate(observations)
+            if not obs.get("label_candidates") or obs.get(INCLUDE_FIXED_CAND_SCORES_KEY)
+        ]
+        acts: List[Message] = [Message({})] * len(observations)
+        if len(inline_group) > 0:
+            for agent in [model] + slots:
+                set_candidate_source(agent, "inline")
+            group_acts = super().batch_act(
+                model, slots, [observations[i] for i in inline_group]
+            )
+            scores = model.scores
+            for row, (i, act) in enumerate(zip(inline_group, group_acts)):
+                act["scores"] = scores[row].tolist()
+                acts[i] = act
+        if len(fixed_group) > 0:
+            for agent in [model] + slots:
+                set_candidate_source(agent, "fixed")
+            group_acts = super().batch_act(
+                model,
+                slots,
+                [as_fixed_cand_observation(observations[i]) for i in fixed_group],
+            )
+            scores = model.scores
+            for row, (i, act) in enumerate(zip(fixed_group, group_acts)):
+                fixed_scores = get_fixed_cand_scores(scores[row])
+                if observations[i].get("label_candidates"):
+                    acts[i][FIXED_CAND_SCORES_KEY] = fixed_scores
+                else:
+                    act["scores"] = fixed_scores
+                    acts[i] = act
+        return acts
@@ -31,8 +31,14 @@ from parlai.core.opt import Opt
 from parlai.core.params import ParlaiParser
 
 from light.registry.base_model_loader import ModelConfig, ModelLoader
+from light.registry.model_batcher import (
+    ModelBatcher,
+    ParlAIBatchedAgentWrapper,
+    DEFAULT_BATCH_WINDOW,
+)
 
 from typing import List, Any, Dict, Optional
+import json
 
 
 CONTEXT_FILL_COUNT = 200
@@ -63,6 +69,19 @@ class ParlAIModelConfig(ModelConfig):
         default_factory=dict,
         metadata={"help": ("Additional overrides for this model's opt")},
     )
+    max_batch_size: int = field(
+        default=1,
+        metadata={
+            "help": (
+                "Max number of concurrent act calls to group into a single "
+                "batch_act. 1 disables batching."
+            )
+        },
+    )
+    batch_window: float = field(
+        default=DEFAULT_BATCH_WINDOW,
+        metadata={"help": ("Seconds to wait for a batch to fill before running it")},
+    )
 
     def get(self, attr: str, default_val: Optional[Any] = None):
         """Wrapper to ensure interoperability with hydra DictConfig"""
@@ -83,6 +102,7 @@ class ParlAIModelLoader(ModelLoader):
     def __init__(self, config: DictConfig):
         self._shared = None
         self.config = config
+        self._batchers: Dict[str, ModelBatcher] = {}
 
     async def load_model(self) -> None:
         """Initialize the model from the given config"""
@@ -145,8 +165,8 @@ class ParlAIModelLoader(ModelLoader):
         """Do any post-initialization we need for this model"""
         return model
 
-    def get_model(self, overrides: Optional[Dict[str, Any]] = None) -> Agent:
-        """Get a copy of the model"""
+    def _create_model(self, overrides: Optional[Dict[str, Any]] = None) -> Agent:
+        """Create a new copy of the model from the shared params"""
         use_shared = self._shared
         if use_shared is not None:
             opt = deepcopy(use_shared["opt"])
@@ -155,3 +175,48 @@ class ParlAIModelLoader(ModelLoader):
             use_shared["opt"] = opt
         model = create_agent_from_shared(use_shared)
         return self.before_return_model(model)
+
+    def batch_act(
+        self, model: Agent, slots: List[Agent], observations: List[Message]
+    ) -> List[Message]:
+        """
+        Run a batch of independent observations through the model, using
+        the slot copies of the model to vectorize each observation.
+        """
+        batch_observations = []
+        for slot, observation in zip(slots, observations):
+            # Every request is independent, so clear any prior history
+            slot.reset()
+            batch_observations.append(slot.observe(observation))
+        return model.batch_act(batch_observations)
+
+    def _get_batcher(self, overrides: Optional[Dict[str, Any]] = None) -> ModelBatcher:
+        """Get the batcher for the given overrides, creating it if needed"""
+        batcher_key = json.dumps(overrides, sort_keys=True, default=str)
+        if batcher_key not in self._batchers:
+            max_batch_size = self.config.get("max_batch_size", 1)
+            model = self._create_model(overrides)
+            slots = [self._create_model(overrides) for _ in range(max_batch_size)]
+
+            def run_batch(observations: List[Message]) -> List[Message]:
+                return self.batch_act(model, slots, observations)
+
+            self._batchers[batcher_key] = ModelBatcher(
+                run_batch,
+                max_batch_size=max_batch_size,
+                batch_window=self.config.get("batch_window", DEFAULT_BATCH_WINDOW),
+            )
+        return self._batchers[batcher_key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return batching metrics for every batcher in use by this loader"""
+        return {key: batcher.get_stats() for key, batcher in self._batchers.items()}
+
+    def get_model(self, overrides: Optional[Dict[str, Any]] = None) -> Agent:
+        """
+        Get a copy of the model. If batching is enabled, this is a wrapper
+        that routes acts through a batcher shared by all copies.
+        """
+        if self.config.get("max_batch_size", 1) > 1:
+            return ParlAIBatchedAgentWrapper(self._get_batcher(overrides))
+        return self._create_model(overrides)
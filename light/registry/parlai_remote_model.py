@@ -5,6 +5,7 @@
 # LICENSE file in the root directory of this source tree.
 
 
+from collections import Counter, deque
 from dataclasses import dataclass, field
 from omegaconf import MISSING, DictConfig
 from copy import deepcopy
@@ -15,8 +16,10 @@ import aiohttp
 import asyncio
 import logging
 import json
+import time
 
 from light.registry.base_model_loader import ModelConfig, ModelLoader
+from light.registry.model_batcher import ModelBatcher
 
 from parlai.core.agents import Agent
 from parlai.core.message import Message
@@ -29,6 +32,12 @@ DEFAULT_SERVER = "http://localhost:40000"
 DEFAULT_SERVER_TIMEOUT = 600
 DEFAULT_RETRIES = 3
 DEFAULT_API_FAIL_TEXT = "MODEL RESPONSE FAILED"
+DEFAULT_MAX_BATCH_SIZE = 8
+DEFAULT_BATCH_WINDOW = 0.005
+DEFAULT_MAX_CONNECTIONS = 8
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+DEFAULT_REQUEST_DELAY = 0.5
+LATENCY_WINDOW = 1000
 
 
 def is_request_failed_response(resp) -> bool:
@@ -131,27 +140,195 @@ def server_is_alive(server: str) -> bool:
         return False
 
 
+def _get_percentile(sorted_vals: List[float], percentile: float) -> float:
+    idx = min(len(sorted_vals) - 1, int(len(sorted_vals) * percentile))
+    return sorted_vals[idx]
+
+
+class RemoteModelClient:
+    """
+    Long-lived connection to a remote model server, shared by every copy of
+    a remote model. Requests go over a pooled keep-alive session, a background
+    task keeps the server's liveness up to date, and latency and retries for
+    every request are tracked for `get_stats`.
+    """
+
+    def __init__(
+        self,
+        server: str,
+        retries: int = DEFAULT_RETRIES,
+        timeout: int = DEFAULT_SERVER_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+        request_delay: float = DEFAULT_REQUEST_DELAY,
+    ):
+        self.server = server
+        self.retries = retries
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.health_check_interval = health_check_interval
+        self.request_delay = request_delay
+        self.is_alive = False
+        self.last_health_check: Optional[float] = None
+        self.total_requests = 0
+        self.total_observations = 0
+        self.total_retries = 0
+        self.failed_requests = 0
+        self.retry_histogram: Counter = Counter()
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the session for the running loop, creating it if needed"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._session is None or self._session.closed:
+            # Like the ModelBatcher, the session is bound lazily to the
+            # caller's loop, as models are loaded and used in different loops.
+            self._loop = loop
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections, keepalive_timeout=60
+                ),
+            )
+            if self.health_check_interval > 0:
+                self._health_task = loop.create_task(self._run_health_checks())
+        return self._session
+
+    async def check_alive(
+        self, session: Optional[aiohttp.ClientSession] = None
+    ) -> bool:
+        """Check if the server is alive, and cache the result"""
+        if session is None:
+            session = self._get_session()
+        try:
+            async with session.post(
+                f"{self.server}/is_alive", json={"alive": True}
+            ) as resp:
+                is_alive = json.loads(await resp.text()).get("alive", False)
+        except Exception as e:
+            logging.warning(f"Error checking liveliness of {self.server}: {e}")
+            is_alive = False
+        self.is_alive = is_alive
+        self.last_health_check = time.time()
+        return is_alive
+
+    async def _run_health_checks(self) -> None:
+        """Periodically refresh the cached liveness of the server"""
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await self.check_alive()
+
+    async def request(self, observations: List[Message]) -> List[Message]:
+        """
+        Get acts for the given observations in a single request, retrying
+        with backoff on failure. Every act is replaced with a failure message
+        if the retries run out.
+        """
+        session = self._get_session()
+        if len(observations) == 1:
+            data: Dict[str, Any] = {"observation": observations[0]}
+        else:
+            data = {"observations": observations}
+        start_time = time.time()
+        request_delay = self.request_delay
+        num_failures = 0
+        acts = None
+        while self.retries < 0 or num_failures <= self.retries:
+            if num_failures > 0:
+                await asyncio.sleep(request_delay)
+                request_delay *= 2
+            try:
+                async with session.post(
+                    f"{self.server}/model_request", json=data
+                ) as resp:
+                    obj = json.loads(await resp.text())
+                if "error" in obj:
+                    logging.warning(f"Error from {self.server}: {obj['error']}")
+                elif "acts" in obj:
+                    acts = [Message(act) for act in obj["acts"]]
+                    break
+                else:
+                    acts = [Message(obj["act"])]
+                    break
+            except (
+                asyncio.TimeoutError,
+                aiohttp.ClientError,
+                json.decoder.JSONDecodeError,
+            ) as e:
+                logging.warning(f"Retrying a request to {self.server}: {e!r}")
+            num_failures += 1
+
+        # Every failed attempt but the last is followed by a retry
+        num_retries = num_failures if acts is not None else num_failures - 1
+        self.total_requests += 1
+        self.total_observations += len(observations)
+        self.total_retries += num_retries
+        self.retry_histogram[num_retries] += 1
+        self.latencies.append(time.time() - start_time)
+        if acts is None or len(acts) != len(observations):
+            logging.error(
+                f"Requests to {self.server} failed, returning failure message."
+            )
+            self.failed_requests += 1
+            return [Message({"text": DEFAULT_API_FAIL_TEXT}) for _ in observations]
+        self.is_alive = True
+        return acts
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the request metrics for this client"""
+        latencies = sorted(self.latencies)
+        latency_stats: Dict[str, float] = {}
+        if len(latencies) > 0:
+            latency_stats = {
+                "mean": sum(latencies) / len(latencies),
+                "p50": _get_percentile(latencies, 0.5),
+                "p95": _get_percentile(latencies, 0.95),
+                "max": latencies[-1],
+            }
+        return {
+            "server": self.server,
+            "is_alive": self.is_alive,
+            "last_health_check": self.last_health_check,
+            "total_requests": self.total_requests,
+            "total_observations": self.total_observations,
+            "total_retries": self.total_retries,
+            "failed_requests": self.failed_requests,
+            "retry_histogram": dict(self.retry_histogram),
+            "latency": latency_stats,
+        }
+
+    async def close(self) -> None:
+        """Stop the health checks and release the pooled connections"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
 class ParlAIRemoteAgentWrapper(Agent):
-    def __init__(self, opt: Opt):
-        """Agent wrapper that actually just executes things remotely"""
+    def __init__(self, opt: Opt, batcher: Optional[ModelBatcher] = None):
+        """
+        Agent wrapper that actually just executes things remotely, through
+        a batcher that coalesces concurrent acts into shared requests
+        """
         self.observed_act = Message({"text": "", "episode_done": True})
         self.server = opt["server"]
         self.retries = opt["retries"]
         self.timeout = opt["timeout"]
+        if batcher is None:
+            client = RemoteModelClient(
+                self.server, retries=self.retries, timeout=self.timeout
+            )
+            batcher = ModelBatcher(client.request, max_batch_size=1)
+        self.batcher = batcher
 
     async def act(self) -> Message:
-        resps = await async_request_many(
-            server=self.server,
-            acts=[self.observed_act],
-            timeout=self.timeout,
-            max_num_tries=self.retries,
-        )
-        resp = resps[0]
-        if is_request_failed_response(resp):
-            act = Message({"text": DEFAULT_API_FAIL_TEXT})
-        else:
-            act = Message(resp["act"])
-        return act
+        return await self.batcher.submit(self.observed_act)
 
     def observe(self, observation: Message) -> None:
         self.observed_act = observation
@@ -177,6 +354,34 @@ class ParlAIRemoteModelConfig(ModelConfig):
             "help": ("How long to wait for a response before considering a timeout")
         },
     )
+    max_batch_size: int = field(
+        default=DEFAULT_MAX_BATCH_SIZE,
+        metadata={
+            "help": (
+                "Most concurrent observations to send in one request. "
+                "Set to 1 to send every observation on its own."
+            )
+        },
+    )
+    batch_window: float = field(
+        default=DEFAULT_BATCH_WINDOW,
+        metadata={
+            "help": ("How long (in seconds) to wait to fill a request with acts.")
+        },
+    )
+    max_connections: int = field(
+        default=DEFAULT_MAX_CONNECTIONS,
+        metadata={"help": ("Most requests to have in flight to the server at once.")},
+    )
+    health_check_interval: float = field(
+        default=DEFAULT_HEALTH_CHECK_INTERVAL,
+        metadata={
+            "help": (
+                "How often (in seconds) to check the server is alive in the "
+                "background. Set to 0 to disable."
+            )
+        },
+    )
 
 
 class ParlAIRemoteModelLoader(ModelLoader):
@@ -193,7 +398,6 @@ class ParlAIRemoteModelLoader(ModelLoader):
         """Initialize the model from the given config"""
         config = self.config
         remote_host = config.get("host", DEFAULT_SERVER)
-        assert server_is_alive(remote_host), "Remote host failed alive check"
         self.remote_opt = Opt(
             {
                 "server": remote_host,
@@ -201,10 +405,34 @@ class ParlAIRemoteModelLoader(ModelLoader):
                 "timeout": config.get("timeout", DEFAULT_SERVER_TIMEOUT),
             }
         )
+        self.client = RemoteModelClient(
+            remote_host,
+            retries=self.remote_opt["retries"],
+            timeout=self.remote_opt["timeout"],
+            max_connections=config.get("max_connections", DEFAULT_MAX_CONNECTIONS),
+            health_check_interval=config.get(
+                "health_check_interval", DEFAULT_HEALTH_CHECK_INTERVAL
+            ),
+        )
+        # Loading often happens in a short-lived loop, so the pooled
+        # session is only created once the model is first used
+        async with aiohttp.ClientSession() as session:
+            is_alive = await self.client.check_alive(session)
+        assert is_alive, "Remote host failed alive check"
+        self.batcher = ModelBatcher(
+            self.client.request,
+            max_batch_size=config.get("max_batch_size", DEFAULT_MAX_BATCH_SIZE),
+            batch_window=config.get("batch_window", DEFAULT_BATCH_WINDOW),
+            max_concurrent_batches=self.client.max_connections,
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return request and batching metrics for the remote model"""
+        stats = self.client.get_stats()
+        stats["batching"] = self.batcher.get_stats()
+        return stats
 
     def get_model(self, overrides: Optional[Dict[str, Any]] = None) -> Agent:
-        """Get a copy of the model"""
-        assert server_is_alive(
-            self.remote_opt["server"]
-        ), "Remote host failed alive check"
-        return ParlAIRemoteAgentWrapper(self.remote_opt)
+        """Get a copy of the model, sharing the loader's connection"""
+        assert self.client.is_alive, "Remote host failed alive check"
+        return ParlAIRemoteAgentWrapper(self.remote_opt, self.batcher)
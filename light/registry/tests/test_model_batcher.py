@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+import asyncio
+
+from parlai.core.message import Message
+
+from light.registry.model_batcher import ModelBatcher, ParlAIBatchedAgentWrapper
+
+
+class TestModelBatcher(unittest.TestCase):
+    """Unit tests for grouping concurrent acts into batches"""
+
+    def setUp(self):
+        self.batches = []
+
+        def echo_batch(observations):
+            self.batches.append(len(observations))
+            return [Message({"text": obs["text"].upper()}) for obs in observations]
+
+        self.echo_batch = echo_batch
+
+    def test_concurrent_acts_are_batched(self):
+        """Concurrent acts should be grouped, with results routed back"""
+        batcher = ModelBatcher(self.echo_batch, max_batch_size=4, batch_window=0.05)
+
+        async def run_acts():
+            agents = [ParlAIBatchedAgentWrapper(batcher) for _ in range(6)]
+            for idx, agent in enumerate(agents):
+                agent.observe(Message({"text": f"hello {idx}", "episode_done": True}))
+            return await asyncio.gather(*[agent.act() for agent in agents])
+
+        acts = asyncio.run(run_acts())
+        self.assertEqual([a["text"] for a in acts], [f"HELLO {i}" for i in range(6)])
+        self.assertEqual(self.batches, [4, 2])
+        stats = batcher.get_stats()
+        self.assertEqual(stats["total_requests"], 6)
+        self.assertEqual(stats["total_batches"], 2)
+        self.assertEqual(stats["batch_size_histogram"], {4: 1, 2: 1})
+        self.assertEqual(stats["queue_depth"], 0)
+
+    def test_batch_errors_reach_callers(self):
+        """A failing batch should raise for every caller in it"""
+
+        def failing_batch(observations):
+            raise RuntimeError("model exploded")
+
+        batcher = ModelBatcher(failing_batch, max_batch_size=2, batch_window=0.01)
+
+        async def run_act():
+            agent = ParlAIBatchedAgentWrapper(batcher)
+            agent.observe(Message({"text": "hi", "episode_done": True}))
+            return await agent.act()
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run_act())
+
+    def test_batcher_survives_new_loop(self):
+        """Batchers are created in one loop and commonly used in another"""
+        batcher = ModelBatcher(self.echo_batch, max_batch_size=2, batch_window=0.01)
+        for text in ["first", "second"]:
+            agent = ParlAIBatchedAgentWrapper(batcher)
+            agent.observe(Message({"text": text, "episode_done": True}))
+            act = asyncio.run(agent.act())
+            self.assertEqual(act["text"], text.upper())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+import asyncio
+from aiohttp import web
+from omegaconf import OmegaConf
+
+from parlai.core.message import Message
+
+from light.registry.parlai_remote_model import (
+    DEFAULT_API_FAIL_TEXT,
+    ParlAIRemoteModelLoader,
+    RemoteModelClient,
+)
+
+
+class StubModelServer:
+    """Minimal model server that upper-cases observations"""
+
+    def __init__(self, num_failures: int = 0):
+        self.num_failures = num_failures
+        self.request_sizes = []
+        self.alive_checks = 0
+
+    async def model_request(self, request):
+        if self.num_failures > 0:
+            self.num_failures -= 1
+            return web.json_response({"error": "not ready"})
+        data = await request.json()
+        if "observations" in data:
+            self.request_sizes.append(len(data["observations"]))
+            acts = [{"text": obs["text"].upper()} for obs in data["observations"]]
+            return web.json_response({"acts": acts})
+        self.request_sizes.append(1)
+        return web.json_response({"act": {"text": data["observation"]["text"].upper()}})
+
+    async def is_alive(self, request):
+        self.alive_checks += 1
+        return web.json_response({"alive": True})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/model_request", self.model_request)
+        app.router.add_post("/is_alive", self.is_alive)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class TestParlAIRemoteModel(unittest.TestCase):
+    """Unit tests for pooled, coalesced requests to a remote model server"""
+
+    def test_concurrent_acts_share_requests(self):
+        """Concurrent acts should be sent together over the shared session"""
+        stub_server = StubModelServer()
+
+        async def run_acts():
+            host = await stub_server.start()
+            loader = ParlAIRemoteModelLoader(
+                OmegaConf.create(
+                    {"host": host, "max_batch_size": 4, "batch_window": 0.05}
+                )
+            )
+            await loader.load_model()
+            agents = [loader.get_model() for _ in range(6)]
+            for idx, agent in enumerate(agents):
+                agent.observe(Message({"text": f"hello {idx}", "episode_done": True}))
+            acts = await asyncio.gather(*[agent.act() for agent in agents])
+            await loader.client.close()
+            await stub_server.stop()
+            return loader, acts
+
+        loader, acts = asyncio.run(run_acts())
+        self.assertEqual([a["text"] for a in acts], [f"HELLO {i}" for i in range(6)])
+        self.assertEqual(stub_server.request_sizes, [4, 2])
+        # Fetching models should rely on the cached liveness check
+        self.assertEqual(stub_server.alive_checks, 1)
+        stats = loader.get_stats()
+        self.assertEqual(stats["total_requests"], 2)
+        self.assertEqual(stats["total_observations"], 6)
+        self.assertEqual(stats["retry_histogram"], {0: 2})
+        self.assertEqual(stats["batching"]["batch_size_histogram"], {4: 1, 2: 1})
+        self.assertIn("p95", stats["latency"])
+
+    def test_retries_are_tracked(self):
+        """Failed requests should be retried, then give up with a failure act"""
+        stub_server = StubModelServer(num_failures=2)
+
+        async def run_requests():
+            host = await stub_server.start()
+            client = RemoteModelClient(host, retries=2, request_delay=0.01)
+            observations = [Message({"text": "hi", "episode_done": True})]
+            retried = await client.request(observations)
+            stub_server.num_failures = 3
+            failed = await client.request(observations)
+            await client.close()
+            await stub_server.stop()
+            return client, retried, failed
+
+        client, retried, failed = asyncio.run(run_requests())
+        self.assertEqual(retried[0]["text"], "HI")
+        self.assertEqual(failed[0]["text"], DEFAULT_API_FAIL_TEXT)
+        stats = client.get_stats()
+        self.assertEqual(stats["total_retries"], 4)
+        self.assertEqual(stats["retry_histogram"], {2: 2})
+        self.assertEqual(stats["failed_requests"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,15 +6,20 @@
 
 import parlai.utils.logging as logging
 from parlai.core.message import Message
+from collections import OrderedDict
 import copy
-import threading
 import asyncio
 from light.registry.model_pool import ModelTypeName
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 if TYPE_CHECKING:
     from light.registry.model_pool import ModelPool
+    from light.graph.elements.graph_nodes import GraphAgent
+
+DEFAULT_PARSE_CACHE_SIZE = 2048
+
+ParseKey = Tuple[str, Tuple[str, ...]]
 
 args = {}
 args["help"] = 0
@@ -97,55 +102,130 @@ def get_input_cands(x, y2, y):
 
 
 class ActionParser:
-    def __init__(self, model_pool: "ModelPool"):
+    """
+    Uses the PARSER model to convert free-form text into a LIGHT action.
+
+    Parsing is fully async, such that concurrent parses from different players
+    can all reach the model together (and be batched by the model pool if the
+    parser model has batching enabled). Identical concurrent requests share a
+    single parse, and recent results are kept in a bounded LRU cache so that
+    repeated commands skip the model entirely.
+    """
+
+    def __init__(
+        self, model_pool: "ModelPool", cache_size: int = DEFAULT_PARSE_CACHE_SIZE
+    ):
         if model_pool.has_model(ModelTypeName.PARSER):
             self.agent = model_pool.get_model(ModelTypeName.PARSER)
         else:
             self.agent = None
-        # Lock to handle concurrency, fixed better with asycio
-        self.parse_lock = threading.Condition()
+        self.cache_size = cache_size
+        self._parse_cache: "OrderedDict[ParseKey, str]" = OrderedDict()
+        self._in_flight: Dict[ParseKey, asyncio.Future] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @staticmethod
+    def normalize(txt: str) -> str:
+        """Normalize text such that trivially different inputs share a parse"""
+        return " ".join(txt.lower().split())
+
+    def get_cache_key(self, txt: str, actor: Optional["GraphAgent"] = None) -> ParseKey:
+        """
+        Parses depend on the text and on what the actor could be referring to,
+        so key on the normalized text and the names of the actor's local nodes
+        """
+        if actor is None or not actor.get_room():
+            return (txt, tuple())
+        room = actor.get_room()
+        local_nodes = actor.get_contents() + room.get_contents() + [room]
+        local_names = [n.name for n in local_nodes]
+        local_names += [n.get_view_from(room) or n.name for n in room.get_neighbors()]
+        return (txt, tuple(sorted(set(local_names))))
+
+    def _cache_get(self, key: ParseKey) -> Optional[str]:
+        """Get the given key from the LRU cache, if present"""
+        result = self._parse_cache.get(key)
+        if result is not None:
+            self._parse_cache.move_to_end(key)
+        return result
+
+    def _cache_put(self, key: ParseKey, result: str) -> None:
+        """Store the result in the LRU cache, evicting the oldest if full"""
+        if self.cache_size <= 0:
+            return
+        self._parse_cache[key] = result
+        self._parse_cache.move_to_end(key)
+        while len(self._parse_cache) > self.cache_size:
+            self._parse_cache.popitem(last=False)
+
+    async def _query(self, txt: str, cands: List[str]) -> str:
+        """Select the best of the given candidates for the text"""
+        query = Message(
+            {
+                "id": "context",
+                "text": txt,
+                "label_candidates": cands,
+                "episode_done": True,
+            }
+        )
+        # observe and act are not separated by an await, so concurrent
+        # queries sharing this agent can't interleave their observations
+        self.agent.observe(query)
+        res = await self.agent.act()
+        return res["text"]
+
+    async def _model_parse(self, txt: str) -> str:
+        """Run the two stage verb and argument parse with the model"""
+        # Predict verb first.
+        verb = await self._query(txt, list(args.keys()))
+
+        # Given verb, predict the args (unless it's a no-arg action(.
+        if args[verb] > 0:
+            cands = list(get_input_cands(txt, verb, txt))
+            return await self._query(txt, cands)
+        return verb
+
+    async def _parse_and_cache(self, txt: str, key: ParseKey) -> str:
+        """Parse with the model, then cache the result for future requests"""
+        try:
+            result = await self._model_parse(txt)
+            self._cache_put(key, result)
+            return result
+        finally:
+            del self._in_flight[key]
 
     async def parse(self, txt, actor=None):
         if self.agent is None:
             # No model installed, return an empty string.
             return ""
 
-        with self.parse_lock:
-            # Predict verb first.
-            txt = txt.lower()
-            verbs = list(args.keys())
-            query = Message(
-                {
-                    "id": "context",
-                    "text": txt,
-                    "label_candidates": verbs,
-                    "episode_done": True,
-                }
-            )
-            self.agent.observe(query)
-            res = await self.agent.act()
-            verb = res["text"]
-
-        with self.parse_lock:
-            # Given verb, predict the args (unless it's a no-arg action(.
-            if args[verb] > 0:
-                cands = list(get_input_cands(txt, verb, txt))
-                query2 = Message(
-                    {
-                        "id": "context",
-                        "text": txt,
-                        "label_candidates": cands,
-                        "episode_done": True,
-                    }
-                )
-                self.agent.observe(query2)
-                res2 = await self.agent.act()
-                txt = res2["text"]
-            else:
-                txt = verb
-        txt = self.post_process(txt, actor)
+        txt = self.normalize(txt)
+        key = self.get_cache_key(txt, actor)
+        result = self._cache_get(key)
+        if result is not None:
+            self.cache_hits += 1
+            return self.post_process(result, actor)
+
+        self.cache_misses += 1
+        pending = self._in_flight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._parse_and_cache(txt, key))
+            self._in_flight[key] = pending
+        # Identical concurrent requests share the same parse, shielded such
+        # that one requester going away doesn't cancel it for the others
+        result = await asyncio.shield(pending)
+
+        return self.post_process(result, actor)
 
-        return txt
+    def get_stats(self) -> Dict[str, int]:
+        """Return cache and in-flight metrics for this parser"""
+        return {
+            "cache_size": len(self._parse_cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "in_flight": len(self._in_flight),
+        }
 
     def post_process(self, txt, actor=None):
         txt = txt.rstrip("\n").rstrip("\r")
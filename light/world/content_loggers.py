@@ -15,6 +15,7 @@ import time
 import uuid
 from light.data_model.db.episodes import DBGroupName, EpisodeLogType
 from light.graph.elements.graph_nodes import GraphAgent
+from light.graph.structured_graph import OOGraph, FRAGMENT_SNAPSHOT_FORMAT
 
 # TODO: Investigate changing the format from 3 line to csv or some other standard
 from light.graph.events.graph_events import (
@@ -33,7 +34,6 @@ from typing import Optional, List, Set, Dict, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from light.world.world import World
-    from light.graph.structured_graph import OOGraph
     from light.graph.events.base import GraphEvent
 
 
@@ -56,8 +56,12 @@ class InteractionLogger(abc.ABC):
             else DBGroupName.PRE_LAUNCH
         )
         # All loggers should have graph state history and a buffer for events
-        # State history is just the json of the graph the event executed on
+        # State history is a snapshot of the graph the event executed on, either
+        # the full json or a manifest of node fragments (see to_fragments_rv)
         self.state_history: List[str] = []
+        self.snapshot_mode = world.log_snapshot_mode
+        # Content-addressed node fragments shared by all snapshots in the history
+        self.fragments: Dict[str, str] = {}
         # Event buffer is (state_history_idx, event_hash, event_json, timestamp)
         # where state_history_idx is the index of the graph the event executed on
         self.event_buffer: List[Tuple[int, int, str, float]] = []
@@ -84,6 +88,18 @@ class InteractionLogger(abc.ABC):
         """
         raise NotImplementedError
 
+    def _snapshot_room(self, room_id: str) -> str:
+        """Snapshot the given room and its neighbors for the state history"""
+        if self.snapshot_mode != FRAGMENT_SNAPSHOT_FORMAT:
+            return self.graph.to_json_rv(room_id)
+        manifest, fragments = self.graph.to_fragments_rv(room_id)
+        self.fragments.update(fragments)
+        return manifest
+
+    def get_state_json(self, idx: int) -> str:
+        """Return the full graph json for an entry in the state history"""
+        return OOGraph.snapshot_to_json(self.state_history[idx], self.fragments)
+
     def _prep_graphs(self) -> List[Dict[str, str]]:
         """
         This method is responsible for preparing the graphs for this event logger
@@ -130,13 +146,15 @@ class InteractionLogger(abc.ABC):
             return  # not actually logging
         graphs = self._prep_graphs()
         events = self._prep_events(graphs, target_id)
-        self._last_episode_logged = self.world.episode_db.write_episode(
+        # Only enqueue here, the EpisodeDB writes the episode in the background
+        self._last_episode_logged = self.world.episode_db.enqueue_episode(
             graphs=graphs,
             events=events,
             log_type=episode_type,
             action_count=self.actions,
             players=self.players,
             group=self.group,
+            fragments=dict(self.fragments) if len(self.fragments) > 0 else None,
         )
 
 
@@ -173,13 +191,14 @@ class AgentInteractionLogger(InteractionLogger):
         """Clear the buffers storage for this logger, dumping context"""
         self.state_history.clear()
         self.event_buffer.clear()
+        self.fragments.clear()
         self.worth_logging = False
 
     def _add_current_graph_state(self) -> None:
         """Make a copy of the graph state so we can replay events on top of it"""
         try:
             self.state_history.append(
-                self.graph.to_json_rv(self.agent.get_room().node_id)
+                self._snapshot_room(self.agent.get_room().node_id)
             )
         except Exception as e:
             print(e)
@@ -286,12 +305,13 @@ class RoomInteractionLogger(InteractionLogger):
         """Clear the buffers storage for this logger"""
         self.state_history.clear()
         self.event_buffer.clear()
+        self.fragments.clear()
         self.worth_logging = False
 
     def _add_current_graph_state(self) -> None:
         """Make a copy of the graph state so we can replay events on top of it"""
         try:
-            self.state_history.append(self.graph.to_json_rv(self.room_id))
+            self.state_history.append(self._snapshot_room(self.room_id))
         except Exception as e:
             print(e)
             import traceback
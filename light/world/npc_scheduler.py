@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+World-level scheduler for the timesteps of model-driven NPC souls. Rather than
+every soul running its own main loop and reacting to each observed event as it
+arrives, souls ask the scheduler for a tick. Requests coalesce per soul, so all
+of the observations that arrived since its last tick are handled together, and
+the scheduler decides who goes next and how expensively:
+
+- NPCs closer to human players go first, while waiting souls age in priority
+  so that distant NPCs aren't starved.
+- At most max_model_ticks model-backed timesteps are in flight per world.
+- Under load, idle or distant NPCs take a cheaper heuristic timestep instead
+  of waiting for a model slot, within a per-round CPU time budget.
+"""
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from light.world.souls.model_soul import ModelSoul
+    from light.world.world import World
+
+# Seconds between scheduling rounds
+DEFAULT_ROUND_INTERVAL = 0.1
+# Room hops from the nearest player beyond which NPCs are considered distant
+DEFAULT_NEAR_DISTANCE = 1
+# Room hops searched outwards from players, further NPCs share the last bucket
+MAX_PLAYER_DISTANCE = 4
+# Seconds a waiting soul has to age before it overtakes one a room closer
+AGING_SECONDS_PER_HOP = 2.0
+# Seconds of heuristic timesteps to run inline per round
+DEFAULT_ROUND_CPU_BUDGET = 0.02
+
+
+class NPCScheduler:
+    """
+    Schedules the timesteps of registered model souls for one world. Souls
+    register on creation and request ticks when they have new observations,
+    and are also ticked every MAIN_LOOP_STEP_TIMEOUT seconds while idle.
+    """
+
+    def __init__(
+        self,
+        world: "World",
+        max_model_ticks: int,
+        round_interval: float = DEFAULT_ROUND_INTERVAL,
+        near_distance: int = DEFAULT_NEAR_DISTANCE,
+        round_cpu_budget: float = DEFAULT_ROUND_CPU_BUDGET,
+    ):
+        assert max_model_ticks > 0, "Must allow at least one model timestep"
+        self.world = world
+        self.max_model_ticks = max_model_ticks
+        self.round_interval = round_interval
+        self.near_distance = near_distance
+        self.round_cpu_budget = round_cpu_budget
+        self._souls: Dict[int, "ModelSoul"] = {}
+        self._next_periodic_tick: Dict[int, float] = {}
+        # Souls with new observations, and when they first asked for a tick
+        self._requested: Dict[int, float] = {}
+        self._in_flight: Dict[int, asyncio.Task] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self._stats = {
+            "model_ticks": 0,
+            "heuristic_ticks": 0,
+            "coalesced_requests": 0,
+            "deferred_ticks": 0,
+            "max_in_flight": 0,
+        }
+
+    # -------- Soul interface -------- #
+
+    def register(self, soul: "ModelSoul") -> None:
+        """Take over the periodic timesteps of the given soul"""
+        self._souls[id(soul)] = soul
+        self._next_periodic_tick[id(soul)] = time.time() + soul.MAIN_LOOP_STEP_TIMEOUT
+        self._ensure_running()
+
+    def unregister(self, soul: "ModelSoul") -> None:
+        """Stop scheduling the given soul, cancelling any running timestep"""
+        soul_id = id(soul)
+        self._souls.pop(soul_id, None)
+        self._next_periodic_tick.pop(soul_id, None)
+        self._requested.pop(soul_id, None)
+        task = self._in_flight.pop(soul_id, None)
+        # Souls reaped during their own timestep finish it themselves
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    def request_tick(self, soul: "ModelSoul") -> None:
+        """
+        Note that the soul has new observations to respond to. Requests made
+        before the soul's next tick are handled by that one tick.
+        """
+        soul_id = id(soul)
+        if soul_id not in self._souls:
+            return
+        if soul_id in self._requested or soul_id in self._in_flight:
+            self._stats["coalesced_requests"] += 1
+        self._requested.setdefault(soul_id, time.time())
+        self._ensure_running()
+
+    # -------- Scheduling -------- #
+
+    def _get_ready_souls(self, now: float) -> List[Tuple["ModelSoul", float, bool]]:
+        """Return (soul, waiting since, has observations) for souls due a tick"""
+        ready = []
+        for soul_id, soul in self._souls.items():
+            if soul_id in self._in_flight:
+                continue
+            if soul_id in self._requested:
+                ready.append((soul, self._requested[soul_id], True))
+            elif self._next_periodic_tick[soul_id] <= now:
+                # Periodic timesteps pause while the soul is away from players
+                if soul.is_dormant() or soul._should_go_dormant():
+                    soul.go_dormant()
+                    continue
+                ready.append((soul, self._next_periodic_tick[soul_id], False))
+        return ready
+
+    def _get_distance(self, soul: "ModelSoul", distances: Dict[str, int]) -> int:
+        room = soul.target_node.get_room()
+        if not room:
+            return MAX_PLAYER_DISTANCE + 1
+        return distances.get(room.node_id, MAX_PLAYER_DISTANCE + 1)
+
+    async def run_round(self) -> None:
+        """Dispatch the timesteps of all of the souls that are due one"""
+        now = time.time()
+        distances = self.world.get_player_distances(MAX_PLAYER_DISTANCE)
+        ready = [
+            (soul, self._get_distance(soul, distances), since, has_observations)
+            for soul, since, has_observations in self._get_ready_souls(now)
+        ]
+        # Closer souls go first, but waiting souls age towards the front
+        ready.sort(key=lambda r: r[1] * AGING_SECONDS_PER_HOP - (now - r[2]))
+        free_slots = self.max_model_ticks - len(self._in_flight)
+        budget_end = time.time() + self.round_cpu_budget
+        for soul, distance, _since, has_observations in ready:
+            if free_slots > 0:
+                free_slots -= 1
+                self._start_model_tick(soul)
+                continue
+            # Out of model slots, so degrade souls that don't need the model
+            is_near = distance <= self.near_distance
+            if (not has_observations or not is_near) and time.time() < budget_end:
+                self._clear_request(id(soul))
+                await self._run_tick(soul, heuristic=True)
+                continue
+            # Leave the request for a later round, gathering more observations
+            self._stats["deferred_ticks"] += 1
+
+    def _clear_request(self, soul_id: int) -> None:
+        self._requested.pop(soul_id, None)
+        soul = self._souls.get(soul_id)
+        if soul is not None:
+            self._next_periodic_tick[soul_id] = (
+                time.time() + soul.MAIN_LOOP_STEP_TIMEOUT
+            )
+
+    def _start_model_tick(self, soul: "ModelSoul") -> None:
+        soul_id = id(soul)
+        self._clear_request(soul_id)
+        task = asyncio.create_task(self._run_tick(soul, heuristic=False))
+        self._in_flight[soul_id] = task
+        self._stats["max_in_flight"] = max(
+            self._stats["max_in_flight"], len(self._in_flight)
+        )
+
+        def _on_done(done_task):
+            if self._in_flight.get(soul_id) is done_task:
+                del self._in_flight[soul_id]
+
+        task.add_done_callback(_on_done)
+
+    async def _run_tick(self, soul: "ModelSoul", heuristic: bool) -> None:
+        if soul.is_reaped:
+            return
+        try:
+            if heuristic:
+                self._stats["heuristic_ticks"] += 1
+                await soul._take_heuristic_timestep()
+            else:
+                self._stats["model_ticks"] += 1
+                await soul._take_timestep()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception(f"Unhandled model soul exception in {soul}, reaping")
+            await soul.reap()
+
+    async def wait_for_ticks(self) -> None:
+        """Wait for all of the model timesteps currently in flight"""
+        while len(self._in_flight) > 0:
+            await asyncio.gather(*self._in_flight.values(), return_exceptions=True)
+
+    # -------- Main loop -------- #
+
+    def _ensure_running(self) -> None:
+        """Start the scheduling loop, if there's an event loop to run it on"""
+        if self._loop_task is not None and not self._loop_task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No running loop, so rounds must be run manually with run_round
+            return
+        self._loop_task = asyncio.create_task(self._run_forever())
+
+    async def _run_forever(self) -> None:
+        while len(self._souls) > 0:
+            # Wait first, so requests arriving together share a round
+            await asyncio.sleep(self.round_interval)
+            await self.run_round()
+
+    def stop(self) -> None:
+        """Stop the scheduling loop and any running timesteps"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        for task in self._in_flight.values():
+            task.cancel()
+        self._in_flight = {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return counts of the scheduling decisions made so far"""
+        stats = dict(self._stats)
+        stats["registered"] = len(self._souls)
+        stats["in_flight"] = len(self._in_flight)
+        stats["waiting"] = len(self._requested)
+        return stats
@@ -6,7 +6,17 @@
 
 import random
 import threading
-from typing import TYPE_CHECKING, List, Dict, Tuple, Type, Callable, Any, Optional
+from typing import (
+    TYPE_CHECKING,
+    Iterable,
+    List,
+    Dict,
+    Tuple,
+    Type,
+    Callable,
+    Any,
+    Optional,
+)
 
 from light.world.souls.player_soul import PlayerSoul
 from light.world.souls.tutorial_player_soul import TutorialPlayerSoul
@@ -37,6 +47,7 @@ class Purgatory:
         """
         self.player_soul_id_to_soul = {}
         self.node_id_to_soul = {}
+        self.node_id_to_provider: Dict[str, str] = {}
         self.filler_soul_providers: Dict[str, SoulProvider] = {}
         self.world = world
         self.player_assign_condition = threading.Condition()
@@ -77,6 +88,7 @@ class Purgatory:
         soul_class, arg_provider = self.filler_soul_providers[wanted_provider]
         soul = soul_class(agent, self.world, *arg_provider())
         self.node_id_to_soul[agent.node_id] = soul
+        self.node_id_to_provider[agent.node_id] = wanted_provider
 
     async def send_event_to_soul(self, event: "GraphEvent", agent: "GraphAgent"):
         """
@@ -90,14 +102,57 @@ class Purgatory:
             return  # We shouldn't send an event to this soul, as it is reaped
         soul: "Soul" = self.node_id_to_soul.get(agent.node_id)
         if soul is not None:
+            soul.wake(fast_forward=False)
             soul.wrap_observe_event(event)
 
+    def wake_souls_in_rooms(self, room_ids: Iterable[str]) -> None:
+        """Wake the souls of agents in the given rooms, as players have come near"""
+        for room_id in room_ids:
+            room = self.world.oo_graph.rooms.get(room_id)
+            if room is None:
+                continue
+            for node in room.get_contents():
+                soul = self.node_id_to_soul.get(node.node_id)
+                if soul is not None:
+                    soul.wake()
+
     async def clear_soul(self, agent: "GraphAgent") -> None:
         """Clear the soul that is associated with the given agent"""
         soul = self.node_id_to_soul.get(agent.node_id)
         if soul is not None:
             del self.node_id_to_soul[agent.node_id]
+            self.node_id_to_provider.pop(agent.node_id, None)
+            was_player = agent.is_player
             await soul.reap()
+            if was_player:
+                self.world.update_interest()
+
+    def get_checkpoint(self) -> Dict[str, Any]:
+        """Return the soul assignments to save along with a world checkpoint"""
+        return {
+            "players": self.players,
+            "filler_souls": {
+                node_id: provider
+                for node_id, provider in self.node_id_to_provider.items()
+                if node_id in self.node_id_to_soul
+            },
+        }
+
+    def restore_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        """
+        Refill the filler souls recorded in a checkpoint from the registered
+        providers of the same name. Agents whose provider isn't registered, or
+        that have since died, are left empty.
+        """
+        self.players = max(self.players, checkpoint["players"])
+        for node_id, provider in checkpoint["filler_souls"].items():
+            agent = self.world.oo_graph.agents.get(node_id)
+            if agent is None or agent.get_prop("dead"):
+                continue
+            if provider not in self.filler_soul_providers:
+                continue
+            if self.node_id_to_soul.get(node_id) is None:
+                self.fill_soul(agent, provider)
 
     async def get_soul_for_player(
         self, player_provider, agent: Optional["GraphAgent"] = None
@@ -120,6 +175,7 @@ class Purgatory:
                 self.node_id_to_soul[target_agent.node_id] = soul
                 self.player_soul_id_to_soul[self.players] = soul
                 self.players += 1
+                self.world.update_interest()
                 return soul
         return None
 
@@ -144,4 +200,5 @@ class TutorialPurgatory(Purgatory):
             self.node_id_to_soul[ag.node_id] = soul
             self.player_soul_id_to_soul[self.players] = soul
             self.players += 1
+            self.world.update_interest()
             return soul
@@ -4,11 +4,16 @@
 
 import os
 import json
-import math
 import random
 import asyncio
 
+import numpy as np
+
 from light.graph.events.graph_events import SystemMessageEvent
+from light.graph.room_distance_index import UNREACHABLE, get_grid_distance
+
+# Penalty for picking agents in the actor's room, which make for too easy tasks
+SAME_ROOM_AGENT_PENALTY = 2
 
 
 class QuestLoader:
@@ -93,48 +98,61 @@ class QuestCreator:
         # satisfying the constraints to be the one that best matches the agent,
         # e.g. using a starspace model.
 
-        locs = list(graph.rooms)
-        viables = []
-        for i in range(0, 100):
-            loc = random.choice(locs)
-            loc = graph.rooms[loc]
-            viable_target = True
-            if (
-                loc is not None
-                and loc.container_node.get() == actor.container_node.get()
-            ):
-                viable_target = False
-            if viable_target:
-                viables.append(loc)
-        if len(viables) == 0:
-            # Failed.
+        # Any room other than the actor's own is viable
+        actor_room = actor.get_room()
+        return QuestCreator.pick_closest(
+            actor, graph, lambda loc: loc.room and loc != actor_room
+        )
+
+    def pick_closest(actor, graph, is_viable, same_room_penalty=0):
+        """
+        Return the viable node closest to the actor, out of the nodes in rooms
+        reachable from the actor's room, breaking ties randomly. Every room is
+        scored at once by its grid distance from the actor's room, with ties
+        going to the room fewer paths away, and then rooms are searched for
+        viable nodes from the best score down.
+        """
+        actor_room = actor.get_room()
+        if not actor_room:
             return None
-        else:
-            best_score = -1000
-            best = viables[0]
-            for v in viables:
-                score = QuestCreator.score_object(actor, v)
-                if score > best_score:
-                    best = v
-                    best_score = score
-            return best
+        index = graph.get_room_distance_index()
+        grid = index.get_grid_locations()
+        actor_idx = index.get_room_index(actor_room.node_id)
+        hops = index.get_hops_from(actor_room.node_id)
+        scores = -np.linalg.norm(grid - grid[actor_idx], axis=1)
+        scores[hops == 0] -= same_room_penalty
+        reachable = np.flatnonzero(hops < UNREACHABLE)
+        room_ids = index.get_room_ids()
+        best_nodes = []
+        best_key = None
+        for room_idx in reachable[np.lexsort((hops[reachable], -scores[reachable]))]:
+            key = (scores[room_idx], hops[room_idx])
+            if best_key is not None and key != best_key:
+                break
+            room = graph.rooms[room_ids[room_idx]]
+            to_check = [room]
+            while len(to_check) > 0:
+                node = to_check.pop()
+                to_check += node.get_contents()
+                if is_viable(node):
+                    best_nodes.append(node)
+                    best_key = key
+        if len(best_nodes) == 0:
+            return None
+        return random.choice(best_nodes)
 
     def distance(agent, node):
         if node.container_node.get().name == "VOID":
             return 1000000
         agent_loc = agent.get_room().grid_location
         target_loc = node.get_room().grid_location
-        dist = 0
-        for i in range(0, 3):
-            dist += math.pow(target_loc[i] - agent_loc[i], 2)
-        dist = math.sqrt(dist)
-        return dist
+        return get_grid_distance(agent_loc, target_loc)
 
     def score_agent(actor, agent):
         score = -QuestCreator.distance(actor, agent)
         if abs(score) < 0.0001:
             # Don't want a too easy task that's in the same room usually.
-            score -= 2
+            score -= SAME_ROOM_AGENT_PENALTY
         return score
 
     def score_object(actor, obj):
@@ -147,42 +165,22 @@ class QuestCreator:
 
         if verb == "steal":
             return obj.container_node.get()
-        viable_agents = []
-
-        pers = list(graph.agents)
-        for i in range(0, 100):
-            per = random.choice(pers)
-            per = graph.agents[per]
-            viable_target = True
-            # needs to not be actor themself
-            if actor == per:
-                viable_target = False
-            if not per.agent:
-                viable_target = False
-            if viable_target:
-                viable_agents.append(per)
-        if len(viable_agents) == 0:
-            # Failed.
-            return None
-        else:
-            best_score = -1000
-            best_agent = viable_agents[0]
-            for a in viable_agents:
-                score = QuestCreator.score_agent(actor, a)
-                if score > best_score:
-                    best_agent = a
-                    best_score = score
-            return best_agent
+        # needs to not be actor themself
+        return QuestCreator.pick_closest(
+            actor,
+            graph,
+            lambda per: per.agent and per != actor,
+            same_room_penalty=SAME_ROOM_AGENT_PENALTY,
+        )
 
     def pick_object(actor, graph, verb, arg, other_obj=None, new_loc=None):
         # TODO: we could update this later to select from the set of objects
         # satisfying the constraints to be the one that best matches the agent,
         # e.g. using a starspace model.
-        objs = list(graph.objects)
-        viable_objs = []
-        for i in range(0, 100):
-            obj = random.choice(objs)
-            obj = graph.objects[obj]
+
+        def is_viable(obj):
+            if not obj.object:
+                return False
             viable_target = True
             # needs to be gettable unless it's a container
             if arg != "CONTAINER" and not obj.gettable:
@@ -212,20 +210,9 @@ class QuestCreator:
                     # Goal already achieved.
                     viable_target = False
 
-            if viable_target:
-                viable_objs.append(obj)
-        if len(viable_objs) == 0:
-            # Failed.
-            return None
-        else:
-            best_score = -1000
-            best_obj = viable_objs[0]
-            for o in viable_objs:
-                score = QuestCreator.score_object(actor, o)
-                if score > best_score:
-                    best_obj = o
-                    best_score = score
-            return best_obj
+            return viable_target
+
+        return QuestCreator.pick_closest(actor, graph, is_viable)
 
     async def rank_quests(quests, quest_scorer_model):
         context = "character: " + quests[0]["actor_name"] + "\n"
@@ -274,6 +261,7 @@ class QuestCreator:
 
         # Add quest to actor's list of quests.
         actor.quests.append(quest)
+        actor.mark_dirty()
         return quest
 
     def create_random_quest(actor, graph):
@@ -6,18 +6,27 @@
 
 import asyncio
 from light.world.souls.soul import Soul
+from collections import OrderedDict, deque
 from copy import deepcopy
+import hashlib
 import os
 import asyncio
-from typing import TYPE_CHECKING, Any, Optional
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
 from light.graph.events.graph_events import SystemMessageEvent
 from light.registry.model_pool import ModelTypeName
+from light.registry.models.acting_score_model import (
+    INCLUDE_FIXED_CAND_SCORES_KEY,
+    FIXED_CAND_SCORES_KEY,
+)
 
 if TYPE_CHECKING:
     from light.graph.elements.graph_nodes import GraphAgent
     from light.world.world import World
     from light.graph.events.base import GraphEvent
 
+# Number of recent contexts to keep fixed candidate scores for
+FIXED_CAND_SCORE_CACHE_SIZE = 16
+
 
 class BaseSoul(Soul):
     """
@@ -40,6 +49,7 @@ class BaseSoul(Soul):
             )
         else:
             self.roleplaying_score_model = None
+        self._fixed_cand_score_cache: "OrderedDict[str, List[float]]" = OrderedDict()
 
     def get_last_interaction_partner(self, node=None) -> Optional["GraphAgent"]:
         if node == None:
@@ -147,7 +157,9 @@ class BaseSoul(Soul):
             agent = self.target_node
 
         agent._last_interaction_partner_id = None
-        agent._last_interaction_history = []
+        agent._last_interaction_history = deque(
+            maxlen=self.world.max_interaction_history
+        )
 
     def dialogue_switch_partner(self, agent1, agent2):
         """
@@ -241,10 +253,32 @@ class BaseSoul(Soul):
             return True
         return False
 
+    @staticmethod
+    def _get_context_hash(context: str) -> str:
+        """Key for caching the fixed candidate scores of a context"""
+        return hashlib.sha1(context.encode("utf-8")).hexdigest()
+
+    def _get_cached_fixed_cand_scores(self, context: str) -> Optional[List[float]]:
+        """Return the cached fixed candidate scores for this context, if any"""
+        context_hash = self._get_context_hash(context)
+        scores = self._fixed_cand_score_cache.get(context_hash)
+        if scores is not None:
+            self._fixed_cand_score_cache.move_to_end(context_hash)
+        return scores
+
+    def _cache_fixed_cand_scores(self, context: str, scores: List[float]) -> None:
+        """Store the fixed candidate scores for this context"""
+        self._fixed_cand_score_cache[self._get_context_hash(context)] = scores
+        while len(self._fixed_cand_score_cache) > FIXED_CAND_SCORE_CACHE_SIZE:
+            self._fixed_cand_score_cache.popitem(last=False)
+
     async def get_fixed_cand_scores(self, context):
         """
         Returns the candidates at self.SAMPLE_INDS
         """
+        scores = self._get_cached_fixed_cand_scores(context)
+        if scores is not None:
+            return scores
         act = {
             "text": context,
             "id": "persona",
@@ -252,7 +286,14 @@ class BaseSoul(Soul):
         }
         self.roleplaying_score_model.observe(act)
         score_act = await self.roleplaying_score_model.act()
-        return score_act["scores"]
+        scores = score_act["scores"]
+        self._cache_fixed_cand_scores(context, scores)
+        return scores
+
+    @staticmethod
+    def _get_human_points(human_score: float, scores: List[float]) -> int:
+        """Points are awarded on the ranking against the fixed candidates"""
+        return len([x for x in scores if x < human_score])
 
     async def get_pos_human_msg(self, human_msg, context, scores):
         """
@@ -269,7 +310,38 @@ class BaseSoul(Soul):
         score_act = await self.roleplaying_score_model.act()
 
         human_score = float(score_act["scores"][0])
-        human_points = len([x for x in scores if x < human_score])
+        human_points = self._get_human_points(human_score, scores)
+        return human_points, human_score
+
+    async def score_human_msg(self, human_msg, context) -> Tuple[int, float]:
+        """
+        Score the human message against the fixed candidates for this context
+        in a single model request. The fixed candidate scores are requested
+        alongside the human message score only when they aren't cached.
+        """
+        scores = self._get_cached_fixed_cand_scores(context)
+        act = {
+            "text": context,
+            "id": "persona",
+            "episode_done": False,
+            "label_candidates": [human_msg],
+            "eval_labels": [human_msg],
+        }
+        if scores is None:
+            act[INCLUDE_FIXED_CAND_SCORES_KEY] = True
+        self.roleplaying_score_model.observe(act)
+        score_act = await self.roleplaying_score_model.act()
+
+        if scores is None:
+            if FIXED_CAND_SCORES_KEY in score_act:
+                scores = score_act[FIXED_CAND_SCORES_KEY]
+                self._cache_fixed_cand_scores(context, scores)
+            else:
+                # Model doesn't support fused scoring, fall back to a second call
+                scores = await self.get_fixed_cand_scores(context)
+
+        human_score = float(score_act["scores"][0])
+        human_points = self._get_human_points(human_score, scores)
         return human_points, human_score
 
     async def score_conversation(self):
@@ -289,11 +361,8 @@ class BaseSoul(Soul):
         # check for n-gram match with context
         if self.too_much_string_overlap(context, human_msg):
             return 0
-        fixed_cand_scores = await self.get_fixed_cand_scores(context)
         # We award points on the score ranking, not the raw model score
-        final_score, _model_score = await self.get_pos_human_msg(
-            human_msg, context, fixed_cand_scores
-        )
+        final_score, _model_score = await self.score_human_msg(human_msg, context)
         return final_score
 
     async def role_playing_score_events(self, event):
@@ -7,7 +7,8 @@
 from light.world.souls.base_soul import BaseSoul
 import os
 import asyncio
-from typing import TYPE_CHECKING, Any
+import time
+from typing import TYPE_CHECKING, Any, Optional
 from concurrent.futures import CancelledError
 
 if TYPE_CHECKING:
@@ -35,8 +36,15 @@ class ModelSoul(BaseSoul):
         super().__init__(target_node, world)
         self._init_with_models(self.model_pool)
         self._main_loop = None
+        # When this soul went dormant, if it's away from any players
+        self._dormant_since: Optional[float] = None
+        self._wake_event: Optional[asyncio.Event] = None
+        self._woken_by_event = False
         if self.HAS_MAIN_LOOP:
-            self._run_timesteps()
+            if self.world.npc_scheduler is not None:
+                self.world.npc_scheduler.register(self)
+            else:
+                self._run_timesteps()
 
     def _init_with_models(self, model_pool: "ModelPool") -> None:
         """
@@ -53,6 +61,66 @@ class ModelSoul(BaseSoul):
         """
         pass
 
+    async def _take_heuristic_timestep(self) -> None:
+        """
+        Cheaper version of _take_timestep that doesn't query models, which
+        the world's NPC scheduler may run instead when it's under load.
+        """
+        pass
+
+    def _fast_forward_timesteps(self, num_timesteps: int) -> None:
+        """
+        Cheaply catch up on the periodic timesteps skipped while dormant, such
+        as by wandering. Called as the soul wakes because players came near.
+        """
+        pass
+
+    def is_dormant(self) -> bool:
+        """Return whether this soul's periodic timesteps are suspended"""
+        return self._dormant_since is not None
+
+    def _should_go_dormant(self) -> bool:
+        """
+        Return whether this soul's periodic timesteps should be suspended, as
+        it's away from any players. A soul woken by an event always gets one
+        timestep to follow up on it first.
+        """
+        if self._woken_by_event:
+            self._woken_by_event = False
+            return False
+        return not self.world.is_room_of_interest(self.target_node.get_room())
+
+    def go_dormant(self) -> None:
+        """Suspend periodic timesteps until this soul is woken"""
+        if self._dormant_since is None:
+            self._dormant_since = time.time()
+
+    def wake(self, fast_forward: bool = True) -> None:
+        """
+        Resume the periodic timesteps of a dormant soul, fast forwarding the
+        ones it skipped unless it's being woken to observe an event where it is
+        """
+        if not fast_forward:
+            self._woken_by_event = True
+        if self._dormant_since is None:
+            return
+        skipped = int((time.time() - self._dormant_since) / self.MAIN_LOOP_STEP_TIMEOUT)
+        self._dormant_since = None
+        if fast_forward and skipped > 0 and not self.is_reaped:
+            self._fast_forward_timesteps(skipped)
+        if self._wake_event is not None:
+            self._wake_event.set()
+
+    async def _request_timestep(self) -> None:
+        """
+        Respond to new observations with a timestep. With an NPC scheduler, this
+        only requests a timestep, which handles all of the pending observations.
+        """
+        if self.world.npc_scheduler is not None:
+            self.world.npc_scheduler.request_tick(self)
+        else:
+            await self._take_timestep()
+
     def _run_timesteps(self) -> None:
         """
         Call _take_timestep every MAIN_LOOP_STEP_TIMEOUT period
@@ -61,6 +129,12 @@ class ModelSoul(BaseSoul):
         async def _run_main_logic_forever():
             try:
                 while not self.is_reaped:
+                    if self._should_go_dormant():
+                        self._wake_event = asyncio.Event()
+                        self.go_dormant()
+                        await self._wake_event.wait()
+                        self._wake_event = None
+                        continue
                     await self._take_timestep()
                     await asyncio.sleep(self.MAIN_LOOP_STEP_TIMEOUT)
             except CancelledError:
@@ -82,3 +156,5 @@ class ModelSoul(BaseSoul):
         await super().reap()
         if self._main_loop is not None:
             self._main_loop.cancel()
+        if self.world.npc_scheduler is not None:
+            self.world.npc_scheduler.unregister(self)
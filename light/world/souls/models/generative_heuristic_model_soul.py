@@ -8,6 +8,7 @@ import time
 import random
 import asyncio
 from collections import deque
+from light.graph.utils import BoundedHistory
 from light.world.souls.on_event_soul import OnEventSoul
 from light.graph.events.base import ErrorEvent
 from light.graph.events.graph_events import TellEvent, SayEvent
@@ -94,7 +95,7 @@ class GenerativeHeuristicModelSoul(OnEventSoul):
 
         # The model may choose to do something in response to this action,
         # so don't wait for the timeout.
-        await self._take_timestep()
+        await self._request_timestep()
 
     def _get_random_time_offset(self):
         """
@@ -122,7 +123,7 @@ class GenerativeHeuristicModelSoul(OnEventSoul):
 
     def ensure_agent_has_utterance_history(self, agent):
         if not hasattr(agent, "_utterance_history"):
-            agent._utterance_history = []
+            agent._utterance_history = BoundedHistory(self.world.max_utterance_history)
 
     def dialogue_pick_non_repeating_response(self, act, partner):
         """
@@ -381,3 +382,21 @@ class GenerativeHeuristicModelSoul(OnEventSoul):
         # Possibly act according to the transformer model
         if not acted:
             await self.npc_action()
+
+    async def _take_heuristic_timestep(self) -> None:
+        """
+        Respond to pending observations with heuristics alone, then take any
+        heuristic actions, without querying the models
+        """
+        if self.target_node._dying or self.get_last_turn_too_recent():
+            return
+        agent = self.target_node
+        agent.get_text()  # Clear the buffer, we use _pending_observations
+        curr_obs = self._pending_observations
+        self._pending_observations = []
+        for obs in curr_obs:
+            if isinstance(obs, SayEvent) or (
+                isinstance(obs, TellEvent) and obs.target_nodes[0] == agent
+            ):
+                self.tell_goal_heuristics(obs)
+        super().timestep_actions()
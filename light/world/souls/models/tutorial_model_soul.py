@@ -7,6 +7,7 @@
 import time
 import random
 from collections import deque
+from light.graph.utils import BoundedHistory
 from light.world.souls.on_event_soul import OnEventSoul
 from light.graph.events.base import ErrorEvent
 from light.graph.events.graph_events import (
@@ -169,7 +170,7 @@ class TutorialModelSoul(OnEventSoul):
 
     def ensure_agent_has_utterance_history(self, agent):
         if not hasattr(agent, "_utterance_history"):
-            agent._utterance_history = []
+            agent._utterance_history = BoundedHistory(self.world.max_utterance_history)
 
     def dialogue_pick_non_repeating_response(self, act, partner):
         """
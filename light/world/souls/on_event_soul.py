@@ -15,11 +15,11 @@ from light.graph.events.graph_events import (
 )
 from light.world.souls.soul import Soul
 from light.world.souls.model_soul import ModelSoul
+from light.graph.room_distance_index import get_grid_distance
 from light.world.quest_loader import QuestCreator
 from typing import TYPE_CHECKING
 
 import copy
-import math
 import random
 
 if TYPE_CHECKING:
@@ -27,6 +27,9 @@ if TYPE_CHECKING:
     from light.world.world import World
     from light.graph.events.base import GraphEvent
 
+# Most skipped timesteps to replay on waking, longer walks are just as random
+MAX_FAST_FORWARD_TIMESTEPS = 1000
+
 
 class OnEventSoul(ModelSoul):
     """
@@ -251,6 +254,12 @@ class OnEventSoul(ModelSoul):
                             agent.quests[0]["helper_agents"].append(other_agent.node_id)
                             q_copy = copy.copy(agent.quests[0])
                             other_agent.quests.append(q_copy)
+                            # Helpers share the quest's helper list, so all changed
+                            agent.mark_dirty()
+                            for helper_id in agent.quests[0]["helper_agents"]:
+                                helper = self.world.oo_graph.get_node(helper_id)
+                                if helper is not None:
+                                    helper.mark_dirty()
                             say_text = agent.quests[0]["text"]
                             self.execute_event(["TellEvent", other_agent, say_text])
                     return True
@@ -264,7 +273,7 @@ class OnEventSoul(ModelSoul):
 
     def resolve_object_string(self, agent, object_str):
         for id, obj in agent.contained_nodes.items():
-            obj = obj._target_node
+            obj = obj.get()
             if object_str in obj.name:
                 return obj
         return None
@@ -357,16 +366,51 @@ class OnEventSoul(ModelSoul):
         # Check if it's too far from agent's starting room
         if not hasattr(agent, "start_loc"):
             agent.start_loc = agent.get_room().grid_location
-        target_loc = room.grid_location
-        dist = 0
-        for i in range(0, 3):
-            dist += math.pow(target_loc[i] - agent.start_loc[i], 2)
-        dist = math.sqrt(dist)
+        dist = get_grid_distance(room.grid_location, agent.start_loc)
         if dist < agent.max_distance_from_start_location:
             return False
         else:
             return True
 
+    def _fast_forward_timesteps(self, num_timesteps: int) -> None:
+        """
+        Replay the random movement of skipped timesteps as a walk straight to
+        where the agent would have wandered, without executing go events that
+        nobody was around to see. The walk avoids rooms with players in them,
+        as the agent would have been seen arriving.
+        """
+        agent = self.target_node
+        if agent._dying or self.get_last_interaction_partner(agent) is not None:
+            return
+        if hasattr(agent, "aggression_target"):
+            return
+        num_moves = sum(
+            random.randint(0, 300) < agent.speed
+            for _ in range(min(num_timesteps, MAX_FAST_FORWARD_TIMESTEPS))
+        )
+        start_room = room = agent.get_room()
+        if room is None:
+            return
+        for _ in range(num_moves):
+            next_rooms = [
+                edge.get()
+                for edge in room.neighbors.values()
+                if not edge.path_is_locked()
+            ]
+            next_rooms = [
+                r
+                for r in next_rooms
+                if not self.is_too_far(agent, r)
+                and not any(getattr(n, "is_player", False) for n in r.get_contents())
+            ]
+            if len(next_rooms) == 0:
+                break
+            room = random.choice(next_rooms)
+        if room is not start_room:
+            agent.move_to(room)
+            self.world.bump_room_version(start_room)
+            self.world.bump_room_version(room)
+
     def aggressive_towards(self, other_agent):
         agro_tags = self.target_node.attack_tagged_agents
         target_tags = other_agent.tags
@@ -390,6 +434,11 @@ class OnEventSoul(ModelSoul):
             return
         self.timestep_actions()
 
+    async def _take_heuristic_timestep(self) -> None:
+        if self.target_node._dying:
+            return
+        self.timestep_actions()
+
     def timestep_actions(self):
         """
         Attempt to take some actions based on any observations in the pending list
@@ -81,6 +81,13 @@ class Soul(ABC):
         """
         pass
 
+    def wake(self, fast_forward: bool = True) -> None:
+        """
+        Resume a soul that was suspended for being away from any players. Souls
+        that are never suspended can ignore this.
+        """
+        pass
+
     async def reap(self):
         """
         Free resources associated with this Soul, and ensure any pending futures
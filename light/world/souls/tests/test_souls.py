@@ -14,6 +14,11 @@ from light.world.world import World, WorldConfig
 from light.graph.events.graph_events import EmoteEvent, SayEvent
 from light.world.souls.mock_soul import MockSoul
 from light.world.souls.repeat_soul import RepeatSoul
+from light.world.souls.base_soul import BaseSoul
+from light.registry.models.acting_score_model import (
+    INCLUDE_FIXED_CAND_SCORES_KEY,
+    FIXED_CAND_SCORES_KEY,
+)
 
 
 def async_test(f):
@@ -130,5 +135,74 @@ class MockSouls(unittest.TestCase):
         )
 
 
+class StubScoringModel:
+    """Scoring model stub that records every request it gets"""
+
+    def __init__(self):
+        self.requests = []
+
+    def observe(self, observation):
+        self.observation = observation
+
+    async def act(self):
+        self.requests.append(self.observation)
+        act = {"scores": [2.5]}
+        if not self.observation.get("label_candidates"):
+            act["scores"] = [4.0, 3.0, 2.0, 1.0]
+        elif self.observation.get(INCLUDE_FIXED_CAND_SCORES_KEY):
+            act[FIXED_CAND_SCORES_KEY] = [4.0, 3.0, 2.0, 1.0]
+        return act
+
+
+class ScoringSoul(BaseSoul):
+    """Minimal BaseSoul for testing the roleplaying score helpers"""
+
+    async def observe_event(self, event):
+        pass
+
+
+class TestRolePlayingScore(unittest.TestCase):
+    """Unit tests for the roleplaying score caching in BaseSoul"""
+
+    def setUp(self):
+        test_graph = OOGraph()
+        self.agent_node = test_graph.add_agent("My test agent", {})
+        room_node = test_graph.add_room("test room", {})
+        self.agent_node.force_move_to(room_node)
+        self.test_world = World(WorldConfig(), True)
+        self.test_world.oo_graph = test_graph
+        self.soul = ScoringSoul(self.agent_node, self.test_world)
+        self.score_model = StubScoringModel()
+        self.soul.roleplaying_score_model = self.score_model
+
+    def test_score_uses_one_call_then_cache(self):
+        """Scoring should be one fused call, and reuse cached fixed scores"""
+        context = "_setting_name test room\n_self_name test agent"
+        points, score = asyncio.run(
+            self.soul.score_human_msg("a long enough human message here", context)
+        )
+        self.assertEqual((points, score), (2, 2.5))
+        self.assertEqual(len(self.score_model.requests), 1)
+        self.assertTrue(self.score_model.requests[0].get(INCLUDE_FIXED_CAND_SCORES_KEY))
+
+        # Same context should only need to score the new message
+        points, score = asyncio.run(
+            self.soul.score_human_msg("another long enough message here", context)
+        )
+        self.assertEqual((points, score), (2, 2.5))
+        self.assertEqual(len(self.score_model.requests), 2)
+        self.assertFalse(
+            self.score_model.requests[1].get(INCLUDE_FIXED_CAND_SCORES_KEY)
+        )
+
+        # Fixed scores for an unchanged context need no model call
+        asyncio.run(self.soul.get_fixed_cand_scores(context))
+        self.assertEqual(len(self.score_model.requests), 2)
+
+        # A new context needs new fixed candidate scores
+        asyncio.run(self.soul.score_human_msg("yet another message", context + "!"))
+        self.assertTrue(self.score_model.requests[2].get(INCLUDE_FIXED_CAND_SCORES_KEY))
+
+
 if __name__ == "__main__":
     unittest.main()
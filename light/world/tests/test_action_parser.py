@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+import asyncio
+
+from parlai.core.message import Message
+
+from light.graph.structured_graph import OOGraph
+from light.registry.model_pool import ModelPool
+from light.world.action_parser import ActionParser
+
+
+class StubParserAgent:
+    """Parser agent that always picks `get`, then the last candidate"""
+
+    def __init__(self):
+        self.acts = 0
+        self.observed = None
+
+    def observe(self, observation):
+        self.observed = observation
+
+    async def act(self):
+        observed = self.observed
+        self.acts += 1
+        await asyncio.sleep(0.01)
+        cands = observed["label_candidates"]
+        if "get" in cands:
+            return Message({"text": "get"})
+        return Message({"text": sorted(cands)[-1]})
+
+
+class TestActionParser(unittest.TestCase):
+    """Unit tests for the parse caching and coalescing in the ActionParser"""
+
+    def setUp(self):
+        self.graph = OOGraph()
+        self.room = self.graph.add_room("test room", {})
+        self.agent = self.graph.add_agent("tester", {})
+        self.sword = self.graph.add_object("sword", {})
+        self.agent.force_move_to(self.room)
+        self.sword.force_move_to(self.room)
+        self.parser = ActionParser(ModelPool())
+        self.stub_agent = StubParserAgent()
+        self.parser.agent = self.stub_agent
+
+    def test_no_model_parse(self):
+        """Without a parser model, parsing should produce nothing"""
+        parser = ActionParser(ModelPool())
+        self.assertEqual(asyncio.run(parser.parse("grab sword", self.agent)), "")
+
+    def test_repeat_parse_is_cached(self):
+        """Repeated commands in the same context shouldn't hit the model"""
+        first = asyncio.run(self.parser.parse("grab  the Sword", self.agent))
+        self.assertEqual(self.stub_agent.acts, 2)
+        second = asyncio.run(self.parser.parse("grab the sword", self.agent))
+        self.assertEqual(first, second)
+        self.assertEqual(self.stub_agent.acts, 2)
+        self.assertEqual(self.parser.get_stats()["cache_hits"], 1)
+
+        # Changing what's nearby should invalidate the cached parse
+        shield = self.graph.add_object("shield", {})
+        shield.force_move_to(self.room)
+        asyncio.run(self.parser.parse("grab the sword", self.agent))
+        self.assertEqual(self.stub_agent.acts, 4)
+
+    def test_concurrent_parses_coalesce(self):
+        """Identical in-flight parses should share the same model calls"""
+
+        async def parse_many():
+            return await asyncio.gather(
+                *[self.parser.parse("grab the sword", self.agent) for _ in range(5)]
+            )
+
+        results = asyncio.run(parse_many())
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(self.stub_agent.acts, 2)
+        self.assertEqual(self.parser.get_stats()["in_flight"], 0)
+
+    def test_cache_is_bounded(self):
+        """The cache should evict the least recently used parses"""
+        self.parser.cache_size = 2
+        for txt in ["grab sword", "grab the sword", "take sword"]:
+            asyncio.run(self.parser.parse(txt, self.agent))
+        self.assertEqual(self.parser.get_stats()["cache_size"], 2)
+        asyncio.run(self.parser.parse("grab sword", self.agent))
+        self.assertEqual(self.stub_agent.acts, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
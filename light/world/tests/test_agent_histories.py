@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+import asyncio
+
+from light.graph.elements.graph_nodes import GraphAgent
+from light.graph.structured_graph import OOGraph
+from light.graph.utils import BoundedHistory
+from light.world.souls.on_event_soul import OnEventSoul
+from light.world.world import World, WorldConfig
+
+
+class TestAgentHistories(unittest.TestCase):
+    """Ensure the histories kept for long running agents stay bounded"""
+
+    def setUp(self):
+        self.graph = OOGraph()
+        self.room = self.graph.add_room("room", {})
+        self.agent = self.graph.add_agent("agent", {})
+        self.agent.force_move_to(self.room)
+
+    def test_bounded_history(self):
+        history = BoundedHistory(3, ["a", "b"])
+        history.append("a")
+        self.assertEqual(list(history), ["a", "b", "a"])
+        history.append("c")
+        self.assertEqual(list(history), ["b", "a", "c"])
+        self.assertIn("a", history)
+        history.append("d")
+        self.assertNotIn("b", history)
+        history.append("e")
+        self.assertNotIn("a", history)
+        self.assertEqual(len(history), 3)
+        self.assertEqual(history[-1], "e")
+
+        copied = history.copy()
+        copied.append("f")
+        self.assertNotIn("f", history)
+        history.clear()
+        self.assertEqual(len(history), 0)
+        self.assertNotIn("e", history)
+        self.assertIn("e", copied)
+
+    def test_agent_buffers(self):
+        for i in range(GraphAgent.MAX_OBSERVATIONS + 10):
+            self.agent.observe_action(f"text {i} ")
+        self.assertEqual(len(self.agent._observations), GraphAgent.MAX_OBSERVATIONS)
+        text = self.agent.get_text(clear_actions=False)
+        self.assertTrue(text.endswith(f"text {GraphAgent.MAX_OBSERVATIONS + 9} "))
+        self.assertFalse(text.startswith("text 0 "))
+        observations = self.agent.get_observations()
+        self.assertEqual(len(observations), GraphAgent.MAX_OBSERVATIONS)
+        self.assertEqual(
+            observations[-1]["txt"], f"text {GraphAgent.MAX_OBSERVATIONS + 9} "
+        )
+        self.assertEqual(self.agent.get_observations(), [])
+        self.assertEqual(self.agent.get_text(), "")
+
+    def test_forks_copy_histories(self):
+        self.agent._utterance_history = BoundedHistory(5, ["hello"])
+        self.agent.observe_action("hello ")
+        fork = self.graph.fork()
+        fork_agent = fork.get_node(self.agent.node_id)
+        fork_agent._utterance_history.append("goodbye")
+        fork_agent.observe_action("goodbye ")
+        self.assertNotIn("goodbye", self.agent._utterance_history)
+        self.assertIn("goodbye", fork_agent._utterance_history)
+        self.assertEqual(len(self.agent._observations), 1)
+        self.assertEqual(len(fork_agent._observations), 2)
+        self.assertEqual(fork_agent._observations.maxlen, GraphAgent.MAX_OBSERVATIONS)
+
+    def test_soul_histories_sized_by_config(self):
+        world = World(WorldConfig(max_interaction_history=3))
+        world.oo_graph = self.graph
+        world.purgatory.register_filler_soul_provider("npc", OnEventSoul, lambda: [])
+
+        async def fill_and_reap():
+            world.purgatory.fill_soul(self.agent, "npc")
+            await world.purgatory.node_id_to_soul[self.agent.node_id].reap()
+
+        asyncio.run(fill_and_reap())
+        self.assertEqual(self.agent._last_interaction_history.maxlen, 3)
+
+    def test_memory_report(self):
+        world = World(WorldConfig())
+        world.oo_graph = self.graph
+        report = world.get_memory_report()
+        self.assertEqual(
+            set(report.keys()),
+            {"graph", "agent_histories", "logger_buffers", "souls", "total"},
+        )
+        self.assertGreater(report["graph"], 0)
+        self.assertEqual(report["souls"], 0)
+        self.assertEqual(
+            report["total"], sum(v for k, v in report.items() if k != "total")
+        )
+
+        for i in range(100):
+            self.agent.observe_action("a long observation " * 10)
+        logger = self.graph.room_id_to_loggers[self.room.node_id]
+        logger.event_buffer.append((0, 0, "an event" * 100, 0.0))
+        new_report = world.get_memory_report()
+        self.assertGreater(new_report["agent_histories"], report["agent_histories"])
+        self.assertGreater(new_report["logger_buffers"], report["logger_buffers"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -88,7 +88,7 @@ class TestInteractionLoggers(unittest.TestCase):
         self.assertEqual(len(logger.state_history), 1, "Had extra in buffer")
         self.assertEqual(len(logger.event_buffer), 0, "Had extra in buffer")
         self.assertEqual(
-            logger.state_history[-1], test_graph.to_json_rv(logger.room_id)
+            logger.get_state_json(-1), test_graph.to_json_rv(logger.room_id)
         )
 
     def test_begin_meta_episode_agent_logger(self):
@@ -112,7 +112,7 @@ class TestInteractionLoggers(unittest.TestCase):
         self.assertEqual(len(logger.event_buffer), 0)
         self.assertEqual(len(logger.state_history), 1)
         self.assertEqual(
-            logger.state_history[-1],
+            logger.get_state_json(-1),
             test_graph.to_json_rv(agent_node.get_room().node_id),
         )
 
@@ -161,7 +161,7 @@ class TestInteractionLoggers(unittest.TestCase):
         self.assertEqual(len(logger.event_buffer), 0)
         self.assertEqual(len(logger.state_history), 1)
         self.assertEqual(
-            logger.state_history[-1], test_graph.to_json_rv(logger.room_id)
+            logger.get_state_json(-1), test_graph.to_json_rv(logger.room_id)
         )
         self.assertEqual(logger.num_players_present, 1)
 
@@ -170,7 +170,7 @@ class TestInteractionLoggers(unittest.TestCase):
         self.assertEqual(len(logger.event_buffer), 0)
         self.assertEqual(len(logger.state_history), 1)
         self.assertEqual(
-            logger.state_history[-1], test_graph.to_json_rv(logger.room_id)
+            logger.get_state_json(-1), test_graph.to_json_rv(logger.room_id)
         )
         self.assertEqual(logger.num_players_present, 2)
 
@@ -303,6 +303,44 @@ class TestInteractionLoggers(unittest.TestCase):
         self.assertFalse(logger._is_player_afk())
         self.assertEqual(len(logger.event_buffer), 1)
 
+    def test_fragment_snapshots_share_unchanged_nodes(self):
+        """
+        Test that repeated snapshots only store fragments for changed nodes,
+        and still expand to the full room json
+        """
+        initial = self.setUp_single_room_graph()
+        test_graph, test_world, agent_node, room_node = initial
+        room_node2 = test_graph.add_room("test room2", {})
+        test_graph.add_paths_between(
+            room_node, room_node2, "a path to the north", "a path to the south"
+        )
+        test_world.oo_graph = test_graph  # refresh logger
+        logger = AgentInteractionLogger(test_world, agent_node)
+
+        logger._begin_meta_episode()
+        num_fragments = len(logger.fragments)
+        self.assertEqual(num_fragments, 3)
+        logger._add_current_graph_state()
+        self.assertEqual(len(logger.fragments), num_fragments)
+
+        test_object = test_graph.add_object("test object", {})
+        test_object.force_move_to(room_node)
+        logger._add_current_graph_state()
+        self.assertEqual(
+            logger.get_state_json(-1), test_graph.to_json_rv(room_node.node_id)
+        )
+        # New object, and the room with new contents
+        self.assertEqual(len(logger.fragments), num_fragments + 2)
+
+        full_mode_world = World(
+            WorldConfig(is_logging=True, log_snapshot_mode="full"), True
+        )
+        full_mode_world.oo_graph = test_graph
+        full_logger = AgentInteractionLogger(full_mode_world, agent_node)
+        full_logger._begin_meta_episode()
+        self.assertEqual(full_logger.state_history[-1], logger.get_state_json(-1))
+        self.assertEqual(len(full_logger.fragments), 0)
+
 
 if __name__ == "__main__":
     unittest.main()
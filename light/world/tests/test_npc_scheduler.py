@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+import asyncio
+
+from light.graph.structured_graph import OOGraph
+from light.world.souls.model_soul import ModelSoul
+from light.world.world import World, WorldConfig
+
+
+class CountingSoul(ModelSoul):
+    """Soul that counts the timesteps it's given, and how many observations"""
+
+    HAS_MAIN_LOOP = True
+    MAIN_LOOP_STEP_TIMEOUT = 1000
+
+    def _init_with_models(self, model_pool) -> None:
+        self.pending = 0
+        self.model_steps = []
+        self.heuristic_steps = []
+
+    async def observe_event(self, event):
+        self.pending += 1
+        await self._request_timestep()
+
+    async def _take_timestep(self) -> None:
+        self.model_steps.append(self.pending)
+        self.pending = 0
+        await asyncio.sleep(0.01)
+
+    async def _take_heuristic_timestep(self) -> None:
+        self.heuristic_steps.append(self.pending)
+        self.pending = 0
+
+
+class TestNPCScheduler(unittest.TestCase):
+    """Ensure model NPC timesteps are coalesced, capped, and prioritized"""
+
+    def setUp(self):
+        graph = OOGraph()
+        # A line of rooms, with the player at one end
+        self.rooms = [graph.add_room(f"room {i}", {}) for i in range(4)]
+        for room, next_room in zip(self.rooms, self.rooms[1:]):
+            graph.add_paths_between(room, next_room, "a path", "a path")
+        player = graph.add_agent("player", {}, is_player=True)
+        player.force_move_to(self.rooms[0])
+        self.world = World(WorldConfig(max_npc_model_ticks=2))
+        self.world.oo_graph = graph
+        self.scheduler = self.world.npc_scheduler
+
+    def add_soul(self, room_idx):
+        agent = self.world.oo_graph.add_agent(f"npc {room_idx}", {})
+        agent.force_move_to(self.rooms[room_idx])
+        return CountingSoul(agent, self.world)
+
+    def observe(self, soul, times=1):
+        for _ in range(times):
+            asyncio.run(soul.observe_event(None))
+
+    def run_round(self):
+        async def _run():
+            await self.scheduler.run_round()
+            await self.scheduler.wait_for_ticks()
+
+        asyncio.run(_run())
+
+    def test_coalesce_observations(self):
+        """Observations before a soul's timestep are handled together"""
+        soul = self.add_soul(0)
+        self.observe(soul, times=3)
+        self.assertEqual(soul.model_steps, [])
+        self.run_round()
+        self.assertEqual(soul.model_steps, [3])
+        self.assertEqual(self.scheduler.get_stats()["coalesced_requests"], 2)
+        # Idle souls aren't stepped until their periodic timestep is due
+        self.run_round()
+        self.assertEqual(soul.model_steps, [3])
+
+    def test_priority_and_degrading(self):
+        """Closer souls get the model, and distant ones fall back to heuristics"""
+        far_soul = self.add_soul(3)
+        near_souls = [self.add_soul(0), self.add_soul(1), self.add_soul(0)]
+        for soul in [far_soul] + near_souls:
+            self.observe(soul)
+        self.run_round()
+        stats = self.scheduler.get_stats()
+        self.assertEqual(stats["max_in_flight"], 2)
+        self.assertEqual(near_souls[0].model_steps, [1])
+        self.assertEqual(near_souls[2].model_steps, [1])
+        # The distant soul degraded, while the near one waits for the model
+        self.assertEqual(far_soul.heuristic_steps, [1])
+        self.assertEqual(near_souls[1].model_steps, [])
+        self.assertEqual(stats["deferred_ticks"], 1)
+
+        self.observe(near_souls[1])
+        self.run_round()
+        self.assertEqual(near_souls[1].model_steps, [2])
+
+    def test_reaped_souls_unregistered(self):
+        soul = self.add_soul(0)
+        self.observe(soul)
+        asyncio.run(soul.reap())
+        self.run_round()
+        self.assertEqual(soul.model_steps, [])
+        self.assertEqual(self.scheduler.get_stats()["registered"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+from light.graph.structured_graph import OOGraph
+from light.graph.events.graph_events import GetObjectEvent
+from light.world.world import World, WorldConfig
+
+
+class TestPossibleEvents(unittest.TestCase):
+    """Unit tests for the cached valid events of World.get_possible_events"""
+
+    def setUp(self):
+        graph = OOGraph()
+        self.room = graph.add_room("test room", {})
+        self.other_room = graph.add_room("other room", {})
+        graph.add_paths_between(self.room, self.other_room, "a door", "a door")
+        self.agent = graph.add_agent("tester", {})
+        self.sword = graph.add_object("sword", {})
+        self.agent.force_move_to(self.room)
+        self.sword.force_move_to(self.room)
+        self.world = World(WorldConfig(), True)
+        self.world.oo_graph = graph
+        self.uncached_world = World(WorldConfig(), True)
+        self.uncached_world.oo_graph = graph
+
+    def assert_matches_uncached(self):
+        """The cached actions should match a fresh computation"""
+        self.uncached_world._possible_events_cache = {}
+        self.assertListEqual(
+            sorted(self.world.get_possible_actions(self.agent.node_id)),
+            sorted(self.uncached_world.get_possible_actions(self.agent.node_id)),
+        )
+
+    def test_cache_hits_return_fresh_events(self):
+        """Repeated calls should reuse the cached events as new copies"""
+        events = self.world.get_possible_events(self.agent.node_id, ["get"])
+        self.assertEqual(len(events), 1)
+        again = self.world.get_possible_events(self.agent.node_id, ["get"])
+        self.assertEqual(len(again), 1)
+        self.assertIsNot(events[0], again[0])
+        self.assertNotEqual(events[0].event_id, again[0].event_id)
+        self.assertEqual(events[0].to_canonical_form(), again[0].to_canonical_form())
+        self.assertIn("get sword", self.world.get_possible_actions(self.agent.node_id))
+
+    def test_execute_invalidates(self):
+        """Executing an event in the room should update the valid actions"""
+        actions = self.world.get_possible_actions(self.agent.node_id)
+        self.assertIn("get sword", actions)
+        self.assertNotIn("drop sword", actions)
+
+        get_event = self.world.get_possible_events(self.agent.node_id, ["get"])[0]
+        self.assertIsInstance(get_event, GetObjectEvent)
+        get_event.execute(self.world)
+
+        actions = self.world.get_possible_actions(self.agent.node_id)
+        self.assertNotIn("get sword", actions)
+        self.assertIn("drop sword", actions)
+        self.assert_matches_uncached()
+
+    def test_direct_moves_invalidate(self):
+        """Moving nodes outside of events should still update valid actions"""
+        self.world.get_possible_actions(self.agent.node_id)
+        shield = self.world.oo_graph.add_object("shield", {})
+        shield.force_move_to(self.room)
+        self.assertIn("get shield", self.world.get_possible_actions(self.agent.node_id))
+        self.assert_matches_uncached()
+
+        self.agent.force_move_to(self.other_room)
+        self.assertNotIn(
+            "get shield", self.world.get_possible_actions(self.agent.node_id)
+        )
+        self.assert_matches_uncached()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+
+from light.graph.structured_graph import OOGraph
+from light.world.quest_loader import QuestCreator
+
+
+class TestQuestCreator(unittest.TestCase):
+    """Ensure quest targets are the closest reachable candidates"""
+
+    def setUp(self):
+        self.graph = OOGraph()
+        self.rooms = [
+            self.graph.add_room(f"room {i}", {"grid_location": [i, 0, 0]})
+            for i in range(4)
+        ]
+        # Rooms 0-2 are connected, room 3 is closer on the grid than 2 but cut off
+        self.rooms[3].grid_location = [0, 1, 0]
+        for i in range(2):
+            self.graph.add_paths_between(
+                self.rooms[i], self.rooms[i + 1], f"to {i + 1}", f"to {i}"
+            )
+        self.actor = self.graph.add_agent("actor", {})
+        self.actor.force_move_to(self.rooms[0])
+
+    def add_object(self, name, room_idx=None):
+        obj = self.graph.add_object(name, {"gettable": True})
+        if room_idx is not None:
+            obj.force_move_to(self.rooms[room_idx])
+        return obj
+
+    def test_pick_object(self):
+        self.add_object("far ball", 2)
+        near_ball = self.add_object("near ball", 1)
+        self.add_object("cut off ball", 3)
+        self.add_object("lost ball")
+        picked = QuestCreator.pick_object(self.actor, self.graph, "obtain", "OBJECT")
+        self.assertIs(picked, near_ball)
+
+    def test_pick_agent(self):
+        neighbor = self.graph.add_agent("neighbor", {})
+        neighbor.force_move_to(self.rooms[0])
+        far_agent = self.graph.add_agent("far agent", {})
+        far_agent.force_move_to(self.rooms[1])
+        picked = QuestCreator.pick_agent(self.actor, self.graph, "hug", "AGENT")
+        # Agents in the same room make for too easy quests
+        self.assertIs(picked, far_agent)
+        far_agent.force_move_to(self.rooms[3])
+        picked = QuestCreator.pick_agent(self.actor, self.graph, "hug", "AGENT")
+        self.assertIs(picked, neighbor)
+
+    def test_pick_location(self):
+        picked = QuestCreator.pick_location(self.actor, self.graph, "drop", "LOCATION")
+        self.assertIs(picked, self.rooms[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
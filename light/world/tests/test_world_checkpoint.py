@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+import asyncio
+import os
+import shutil
+import tempfile
+
+from light.graph.structured_graph import OOGraph
+from light.world.souls.mock_soul import MockSoul
+from light.world.world import World, WorldConfig
+
+
+class TestWorldCheckpoint(unittest.TestCase):
+    """Ensure worlds can be saved to and restored from binary checkpoints"""
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.data_dir, "world.ckpt")
+        graph = OOGraph()
+        self.room = graph.add_room("test room", {})
+        self.other_room = graph.add_room("other room", {})
+        graph.add_paths_between(self.room, self.other_room, "a door", "a door")
+        self.agent = graph.add_agent("tester", {})
+        self.npc = graph.add_agent("guard", {})
+        self.victim = graph.add_agent("victim", {})
+        self.sword = graph.add_object("sword", {"wieldable": True})
+        for node in [self.agent, self.npc, self.victim, self.sword]:
+            node.force_move_to(self.room)
+        self.world = World(WorldConfig())
+        self.world.oo_graph = graph
+        self.world.purgatory.register_filler_soul_provider("mock", MockSoul, list)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def get_new_world(self):
+        world = World(WorldConfig())
+        world.purgatory.register_filler_soul_provider("mock", MockSoul, list)
+        return world
+
+    def reap_souls(self, world):
+        for soul in world.purgatory.node_id_to_soul.values():
+            asyncio.run(soul.reap())
+
+    def test_save_and_load(self):
+        """Restored worlds should match the live state that was saved"""
+        world = self.world
+        self.sword.move_to(self.agent)
+        self.npc.move_to(self.other_room)
+        world.purgatory.fill_soul(self.npc, "mock")
+        world.purgatory.fill_soul(self.victim, "mock")
+        p_id = world.spawn_player()
+        self.assertNotEqual(p_id, -1)
+        dead_node = world.oo_graph.agent_die(self.victim)
+        world.save_graph(self.fname)
+
+        restored = self.get_new_world()
+        restored.load_graph(self.fname)
+        self.assertEqual(restored.oo_graph.to_json(), world.oo_graph.to_json())
+        self.assertEqual(restored.oo_graph.cnt, world.oo_graph.cnt)
+        self.assertEqual(list(restored.oo_graph.dead_nodes), [dead_node.node_id])
+        self.assertEqual(
+            restored.playerid_to_agentid(p_id), world.playerid_to_agentid(p_id)
+        )
+        self.assertEqual(restored._player_cnt, world._player_cnt)
+
+        # Only the living filler souls come back
+        souls = restored.purgatory.node_id_to_soul
+        self.assertEqual(list(souls.keys()), [self.npc.node_id])
+        self.assertIsInstance(souls[self.npc.node_id], MockSoul)
+        self.assertIs(
+            souls[self.npc.node_id].target_node,
+            restored.oo_graph.agents[self.npc.node_id],
+        )
+        # New nodes shouldn't reuse ids from before the restore
+        new_node = restored.oo_graph.add_object("shield", {})
+        self.assertNotIn(new_node.node_id, world.oo_graph.all_nodes)
+        self.reap_souls(world)
+        self.reap_souls(restored)
+
+    def test_periodic_checkpoints(self):
+        """Background checkpoints should keep up with changes to the world"""
+
+        async def run_checkpoints():
+            task = self.world.start_periodic_checkpoints(self.fname, 0.01)
+            await asyncio.sleep(0.05)
+            self.sword.move_to(self.agent)
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+        asyncio.run(run_checkpoints())
+        restored = self.get_new_world()
+        restored.load_graph(self.fname)
+        sword = restored.oo_graph.get_node(self.sword.node_id)
+        self.assertEqual(sword.get_container().node_id, self.agent.node_id)
+        self.assertEqual(os.listdir(self.data_dir), ["world.ckpt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
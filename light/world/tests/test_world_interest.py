@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import unittest
+import asyncio
+import time
+
+from light.graph.structured_graph import OOGraph
+from light.world.souls.model_soul import ModelSoul
+from light.world.souls.on_event_soul import OnEventSoul
+from light.world.world import World, WorldConfig
+
+
+class SleepySoul(ModelSoul):
+    """Soul that counts its timesteps, and the ones it fast forwards"""
+
+    HAS_MAIN_LOOP = True
+    MAIN_LOOP_STEP_TIMEOUT = 0.01
+
+    def _init_with_models(self, model_pool) -> None:
+        self.timesteps = 0
+        self.fast_forwarded = []
+
+    async def observe_event(self, event):
+        pass
+
+    async def _take_timestep(self) -> None:
+        self.timesteps += 1
+
+    def _fast_forward_timesteps(self, num_timesteps: int) -> None:
+        self.fast_forwarded.append(num_timesteps)
+
+
+class TestWorldInterest(unittest.TestCase):
+    """Ensure NPCs away from players go dormant, and wake as they come near"""
+
+    def setUp(self):
+        graph = OOGraph()
+        # A line of rooms, with the player at one end
+        self.rooms = [graph.add_room(f"room {i}", {}) for i in range(4)]
+        for room, next_room in zip(self.rooms, self.rooms[1:]):
+            graph.add_paths_between(
+                room, next_room, f"path to {next_room.name}", f"path to {room.name}"
+            )
+        self.player = graph.add_agent("player", {}, is_player=True)
+        self.player.force_move_to(self.rooms[0])
+        self.world = World(WorldConfig(npc_interest_radius=1))
+        self.world.oo_graph = graph
+        self.world.purgatory.register_filler_soul_provider(
+            "sleepy", SleepySoul, lambda: []
+        )
+        self.world.purgatory.register_filler_soul_provider(
+            "on_event", OnEventSoul, lambda: []
+        )
+
+    def add_npc(self, room_idx, provider="sleepy", props=None):
+        agent = self.world.oo_graph.add_agent(f"npc {room_idx}", props or {})
+        agent.force_move_to(self.rooms[room_idx])
+        self.world.purgatory.fill_soul(agent, provider)
+        return self.world.purgatory.node_id_to_soul[agent.node_id]
+
+    async def move_player(self, *room_idxs):
+        for room_idx in room_idxs:
+            executed, _ = await self.world.parse_exec(
+                self.player.node_id, f"go path to room {room_idx}"
+            )
+            self.assertTrue(executed)
+
+    def test_rooms_of_interest(self):
+        interesting = [self.world.is_room_of_interest(r) for r in self.rooms]
+        self.assertEqual(interesting, [True, True, False, False])
+        asyncio.run(self.move_player(1))
+        interesting = [self.world.is_room_of_interest(r) for r in self.rooms]
+        self.assertEqual(interesting, [True, True, True, False])
+
+        world = World(WorldConfig())
+        world.oo_graph = self.world.oo_graph
+        self.assertTrue(all(world.is_room_of_interest(r) for r in self.rooms))
+
+    def test_dormant_souls_wake(self):
+        async def _run():
+            near_soul = self.add_npc(1)
+            far_soul = self.add_npc(3)
+            await asyncio.sleep(0.1)
+            self.assertGreater(near_soul.timesteps, 1)
+            self.assertEqual(far_soul.timesteps, 0)
+            self.assertTrue(far_soul.is_dormant())
+
+            # Events wake souls for one timestep, without fast forwarding
+            await self.world.purgatory.send_event_to_soul(None, far_soul.target_node)
+            await asyncio.sleep(0.05)
+            self.assertEqual(far_soul.timesteps, 1)
+            self.assertEqual(far_soul.fast_forwarded, [])
+            self.assertTrue(far_soul.is_dormant())
+
+            # Players coming near wake souls, fast forwarding skipped timesteps
+            await self.move_player(1, 2)
+            self.assertFalse(far_soul.is_dormant())
+            self.assertEqual(len(far_soul.fast_forwarded), 1)
+            self.assertGreater(far_soul.fast_forwarded[0], 0)
+            await asyncio.sleep(0.05)
+            self.assertGreater(far_soul.timesteps, 1)
+            await near_soul.reap()
+            await far_soul.reap()
+
+        asyncio.run(_run())
+
+    def test_fast_forward_wander(self):
+        async def _run():
+            props = {"speed": 301, "max_distance_from_start_location": 10}
+            near_soul = self.add_npc(1, "on_event", props)
+            # Wandering shouldn't enter rooms with players
+            near_soul._fast_forward_timesteps(1)
+            self.assertEqual(near_soul.target_node.get_room(), self.rooms[2])
+            await near_soul.reap()
+
+            far_soul = self.add_npc(3, "on_event", props)
+            await asyncio.sleep(0)
+            self.assertTrue(far_soul.is_dormant())
+            # Pretend the soul slept through a timestep where it would move
+            far_soul._dormant_since = time.time() - 1.5
+            far_soul.wake()
+            self.assertEqual(far_soul.target_node.get_room(), self.rooms[2])
+            self.world.oo_graph.assert_valid()
+            await far_soul.reap()
+
+        asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    unittest.main()
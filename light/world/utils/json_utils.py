@@ -43,8 +43,8 @@ def create_agent_tree(node: GraphAgent) -> Dict[str, GraphNode]:
         new_node = unvisited_nodes.pop()
         agent_nodes[new_node.node_id] = new_node
         for v in new_node.contained_nodes.values():
-            if v._target_node.node_id not in agent_nodes:
-                unvisited_nodes.append(v._target_node)
+            if v.target_id not in agent_nodes:
+                unvisited_nodes.append(v.get())
 
     return agent_nodes
 
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Helpers for estimating how much memory parts of a world are holding on to"""
+
+import asyncio
+import gc
+import sys
+import types
+from typing import Any, Iterable, Set, Tuple
+
+# Objects never counted towards a size, or followed to what they refer to
+DEFAULT_STOP_TYPES: Tuple[type, ...] = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    types.FrameType,
+    types.CoroutineType,
+    asyncio.Future,
+    asyncio.AbstractEventLoop,
+)
+
+
+def get_deep_size(
+    objs: Iterable[Any],
+    seen: Set[int],
+    stop_types: Tuple[type, ...] = DEFAULT_STOP_TYPES,
+) -> int:
+    """
+    Return the bytes used by the given objects and everything they refer to,
+    skipping anything whose id is in seen and anything of the stop_types.
+    Counted objects are added to seen, so sharing one set between calls
+    counts every object towards the first call that reaches it.
+    """
+    size = 0
+    pending = list(objs)
+    while len(pending) > 0:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, stop_types):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        pending.extend(gc.get_referents(obj))
+    return size
@@ -9,12 +9,17 @@ from light.graph.elements.graph_nodes import GraphRoom
 from light.world.action_parser import ActionParser
 from light.world.content_loggers import RoomInteractionLogger
 
-from copy import deepcopy
+from copy import copy
 import emoji
+import gc
+import logging
 import os
 import random
 import asyncio
 import re
+import time
+from collections import deque
+from uuid import uuid4
 
 from light.graph.utils import rm, deprecated
 from light.graph.events.base import GraphEvent, ErrorEvent
@@ -30,14 +35,15 @@ from light.graph.events.all_events_list import (
     ALL_EVENTS_LIST,
 )
 from light.graph.events.magic import init_magic
-from light.graph.elements.graph_nodes import GraphNode, GraphAgent
+from light.graph.elements.graph_nodes import GraphNode, GraphAgent, get_msgpack
 from light.world.views import WorldViewer
 from light.world.purgatory import Purgatory
+from light.world.npc_scheduler import NPCScheduler
+from light.world.utils.memory_utils import DEFAULT_STOP_TYPES, get_deep_size
 
-from typing import List, Optional, Dict, Any, TYPE_CHECKING
+from typing import List, Optional, Dict, Any, Set, Tuple, TYPE_CHECKING
 from dataclasses import dataclass, field
 
-
 if TYPE_CHECKING:
     from light.data_model.db.episodes import EpisodeDB
     from light.registry.model_pool import ModelPool
@@ -62,6 +68,53 @@ def check_integrity(f):
     return wrapper
 
 
+# Valid events for an event class, and their canonical forms (built lazily)
+PossibleEventsEntry = Tuple[List[GraphEvent], Optional[List[Optional[str]]]]
+
+# Version of the binary format written by World.get_checkpoint
+WORLD_CHECKPOINT_FORMAT = 1
+
+# Histories that agents and their souls accumulate while the world runs
+AGENT_HISTORY_ATTRIBUTES = [
+    "_observations",
+    "_text_buffer",
+    "_utterance_history",
+    "_action_history",
+    "_last_interaction_history",
+]
+
+
+def write_file_atomic(fname: str, contents: bytes) -> None:
+    """Write the file such that readers only ever see a complete version"""
+    tmp_fname = f"{fname}.{os.getpid()}.tmp"
+    with open(tmp_fname, "wb") as tmp_file:
+        tmp_file.write(contents)
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+    os.replace(tmp_fname, fname)
+
+
+class ForkedRoomLoggers(dict):
+    """
+    Room interaction loggers for a forked world, only created for the rooms
+    that are used rather than for every room when the fork is made
+    """
+
+    def __init__(self, world: "World"):
+        super().__init__()
+        self._world = world
+
+    def __contains__(self, room_id) -> bool:
+        return super().__contains__(room_id) or room_id in self._world.oo_graph.rooms
+
+    def __missing__(self, room_id: str) -> RoomInteractionLogger:
+        if room_id not in self._world.oo_graph.rooms:
+            raise KeyError(room_id)
+        logger = RoomInteractionLogger(self._world, room_id)
+        self[room_id] = logger
+        return logger
+
+
 def get_empty_model_pool():
     from light.registry.model_pool import ModelPool
 
@@ -79,8 +132,18 @@ class WorldConfig:
     graph_builder: Optional["GraphBuilder"] = None
     model_pool: Optional["ModelPool"] = field(default_factory=get_empty_model_pool)
     is_logging: bool = False
+    # Either "fragments" (content-addressed node fragments) or "full"
+    log_snapshot_mode: str = "fragments"
     safety_classifier_path: Optional[str] = None
     magic_db_path: Optional[str] = "/scratch/light/data/magic.db"
+    # If set, model NPC timesteps are scheduled with at most this many in flight
+    max_npc_model_ticks: Optional[int] = None
+    # If set, NPC souls further than this many rooms from players go dormant
+    npc_interest_radius: Optional[int] = None
+    # Utterances per agent remembered to avoid repeating, and dialogue turns
+    # kept as model context, for model NPC souls
+    max_utterance_history: int = 1000
+    max_interaction_history: int = 100
 
     def copy(self) -> "WorldConfig":
         """Return a new shallow copy of this WorldConfig"""
@@ -89,8 +152,13 @@ class WorldConfig:
             graph_builder=self.graph_builder,
             model_pool=self.model_pool,
             is_logging=self.is_logging,
+            log_snapshot_mode=self.log_snapshot_mode,
             safety_classifier_path=self.safety_classifier_path,
             magic_db_path=self.magic_db_path,
+            max_npc_model_ticks=self.max_npc_model_ticks,
+            npc_interest_radius=self.npc_interest_radius,
+            max_utterance_history=self.max_utterance_history,
+            max_interaction_history=self.max_interaction_history,
         )
 
 
@@ -114,6 +182,7 @@ class World(object):
         self.view = WorldViewer(self)
         self.purgatory = Purgatory(self)
         self.is_logging = config.is_logging
+        self.log_snapshot_mode = config.log_snapshot_mode
         self.episode_db = config.episode_db
         model_pool = config.model_pool
         if model_pool is None:
@@ -142,6 +211,26 @@ class World(object):
         # Set up action parser.
         self.action_parser = ActionParser(self.model_pool)
 
+        # Set up scheduling for model NPCs, if they shouldn't all run at once
+        self.npc_scheduler: Optional[NPCScheduler] = None
+        if config.max_npc_model_ticks is not None:
+            self.npc_scheduler = NPCScheduler(self, config.max_npc_model_ticks)
+
+        # Rooms near human players, where NPC souls are simulated
+        self.npc_interest_radius = config.npc_interest_radius
+        self._rooms_of_interest: Optional[Set[str]] = None
+        self._player_rooms: Dict[str, Optional[str]] = {}
+
+        # Caps on the histories souls keep on their agents
+        self.max_utterance_history = config.max_utterance_history
+        self.max_interaction_history = config.max_interaction_history
+
+        # Valid events per actor, invalidated by room version changes
+        self._room_versions: Dict[str, int] = {}
+        self._possible_events_cache: Dict[
+            str, Tuple[Tuple[Any, ...], Dict[str, PossibleEventsEntry]]
+        ] = {}
+
     @property
     def oo_graph(self):
         """Wrapper around oo_graph allowing us to do special configuration when set"""
@@ -156,6 +245,8 @@ class World(object):
         # TODO maybe there's a better way to do this? What happens when we add a new room
         # to an existin graph?
         self._oo_graph = oo_graph
+        self._possible_events_cache = {}
+        self._rooms_of_interest = None
         for room_id in oo_graph.rooms.keys():
             oo_graph.room_id_to_loggers[room_id] = RoomInteractionLogger(self, room_id)
 
@@ -188,12 +279,26 @@ class World(object):
 
     def copy(self):
         """return a copy of this world"""
-        # TODO copy the graph, then copy the world
-        return deepcopy(self)
+        return self.fork()
+
+    def fork(self) -> "World":
+        """
+        Return a world over a copy-on-access fork of this world's graph, for
+        simulations that shouldn't affect this world. The fork shares the
+        config, but not the souls or players. This world's graph must not
+        change while forks are in use.
+        """
+        world = World(self._config, self.debug)
+        oo_graph = self.oo_graph.fork()
+        oo_graph.room_id_to_loggers = ForkedRoomLoggers(world)
+        world._oo_graph = oo_graph
+        world._node_freeze = self._node_freeze
+        world._cnt = self._cnt
+        return world
 
     def unique_hash(self):
         # TODO: consider world properties
-        return self.oo_graph.to_json()
+        return self.oo_graph.to_json(compact=True)
 
     def __eq__(self, other):
         return self.unique_hash() == other.unique_hash()
@@ -210,15 +315,99 @@ class World(object):
         """return a list of all the node ids in the graph"""
         return self.oo_graph.get_all_ids()
 
+    def get_checkpoint(self) -> bytes:
+        """
+        Encode the live state of this world (the graph, which filler souls
+        inhabit which agents, the player mapping, and counters) as msgpack.
+        The graph encoding reuses each node's cached encoding, so only nodes
+        that changed since the last checkpoint are encoded again.
+        """
+        msgpack = get_msgpack()
+        checkpoint = {
+            "checkpoint_format": WORLD_CHECKPOINT_FORMAT,
+            "graph": self.oo_graph.to_msgpack(),
+            "graph_cnt": self.oo_graph.cnt,
+            "dead_node_ids": sorted(self.oo_graph.dead_nodes.keys()),
+            "cnt": self._cnt,
+            "node_freeze": self._node_freeze,
+            "player_cnt": self._player_cnt,
+            "playerid_to_agentid": self._playerid_to_agentid,
+            "purgatory": self.purgatory.get_checkpoint(),
+        }
+        return msgpack.packb(checkpoint)
+
+    def restore_checkpoint(self, checkpoint: bytes) -> None:
+        """
+        Restore the state in the given checkpoint to this (freshly created)
+        world. Filler souls are refilled from the purgatory's registered
+        providers, so register them first. Player souls aren't restored, as
+        players need to rejoin.
+        """
+        msgpack = get_msgpack()
+        state = msgpack.unpackb(checkpoint)
+        checkpoint_format = state.get("checkpoint_format")
+        assert (
+            checkpoint_format == WORLD_CHECKPOINT_FORMAT
+        ), f"Unsupported world checkpoint format {checkpoint_format}"
+        # Rebuilding the graph allocates many objects but frees none, so
+        # cyclic garbage collection passes along the way are wasted work
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            oo_graph = OOGraph.from_msgpack(state["graph"])
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        oo_graph.cnt = state["graph_cnt"]
+        oo_graph.dead_nodes = {
+            node_id: oo_graph.all_nodes[node_id]
+            for node_id in state["dead_node_ids"]
+            if node_id in oo_graph.all_nodes
+        }
+        self.oo_graph = oo_graph
+        self._cnt = state["cnt"]
+        self._node_freeze = state["node_freeze"]
+        self._player_cnt = state["player_cnt"]
+        self._playerid_to_agentid = dict(state["playerid_to_agentid"])
+        self._agentid_to_playerid = {
+            a_id: p_id for p_id, a_id in self._playerid_to_agentid.items()
+        }
+        self.purgatory.restore_checkpoint(state["purgatory"])
+
     def save_graph(self, fname):
-        """Save this graph to the file"""
-        # TODO implement
-        raise NotImplementedError
+        """Save a checkpoint of this world to the file"""
+        write_file_atomic(fname, self.get_checkpoint())
+
+    async def save_graph_async(self, fname):
+        """
+        Save a checkpoint of this world to the file, only encoding it on the
+        event loop (where the graph can't change underneath) and writing it
+        out in an executor so that the loop isn't stalled on disk
+        """
+        checkpoint = self.get_checkpoint()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, write_file_atomic, fname, checkpoint)
+
+    def start_periodic_checkpoints(self, fname, interval: float) -> "asyncio.Task":
+        """
+        Save a checkpoint to the file every interval seconds in the background,
+        until the returned task is cancelled
+        """
+
+        async def checkpoint_loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.save_graph_async(fname)
+                except Exception:
+                    logging.exception(f"Failed to checkpoint world to {fname}")
+
+        return asyncio.create_task(checkpoint_loop())
 
     def load_graph(self, fname):
-        """load the contents of the file to this graph"""
-        # TODO implement
-        raise NotImplementedError
+        """Restore this world from a checkpoint saved to the file"""
+        with open(fname, "rb") as checkpoint_file:
+            self.restore_checkpoint(checkpoint_file.read())
 
     def freeze(self, freeze=None):
         if freeze is not None:
@@ -783,24 +972,231 @@ class World(object):
     def print_graph(self, start_node, agentid, visited=False):
         return self._graph_printer.print(self, start_node, agentid, visited)
 
-    def get_possible_actions(self, my_agent_id, use_actions=None):
-        graph_events = self.get_possible_events(my_agent_id, use_actions)
-        return [e.to_canonical_form() for e in graph_events]
+    def bump_room_version(self, room: Optional[GraphNode]) -> None:
+        """Invalidate any cached state for the given room"""
+        if not room:
+            return
+        self._room_versions[room.node_id] = self._room_versions.get(room.node_id, 0) + 1
 
-    def get_possible_events(self, my_agent_id, use_actions=None):
-        if self.get_prop(my_agent_id, "dead"):
-            return []
+    def note_event_executed(self, event: GraphEvent) -> None:
+        """
+        Bump the versions of every room an executed event may have changed,
+        called automatically after every event's execute
+        """
+        nodes = [getattr(event, "room", None), getattr(event, "actor", None)]
+        nodes += getattr(event, "target_nodes", [])
+        players_moved = False
+        for node in nodes:
+            if not isinstance(node, GraphNode):
+                continue
+            if self.oo_graph.get_node(node.node_id) is not node:
+                continue  # Deleted by this event, covered by the event room
+            self.bump_room_version(self._get_placed_room(node))
+            if self.npc_interest_radius is not None and getattr(
+                node, "is_player", False
+            ):
+                room = node.get_room()
+                room_id = room.node_id if room else None
+                if self._player_rooms.get(node.node_id, False) != room_id:
+                    players_moved = True
+        if players_moved:
+            self.update_interest()
+
+    # -- Memory accounting -- #
+
+    def get_memory_report(self) -> Dict[str, int]:
+        """
+        Estimate the bytes this world holds, broken down into the graph's
+        nodes and indices, the histories kept on its agents, the buffers of
+        its interaction loggers, and the remaining state of its souls. Models
+        and anything shared with other worlds (such as the nodes of a forked
+        graph's parent) aren't counted.
+        """
+        graph = self.oo_graph
+        # Objects reached from here are counted under the first part of the
+        # report to get to them, and the world itself is never followed
+        seen = {id(self), id(graph), id(self.model_pool)}
+        stop_types = DEFAULT_STOP_TYPES + (World, OOGraph)
+        nodes = graph.get_owned_nodes()
+        histories = [
+            getattr(node, attr)
+            for node in nodes
+            for attr in AGENT_HISTORY_ATTRIBUTES
+            if hasattr(node, attr)
+        ]
+        # Observations refer to nodes, which are counted under the graph
+        report = {
+            "agent_histories": get_deep_size(
+                histories, seen, stop_types + (GraphNode,)
+            ),
+            "graph": get_deep_size(
+                nodes + [graph._name_index, graph._room_distances], seen, stop_types
+            ),
+        }
+        souls = list(self.purgatory.node_id_to_soul.values())
+        loggers = list(graph.room_id_to_loggers.values())
+        loggers += [
+            soul.agent_logger for soul in souls if hasattr(soul, "agent_logger")
+        ]
+        buffers = []
+        for logger in loggers:
+            buffers += [logger.state_history, logger.event_buffer, logger.fragments]
+        report["logger_buffers"] = get_deep_size(buffers, seen, stop_types)
+        report["souls"] = get_deep_size(souls, seen, stop_types)
+        report["total"] = sum(report.values())
+        return report
+
+    # -- Area of interest -- #
+
+    def get_player_distances(self, max_distance: int) -> Dict[str, int]:
+        """
+        Return the room hops from the nearest human player for every room
+        within max_distance hops of one
+        """
+        distances: Dict[str, int] = {}
+        queue = deque()
+        for player in self.oo_graph.get_humans():
+            room = player.get_room()
+            if room and room.node_id not in distances:
+                distances[room.node_id] = 0
+                queue.append(room)
+        while len(queue) > 0:
+            room = queue.popleft()
+            distance = distances[room.node_id]
+            if distance >= max_distance:
+                continue
+            for neighbor in room.get_neighbors():
+                if neighbor.node_id not in distances:
+                    distances[neighbor.node_id] = distance + 1
+                    queue.append(neighbor)
+        return distances
+
+    def update_interest(self) -> None:
+        """
+        Recompute the rooms within npc_interest_radius of a human player, and
+        wake the dormant souls in any rooms that just came into range
+        """
+        if self.npc_interest_radius is None:
+            return
+        self._player_rooms = {}
+        for player in self.oo_graph.get_humans():
+            room = player.get_room()
+            self._player_rooms[player.node_id] = room.node_id if room else None
+        old_rooms = self._rooms_of_interest
+        self._rooms_of_interest = set(
+            self.get_player_distances(self.npc_interest_radius).keys()
+        )
+        if old_rooms is not None:
+            new_rooms = self._rooms_of_interest - old_rooms
+            if len(new_rooms) > 0:
+                self.purgatory.wake_souls_in_rooms(new_rooms)
+
+    def is_room_of_interest(self, room: Optional[GraphNode]) -> bool:
+        """
+        Return whether NPCs in the given room should be simulated, which is
+        always the case unless the world has an npc_interest_radius
+        """
+        if self.npc_interest_radius is None or not room:
+            return True
+        if self._rooms_of_interest is None:
+            self.update_interest()
+        return room.node_id in self._rooms_of_interest
+
+    def _get_placed_room(self, node: GraphNode) -> Optional[GraphNode]:
+        """Return the room containing the node, or None if it's in the void"""
+        while not node.room:
+            node = node.get_container()
+            if node is None or node is self.oo_graph.void:
+                return None
+        return node
+
+    def _get_possible_events_key(self, actor_node: GraphNode) -> Tuple[Any, ...]:
+        """
+        Return the key cached valid events for an actor are stored under. It
+        covers the version of the actor's room, as well as the size of the room
+        and the actor's inventory to catch moves made outside of events.
+        """
+        room = self._get_placed_room(actor_node)
+        if room is None:
+            return (None, len(actor_node.contained_nodes))
+        return (
+            room.node_id,
+            self._room_versions.get(room.node_id, 0),
+            len(room.contained_nodes),
+            len(actor_node.contained_nodes),
+        )
+
+    def _get_possible_events_entries(
+        self, my_agent_id, use_actions=None
+    ) -> List[Tuple[str, PossibleEventsEntry]]:
+        """
+        Return the cached valid events for each of the requested event
+        classes, computing any that are missing or out of date
+        """
         use_events = ALL_EVENTS_LIST
         if use_actions is not None:
             use_events = [ALL_EVENTS[name] for name in use_actions]
 
         actor_node = self.oo_graph.get_node(my_agent_id)
+        key = self._get_possible_events_key(actor_node)
+        cached = self._possible_events_cache.get(my_agent_id)
+        if cached is None or cached[0] != key:
+            cached = (key, {})
+            self._possible_events_cache[my_agent_id] = cached
+        class_entries = cached[1]
+
+        entries = []
+        for EventClass in use_events:
+            class_name = EventClass.__name__
+            if class_name not in class_entries:
+                class_entries[class_name] = (
+                    EventClass.get_valid_actions(self.oo_graph, actor_node),
+                    None,
+                )
+            entries.append((class_name, class_entries[class_name]))
+        return entries
+
+    def get_possible_actions(self, my_agent_id, use_actions=None):
+        """
+        Lightweight version of get_possible_events, returning the cached
+        canonical forms rather than new event objects
+        """
+        if self.get_prop(my_agent_id, "dead"):
+            return []
+        entries = self._get_possible_events_entries(my_agent_id, use_actions)
+        actor_entries = self._possible_events_cache[my_agent_id][1]
+        all_actions = []
+        for class_name, (events, canonical_forms) in entries:
+            if canonical_forms is None:
+                canonical_forms = [e.to_canonical_form() for e in events]
+                actor_entries[class_name] = (events, canonical_forms)
+            all_actions += canonical_forms
+        return all_actions
 
+    def get_possible_events(self, my_agent_id, use_actions=None):
+        """
+        Return all of the events the given agent could take right now. Results
+        are cached per actor until something changes in their room, so fresh
+        copies of the cached events are returned for callers to execute.
+        """
+        if self.get_prop(my_agent_id, "dead"):
+            return []
+        entries = self._get_possible_events_entries(my_agent_id, use_actions)
         all_events = []
-        for EventClass in use_events:
-            all_events += EventClass.get_valid_actions(self.oo_graph, actor_node)
+        for _class_name, (events, _canonical) in entries:
+            all_events += [self._copy_possible_event(e) for e in events]
         return all_events
 
+    def _copy_possible_event(self, event: GraphEvent) -> GraphEvent:
+        """Return an unexecuted copy of the given event with a new identity"""
+        event_copy = copy(event)
+        event_copy.event_id = str(uuid4())
+        event_copy.executed = False
+        event_copy.event_time = time.time()
+        event_copy.target_nodes = list(event.target_nodes)
+        event_copy._shared_frontend_form = None
+        return event_copy
+
     # TODO refactor parsing methods with action objects
     def help_message(self):
         h = ["Have you tried typing help?"]
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+import argparse
+import os
+import pickle
+import random
+import tempfile
+import time
+
+from light.data_model.light_database import (
+    LIGHTDatabase,
+    DB_EDGE_IN_CONTAINED,
+    DB_STATUS_PROD,
+)
+
+"""
+This script writes a synthetic environment pickle, and times loading it into
+a fresh LIGHTDatabase with the bulk loader in add_environment_data, against
+inserting the same entries one create_* call at a time as it used to.
+
+Example:
+python scripts/misc/benchmark_bulk_import.py --num-rooms 2000
+"""
+
+PICKLE_ATTRS = {"is_from_pickle": True, "status": DB_STATUS_PROD}
+
+
+def make_environment(args):
+    """Return environment data in the format of the LIGHT pickle dumps"""
+    rooms, characters, objects = {}, {}, {}
+    for idx in range(args.num_rooms * args.per_room):
+        characters[idx] = {
+            "base_form": [f"creature {idx % 200}"],
+            "character_id": idx,
+            "name": f"creature {idx}",
+            "desc": f"a creature numbered {idx}",
+            "personas": [f"I am creature {idx}", f"I like number {idx}"],
+            "char_type": "creature",
+            "wearing_objects": [],
+            "wielding_objects": [],
+            "carrying_objects": [idx],
+        }
+        objects[idx] = {
+            "base_form": [f"thing {idx % 200}"],
+            "object_id": idx,
+            "name": f"thing {idx}",
+            "descriptions": [f"a thing numbered {idx}"],
+            "is_container": 0.0,
+            "is_drink": 0.0,
+            "is_food": 0.0,
+            "is_gettable": 1.0,
+            "is_surface": 0.0,
+            "is_wearable": 0.0,
+            "is_weapon": 0.0,
+        }
+    for idx in range(args.num_rooms):
+        contents = list(range(idx * args.per_room, (idx + 1) * args.per_room))
+        rooms[idx] = {
+            "room_id": idx,
+            "category": f"place {idx % 100}",
+            "setting": f"room {idx}",
+            "description": f"a room numbered {idx}",
+            "background": f"the story of room {idx}",
+            "in_characters": contents,
+            "in_objects": contents,
+            "ex_characters": [],
+            "ex_objects": [],
+        }
+    neighbors = {
+        idx: {
+            "room_id": idx,
+            "destination": f"room {(idx + 1) % args.num_rooms}",
+            "direction": "north",
+            "connection": "a path",
+        }
+        for idx in range(args.num_rooms)
+    }
+    return {
+        "rooms": rooms,
+        "characters": characters,
+        "objects": objects,
+        "neighbors": neighbors,
+    }
+
+
+def load_row_by_row(db, data):
+    """Insert the environment with one create_* call per entry"""
+    room_ids, char_ids, obj_ids = {}, {}, {}
+    for r in data["rooms"].values():
+        base_id = db.create_base_room(r["category"], dict(PICKLE_ATTRS))[0]
+        room_ids[r["room_id"]] = db.create_room(
+            r["setting"], base_id, r["description"], r["background"], dict(PICKLE_ATTRS)
+        )[0]
+    for c in data["characters"].values():
+        base_id = db.create_base_character(c["base_form"][0], dict(PICKLE_ATTRS))[0]
+        char_ids[c["character_id"]] = [
+            db.create_character(
+                c["name"], base_id, persona, c["desc"], dict(PICKLE_ATTRS)
+            )[0]
+            for persona in c["personas"]
+        ]
+    for o in data["objects"].values():
+        base_id = db.create_base_object(o["base_form"][0], dict(PICKLE_ATTRS))[0]
+        obj_ids[o["object_id"]] = db.create_object(
+            o["name"],
+            base_id,
+            *[o[attr] for attr in ["is_container", "is_drink", "is_food"]],
+            *[o[attr] for attr in ["is_gettable", "is_surface", "is_wearable"]],
+            o["is_weapon"],
+            o["descriptions"][0],
+            dict(PICKLE_ATTRS),
+        )[0]
+    for r in data["rooms"].values():
+        for i in r["in_characters"]:
+            for char_id in char_ids[i]:
+                db.create_node_content(
+                    room_ids[r["room_id"]],
+                    char_id,
+                    DB_EDGE_IN_CONTAINED,
+                    1,
+                    dict(PICKLE_ATTRS),
+                )
+        for i in r["in_objects"]:
+            db.create_node_content(
+                room_ids[r["room_id"]],
+                obj_ids[i],
+                DB_EDGE_IN_CONTAINED,
+                1,
+                dict(PICKLE_ATTRS),
+            )
+
+
+def count_rows(db):
+    return len(db.get_id())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk database imports")
+    parser.add_argument("--num-rooms", type=int, default=2000)
+    parser.add_argument("--per-room", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    data_dir = tempfile.mkdtemp()
+    pklpath = os.path.join(data_dir, "enviro.pickle")
+    data = make_environment(args)
+    with open(pklpath, "wb") as pkl_file:
+        pickle.dump(data, pkl_file)
+
+    start_time = time.time()
+    with LIGHTDatabase(os.path.join(data_dir, "row_by_row.db")) as db:
+        load_row_by_row(db, data)
+        num_rows = count_rows(db)
+    elapsed = time.time() - start_time
+    print(
+        f"row by row: {num_rows} entries in {elapsed:.1f}s "
+        f"({num_rows / elapsed:.0f} entries/s, without text or neighbor edges)"
+    )
+
+    start_time = time.time()
+    with LIGHTDatabase(os.path.join(data_dir, "bulk.db")) as db:
+        db.add_environment_data(pklpath, disable_TQDM=True)
+        num_rows = count_rows(db)
+    elapsed = time.time() - start_time
+    print(
+        f"bulk: {num_rows} entries in {elapsed:.1f}s "
+        f"({num_rows / elapsed:.0f} entries/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
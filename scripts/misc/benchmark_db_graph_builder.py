@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+from light.data_model.db.base import LightLocalDBConfig
+from light.data_model.db.environment import DBEdgeType, EnvDB
+from light.graph.builders.base import DBGraphBuilder, GraphBuilderConfig
+
+"""
+This script times how long a DBGraphBuilder takes to set up over a synthetic
+EnvDB, and then to resolve the text features and ids of candidate rooms,
+objects, and characters the way model-based builders do while building a
+world. The in-memory lookups are compared against searching the db for each
+candidate.
+
+Example:
+python scripts/misc/benchmark_db_graph_builder.py --num-rooms 200
+"""
+
+
+def build_db(db, num_rooms, objects_per_room, agents_per_room):
+    """Fill the db with rooms that each contain some objects and agents"""
+    room_feats, obj_feats, char_feats = [], [], []
+    for room_idx in range(num_rooms):
+        room_id = db.create_room_entry(
+            f"room {room_idx}", "room", "A benchmark room.", "It was built."
+        )
+        room_feats.append((f"room {room_idx}. room", room_id))
+        for obj_idx in range(objects_per_room):
+            name = f"object {room_idx}-{obj_idx}"
+            obj_id = db.create_object_entry(
+                name, "object", "A benchmark object", 0, 0, 0, 1, 0, 0, 0
+            )
+            db.create_edge(room_id, obj_id, DBEdgeType.CONTAINS)
+            obj_feats.append((f"{name}. A benchmark object", obj_id))
+        for agent_idx in range(agents_per_room):
+            name = f"agent {room_idx}-{agent_idx}"
+            agent_id = db.create_agent_entry(
+                name, "agent", "I am a benchmark agent.", "A benchmark agent"
+            )
+            db.create_edge(room_id, agent_id, DBEdgeType.CONTAINS)
+            char_feats.append((f"{name}. I am a benchmark agent.", agent_id))
+    return room_feats, obj_feats, char_feats
+
+
+def search_db(db, text_feats, element_type):
+    """Resolve a candidate by searching the db, as builders used to"""
+    features = text_feats.split(". ", 1)
+    if element_type == "room":
+        elems = db.find_rooms(name=features[0])
+    elif element_type == "object":
+        elems = db.find_objects(name=features[0], physical_description=features[1])
+    else:
+        elems = db.find_agents(name=features[0], persona=features[1])
+    return elems[0].db_id
+
+
+def time_resolution(name, candidates, resolve):
+    start_time = time.time()
+    for text_feats, element_type, db_id in candidates:
+        assert resolve(text_feats, element_type) == db_id
+    elapsed = time.time() - start_time
+    print(
+        f"{name}: {elapsed:.3f}s for {len(candidates)} candidates "
+        f"({elapsed / len(candidates) * 1e6:.1f}us each)"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DBGraphBuilder lookups")
+    parser.add_argument("--num-rooms", type=int, default=100)
+    parser.add_argument("--objects-per-room", type=int, default=5)
+    parser.add_argument("--agents-per-room", type=int, default=3)
+    parser.add_argument("--num-candidates", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    data_dir = tempfile.mkdtemp()
+    try:
+        db = EnvDB(LightLocalDBConfig(file_root=data_dir))
+        start_time = time.time()
+        room_feats, obj_feats, char_feats = build_db(
+            db, args.num_rooms, args.objects_per_room, args.agents_per_room
+        )
+        print(f"Filled db in {time.time() - start_time:.2f}s")
+
+        start_time = time.time()
+        builder = DBGraphBuilder(GraphBuilderConfig(), db, allow_blocked=True)
+        print(f"Builder setup: {time.time() - start_time:.3f}s")
+
+        candidates = []
+        for _ in range(args.num_candidates):
+            element_type, feats = random.choice(
+                [("room", room_feats), ("object", obj_feats), ("char", char_feats)]
+            )
+            text_feats, db_id = random.choice(feats)
+            candidates.append((text_feats, element_type, db_id))
+
+        feats_to_id = {
+            "room": builder.roomfeats_to_id,
+            "object": builder.objfeats_to_id,
+            "char": builder.charfeats_to_id,
+        }
+        from_id = {
+            "room": builder.get_room_from_id,
+            "object": builder.get_obj_from_id,
+            "char": builder.get_char_from_id,
+        }
+
+        def resolve_in_memory(text_feats, element_type):
+            db_id = feats_to_id[element_type](text_feats)
+            return from_id[element_type](db_id).db_id
+
+        def resolve_with_search(text_feats, element_type):
+            db_id = search_db(db, text_feats, element_type)
+            return from_id[element_type](db_id).db_id
+
+        searched = time_resolution("db search", candidates, resolve_with_search)
+        in_memory = time_resolution("in memory", candidates, resolve_in_memory)
+        print(f"Speedup: {searched / in_memory:.1f}x")
+
+        # Resolving every room along with its contents, as when building a world
+        start_time = time.time()
+        for room_id in builder.get_usable_rooms():
+            room = builder.get_room_from_id(room_id)
+            for edge in room.node_edges:
+                child = builder.get_obj_from_id(edge.child_id)
+                if child is None:
+                    child = builder.get_char_from_id(edge.child_id)
+                assert child is not None
+        print(f"World build: {time.time() - start_time:.3f}s")
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == "__main__":
+    main()
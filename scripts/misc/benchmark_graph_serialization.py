@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+import argparse
+import random
+import time
+
+from light.graph.structured_graph import OOGraph
+
+"""
+This script compares the full json export of an OOGraph against the compact
+and msgpack exports, which only re-encode the nodes that changed since the
+previous export.
+"""
+
+
+def build_graph(num_rooms, objects_per_room, agents_per_room):
+    """Create a chain of connected rooms full of objects and agents"""
+    graph = OOGraph(title="benchmark")
+    rooms = []
+    for room_idx in range(num_rooms):
+        room = graph.add_room(f"room {room_idx}", {"desc": "A benchmark room"})
+        if len(rooms) > 0:
+            graph.add_paths_between(
+                room, rooms[-1], f"a path to room {room_idx - 1}", "a path back"
+            )
+        rooms.append(room)
+        for obj_idx in range(objects_per_room):
+            obj = graph.add_object(
+                f"object {room_idx}-{obj_idx}", {"desc": "A benchmark object"}
+            )
+            obj.force_move_to(room)
+        for agent_idx in range(agents_per_room):
+            agent = graph.add_agent(
+                f"agent {room_idx}-{agent_idx}", {"persona": "A benchmark agent"}
+            )
+            agent.force_move_to(room)
+    return graph
+
+
+def time_call(fn, repeats):
+    """Return the average runtime of fn over the given repeats"""
+    start_time = time.time()
+    for _ in range(repeats):
+        fn()
+    return (time.time() - start_time) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark graph serialization")
+    parser.add_argument("--num-rooms", type=int, default=200)
+    parser.add_argument("--objects-per-room", type=int, default=10)
+    parser.add_argument("--agents-per-room", type=int, default=3)
+    parser.add_argument(
+        "--changes-per-export",
+        type=int,
+        default=10,
+        help="Number of agents to update between each warm export",
+    )
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    graph = build_graph(args.num_rooms, args.objects_per_room, args.agents_per_room)
+    agents = list(graph.agents.values())
+    print(f"Graph with {len(graph.all_nodes)} nodes")
+
+    def change_some_agents():
+        for agent in random.sample(agents, min(len(agents), args.changes_per_export)):
+            agent.health = random.randint(1, 10)
+
+    def warm(export_fn):
+        def run():
+            change_some_agents()
+            export_fn()
+
+        return run
+
+    full_time = time_call(warm(graph.to_json), args.repeats)
+    print(f"to_json():             {full_time * 1000:.1f}ms")
+    compact_time = time_call(warm(lambda: graph.to_json(compact=True)), args.repeats)
+    print(
+        f"to_json(compact=True): {compact_time * 1000:.1f}ms "
+        f"({full_time / compact_time:.1f}x)"
+    )
+    try:
+        msgpack_time = time_call(warm(graph.to_msgpack), args.repeats)
+    except ImportError:
+        return
+    print(
+        f"to_msgpack():          {msgpack_time * 1000:.1f}ms "
+        f"({full_time / msgpack_time:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+import argparse
+import random
+import time
+
+from light.graph.structured_graph import OOGraph
+from light.modeling.agents.quests.rl.switch.environments.subproc_envs import (
+    SubprocGameEnvs,
+    execute_action,
+    graph_from_json,
+    list_possible_actions,
+)
+
+"""
+This script measures the env steps per second of the game side of the quest
+RL environments, where each step lists the partner agent's possible actions
+and then executes one of them. Graphs are stepped serially on the main process
+and then sharded across worker processes, optionally sleeping for a simulated
+batched model call each step that the workers can overlap with.
+
+Example:
+python scripts/misc/benchmark_quest_envs.py --num-envs 16 --num-workers 4
+"""
+
+
+def build_graph_json(seed, num_objects, num_agents):
+    """Make a serialized room containing the partner, other agents, and objects"""
+    rng = random.Random(seed)
+    graph = OOGraph()
+    room = graph.add_room(f"room {seed}", {"desc": "A benchmark room."})
+    partner = graph.add_agent(f"partner {seed}", {})
+    partner.force_move_to(room)
+    for idx in range(num_agents):
+        agent = graph.add_agent(f"agent {seed}-{idx}", {})
+        agent.force_move_to(room)
+    for idx in range(num_objects):
+        props = {"food": rng.random() < 0.3, "wearable": rng.random() < 0.3}
+        obj = graph.add_object(f"object {seed}-{idx}", props)
+        obj.force_move_to(room if rng.random() < 0.7 else partner)
+    return graph.to_json(), partner.node_id
+
+
+def get_episodes(args):
+    return [
+        build_graph_json(seed, args.num_objects, args.num_agents)
+        for seed in range(args.num_envs * (args.num_steps // args.episode_steps + 1))
+    ]
+
+
+def choose_actions(rngs, possible_actions):
+    return [
+        rng.choice(actions) if len(actions) > 0 else None
+        for rng, actions in zip(rngs, possible_actions)
+    ]
+
+
+def run_serial(args, episodes):
+    """Step every game graph on the main process, as the wrappers do by default"""
+    worlds = [graph_from_json(graph_json) for graph_json, _ in episodes]
+    rngs = [random.Random(idx) for idx in range(args.num_envs)]
+    episode_idxs = list(range(args.num_envs))
+    history = []
+    start_time = time.time()
+    for step in range(args.num_steps):
+        possible_actions = [
+            list_possible_actions(worlds[ep], episodes[ep][1]) for ep in episode_idxs
+        ]
+        history.append(possible_actions)
+        time.sleep(args.model_delay)
+        chosen = choose_actions(rngs, possible_actions)
+        for idx, action in enumerate(chosen):
+            if action is not None:
+                ep = episode_idxs[idx]
+                execute_action(worlds[ep], episodes[ep][1], action)
+        if (step + 1) % args.episode_steps == 0:
+            episode_idxs = [ep + args.num_envs for ep in episode_idxs]
+        # The next observation is encoded after the game step
+        time.sleep(args.model_delay)
+    return time.time() - start_time, history
+
+
+def run_subproc(args, episodes):
+    """Step game graphs in worker processes, overlapping with model calls"""
+    worlds = [graph_from_json(graph_json) for graph_json, _ in episodes]
+    rngs = [random.Random(idx) for idx in range(args.num_envs)]
+    episode_idxs = list(range(args.num_envs))
+    game_envs = SubprocGameEnvs(args.num_envs, args.num_workers)
+    history = []
+    try:
+        # Wait for the workers to start up before timing
+        game_envs.get_possible_actions()
+        start_time = time.time()
+        for idx, ep in enumerate(episode_idxs):
+            game_envs.set_graph(idx, worlds[ep], episodes[ep][1])
+        game_envs.step_async()
+        for step in range(args.num_steps):
+            possible_actions = game_envs.get_possible_actions()
+            history.append(possible_actions)
+            time.sleep(args.model_delay)
+            chosen = choose_actions(rngs, possible_actions)
+            for idx, action in enumerate(chosen):
+                if action is not None:
+                    game_envs.execute(idx, action)
+            if (step + 1) % args.episode_steps == 0:
+                episode_idxs = [ep + args.num_envs for ep in episode_idxs]
+                for idx, ep in enumerate(episode_idxs):
+                    game_envs.set_graph(idx, worlds[ep], episodes[ep][1])
+            game_envs.step_async()
+            # The next observation is encoded while the workers step
+            time.sleep(args.model_delay)
+        elapsed = time.time() - start_time
+    finally:
+        game_envs.close()
+    return elapsed, history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quest env stepping")
+    parser.add_argument("--num-envs", type=int, default=16)
+    parser.add_argument("--num-workers", type=int, default=4)
+    parser.add_argument("--num-steps", type=int, default=50)
+    parser.add_argument("--episode-steps", type=int, default=10)
+    parser.add_argument("--num-objects", type=int, default=20)
+    parser.add_argument("--num-agents", type=int, default=4)
+    parser.add_argument(
+        "--model-delay",
+        type=float,
+        default=0.0,
+        help="seconds to sleep per step for a simulated batched model call",
+    )
+    args = parser.parse_args()
+
+    episodes = get_episodes(args)
+    serial_time, serial_history = run_serial(args, episodes)
+    subproc_time, subproc_history = run_subproc(args, episodes)
+    # Later steps can diverge, as some game events (like stealing) are random
+    assert serial_history[0] == subproc_history[0], "Workers listed other actions"
+
+    env_steps = args.num_envs * args.num_steps
+    print(f"serial: {env_steps / serial_time:.1f} env steps/s")
+    print(
+        f"{args.num_workers} workers: {env_steps / subproc_time:.1f} env steps/s "
+        f"({serial_time / subproc_time:.2f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
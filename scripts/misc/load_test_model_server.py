@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+from parlai.core.message import Message
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+
+from deploy.web.server.model_server import ModelServer, tornado_settings
+from light.registry.model_batcher import ModelBatcher, ParlAIBatchedAgentWrapper
+
+"""
+This script load tests the model server with a stub model, so that it can run
+on CPU. The stub's batch_act sleeps for a fixed overhead plus a per-item cost,
+approximating a forward pass, and the script reports the throughput and
+latency of many concurrent clients along with the server's /stats.
+
+Example:
+python scripts/misc/load_test_model_server.py --max-batch-size 1
+python scripts/misc/load_test_model_server.py --max-batch-size 16
+"""
+
+
+class StubBatchModel:
+    """Stand-in for a model whose batched forward pass amortizes overhead"""
+
+    def __init__(self, batch_overhead, item_cost):
+        self.batch_overhead = batch_overhead
+        self.item_cost = item_cost
+
+    def batch_act(self, observations):
+        time.sleep(self.batch_overhead + self.item_cost * len(observations))
+        return [
+            Message({"text": f"You said: {obs['text']}", "episode_done": False})
+            for obs in observations
+        ]
+
+
+async def run_client(session, url, num_requests, latencies):
+    """Send requests one after another, as a single soul would"""
+    for idx in range(num_requests):
+        start_time = time.time()
+        observation = {"text": f"request {idx}", "episode_done": True}
+        async with session.post(url, json={"observation": observation}) as resp:
+            await resp.json(content_type=None)
+        latencies.append(time.time() - start_time)
+
+
+async def run_load_test(args):
+    model = StubBatchModel(args.batch_overhead, args.item_cost)
+    batcher = ModelBatcher(
+        model.batch_act,
+        max_batch_size=args.max_batch_size,
+        batch_window=args.max_latency,
+    )
+    app = ModelServer(
+        ParlAIBatchedAgentWrapper(batcher), given_tornado_settings=tornado_settings
+    )
+    sock, port = bind_unused_port()
+    server = HTTPServer(app)
+    server.add_sockets([sock])
+    base_url = f"http://127.0.0.1:{port}"
+
+    latencies = []
+    connector = aiohttp.TCPConnector(limit=args.num_clients)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start_time = time.time()
+        await asyncio.gather(
+            *[
+                run_client(
+                    session,
+                    f"{base_url}/model_request",
+                    args.requests_per_client,
+                    latencies,
+                )
+                for _ in range(args.num_clients)
+            ]
+        )
+        elapsed = time.time() - start_time
+        async with session.get(f"{base_url}/stats") as resp:
+            stats = json.loads(await resp.text())
+    server.stop()
+
+    latencies.sort()
+    print(
+        f"{len(latencies)} requests from {args.num_clients} clients "
+        f"in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} req/s)"
+    )
+    print(
+        f"latency p50: {latencies[len(latencies) // 2] * 1000:.1f}ms "
+        f"p95: {latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms "
+        f"max: {latencies[-1] * 1000:.1f}ms"
+    )
+    print(json.dumps(stats, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the model server")
+    parser.add_argument("--num-clients", type=int, default=64)
+    parser.add_argument("--requests-per-client", type=int, default=20)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument(
+        "--max-latency",
+        type=float,
+        default=0.01,
+        help="Seconds the server waits for a batch to fill",
+    )
+    parser.add_argument(
+        "--batch-overhead",
+        type=float,
+        default=0.02,
+        help="Seconds of fixed cost for each stub forward pass",
+    )
+    parser.add_argument(
+        "--item-cost",
+        type=float,
+        default=0.001,
+        help="Seconds of cost for each item in a stub forward pass",
+    )
+    args = parser.parse_args()
+    asyncio.run(run_load_test(args))
+
+
+if __name__ == "__main__":
+    main()